@@ -1,5 +1,6 @@
 import { Injectable, ForbiddenException, Logger } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 
 export interface ResetDataResult {
   success: boolean;
@@ -13,7 +14,10 @@ export interface ResetDataResult {
 export class AdminService {
   private readonly logger = new Logger(AdminService.name);
 
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private catalogCache: CatalogCacheService,
+  ) {}
 
   /**
    * Zera todos os dados do servidor Railway, EXCETO usuários, branches e sessions de auth
@@ -189,6 +193,7 @@ export class AdminService {
         timeout: 120000, // 2 minutos para operação grande
       });
 
+      this.catalogCache.invalidateAll();
       this.logger.warn(`✅ RESET DE DADOS DO SERVIDOR CONCLUÍDO!`);
       this.logger.warn(`📊 Total de registros deletados: ${Object.values(stats).reduce((a, b) => a + b, 0)}`);
 
@@ -288,6 +293,7 @@ export class AdminService {
         },
       });
 
+      this.catalogCache.invalidate('settings');
       this.logger.warn(`📱 Comando de reset mobile criado: ${commandId}`);
       this.logger.warn(`   Target: ${targetDeviceId}`);
       this.logger.warn(`   Criado por: ${createdBy}`);
@@ -369,6 +375,7 @@ export class AdminService {
         },
       });
 
+      this.catalogCache.invalidate('settings');
       this.logger.log(`✅ Comando ${commandId} confirmado: ${success ? 'sucesso' : 'falha'}`);
       if (stats) {
         this.logger.log(`   Stats: ${JSON.stringify(stats)}`);
@@ -1,12 +1,14 @@
-import { Module, MiddlewareConsumer, NestModule } from '@nestjs/common';
+import { Module, MiddlewareConsumer, NestModule, RequestMethod } from '@nestjs/common';
 import { ConfigModule } from '@nestjs/config';
 import { ScheduleModule } from '@nestjs/schedule';
 import { BullModule } from '@nestjs/bull';
 import { LoggerMiddleware } from './common/middleware/logger.middleware';
 import { IdempotencyMiddleware } from './common/middleware/idempotency.middleware';
+import { ConditionalGetMiddleware, DataVersionMiddleware } from './common/middleware/conditional-get.middleware';
 
 // Core modules
 import { PrismaModule } from './prisma/prisma.module';
+import { CacheModule } from './cache/cache.module';
 import { AuthModule } from './auth/auth.module';
 import { UsersModule } from './users/users.module';
 import { BranchesModule } from './branches/branches.module';
@@ -62,6 +64,7 @@ import { AdminModule } from './admin/admin.module';
     
     // Core
     PrismaModule,
+    CacheModule,
     AuthModule,
     UsersModule,
     BranchesModule,
@@ -108,6 +111,23 @@ export class AppModule implements NestModule {
       .apply(IdempotencyMiddleware)
       .forRoutes('sales', 'debts', 'purchases', 'inventory', 'cash-box');
     
+    // Versão de dados - toda escrita invalida os ETags da filial
+    consumer
+      .apply(DataVersionMiddleware)
+      .forRoutes('*');
+
+    // ETag / GET condicional - listas grandes consultadas por polling
+    consumer
+      .apply(ConditionalGetMiddleware)
+      .forRoutes(
+        { path: 'inventory', method: RequestMethod.GET },
+        { path: 'inventory/(.*)', method: RequestMethod.GET },
+        { path: 'products', method: RequestMethod.GET },
+        { path: 'products/(.*)', method: RequestMethod.GET },
+        { path: 'sync/pull-delta', method: RequestMethod.GET },
+        { path: 'reports/(.*)', method: RequestMethod.GET },
+      );
+    
     // Logger - aplicar em todas as rotas
     consumer
       .apply(LoggerMiddleware)
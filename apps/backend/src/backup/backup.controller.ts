@@ -8,6 +8,8 @@ import {
   Res,
   Body,
   Param,
+  Query,
+  Headers,
   HttpCode,
   HttpStatus,
   BadRequestException,
@@ -35,14 +37,36 @@ export class BackupController {
 
   /**
    * POST /backup/download
-   * Gera um backup e retorna como JSON para download
+   * Gera um backup e envia em streaming para download
+   * - padrão: JSON (formato BackupData, compatível com o desktop)
+   * - ?format=ndjson: NDJSON comprimido (gzip) com checksums por seção
    */
   @Post('download')
   @HttpCode(HttpStatus.OK)
-  async downloadBackup(@Request() req: any) {
+  async downloadBackup(@Request() req: any, @Res() res: Response, @Query('format') format?: string) {
     const userId = req.user?.userId || req.user?.id;
-    const result = await this.backupService.createFullBackup(userId);
-    return result.data;
+    const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
+
+    if (format === 'ndjson') {
+      res.setHeader('Content-Type', 'application/gzip');
+      res.setHeader('Content-Disposition', `attachment; filename="backup-${timestamp}.ndjson.gz"`);
+    } else {
+      res.setHeader('Content-Type', 'application/json; charset=utf-8');
+    }
+
+    try {
+      if (format === 'ndjson') {
+        await this.backupService.streamBackup(res, userId);
+      } else {
+        await this.backupService.streamLegacyJsonBackup(res, userId);
+      }
+    } catch (error: any) {
+      // Depois que o corpo começou a ser enviado não há como mudar o status
+      if (!res.headersSent) {
+        throw error;
+      }
+      res.destroy(error);
+    }
   }
 
   /**
@@ -73,6 +97,56 @@ export class BackupController {
     return result;
   }
 
+  /**
+   * POST /backup/restore-stream
+   * Restaura um backup NDJSON (gzip) enviado como corpo binário, em streaming
+   * Header obrigatório: X-Confirmation-Code: CONFIRMAR_RESTAURACAO
+   * ATENÇÃO: Operação destrutiva - apaga dados existentes
+   */
+  @Post('restore-stream')
+  async restoreBackupStream(
+    @Request() req: any,
+    @Headers('x-confirmation-code') confirmationCode: string,
+  ) {
+    const userId = req.user?.userId || req.user?.id;
+    const userRole = req.user?.role || req.user?.roleName;
+
+    if (confirmationCode !== 'CONFIRMAR_RESTAURACAO') {
+      throw new BadRequestException('Código de confirmação inválido. Use: CONFIRMAR_RESTAURACAO');
+    }
+
+    const result = await this.backupService.restoreBackupStream(req, userId, userRole);
+    if (!result.success) {
+      throw new InternalServerErrorException(result.message);
+    }
+    return result;
+  }
+
+  /**
+   * POST /backup/restore-file/:filename
+   * Restaura um backup salvo no servidor
+   * ATENÇÃO: Operação destrutiva - apaga dados existentes
+   */
+  @Post('restore-file/:filename')
+  async restoreBackupFile(
+    @Request() req: any,
+    @Param('filename') filename: string,
+    @Body() body: { confirmationCode: string },
+  ) {
+    const userId = req.user?.userId || req.user?.id;
+    const userRole = req.user?.role || req.user?.roleName;
+
+    if (body?.confirmationCode !== 'CONFIRMAR_RESTAURACAO') {
+      throw new BadRequestException('Código de confirmação inválido. Use: CONFIRMAR_RESTAURACAO');
+    }
+
+    const result = await this.backupService.restoreBackupFile(filename, userId, userRole);
+    if (!result.success) {
+      throw new InternalServerErrorException(result.message);
+    }
+    return result;
+  }
+
   /**
    * GET /backup/list
    * Lista todos os backups salvos no servidor
@@ -1,12 +1,78 @@
 import { Injectable, Logger, BadRequestException, ConflictException } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 import { Cron, CronExpression } from '@nestjs/schedule';
+import { Prisma } from '@prisma/client';
 import * as fs from 'fs';
 import * as path from 'path';
+import * as zlib from 'zlib';
+import * as readline from 'readline';
+import { createHash } from 'crypto';
+import { Readable, Writable } from 'stream';
+import { pipeline } from 'stream/promises';
 
 // Versão do schema de backup
 const BACKUP_SCHEMA_VERSION = '2.0';
 
+// Formato streaming: NDJSON comprimido com gzip
+const NDJSON_FORMAT = 'barmanager-ndjson';
+const NDJSON_EXTENSION = '.ndjson.gz';
+
+// Linhas lidas por página (keyset) e inseridas por lote na restauração
+const BACKUP_PAGE_SIZE = parseInt(process.env.BACKUP_PAGE_SIZE || '', 10) || 1000;
+const RESTORE_TIMEOUT_MS = parseInt(process.env.BACKUP_RESTORE_TIMEOUT_MS || '', 10) || 10 * 60 * 1000;
+
+type BackupSectionName = Exclude<keyof BackupData, 'metadata'>;
+
+interface BackupSection {
+  name: BackupSectionName;
+  model: string;
+  primaryKey: 'id' | 'key';
+  // Relações que backups antigos (findMany com include) trazem aninhadas
+  nested?: string[];
+}
+
+/**
+ * Seções na ordem de restauração (pais antes de filhos, respeitando FKs).
+ * O backup é gravado nesta mesma ordem para que a restauração possa inserir
+ * cada lote assim que ele é lido.
+ *
+ * ORDEM CRÍTICA (FKs): Sales -> Debts -> Payments -> DebtPayments
+ * - Debt.saleId -> Sale.id (debts_sale_id_fkey)
+ * - Payment.saleId -> Sale.id (payments_sale_id_fkey)
+ * - Payment.debtId -> Debt.id (payments_debt_id_fkey) ⚠️
+ * - DebtPayment.debtId -> Debt.id / DebtPayment.paymentId -> Payment.id
+ */
+const BACKUP_SECTIONS: BackupSection[] = [
+  { name: 'branches', model: 'branch', primaryKey: 'id' },
+  { name: 'categories', model: 'category', primaryKey: 'id' },
+  { name: 'suppliers', model: 'supplier', primaryKey: 'id' },
+  { name: 'products', model: 'product', primaryKey: 'id' },
+  { name: 'customers', model: 'customer', primaryKey: 'id' },
+  { name: 'tables', model: 'table', primaryKey: 'id' },
+  { name: 'tableSessions', model: 'tableSession', primaryKey: 'id', nested: ['customers', 'orders'] },
+  { name: 'tableCustomers', model: 'tableCustomer', primaryKey: 'id' },
+  { name: 'tableOrders', model: 'tableOrder', primaryKey: 'id' },
+  { name: 'tablePayments', model: 'tablePayment', primaryKey: 'id' },
+  { name: 'tableActions', model: 'tableAction', primaryKey: 'id' },
+  { name: 'inventory', model: 'inventory', primaryKey: 'id' },
+  { name: 'inventoryItems', model: 'inventoryItem', primaryKey: 'id', nested: ['movements'] },
+  { name: 'inventoryMovements', model: 'inventoryMovement', primaryKey: 'id' },
+  { name: 'stockMovements', model: 'stockMovement', primaryKey: 'id' },
+  { name: 'purchases', model: 'purchase', primaryKey: 'id', nested: ['items'] },
+  { name: 'purchaseItems', model: 'purchaseItem', primaryKey: 'id' },
+  { name: 'cashBoxes', model: 'cashBox', primaryKey: 'id' },
+  { name: 'sales', model: 'sale', primaryKey: 'id', nested: ['items', 'payments'] },
+  { name: 'saleItems', model: 'saleItem', primaryKey: 'id' },
+  { name: 'debts', model: 'debt', primaryKey: 'id', nested: ['payments'] },
+  { name: 'payments', model: 'payment', primaryKey: 'id' },
+  { name: 'debtPayments', model: 'debtPayment', primaryKey: 'id' },
+  { name: 'loyaltyTransactions', model: 'loyaltyTransaction', primaryKey: 'id' },
+  { name: 'productPriceHistory', model: 'productPriceHistory', primaryKey: 'id' },
+  { name: 'feedback', model: 'feedback', primaryKey: 'id' },
+  { name: 'settings', model: 'setting', primaryKey: 'key' },
+];
+
 export interface BackupMetadata {
   version: string;
   schemaVersion: string;
@@ -48,6 +114,24 @@ export interface BackupData {
   settings: any[];
 }
 
+/**
+ * Manifesto de um backup NDJSON: contagem e sha256 das linhas de cada seção.
+ * Vai como última linha do arquivo e, para backups em disco, num arquivo
+ * `.manifest.json` ao lado (usado na listagem sem descomprimir o backup).
+ */
+export interface BackupManifest extends BackupMetadata {
+  format: string;
+  checksums: Record<string, string>;
+  filename?: string;
+  size?: number;
+  sha256?: string;
+}
+
+interface RestoreBatch {
+  section: BackupSection;
+  rows: any[];
+}
+
 export interface RestoreResult {
   success: boolean;
   message: string;
@@ -63,7 +147,10 @@ export class BackupService {
   private isRestoring = false;
   private isBackingUp = false;
 
-  constructor(private readonly prisma: PrismaService) {
+  constructor(
+    private readonly prisma: PrismaService,
+    private readonly catalogCache: CatalogCacheService,
+  ) {
     // Ensure backup directory exists
     if (!fs.existsSync(this.backupDir)) {
       fs.mkdirSync(this.backupDir, { recursive: true });
@@ -72,200 +159,376 @@ export class BackupService {
 
   /**
    * Cria um backup completo do servidor
+   * Gravado em streaming (NDJSON + gzip) direto no disco, página por página.
    */
   async createFullBackup(userId: string, branchId?: string): Promise<{
     filename: string;
-    data: BackupData;
     size: number;
     timestamp: string;
+    manifest: BackupManifest;
   }> {
-    if (this.isBackingUp) {
-      throw new ConflictException('Um backup já está em andamento');
-    }
-
-    this.isBackingUp = true;
-    this.logger.log(`📦 Iniciando backup completo - Usuário: ${userId}`);
-
-    try {
+    return this.withBackupLock(async () => {
+      this.logger.log(`📦 Iniciando backup completo - Usuário: ${userId}`);
       const startTime = Date.now();
 
-      // Exportar todas as entidades
-      const [
-        branches,
-        categories,
-        suppliers,
-        products,
-        customers,
-        tables,
-        tableSessions,
-        tableCustomers,
-        tableOrders,
-        tablePayments,      // 🔴 CORREÇÃO: Adicionado
-        tableActions,       // 🔴 CORREÇÃO: Adicionado
-        inventory,
-        inventoryItems,
-        inventoryMovements,
-        stockMovements,
-        purchases,
-        purchaseItems,
-        sales,
-        saleItems,
-        payments,
-        cashBoxes,
-        debts,
-        debtPayments,
-        loyaltyTransactions,
-        productPriceHistory, // 🔴 CORREÇÃO: Adicionado
-        feedback,            // 🔴 CORREÇÃO: Adicionado
-        settings,
-      ] = await Promise.all([
-        this.prisma.branch.findMany(),
-        this.prisma.category.findMany(),
-        this.prisma.supplier.findMany(),
-        this.prisma.product.findMany(),
-        this.prisma.customer.findMany(),
-        this.prisma.table.findMany(),
-        this.prisma.tableSession.findMany({ include: { customers: true, orders: true } }),
-        this.prisma.tableCustomer.findMany(),
-        this.prisma.tableOrder.findMany(),
-        this.prisma.tablePayment.findMany(),     // 🔴 CORREÇÃO: Adicionado
-        this.prisma.tableAction.findMany(),      // 🔴 CORREÇÃO: Adicionado
-        this.prisma.inventory.findMany(),
-        this.prisma.inventoryItem.findMany(),
-        this.prisma.inventoryMovement.findMany(),
-        this.prisma.stockMovement.findMany(),
-        this.prisma.purchase.findMany({ include: { items: true } }),
-        this.prisma.purchaseItem.findMany(),
-        this.prisma.sale.findMany({ include: { items: true, payments: true } }),
-        this.prisma.saleItem.findMany(),
-        this.prisma.payment.findMany(),
-        this.prisma.cashBox.findMany(),
-        this.prisma.debt.findMany({ include: { payments: true } }),
-        this.prisma.debtPayment.findMany(),
-        this.prisma.loyaltyTransaction.findMany(),
-        this.prisma.productPriceHistory.findMany(), // 🔴 CORREÇÃO: Adicionado
-        this.prisma.feedback.findMany(),            // 🔴 CORREÇÃO: Adicionado
-        this.prisma.setting.findMany(),
-      ]);
-
-      // Calcular totais
-      const entities: Record<string, number> = {
-        branches: branches.length,
-        categories: categories.length,
-        suppliers: suppliers.length,
-        products: products.length,
-        customers: customers.length,
-        tables: tables.length,
-        tableSessions: tableSessions.length,
-        tableCustomers: tableCustomers.length,
-        tableOrders: tableOrders.length,
-        tablePayments: tablePayments.length,       // 🔴 CORREÇÃO: Adicionado
-        tableActions: tableActions.length,         // 🔴 CORREÇÃO: Adicionado
-        inventory: inventory.length,
-        inventoryItems: inventoryItems.length,
-        inventoryMovements: inventoryMovements.length,
-        stockMovements: stockMovements.length,
-        purchases: purchases.length,
-        purchaseItems: purchaseItems.length,
-        sales: sales.length,
-        saleItems: saleItems.length,
-        payments: payments.length,
-        cashBoxes: cashBoxes.length,
-        debts: debts.length,
-        debtPayments: debtPayments.length,
-        loyaltyTransactions: loyaltyTransactions.length,
-        productPriceHistory: productPriceHistory.length, // 🔴 CORREÇÃO: Adicionado
-        feedback: feedback.length,                       // 🔴 CORREÇÃO: Adicionado
-        settings: settings.length,
-      };
-
-      const totalRecords = Object.values(entities).reduce((a, b) => a + b, 0);
-
       const timestamp = new Date().toISOString();
-      const backupData: BackupData = {
-        metadata: {
-          version: '2.0',
-          schemaVersion: BACKUP_SCHEMA_VERSION,
-          timestamp,
-          createdBy: userId,
-          branchId,
-          totalRecords,
-          entities,
+      const filename = `backup-${timestamp.replace(/[:.]/g, '-')}${NDJSON_EXTENSION}`;
+      const filepath = path.join(this.backupDir, filename);
+      const partialPath = `${filepath}.partial`;
+
+      // sha256 do arquivo comprimido calculado enquanto é gravado
+      const fileHash = createHash('sha256');
+      const fileStream = fs.createWriteStream(partialPath);
+      const hashingStream: Writable = new Writable({
+        write(chunk, _encoding, callback) {
+          fileHash.update(chunk);
+          if (fileStream.write(chunk)) {
+            callback();
+          } else {
+            fileStream.once('drain', () => callback());
+          }
         },
-        branches,
-        categories,
-        suppliers,
-        products,
-        customers,
-        tables,
-        tableSessions,
-        tableCustomers,
-        tableOrders,
-        tablePayments,       // 🔴 CORREÇÃO: Adicionado
-        tableActions,        // 🔴 CORREÇÃO: Adicionado
-        inventory,
-        inventoryItems,
-        inventoryMovements,
-        stockMovements,
-        purchases,
-        purchaseItems,
-        sales,
-        saleItems,
-        payments,
-        cashBoxes,
-        debts,
-        debtPayments,
-        loyaltyTransactions,
-        productPriceHistory, // 🔴 CORREÇÃO: Adicionado
-        feedback,            // 🔴 CORREÇÃO: Adicionado
-        settings,
-      };
+        final(callback) {
+          fileStream.end(callback);
+        },
+      });
+      fileStream.on('error', (error) => hashingStream.destroy(error));
+
+      let manifest: BackupManifest;
+      try {
+        manifest = await this.writeNdjsonBackup(hashingStream, userId, timestamp, branchId);
+        fs.renameSync(partialPath, filepath);
+      } catch (error) {
+        fs.rmSync(partialPath, { force: true });
+        throw error;
+      }
 
-      // Salvar arquivo
-      const filename = `backup-${timestamp.replace(/[:.]/g, '-')}.json`;
-      const filepath = path.join(this.backupDir, filename);
-      fs.writeFileSync(filepath, JSON.stringify(backupData, null, 2));
       const size = fs.statSync(filepath).size;
+      manifest = { ...manifest, filename, size, sha256: fileHash.digest('hex') };
+      fs.writeFileSync(this.manifestPath(filename), JSON.stringify(manifest, null, 2));
 
       const duration = Date.now() - startTime;
-      this.logger.log(`✅ Backup concluído em ${duration}ms - ${totalRecords} registros - ${(size / 1024 / 1024).toFixed(2)}MB`);
+      this.logger.log(`✅ Backup concluído em ${duration}ms - ${manifest.totalRecords} registros - ${(size / 1024 / 1024).toFixed(2)}MB`);
 
       // Log de auditoria
-      await this.logBackupAction('CREATE_BACKUP', userId, { filename, totalRecords, size, duration });
+      await this.logBackupAction('CREATE_BACKUP', userId, { filename, totalRecords: manifest.totalRecords, size, duration });
 
-      return { filename, data: backupData, size, timestamp };
-    } finally {
-      this.isBackingUp = false;
+      return { filename, size, timestamp, manifest };
+    });
+  }
+
+  /**
+   * Envia o backup (NDJSON + gzip) direto para a resposta, sem salvar no servidor
+   */
+  async streamBackup(output: Writable, userId: string): Promise<BackupManifest> {
+    return this.withBackupLock(async () => {
+      this.logger.log(`📦 Gerando backup para download (ndjson) - Usuário: ${userId}`);
+      const manifest = await this.writeNdjsonBackup(output, userId, new Date().toISOString());
+      await this.logBackupAction('DOWNLOAD_BACKUP', userId, { format: NDJSON_FORMAT, totalRecords: manifest.totalRecords });
+      return manifest;
+    });
+  }
+
+  /**
+   * Envia o backup no formato JSON legado (BackupData) para a resposta.
+   * O documento é escrito seção a seção (metadata por último), então a memória
+   * usada é de uma página por vez, e não do banco inteiro.
+   */
+  async streamLegacyJsonBackup(output: Writable, userId: string): Promise<BackupMetadata> {
+    return this.withBackupLock(async () => {
+      this.logger.log(`📦 Gerando backup para download (json) - Usuário: ${userId}`);
+      const entities: Record<string, number> = {};
+
+      await this.writeChunk(output, '{');
+      for (const section of BACKUP_SECTIONS) {
+        await this.writeChunk(output, `${JSON.stringify(section.name)}:[`);
+        let count = 0;
+        for await (const rows of this.readSection(section)) {
+          const lines = rows.map((row) => JSON.stringify(row));
+          await this.writeChunk(output, (count > 0 ? ',' : '') + lines.join(','));
+          count += rows.length;
+        }
+        await this.writeChunk(output, '],');
+        entities[section.name] = count;
+      }
+
+      const metadata: BackupMetadata = {
+        version: '2.0',
+        schemaVersion: BACKUP_SCHEMA_VERSION,
+        timestamp: new Date().toISOString(),
+        createdBy: userId,
+        totalRecords: Object.values(entities).reduce((a, b) => a + b, 0),
+        entities,
+      };
+      await this.writeChunk(output, `"metadata":${JSON.stringify(metadata)}}`);
+      output.end();
+
+      await this.logBackupAction('DOWNLOAD_BACKUP', userId, { format: 'json', totalRecords: metadata.totalRecords });
+      return metadata;
+    });
+  }
+
+  /**
+   * Escreve o backup em NDJSON comprimido:
+   *   {"type":"header",...}
+   *   {"type":"section","name":"sales"}
+   *   <uma linha JSON por registro>
+   *   {"type":"end","name":"sales","count":N,"sha256":"..."}
+   *   ...
+   *   {"type":"manifest",...}
+   */
+  private async writeNdjsonBackup(
+    output: Writable,
+    userId: string,
+    timestamp: string,
+    branchId?: string,
+  ): Promise<BackupManifest> {
+    const gzip = zlib.createGzip({ level: 6 });
+    const writing = pipeline(gzip, output);
+    const entities: Record<string, number> = {};
+    const checksums: Record<string, string> = {};
+
+    try {
+      await this.writeChunk(gzip, JSON.stringify({
+        type: 'header',
+        format: NDJSON_FORMAT,
+        schemaVersion: BACKUP_SCHEMA_VERSION,
+        timestamp,
+        createdBy: userId,
+        branchId,
+      }) + '\n');
+
+      for (const section of BACKUP_SECTIONS) {
+        await this.writeChunk(gzip, JSON.stringify({ type: 'section', name: section.name }) + '\n');
+        const hash = createHash('sha256');
+        let count = 0;
+        for await (const rows of this.readSection(section)) {
+          const lines = rows.map((row) => JSON.stringify(row) + '\n').join('');
+          hash.update(lines);
+          count += rows.length;
+          await this.writeChunk(gzip, lines);
+        }
+        entities[section.name] = count;
+        checksums[section.name] = hash.digest('hex');
+        await this.writeChunk(gzip, JSON.stringify({ type: 'end', name: section.name, count, sha256: checksums[section.name] }) + '\n');
+      }
+
+      const manifest: BackupManifest = {
+        version: '3.0',
+        format: NDJSON_FORMAT,
+        schemaVersion: BACKUP_SCHEMA_VERSION,
+        timestamp,
+        createdBy: userId,
+        branchId,
+        totalRecords: Object.values(entities).reduce((a, b) => a + b, 0),
+        entities,
+        checksums,
+      };
+      await this.writeChunk(gzip, JSON.stringify({ type: 'manifest', ...manifest }) + '\n');
+      gzip.end();
+      await writing;
+      return manifest;
+    } catch (error) {
+      gzip.destroy(error as Error);
+      await writing.catch(() => undefined);
+      throw error;
+    }
+  }
+
+  /**
+   * Lê uma tabela em páginas ordenadas pela chave primária (keyset: chave > última lida)
+   */
+  private async *readSection(section: BackupSection): AsyncGenerator<any[]> {
+    const delegate = (this.prisma as any)[section.model];
+    const key = section.primaryKey;
+    let lastKey: string | null = null;
+
+    while (true) {
+      const rows: any[] = await delegate.findMany({
+        where: lastKey !== null ? { [key]: { gt: lastKey } } : undefined,
+        orderBy: { [key]: 'asc' },
+        take: BACKUP_PAGE_SIZE,
+      });
+      if (rows.length === 0) {
+        return;
+      }
+      yield rows;
+      if (rows.length < BACKUP_PAGE_SIZE) {
+        return;
+      }
+      lastKey = rows[rows.length - 1][key];
     }
   }
 
   /**
-   * Retorna o backup como JSON para download direto (sem salvar no servidor)
+   * Escreve respeitando backpressure; falha se o destino fechar (cliente desconectou)
    */
-  async createBackupForDownload(userId: string): Promise<BackupData> {
+  private async writeChunk(stream: Writable, chunk: string) {
+    if (stream.destroyed) {
+      throw new Error('Conexão encerrada durante o backup');
+    }
+    if (stream.write(chunk)) {
+      return;
+    }
+    await new Promise<void>((resolve, reject) => {
+      const onDrain = () => {
+        cleanup();
+        resolve();
+      };
+      const onClose = () => {
+        cleanup();
+        reject(new Error('Conexão encerrada durante o backup'));
+      };
+      const cleanup = () => {
+        stream.off('drain', onDrain);
+        stream.off('close', onClose);
+      };
+      stream.on('drain', onDrain);
+      stream.on('close', onClose);
+    });
+  }
+
+  private async withBackupLock<T>(operation: () => Promise<T>): Promise<T> {
     if (this.isBackingUp) {
       throw new ConflictException('Um backup já está em andamento');
     }
-
     this.isBackingUp = true;
-    this.logger.log(`📦 Gerando backup para download - Usuário: ${userId}`);
-
     try {
-      const result = await this.createFullBackup(userId);
-      return result.data;
+      return await operation();
     } finally {
       this.isBackingUp = false;
     }
   }
 
+  private manifestPath(filename: string) {
+    return path.join(this.backupDir, filename.replace(NDJSON_EXTENSION, '.manifest.json'));
+  }
+
   /**
-   * Restaura um backup completo
+   * Restaura um backup completo (formato JSON legado, já carregado em memória)
    * ATENÇÃO: Esta operação apaga todos os dados (exceto usuários/auth)
    */
   async restoreBackup(
     backupData: BackupData,
     userId: string,
     userRole: string,
+  ): Promise<RestoreResult> {
+    this.logger.warn(`   Backup de: ${backupData.metadata.timestamp}`);
+    this.logger.warn(`   Total de registros: ${backupData.metadata.totalRecords}`);
+
+    // Validar versão do schema
+    if (backupData.metadata.schemaVersion !== BACKUP_SCHEMA_VERSION) {
+      this.logger.warn(`⚠️ Versão do schema diferente: ${backupData.metadata.schemaVersion} vs ${BACKUP_SCHEMA_VERSION}`);
+    }
+
+    async function* batches(): AsyncGenerator<RestoreBatch> {
+      for (const section of BACKUP_SECTIONS) {
+        const rows = backupData[section.name] || [];
+        for (let offset = 0; offset < rows.length; offset += BACKUP_PAGE_SIZE) {
+          yield { section, rows: rows.slice(offset, offset + BACKUP_PAGE_SIZE) };
+        }
+      }
+    }
+
+    return this.runRestore(userId, userRole, backupData.metadata.timestamp, batches());
+  }
+
+  /**
+   * Restaura um backup NDJSON (gzip) lido em streaming (upload ou arquivo do servidor).
+   * Cada seção é conferida contra a contagem e o sha256 gravados no backup;
+   * qualquer divergência (ou arquivo truncado) desfaz a transação inteira.
+   */
+  async restoreBackupStream(input: Readable, userId: string, userRole: string): Promise<RestoreResult> {
+    const sectionsByName = new Map(BACKUP_SECTIONS.map((section) => [section.name as string, section]));
+    const lines = readline.createInterface({
+      input: input.pipe(zlib.createGunzip()),
+      crlfDelay: Infinity,
+    });
+    const header: { timestamp?: string } = {};
+
+    async function* batches(): AsyncGenerator<RestoreBatch> {
+      let section: BackupSection | null = null;
+      let rows: any[] = [];
+      let count = 0;
+      let hash = createHash('sha256');
+      let sawHeader = false;
+      let sawManifest = false;
+
+      for await (const line of lines) {
+        if (!line) continue;
+
+        // Dentro de uma seção toda linha é um registro, exceto o marcador de fim
+        if (section && !line.startsWith('{"type":"end"')) {
+          hash.update(line + '\n');
+          rows.push(JSON.parse(line));
+          count++;
+          if (rows.length >= BACKUP_PAGE_SIZE) {
+            yield { section, rows };
+            rows = [];
+          }
+          continue;
+        }
+
+        const record = JSON.parse(line);
+        if (record.type === 'header') {
+          if (record.format !== NDJSON_FORMAT) {
+            throw new BadRequestException(`Formato de backup desconhecido: ${record.format}`);
+          }
+          header.timestamp = record.timestamp;
+          sawHeader = true;
+        } else if (record.type === 'section') {
+          section = sectionsByName.get(record.name) || null;
+          if (!section) {
+            throw new BadRequestException(`Seção desconhecida no backup: ${record.name}`);
+          }
+          rows = [];
+          count = 0;
+          hash = createHash('sha256');
+        } else if (record.type === 'end') {
+          if (!section || record.name !== section.name) {
+            throw new BadRequestException(`Backup corrompido: fim inesperado da seção ${record.name}`);
+          }
+          if (record.count !== count || record.sha256 !== hash.digest('hex')) {
+            throw new BadRequestException(`Checksum inválido na seção ${record.name}`);
+          }
+          if (rows.length > 0) {
+            yield { section, rows };
+          }
+          section = null;
+          rows = [];
+        } else if (record.type === 'manifest') {
+          sawManifest = true;
+        }
+      }
+
+      if (!sawHeader || !sawManifest || section) {
+        throw new BadRequestException('Backup incompleto ou truncado');
+      }
+    }
+
+    return this.runRestore(userId, userRole, () => header.timestamp, batches());
+  }
+
+  /**
+   * Restaura um backup salvo no servidor (NDJSON em streaming; JSON legado em memória)
+   */
+  async restoreBackupFile(filename: string, userId: string, userRole: string): Promise<RestoreResult> {
+    const { filepath } = await this.downloadBackup(filename);
+    if (filename.endsWith(NDJSON_EXTENSION)) {
+      return this.restoreBackupStream(fs.createReadStream(filepath), userId, userRole);
+    }
+    const backupData = JSON.parse(fs.readFileSync(filepath, 'utf-8')) as BackupData;
+    return this.restoreBackup(backupData, userId, userRole);
+  }
+
+  /**
+   * Apaga os dados atuais e insere os lotes recebidos, tudo numa única transação
+   */
+  private async runRestore(
+    userId: string,
+    userRole: string,
+    source: string | (() => string | undefined),
+    batches: AsyncIterable<RestoreBatch>,
   ): Promise<RestoreResult> {
     // Validar permissão
     if (!['admin', 'owner'].includes(userRole)) {
@@ -284,330 +547,30 @@ export class BackupService {
 
     this.logger.warn(`🔄 INICIANDO RESTAURAÇÃO DE BACKUP`);
     this.logger.warn(`   Usuário: ${userId} (${userRole})`);
-    this.logger.warn(`   Backup de: ${backupData.metadata.timestamp}`);
-    this.logger.warn(`   Total de registros: ${backupData.metadata.totalRecords}`);
 
     try {
-      // Validar versão do schema
-      if (backupData.metadata.schemaVersion !== BACKUP_SCHEMA_VERSION) {
-        this.logger.warn(`⚠️ Versão do schema diferente: ${backupData.metadata.schemaVersion} vs ${BACKUP_SCHEMA_VERSION}`);
-      }
-
       // Executar dentro de uma transação
       await this.prisma.$transaction(async (tx) => {
         // ====== FASE 1: LIMPAR DADOS EXISTENTES ======
         this.logger.log('🗑️ Fase 1: Limpando dados existentes...');
-
-        // ============================================================
-        // ORDEM DE DELEÇÃO (FKs - filhos antes de pais):
-        // 
-        // Cadeia principal de vendas/dívidas/pagamentos:
-        // DebtPayment -> Payment, Debt
-        // Payment -> Sale, Debt
-        // Debt -> Sale, Customer
-        // SaleItem -> Sale
-        // Sale -> Customer, Table
-        //
-        // Outras dependências:
-        // StockMovement -> Product, Sale, Purchase
-        // InventoryMovement -> InventoryItem
-        // InventoryItem -> Product
-        // TableOrder -> Product, TableCustomer, TableSession
-        // TablePayment -> TableSession, TableCustomer, Payment
-        // TableAction -> TableSession
-        // TableCustomer -> TableSession, Customer
-        // TableSession -> Table
-        // ============================================================
-
-        // Nível 0: Tabelas de ação/pagamento de mesa (dependem de TableSession e Payment)
-        await tx.tablePayment.deleteMany({});
-        await tx.tableAction.deleteMany({});
-        
-        // Nível 1: DebtPayment (depende de Debt e Payment)
-        await tx.debtPayment.deleteMany({});
-        
-        // Nível 2: Payment (depende de Sale e Debt)
-        await tx.payment.deleteMany({});
-        
-        // Nível 3: Debt (depende de Sale e Customer)
-        await tx.debt.deleteMany({});
-        
-        // Nível 4: SaleItem (depende de Sale)
-        await tx.saleItem.deleteMany({});
-        
-        // Nível 5: Sale (depende de Customer e Table)
-        await tx.sale.deleteMany({});
-        
-        // Nível 6: LoyaltyTransaction (depende de Customer)
-        await tx.loyaltyTransaction.deleteMany({});
-        
-        // Nível 7: PurchaseItem e Purchase
-        await tx.purchaseItem.deleteMany({});
-        await tx.purchase.deleteMany({});
-        
-        // Nível 8: CashBox (depende de Branch e User - não deletamos esses)
-        await tx.cashBox.deleteMany({});
-        
-        // Nível 9: StockMovement (depende de Product, Sale, Purchase)
-        await tx.stockMovement.deleteMany({});
-        
-        // Nível 10: InventoryMovement (depende de InventoryItem)
-        await tx.inventoryMovement.deleteMany({});
-        
-        // Nível 11: InventoryItem (depende de Product)
-        await tx.inventoryItem.deleteMany({});
-        
-        // Nível 12: Inventory (depende de Product)
-        await tx.inventory.deleteMany({});
-        
-        // Nível 13: TableOrder (depende de Product, TableCustomer, TableSession)
-        await tx.tableOrder.deleteMany({});
-        
-        // Nível 14: ProductPriceHistory (depende de Product)
-        await tx.productPriceHistory.deleteMany({});
-        
-        // Nível 15: Feedback (depende de Customer, Sale)
-        await tx.feedback.deleteMany({});
-        
-        // Nível 16: TableCustomer (depende de TableSession e Customer)
-        await tx.tableCustomer.deleteMany({});
-        
-        // Nível 17: TableSession (depende de Table)
-        await tx.tableSession.deleteMany({});
-        
-        // Nível 18: Table (depende de Branch)
-        await tx.table.deleteMany({});
-        
-        // Nível 19: Product (tabela raiz)
-        await tx.product.deleteMany({});
-        
-        // Nível 20: Category, Supplier, Customer (tabelas raiz)
-        await tx.category.deleteMany({});
-        await tx.supplier.deleteMany({});
-        await tx.customer.deleteMany({});
-        // NÃO deletar: users, branches (manter estrutura), sessions, settings
-
+        await this.clearData(tx);
         this.logger.log('✅ Dados antigos removidos');
 
-        // ====== FASE 2: RESTAURAR DADOS ======
+        // ====== FASE 2: RESTAURAR DADOS (lote a lote) ======
         this.logger.log('📥 Fase 2: Restaurando dados...');
-
-        // 1. Branches (apenas atualizar, não criar novos para evitar conflitos)
-        if (backupData.branches?.length > 0) {
-          for (const branch of backupData.branches) {
-            try {
-              await tx.branch.upsert({
-                where: { id: branch.id },
-                create: branch,
-                update: { name: branch.name, code: branch.code, address: branch.address, phone: branch.phone },
-              });
-            } catch (e: any) {
-              errors.push(`Branch ${branch.id}: ${e.message}`);
-            }
-          }
-          stats['branches'] = backupData.branches.length;
-        }
-
-        // 2. Categories
-        if (backupData.categories?.length > 0) {
-          await tx.category.createMany({ data: backupData.categories, skipDuplicates: true });
-          stats['categories'] = backupData.categories.length;
-        }
-
-        // 3. Suppliers
-        if (backupData.suppliers?.length > 0) {
-          await tx.supplier.createMany({ data: backupData.suppliers, skipDuplicates: true });
-          stats['suppliers'] = backupData.suppliers.length;
-        }
-
-        // 4. Products
-        if (backupData.products?.length > 0) {
-          await tx.product.createMany({ data: backupData.products, skipDuplicates: true });
-          stats['products'] = backupData.products.length;
-        }
-
-        // 5. Customers
-        if (backupData.customers?.length > 0) {
-          await tx.customer.createMany({ data: backupData.customers, skipDuplicates: true });
-          stats['customers'] = backupData.customers.length;
-        }
-
-        // 6. Tables
-        if (backupData.tables?.length > 0) {
-          await tx.table.createMany({ data: backupData.tables, skipDuplicates: true });
-          stats['tables'] = backupData.tables.length;
-        }
-
-        // 7. Table Sessions
-        if (backupData.tableSessions?.length > 0) {
-          // Remover relações aninhadas para createMany
-          const sessionsClean = backupData.tableSessions.map(s => {
-            const { customers, orders, ...session } = s;
-            return session;
-          });
-          await tx.tableSession.createMany({ data: sessionsClean, skipDuplicates: true });
-          stats['tableSessions'] = sessionsClean.length;
-        }
-
-        // 8. Table Customers
-        if (backupData.tableCustomers?.length > 0) {
-          await tx.tableCustomer.createMany({ data: backupData.tableCustomers, skipDuplicates: true });
-          stats['tableCustomers'] = backupData.tableCustomers.length;
-        }
-
-        // 9. Table Orders
-        if (backupData.tableOrders?.length > 0) {
-          await tx.tableOrder.createMany({ data: backupData.tableOrders, skipDuplicates: true });
-          stats['tableOrders'] = backupData.tableOrders.length;
-        }
-
-        // 9.1 Table Payments 🔴 CORREÇÃO: Restaurar pagamentos de mesa
-        if (backupData.tablePayments?.length > 0) {
-          await tx.tablePayment.createMany({ data: backupData.tablePayments, skipDuplicates: true });
-          stats['tablePayments'] = backupData.tablePayments.length;
-        }
-
-        // 9.2 Table Actions 🔴 CORREÇÃO: Restaurar log de ações de mesa
-        if (backupData.tableActions?.length > 0) {
-          await tx.tableAction.createMany({ data: backupData.tableActions, skipDuplicates: true });
-          stats['tableActions'] = backupData.tableActions.length;
-        }
-
-        // 10. Inventory
-        if (backupData.inventory?.length > 0) {
-          await tx.inventory.createMany({ data: backupData.inventory, skipDuplicates: true });
-          stats['inventory'] = backupData.inventory.length;
-        }
-
-        // 10.1 Inventory Items (sem movements aninhados)
-        if (backupData.inventoryItems?.length > 0) {
-          const itemsClean = backupData.inventoryItems.map(item => {
-            const { movements, ...rest } = item;
-            return rest;
-          });
-          await tx.inventoryItem.createMany({ data: itemsClean, skipDuplicates: true });
-          stats['inventoryItems'] = itemsClean.length;
-        }
-
-        // 11. Inventory Movements
-        if (backupData.inventoryMovements?.length > 0) {
-          await tx.inventoryMovement.createMany({ data: backupData.inventoryMovements, skipDuplicates: true });
-          stats['inventoryMovements'] = backupData.inventoryMovements.length;
-        }
-
-        // 11.1 Stock Movements
-        if (backupData.stockMovements?.length > 0) {
-          await tx.stockMovement.createMany({ data: backupData.stockMovements, skipDuplicates: true });
-          stats['stockMovements'] = backupData.stockMovements.length;
-        }
-
-        // 12. Purchases (sem items aninhados)
-        if (backupData.purchases?.length > 0) {
-          const purchasesClean = backupData.purchases.map(p => {
-            const { items, ...purchase } = p;
-            return purchase;
-          });
-          await tx.purchase.createMany({ data: purchasesClean, skipDuplicates: true });
-          stats['purchases'] = purchasesClean.length;
-        }
-
-        // 13. Purchase Items
-        if (backupData.purchaseItems?.length > 0) {
-          await tx.purchaseItem.createMany({ data: backupData.purchaseItems, skipDuplicates: true });
-          stats['purchaseItems'] = backupData.purchaseItems.length;
-        }
-
-        // 14. Cash Boxes
-        if (backupData.cashBoxes?.length > 0) {
-          await tx.cashBox.createMany({ data: backupData.cashBoxes, skipDuplicates: true });
-          stats['cashBoxes'] = backupData.cashBoxes.length;
-        }
-
-        // ============================================================
-        // ORDEM CRÍTICA DE INSERÇÃO (FKs):
-        // Sales -> Debts -> Payments -> DebtPayments
-        // 
-        // Porque:
-        // - Debt.saleId -> Sale.id (debts_sale_id_fkey)
-        // - Payment.saleId -> Sale.id (payments_sale_id_fkey)  
-        // - Payment.debtId -> Debt.id (payments_debt_id_fkey) ⚠️
-        // - DebtPayment.debtId -> Debt.id
-        // - DebtPayment.paymentId -> Payment.id
-        // ============================================================
-
-        // 15. Sales (sem items/payments aninhados)
-        if (backupData.sales?.length > 0) {
-          const salesClean = backupData.sales.map(s => {
-            const { items, payments, ...sale } = s;
-            return sale;
-          });
-          await tx.sale.createMany({ data: salesClean, skipDuplicates: true });
-          stats['sales'] = salesClean.length;
-        }
-
-        // 16. Sale Items (depende de Sales)
-        if (backupData.saleItems?.length > 0) {
-          await tx.saleItem.createMany({ data: backupData.saleItems, skipDuplicates: true });
-          stats['saleItems'] = backupData.saleItems.length;
-        }
-
-        // 17. Debts (depende de Sales via saleId) - ANTES de Payments
-        if (backupData.debts?.length > 0) {
-          const debtsClean = backupData.debts.map(d => {
-            const { payments, ...debt } = d;
-            return debt;
-          });
-          await tx.debt.createMany({ data: debtsClean, skipDuplicates: true });
-          stats['debts'] = debtsClean.length;
-        }
-
-        // 18. Payments (depende de Sales E Debts) - DEPOIS de Debts
-        if (backupData.payments?.length > 0) {
-          await tx.payment.createMany({ data: backupData.payments, skipDuplicates: true });
-          stats['payments'] = backupData.payments.length;
-        }
-
-        // 19. Debt Payments (depende de Debts e Payments)
-        if (backupData.debtPayments?.length > 0) {
-          await tx.debtPayment.createMany({ data: backupData.debtPayments, skipDuplicates: true });
-          stats['debtPayments'] = backupData.debtPayments.length;
-        }
-
-        // 20. Loyalty Transactions
-        if (backupData.loyaltyTransactions?.length > 0) {
-          await tx.loyaltyTransaction.createMany({ data: backupData.loyaltyTransactions, skipDuplicates: true });
-          stats['loyaltyTransactions'] = backupData.loyaltyTransactions.length;
-        }
-
-        // 20.1 Product Price History 🔴 CORREÇÃO: Restaurar histórico de preços
-        if (backupData.productPriceHistory?.length > 0) {
-          await tx.productPriceHistory.createMany({ data: backupData.productPriceHistory, skipDuplicates: true });
-          stats['productPriceHistory'] = backupData.productPriceHistory.length;
-        }
-
-        // 20.2 Feedback 🔴 CORREÇÃO: Restaurar feedbacks de clientes
-        if (backupData.feedback?.length > 0) {
-          await tx.feedback.createMany({ data: backupData.feedback, skipDuplicates: true });
-          stats['feedback'] = backupData.feedback.length;
-        }
-
-        // 21. Settings (usa 'key' como chave primária, não 'id')
-        if (backupData.settings?.length > 0) {
-          for (const setting of backupData.settings) {
-            await tx.setting.upsert({
-              where: { key: setting.key },
-              create: setting,
-              update: { value: setting.value },
-            });
-          }
-          stats['settings'] = backupData.settings.length;
+        for await (const batch of batches) {
+          await this.insertBatch(tx, batch, errors);
+          stats[batch.section.name] = (stats[batch.section.name] || 0) + batch.rows.length;
         }
 
         this.logger.log('✅ Dados restaurados com sucesso');
       }, {
-        timeout: 120000, // 2 minutos para operações grandes
+        timeout: RESTORE_TIMEOUT_MS,
       });
 
+      // Catálogo (produtos, categorias, fornecedores, settings) foi trocado: descartar o cache só depois do commit
+      this.catalogCache.invalidateAll();
+
       const duration = Date.now() - startTime;
       const totalRestored = Object.values(stats).reduce((a, b) => a + b, 0);
 
@@ -620,7 +583,7 @@ export class BackupService {
 
       // Log de auditoria
       await this.logBackupAction('RESTORE_BACKUP', userId, { 
-        originalTimestamp: backupData.metadata.timestamp,
+        originalTimestamp: typeof source === 'function' ? source() : source,
         totalRestored, 
         duration,
         errors: errors.length,
@@ -648,22 +611,164 @@ export class BackupService {
     }
   }
 
+  private async clearData(tx: Prisma.TransactionClient) {
+    // ============================================================
+    // ORDEM DE DELEÇÃO (FKs - filhos antes de pais):
+    // 
+    // Cadeia principal de vendas/dívidas/pagamentos:
+    // DebtPayment -> Payment, Debt
+    // Payment -> Sale, Debt
+    // Debt -> Sale, Customer
+    // SaleItem -> Sale
+    // Sale -> Customer, Table
+    //
+    // Outras dependências:
+    // StockMovement -> Product, Sale, Purchase
+    // InventoryMovement -> InventoryItem
+    // InventoryItem -> Product
+    // TableOrder -> Product, TableCustomer, TableSession
+    // TablePayment -> TableSession, TableCustomer, Payment
+    // TableAction -> TableSession
+    // TableCustomer -> TableSession, Customer
+    // TableSession -> Table
+    // ============================================================
+
+    // Nível 0: Tabelas de ação/pagamento de mesa (dependem de TableSession e Payment)
+    await tx.tablePayment.deleteMany({});
+    await tx.tableAction.deleteMany({});
+    
+    // Nível 1: DebtPayment (depende de Debt e Payment)
+    await tx.debtPayment.deleteMany({});
+    
+    // Nível 2: Payment (depende de Sale e Debt)
+    await tx.payment.deleteMany({});
+    
+    // Nível 3: Debt (depende de Sale e Customer)
+    await tx.debt.deleteMany({});
+    
+    // Nível 4: SaleItem (depende de Sale)
+    await tx.saleItem.deleteMany({});
+    
+    // Nível 5: Sale (depende de Customer e Table)
+    await tx.sale.deleteMany({});
+    
+    // Nível 6: LoyaltyTransaction (depende de Customer)
+    await tx.loyaltyTransaction.deleteMany({});
+    
+    // Nível 7: PurchaseItem e Purchase
+    await tx.purchaseItem.deleteMany({});
+    await tx.purchase.deleteMany({});
+    
+    // Nível 8: CashBox (depende de Branch e User - não deletamos esses)
+    await tx.cashBox.deleteMany({});
+    
+    // Nível 9: StockMovement (depende de Product, Sale, Purchase)
+    await tx.stockMovement.deleteMany({});
+    
+    // Nível 10: InventoryMovement (depende de InventoryItem)
+    await tx.inventoryMovement.deleteMany({});
+    
+    // Nível 11: InventoryItem (depende de Product)
+    await tx.inventoryItem.deleteMany({});
+    
+    // Nível 12: Inventory (depende de Product)
+    await tx.inventory.deleteMany({});
+    
+    // Nível 13: TableOrder (depende de Product, TableCustomer, TableSession)
+    await tx.tableOrder.deleteMany({});
+    
+    // Nível 14: ProductPriceHistory (depende de Product)
+    await tx.productPriceHistory.deleteMany({});
+    
+    // Nível 15: Feedback (depende de Customer, Sale)
+    await tx.feedback.deleteMany({});
+    
+    // Nível 16: TableCustomer (depende de TableSession e Customer)
+    await tx.tableCustomer.deleteMany({});
+    
+    // Nível 17: TableSession (depende de Table)
+    await tx.tableSession.deleteMany({});
+    
+    // Nível 18: Table (depende de Branch)
+    await tx.table.deleteMany({});
+    
+    // Nível 19: Product (tabela raiz)
+    await tx.product.deleteMany({});
+    
+    // Nível 20: Category, Supplier, Customer (tabelas raiz)
+    await tx.category.deleteMany({});
+    await tx.supplier.deleteMany({});
+    await tx.customer.deleteMany({});
+    // NÃO deletar: users, branches (manter estrutura), sessions, settings
+  }
+
+  /**
+   * Insere um lote de uma seção
+   */
+  private async insertBatch(tx: Prisma.TransactionClient, batch: RestoreBatch, errors: string[]) {
+    const { section } = batch;
+    // Remover relações aninhadas para createMany (backups antigos usavam include)
+    const rows = section.nested
+      ? batch.rows.map((row) => {
+          const clean = { ...row };
+          for (const relation of section.nested!) {
+            delete clean[relation];
+          }
+          return clean;
+        })
+      : batch.rows;
+
+    // Branches: apenas atualizar, não criar novos para evitar conflitos
+    if (section.name === 'branches') {
+      for (const branch of rows) {
+        try {
+          await tx.branch.upsert({
+            where: { id: branch.id },
+            create: branch,
+            update: { name: branch.name, code: branch.code, address: branch.address, phone: branch.phone },
+          });
+        } catch (e: any) {
+          errors.push(`Branch ${branch.id}: ${e.message}`);
+        }
+      }
+      return;
+    }
+
+    // Settings (usa 'key' como chave primária, não 'id')
+    if (section.name === 'settings') {
+      for (const setting of rows) {
+        await tx.setting.upsert({
+          where: { key: setting.key },
+          create: setting,
+          update: { value: setting.value },
+        });
+      }
+      return;
+    }
+
+    await (tx as any)[section.model].createMany({ data: rows, skipDuplicates: true });
+  }
+
   /**
    * Lista backups disponíveis no servidor
    */
   async listBackups() {
     const files = fs.readdirSync(this.backupDir)
-      .filter(f => f.startsWith('backup-') && f.endsWith('.json'))
+      .filter(f => f.startsWith('backup-') && (f.endsWith(NDJSON_EXTENSION) || (f.endsWith('.json') && !f.endsWith('.manifest.json'))))
       .map(f => {
         const filepath = path.join(this.backupDir, f);
         const stats = fs.statSync(filepath);
         
-        // Tentar ler metadata
+        // Tentar ler metadata (backups NDJSON: manifesto ao lado, sem descomprimir)
         let metadata = null;
         try {
-          const content = fs.readFileSync(filepath, 'utf-8');
-          const data = JSON.parse(content);
-          metadata = data.metadata;
+          if (f.endsWith(NDJSON_EXTENSION)) {
+            metadata = JSON.parse(fs.readFileSync(this.manifestPath(f), 'utf-8'));
+          } else {
+            const content = fs.readFileSync(filepath, 'utf-8');
+            const data = JSON.parse(content);
+            metadata = data.metadata;
+          }
         } catch (e) {
           // Ignorar erro de leitura
         }
@@ -685,30 +790,30 @@ export class BackupService {
   /**
    * Baixa um backup específico
    */
-  async downloadBackup(filename: string): Promise<{ filepath: string; data: BackupData }> {
-    const filepath = path.join(this.backupDir, filename);
+  async downloadBackup(filename: string): Promise<{ filepath: string }> {
+    const filepath = path.join(this.backupDir, path.basename(filename));
     
     if (!fs.existsSync(filepath)) {
       throw new BadRequestException('Backup não encontrado');
     }
 
-    const content = fs.readFileSync(filepath, 'utf-8');
-    const data = JSON.parse(content) as BackupData;
-    
-    return { filepath, data };
+    return { filepath };
   }
 
   /**
    * Deleta um backup
    */
   async deleteBackup(filename: string): Promise<void> {
-    const filepath = path.join(this.backupDir, filename);
+    const filepath = path.join(this.backupDir, path.basename(filename));
     
     if (!fs.existsSync(filepath)) {
       throw new BadRequestException('Backup não encontrado');
     }
 
     fs.unlinkSync(filepath);
+    if (filepath.endsWith(NDJSON_EXTENSION)) {
+      fs.rmSync(this.manifestPath(path.basename(filepath)), { force: true });
+    }
     this.logger.log(`🗑️ Backup deletado: ${filename}`);
   }
 
@@ -0,0 +1,10 @@
+import { Module, Global } from '@nestjs/common';
+import { CatalogCacheService } from './catalog-cache.service';
+import { DataVersionService } from './data-version.service';
+
+@Global()
+@Module({
+  providers: [CatalogCacheService, DataVersionService],
+  exports: [CatalogCacheService, DataVersionService],
+})
+export class CacheModule {}
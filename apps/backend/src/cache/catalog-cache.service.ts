@@ -0,0 +1,192 @@
+import { Injectable, Logger } from '@nestjs/common';
+
+/**
+ * Namespaces do cache de catálogo.
+ * Cada namespace é invalidado pelos caminhos de escrita correspondentes.
+ */
+export type CatalogNamespace = 'products' | 'categories' | 'settings' | 'qr-menu';
+
+interface CacheEntry<T = any> {
+  value: T;
+  expiresAt: number;
+}
+
+interface NamespaceCounters {
+  hits: number;
+  misses: number;
+  invalidations: number;
+}
+
+const DEFAULT_TTL_MS = 5 * 60 * 1000; // 5 minutos
+const DEFAULT_MAX_ENTRIES = 500;
+
+/** Chave usada para dados que não pertencem a uma filial específica */
+export const ALL_BRANCHES = '*';
+
+/**
+ * Cache em memória (LRU + TTL) para leituras de catálogo:
+ * produtos, categorias, configurações e menus QR.
+ *
+ * As chaves são `namespace|branchId|variante`, de forma que uma escrita
+ * pode invalidar apenas uma filial ou o namespace inteiro.
+ * O Map mantém ordem de inserção, o que permite LRU sem estrutura extra:
+ * um acesso reinsere a chave no fim e a remoção tira a primeira.
+ */
+@Injectable()
+export class CatalogCacheService {
+  private readonly logger = new Logger(CatalogCacheService.name);
+  private readonly entries = new Map<string, CacheEntry>();
+  private readonly inflight = new Map<string, Promise<any>>();
+  private readonly counters = new Map<CatalogNamespace, NamespaceCounters>();
+  private evictions = 0;
+
+  private readonly ttlMs = parseInt(process.env.CATALOG_CACHE_TTL_MS || '', 10) || DEFAULT_TTL_MS;
+  private readonly maxEntries =
+    parseInt(process.env.CATALOG_CACHE_MAX_ENTRIES || '', 10) || DEFAULT_MAX_ENTRIES;
+  private readonly enabled = process.env.CATALOG_CACHE_DISABLED !== 'true';
+
+  /**
+   * Retorna o valor em cache ou executa `loader` e guarda o resultado.
+   * Chamadas concorrentes para a mesma chave partilham a mesma consulta.
+   */
+  async wrap<T>(
+    namespace: CatalogNamespace,
+    branchId: string | null | undefined,
+    variant: string,
+    loader: () => Promise<T>,
+  ): Promise<T> {
+    if (!this.enabled) {
+      return loader();
+    }
+
+    const key = this.buildKey(namespace, branchId, variant);
+    const counters = this.getCounters(namespace);
+    const entry = this.entries.get(key);
+
+    if (entry && entry.expiresAt > Date.now()) {
+      counters.hits++;
+      // Reinserir para marcar como usado recentemente (LRU)
+      this.entries.delete(key);
+      this.entries.set(key, entry);
+      return entry.value as T;
+    }
+
+    if (entry) {
+      this.entries.delete(key);
+    }
+
+    counters.misses++;
+
+    const pending = this.inflight.get(key);
+    if (pending) {
+      return pending as Promise<T>;
+    }
+
+    const promise = loader()
+      .then((value) => {
+        // Só guardar se ninguém invalidou a chave durante a consulta
+        if (this.inflight.get(key) === promise) {
+          this.set(key, value);
+        }
+        return value;
+      })
+      .finally(() => {
+        if (this.inflight.get(key) === promise) {
+          this.inflight.delete(key);
+        }
+      });
+
+    this.inflight.set(key, promise);
+    return promise;
+  }
+
+  /**
+   * Invalida um namespace inteiro ou apenas as entradas de uma filial.
+   * Entradas globais (ALL_BRANCHES) são sempre invalidadas junto,
+   * pois podem conter dados da filial alterada.
+   */
+  invalidate(namespace: CatalogNamespace, branchId?: string | null) {
+    const prefixes = branchId
+      ? [`${namespace}|${branchId}|`, `${namespace}|${ALL_BRANCHES}|`]
+      : [`${namespace}|`];
+
+    let removed = 0;
+    for (const map of [this.entries, this.inflight] as Map<string, unknown>[]) {
+      for (const key of Array.from(map.keys())) {
+        if (prefixes.some((prefix) => key.startsWith(prefix))) {
+          map.delete(key);
+          removed++;
+        }
+      }
+    }
+
+    this.getCounters(namespace).invalidations++;
+    if (removed > 0) {
+      this.logger.debug(`🧹 Cache ${namespace}${branchId ? ` (${branchId})` : ''}: ${removed} entradas invalidadas`);
+    }
+  }
+
+  invalidateAll() {
+    this.entries.clear();
+    this.inflight.clear();
+    for (const namespace of Array.from(this.counters.keys())) {
+      this.getCounters(namespace).invalidations++;
+    }
+  }
+
+  /**
+   * Estatísticas do cache (para monitoramento via /health/cache)
+   */
+  getStats() {
+    const namespaces: Record<string, NamespaceCounters & { hitRate: number; entries: number }> = {};
+    let totalHits = 0;
+    let totalMisses = 0;
+
+    for (const [namespace, counters] of this.counters.entries()) {
+      const lookups = counters.hits + counters.misses;
+      namespaces[namespace] = {
+        ...counters,
+        hitRate: lookups > 0 ? Number((counters.hits / lookups).toFixed(4)) : 0,
+        entries: Array.from(this.entries.keys()).filter((key) => key.startsWith(`${namespace}|`)).length,
+      };
+      totalHits += counters.hits;
+      totalMisses += counters.misses;
+    }
+
+    const totalLookups = totalHits + totalMisses;
+    return {
+      enabled: this.enabled,
+      ttlMs: this.ttlMs,
+      maxEntries: this.maxEntries,
+      size: this.entries.size,
+      evictions: this.evictions,
+      hits: totalHits,
+      misses: totalMisses,
+      hitRate: totalLookups > 0 ? Number((totalHits / totalLookups).toFixed(4)) : 0,
+      namespaces,
+    };
+  }
+
+  private set(key: string, value: any) {
+    this.entries.set(key, { value, expiresAt: Date.now() + this.ttlMs });
+
+    while (this.entries.size > this.maxEntries) {
+      const oldestKey = this.entries.keys().next().value;
+      this.entries.delete(oldestKey);
+      this.evictions++;
+    }
+  }
+
+  private buildKey(namespace: CatalogNamespace, branchId: string | null | undefined, variant: string) {
+    return `${namespace}|${branchId || ALL_BRANCHES}|${variant}`;
+  }
+
+  private getCounters(namespace: CatalogNamespace): NamespaceCounters {
+    let counters = this.counters.get(namespace);
+    if (!counters) {
+      counters = { hits: 0, misses: 0, invalidations: 0 };
+      this.counters.set(namespace, counters);
+    }
+    return counters;
+  }
+}
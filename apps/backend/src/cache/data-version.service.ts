@@ -0,0 +1,57 @@
+import { Injectable } from '@nestjs/common';
+
+/**
+ * Versão dos dados por filial, usada para gerar ETags fortes.
+ *
+ * - `global`: escritas sem filial identificável (afetam todas as filiais)
+ * - `branches[id]`: escritas de uma filial específica
+ * - `total`: qualquer escrita (usado em leituras sem filtro de filial)
+ *
+ * O `bootId` entra no ETag para que um reinício do servidor (que zera os
+ * contadores em memória) nunca produza um 304 com dados antigos.
+ *
+ * Incrementada pelo PrismaService (toda escrita no banco, com ou sem
+ * requisição HTTP) e pelo DataVersionMiddleware (fim de cada escrita HTTP).
+ *
+ * Limitação: os contadores são deste processo. Com mais de uma instância do
+ * backend atrás de um balanceador, uma escrita feita em outra réplica não
+ * muda a versão daqui, e um cliente fixo nesta réplica pode receber 304 com
+ * dados antigos. O ETag pressupõe uma instância só; para escalar, a versão
+ * precisa ser partilhada (ex.: INCR no Redis que já serve as filas) ou o
+ * ConditionalGetMiddleware deve ser desativado.
+ */
+@Injectable()
+export class DataVersionService {
+  private readonly bootId = Date.now().toString(36);
+  private global = 0;
+  private total = 0;
+  private readonly branches = new Map<string, number>();
+
+  bump(branchId?: string | null) {
+    this.total++;
+    if (branchId) {
+      this.branches.set(branchId, (this.branches.get(branchId) || 0) + 1);
+    } else {
+      this.global++;
+    }
+  }
+
+  /**
+   * Versão atual para uma leitura, com ou sem filtro de filial.
+   */
+  getVersion(branchId?: string | null): string {
+    if (branchId) {
+      return `${this.bootId}.${this.global}.${this.branches.get(branchId) || 0}`;
+    }
+    return `${this.bootId}.${this.total}`;
+  }
+
+  getStats() {
+    return {
+      bootId: this.bootId,
+      global: this.global,
+      total: this.total,
+      branches: Object.fromEntries(this.branches),
+    };
+  }
+}
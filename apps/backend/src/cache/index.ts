@@ -0,0 +1,3 @@
+export * from './cache.module';
+export * from './catalog-cache.service';
+export * from './data-version.service';
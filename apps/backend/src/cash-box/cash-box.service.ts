@@ -1,7 +1,61 @@
 import { Injectable, NotFoundException, BadRequestException } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { Prisma } from '@prisma/client';
 import { OpenCashBoxDto, CloseCashBoxDto, AddTransactionDto } from './dto';
 
+type CashBoxWindow = {
+  id: string;
+  branchId: string;
+  openingCash: number;
+  openedAt: Date;
+  closedAt: Date | null;
+};
+
+type CashBoxStats = {
+  salesCount: number;
+  directSales: number;
+  tableSales: number;
+  cashPayments: number;
+  mobileMoneyPayments: number;
+  cardPayments: number;
+  debtPayments: number;
+};
+
+type PaymentBucket = 'cashPayments' | 'mobileMoneyPayments' | 'cardPayments' | 'debtPayments';
+
+// VALE de mesa (grafias usadas pelos clientes)
+const TABLE_VALE_METHODS = ['VALE', 'vale', 'Vale'];
+
+function emptyCashBoxStats(): CashBoxStats {
+  return {
+    salesCount: 0,
+    directSales: 0,
+    tableSales: 0,
+    cashPayments: 0,
+    mobileMoneyPayments: 0,
+    cardPayments: 0,
+    debtPayments: 0,
+  };
+}
+
+// Classificação dos métodos de pagamento (case-insensitive)
+function paymentBucket(method: string | null): PaymentBucket | null {
+  const normalized = (method || '').toLowerCase();
+  if (normalized === 'cash') {
+    return 'cashPayments';
+  }
+  if (normalized === 'orange' || normalized === 'orange_money' || normalized === 'teletaku' || normalized === 'mobile') {
+    return 'mobileMoneyPayments';
+  }
+  if (normalized === 'card' || normalized === 'mixed') {
+    return 'cardPayments';
+  }
+  if (normalized === 'debt' || normalized === 'vale') {
+    return 'debtPayments';
+  }
+  return null;
+}
+
 @Injectable()
 export class CashBoxService {
   constructor(private prisma: PrismaService) {}
@@ -348,136 +402,12 @@ export class CashBoxService {
       take: limit,
     });
 
-    // Para cada caixa, calcular estatísticas
-    const enrichedCashBoxes = await Promise.all(
-      cashBoxes.map(async (cashBox) => {
-        const salesQuery: any = {
-          branchId: cashBox.branchId,
-          openedAt: { gte: cashBox.openedAt },
-        };
-        
-        // Query para TablePayments - APENAS os que NÃO têm Payment vinculado (evita duplicação)
-        // CORREÇÃO: Excluir VALE pois já está contabilizado na Sale com paymentMethod='VALE'
-        const tablePaymentsQuery: any = {
-          processedAt: { gte: cashBox.openedAt },
-          session: { branchId: cashBox.branchId },
-          paymentId: null, // ⚠️ CRÍTICO: Evita contar TablePayment que já tem Payment
-          NOT: {
-            method: { in: ['VALE', 'vale', 'Vale'] },
-          },
-        };
-        
-        if (cashBox.closedAt) {
-          salesQuery.openedAt = {
-            gte: cashBox.openedAt,
-            lte: cashBox.closedAt,
-          };
-          tablePaymentsQuery.processedAt = {
-            gte: cashBox.openedAt,
-            lte: cashBox.closedAt,
-          };
-        }
-
-        const sales = await this.prisma.sale.findMany({
-          where: salesQuery,
-          include: { payments: true },
-        });
-
-        // CRÍTICO: Buscar também pagamentos de mesas (TablePayment)
-        const tablePayments = await this.prisma.tablePayment.findMany({
-          where: tablePaymentsQuery,
-        });
-
-        // Buscar VALE de mesas separadamente para contabilizar em debtPayments
-        // (VALE não cria Sale quando é de mesa, então precisa ser buscado separadamente)
-        const tableValeQuery1 = {
-          processedAt: tablePaymentsQuery.processedAt,
-          session: tablePaymentsQuery.session,
-          paymentId: null,
-          method: { in: ['VALE', 'vale', 'Vale'] },
-        };
-        const tableValePayments1 = await this.prisma.tablePayment.findMany({
-          where: tableValeQuery1,
-        });
-        const tableValeTotal1 = tableValePayments1.reduce((sum, tp) => sum + tp.amount, 0);
-
-        // Combinar totais de vendas diretas + pagamentos de mesas
-        const directTotalSales = sales.reduce((sum, sale) => sum + sale.total, 0);
-        const tableTotalSales = tablePayments.reduce((sum, tp) => sum + tp.amount, 0);
-        const totalSales = directTotalSales + tableTotalSales;
-        
-        // Calcular pagamentos por método (case-insensitive) - CONSISTÊNCIA com getCurrentCashBoxForUser
-        let cashPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => (p.method || '').toLowerCase() === 'cash')
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        let mobileMoneyPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => {
-              const method = (p.method || '').toLowerCase();
-              return method === 'orange' || method === 'orange_money' || method === 'teletaku' || method === 'mobile';
-            })
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        let cardPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => {
-              const method = (p.method || '').toLowerCase();
-              return method === 'card' || method === 'mixed';
-            })
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        let debtPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => {
-              const method = (p.method || '').toLowerCase();
-              return method === 'debt' || method === 'vale';
-            })
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        // CRÍTICO: Adicionar pagamentos de mesas aos totais por método
-        for (const tp of tablePayments) {
-          const method = (tp.method || '').toLowerCase();
-          if (method === 'cash') {
-            cashPayments += tp.amount;
-          } else if (method === 'vale' || method === 'debt') {
-            debtPayments += tp.amount;
-          } else if (method === 'orange' || method === 'orange_money' || method === 'teletaku' || method === 'mobile') {
-            mobileMoneyPayments += tp.amount;
-          } else if (method === 'card' || method === 'mixed') {
-            cardPayments += tp.amount;
-          }
-        }
-
-        // Adicionar VALE de mesas ao debtPayments
-        debtPayments += tableValeTotal1;
-
-        return {
-          ...cashBox,
-          stats: {
-            totalSales,
-            cashPayments,
-            mobileMoneyPayments,
-            cardPayments,
-            debtPayments,
-            totalCashOut: 0, // Saídas de caixa (não implementado ainda)
-            currentAmount: cashBox.openingCash + cashPayments,
-            salesCount: sales.length,
-          },
-        };
-      })
-    );
-
-    return enrichedCashBoxes;
+    // Estatísticas de todos os caixas da página em 3 queries agrupadas (não 3 por caixa)
+    const stats = await this.aggregateCashBoxStats(cashBoxes);
+    return cashBoxes.map((cashBox) => ({
+      ...cashBox,
+      stats: this.toHistoryStats(cashBox, stats.get(cashBox.id)),
+    }));
   }
 
   async findOne(id: string) {
@@ -656,138 +586,129 @@ export class CashBoxService {
       take: limit,
     });
 
-    // Para cada caixa, calcular estatísticas
-    const enrichedCashBoxes = await Promise.all(
-      cashBoxes.map(async (cashBox) => {
-        // Buscar vendas do período desse caixa
-        const salesQuery: any = {
-          branchId: cashBox.branchId,
-          openedAt: { gte: cashBox.openedAt },
-        };
-        
-        // Query para TablePayments - APENAS os que NÃO têm Payment vinculado (evita duplicação)
-        // CORREÇÃO: Excluir VALE pois já está contabilizado na Sale com paymentMethod='VALE'
-        const tablePaymentsQuery: any = {
-          processedAt: { gte: cashBox.openedAt },
-          session: { branchId: cashBox.branchId },
-          paymentId: null, // ⚠️ CRÍTICO: Evita contar TablePayment que já tem Payment
-          NOT: {
-            method: { in: ['VALE', 'vale', 'Vale'] },
-          },
-        };
-        
-        // Se o caixa está fechado, limitar até a data de fechamento
-        if (cashBox.closedAt) {
-          salesQuery.openedAt = {
-            gte: cashBox.openedAt,
-            lte: cashBox.closedAt,
-          };
-          tablePaymentsQuery.processedAt = {
-            gte: cashBox.openedAt,
-            lte: cashBox.closedAt,
-          };
-        }
-
-        const sales = await this.prisma.sale.findMany({
-          where: salesQuery,
-          include: { payments: true },
-        });
+    // Estatísticas de todos os caixas da página em 3 queries agrupadas (não 3 por caixa)
+    const stats = await this.aggregateCashBoxStats(cashBoxes);
+    return cashBoxes.map((cashBox) => ({
+      ...cashBox,
+      stats: this.toHistoryStats(cashBox, stats.get(cashBox.id)),
+    }));
+  }
 
-        // CRÍTICO: Buscar também pagamentos de mesas (TablePayment)
-        const tablePayments = await this.prisma.tablePayment.findMany({
-          where: tablePaymentsQuery,
-        });
+  /**
+   * Janelas de tempo dos caixas como tabela derivada (caixa, filial, abertura, fechamento).
+   * Caixa sem fechamento não tem limite superior ('infinity').
+   */
+  private cashBoxWindows(cashBoxes: CashBoxWindow[]) {
+    const ids = cashBoxes.map((box) => box.id);
+    const branchIds = cashBoxes.map((box) => box.branchId);
+    const openedAts = cashBoxes.map((box) => box.openedAt.toISOString());
+    const closedAts = cashBoxes.map((box) => (box.closedAt ? box.closedAt.toISOString() : 'infinity'));
+
+    return Prisma.sql`
+      SELECT * FROM unnest(
+        ${ids}::text[],
+        ${branchIds}::text[],
+        ${openedAts}::text[]::timestamp[],
+        ${closedAts}::text[]::timestamp[]
+      ) AS w(cash_box_id, branch_id, opened_at, closed_at)
+    `;
+  }
 
-        // Buscar VALE de mesas separadamente para contabilizar em debtPayments
-        // (VALE não cria Sale quando é de mesa, então precisa ser buscado separadamente)
-        const tableValeQuery3 = {
-          processedAt: tablePaymentsQuery.processedAt,
-          session: tablePaymentsQuery.session,
-          paymentId: null,
-          method: { in: ['VALE', 'vale', 'Vale'] },
-        };
-        const tableValePayments3 = await this.prisma.tablePayment.findMany({
-          where: tableValeQuery3,
-        });
-        const tableValeTotal3 = tableValePayments3.reduce((sum, tp) => sum + tp.amount, 0);
-
-        // Combinar totais de vendas diretas + pagamentos de mesas
-        const directTotalSales = sales.reduce((sum, sale) => sum + sale.total, 0);
-        const tableTotalSales = tablePayments.reduce((sum, tp) => sum + tp.amount, 0);
-        const totalSales = directTotalSales + tableTotalSales;
-        
-        // Calcular pagamentos por método (case-insensitive)
-        let cashPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => (p.method || '').toLowerCase() === 'cash')
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        let mobileMoneyPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => {
-              const method = (p.method || '').toLowerCase();
-              return method === 'orange' || method === 'orange_money' || method === 'teletaku' || method === 'mobile';
-            })
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        let cardPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => {
-              const method = (p.method || '').toLowerCase();
-              return method === 'card' || method === 'mixed';
-            })
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        let debtPayments = sales.reduce((sum, sale) => {
-          const amount = sale.payments
-            .filter(p => {
-              const method = (p.method || '').toLowerCase();
-              return method === 'debt' || method === 'vale';
-            })
-            .reduce((s, p) => s + p.amount, 0);
-          return sum + amount;
-        }, 0);
-
-        // CRÍTICO: Adicionar pagamentos de mesas aos totais por método
-        for (const tp of tablePayments) {
-          const method = (tp.method || '').toLowerCase();
-          if (method === 'cash') {
-            cashPayments += tp.amount;
-          } else if (method === 'vale' || method === 'debt') {
-            debtPayments += tp.amount;
-          } else if (method === 'orange' || method === 'orange_money' || method === 'teletaku' || method === 'mobile') {
-            mobileMoneyPayments += tp.amount;
-          } else if (method === 'card' || method === 'mixed') {
-            cardPayments += tp.amount;
-          }
-        }
-
-        // Adicionar VALE de mesas ao debtPayments
-        debtPayments += tableValeTotal3;
-
-        return {
-          ...cashBox,
-          stats: {
-            totalSales,
-            cashPayments,
-            mobileMoneyPayments,
-            cardPayments,
-            debtPayments,
-            totalCashOut: 0, // Saídas de caixa (não implementado ainda)
-            currentAmount: cashBox.openingCash + cashPayments,
-            salesCount: sales.length,
-          },
-        };
-      })
-    );
+  /**
+   * Agrega vendas, pagamentos e pagamentos de mesa de vários caixas de uma vez.
+   * Cada query junta as linhas às janelas dos caixas e agrupa por caixa, então o
+   * custo é constante (3 queries) independente do número de caixas.
+   *
+   * Mesmas regras do cálculo por caixa:
+   * - TablePayment só conta se NÃO tem Payment vinculado (evita duplicar a Sale)
+   * - VALE de mesa vai para debtPayments mas não soma em totalSales (é crédito)
+   */
+  private async aggregateCashBoxStats(cashBoxes: CashBoxWindow[]) {
+    const stats = new Map<string, CashBoxStats>();
+    if (cashBoxes.length === 0) {
+      return stats;
+    }
+
+    const windows = this.cashBoxWindows(cashBoxes);
+    const [salesRows, paymentRows, tablePaymentRows] = await Promise.all([
+      this.prisma.$queryRaw<{ cash_box_id: string; sales_count: number; total: bigint }[]>`
+        WITH w AS (${windows})
+        SELECT w.cash_box_id, COUNT(*)::int AS sales_count, COALESCE(SUM(s.total), 0)::bigint AS total
+        FROM w
+        JOIN "sales" s ON s.branch_id = w.branch_id
+          AND s.opened_at >= w.opened_at AND s.opened_at <= w.closed_at
+        GROUP BY w.cash_box_id
+      `,
+      this.prisma.$queryRaw<{ cash_box_id: string; method: string | null; total: bigint }[]>`
+        WITH w AS (${windows})
+        SELECT w.cash_box_id, p.method, SUM(p.amount)::bigint AS total
+        FROM w
+        JOIN "sales" s ON s.branch_id = w.branch_id
+          AND s.opened_at >= w.opened_at AND s.opened_at <= w.closed_at
+        JOIN "payments" p ON p.sale_id = s.id
+        GROUP BY w.cash_box_id, p.method
+      `,
+      this.prisma.$queryRaw<{ cash_box_id: string; method: string | null; total: bigint }[]>`
+        WITH w AS (${windows})
+        SELECT w.cash_box_id, tp.method, SUM(tp.amount)::bigint AS total
+        FROM w
+        JOIN "table_sessions" ts ON ts.branch_id = w.branch_id
+        JOIN "table_payments" tp ON tp.session_id = ts.id
+        WHERE tp.payment_id IS NULL
+          AND tp.processed_at >= w.opened_at AND tp.processed_at <= w.closed_at
+        GROUP BY w.cash_box_id, tp.method
+      `,
+    ]);
+
+    const statsFor = (cashBoxId: string) => {
+      let entry = stats.get(cashBoxId);
+      if (!entry) {
+        entry = emptyCashBoxStats();
+        stats.set(cashBoxId, entry);
+      }
+      return entry;
+    };
+
+    for (const row of salesRows) {
+      const entry = statsFor(row.cash_box_id);
+      entry.salesCount = Number(row.sales_count);
+      entry.directSales = Number(row.total);
+    }
 
-    return enrichedCashBoxes;
+    for (const row of paymentRows) {
+      const bucket = paymentBucket(row.method);
+      if (bucket) {
+        statsFor(row.cash_box_id)[bucket] += Number(row.total);
+      }
+    }
+
+    for (const row of tablePaymentRows) {
+      const entry = statsFor(row.cash_box_id);
+      const amount = Number(row.total);
+      // VALE de mesa não cria Sale: conta como dívida, não como venda
+      if (!TABLE_VALE_METHODS.includes(row.method || '')) {
+        entry.tableSales += amount;
+      }
+      const bucket = paymentBucket(row.method);
+      if (bucket) {
+        entry[bucket] += amount;
+      }
+    }
+
+    return stats;
+  }
+
+  private toHistoryStats(cashBox: CashBoxWindow, stats = emptyCashBoxStats()) {
+    return {
+      totalSales: stats.directSales + stats.tableSales,
+      cashPayments: stats.cashPayments,
+      mobileMoneyPayments: stats.mobileMoneyPayments,
+      cardPayments: stats.cardPayments,
+      debtPayments: stats.debtPayments,
+      totalCashOut: 0, // Saídas de caixa (não implementado ainda)
+      currentAmount: cashBox.openingCash + stats.cashPayments,
+      salesCount: stats.salesCount,
+    };
   }
 
   /**
@@ -811,129 +732,67 @@ export class CashBoxService {
       throw new NotFoundException('Caixa não encontrado');
     }
 
-    // Definir período de análise
-    const startDate = cashBox.openedAt;
-    const endDate = cashBox.closedAt || new Date();
-
-    // 1. Buscar todas as vendas do período
-    const sales = await this.prisma.sale.findMany({
-      where: {
-        branchId: cashBox.branchId,
-        openedAt: {
-          gte: startDate,
-          lte: endDate,
-        },
-      },
-      include: {
-        items: {
-          include: {
-            product: {
-              select: { id: true, name: true, sku: true },
-            },
-          },
-        },
-        payments: true,
-      },
+    // 1. Agrupar itens por produto e pagamentos por método direto no banco
+    // (antes: todas as vendas do período com itens e produtos carregadas em memória)
+    const windows = this.cashBoxWindows([cashBox]);
+    const [productRows, stats] = await Promise.all([
+      this.prisma.$queryRaw<{
+        productId: string;
+        productName: string;
+        sku: string;
+        qtySold: bigint;
+        revenue: bigint;
+        cost: bigint;
+      }[]>`
+        WITH w AS (${windows})
+        SELECT si.product_id AS "productId",
+               p.name AS "productName",
+               COALESCE(p.sku, '') AS sku,
+               SUM(si.qty_units)::bigint AS "qtySold",
+               SUM(si.total)::bigint AS revenue,
+               SUM(si.unit_cost * si.qty_units)::bigint AS cost
+        FROM w
+        JOIN "sales" s ON s.branch_id = w.branch_id
+          AND s.opened_at >= w.opened_at AND s.opened_at <= w.closed_at
+        JOIN "sale_items" si ON si.sale_id = s.id
+        JOIN "products" p ON p.id = si.product_id
+        GROUP BY si.product_id, p.name, p.sku
+        ORDER BY revenue DESC
+      `,
+      this.aggregateCashBoxStats([cashBox]),
+    ]);
+    const boxStats = stats.get(cashBox.id) || emptyCashBoxStats();
+
+    // 2. Calcular margens por produto (ordenado por receita DESC)
+    const salesItems = productRows.map((row) => {
+      const revenue = Number(row.revenue);
+      const cost = Number(row.cost);
+      return {
+        productId: row.productId,
+        productName: row.productName,
+        sku: row.sku,
+        qtySold: Number(row.qtySold),
+        revenue,
+        cost,
+        profit: revenue - cost,
+        margin: revenue > 0 ? ((revenue - cost) / revenue) * 100 : 0,
+      };
     });
 
-    // 2. Agrupar itens por produto (exatamente como o Electron faz)
-    const productMap = new Map<string, {
-      productId: string;
-      productName: string;
-      sku: string;
-      qtySold: number;
-      revenue: number;
-      cost: number;
-      profit: number;
-    }>();
-
-    for (const sale of sales) {
-      for (const item of sale.items) {
-        const key = item.productId;
-        const existing = productMap.get(key) || {
-          productId: item.productId,
-          productName: item.product.name,
-          sku: item.product.sku || '',
-          qtySold: 0,
-          revenue: 0,
-          cost: 0,
-          profit: 0,
-        };
-
-        existing.qtySold += item.qtyUnits;
-        existing.revenue += item.total;
-        existing.cost += item.unitCost * item.qtyUnits;
-        existing.profit = existing.revenue - existing.cost;
-
-        productMap.set(key, existing);
-      }
-    }
-
-    // 3. Converter para array e calcular margens
-    const salesItems = Array.from(productMap.values())
-      .map(item => ({
-        ...item,
-        margin: item.revenue > 0 ? ((item.revenue - item.cost) / item.revenue) * 100 : 0,
-      }))
-      .sort((a, b) => b.revenue - a.revenue); // Ordenar por receita DESC
-
-    // 4. Calcular totais
+    // 3. Calcular totais
     const totalRevenue = salesItems.reduce((sum, item) => sum + item.revenue, 0);
     const totalCOGS = salesItems.reduce((sum, item) => sum + item.cost, 0);
     const grossProfit = totalRevenue - totalCOGS;
     const profitMargin = totalRevenue > 0 ? (grossProfit / totalRevenue) * 100 : 0;
 
-    // 5. Calcular totais por método de pagamento
-    let cashPayments = 0;
-    let mobileMoneyPayments = 0;
-    let cardPayments = 0;
-    let debtPayments = 0;
-
-    for (const sale of sales) {
-      for (const payment of sale.payments) {
-        const method = (payment.method || '').toLowerCase();
-        if (method === 'cash') {
-          cashPayments += payment.amount;
-        } else if (['orange', 'orange_money', 'teletaku', 'mobile'].includes(method)) {
-          mobileMoneyPayments += payment.amount;
-        } else if (['card', 'mixed'].includes(method)) {
-          cardPayments += payment.amount;
-        } else if (['vale', 'debt'].includes(method)) {
-          debtPayments += payment.amount;
-        }
-      }
-    }
-
-    // 6. Buscar TablePayments do período (para vendas de mesa)
-    const tablePayments = await this.prisma.tablePayment.findMany({
-      where: {
-        processedAt: {
-          gte: startDate,
-          lte: endDate,
-        },
-        session: { branchId: cashBox.branchId },
-        paymentId: null, // Apenas os que não têm Payment vinculado
-      },
-    });
-
-    for (const tp of tablePayments) {
-      const method = (tp.method || '').toLowerCase();
-      if (method === 'cash') {
-        cashPayments += tp.amount;
-      } else if (['orange', 'orange_money', 'teletaku', 'mobile'].includes(method)) {
-        mobileMoneyPayments += tp.amount;
-      } else if (['card', 'mixed'].includes(method)) {
-        cardPayments += tp.amount;
-      } else if (['vale', 'debt'].includes(method)) {
-        debtPayments += tp.amount;
-      }
-    }
+    // 4. Totais por método: pagamentos das vendas + TablePayments sem Payment vinculado
+    const { cashPayments, mobileMoneyPayments, cardPayments, debtPayments } = boxStats;
 
-    // 7. Calcular lucro líquido (desconta vales pois são crédito)
+    // 5. Calcular lucro líquido (desconta vales pois são crédito)
     const netProfit = grossProfit - debtPayments;
     const netMargin = totalRevenue > 0 ? (netProfit / totalRevenue) * 100 : 0;
 
-    // 8. Retornar estrutura completa
+    // 6. Retornar estrutura completa
     return {
       // Dados do caixa
       id: cashBox.id,
@@ -949,7 +808,7 @@ export class CashBoxService {
       openedBy: cashBox.openedByUser?.fullName || 'Desconhecido',
       
       // Contagem de vendas
-      salesCount: sales.length,
+      salesCount: boxStats.salesCount,
       
       // Totais por método de pagamento
       totalSales: totalRevenue,
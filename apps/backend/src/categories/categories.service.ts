@@ -1,12 +1,31 @@
 import { Injectable, NotFoundException } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 import { CreateCategoryDto, UpdateCategoryDto } from './dto';
 
 @Injectable()
 export class CategoriesService {
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private catalogCache: CatalogCacheService,
+  ) {}
+
+  /**
+   * Produtos e menus QR incluem a categoria, então também são invalidados.
+   */
+  private invalidateCache() {
+    this.catalogCache.invalidate('categories');
+    this.catalogCache.invalidate('products');
+    this.catalogCache.invalidate('qr-menu');
+  }
 
   async create(createDto: CreateCategoryDto) {
+    const category = await this.createOrUpsert(createDto);
+    this.invalidateCache();
+    return category;
+  }
+
+  private async createOrUpsert(createDto: CreateCategoryDto) {
     const { parentId, id, ...data } = createDto;
     
     // Usar upsert para suportar sincronização (criar ou atualizar se ID já existir)
@@ -42,7 +61,8 @@ export class CategoriesService {
   }
 
   async findAll(parentId?: string, active?: boolean) {
-    return this.prisma.category.findMany({
+    const variant = JSON.stringify([parentId === undefined ? '__any__' : parentId, active ?? null]);
+    return this.catalogCache.wrap('categories', null, variant, () => this.prisma.category.findMany({
       where: {
         ...(parentId !== undefined && { parentId }),
         ...(active !== undefined && { isActive: active }),
@@ -54,7 +74,7 @@ export class CategoriesService {
         },
       },
       orderBy: [{ sortOrder: 'asc' }, { name: 'asc' }],
-    });
+    }));
   }
 
   async findOne(id: string) {
@@ -86,7 +106,7 @@ export class CategoriesService {
     }
 
     const { parentId, ...data } = updateDto;
-    return this.prisma.category.update({
+    const updated = await this.prisma.category.update({
       where: { id },
       data: {
         ...data,
@@ -95,6 +115,8 @@ export class CategoriesService {
         }),
       },
     });
+    this.invalidateCache();
+    return updated;
   }
 
   async remove(id: string) {
@@ -109,15 +131,19 @@ export class CategoriesService {
 
     // Se tiver produtos ou subcategorias, apenas desativar
     if (category.products.length > 0 || category.children.length > 0) {
-      return this.prisma.category.update({
+      const deactivated = await this.prisma.category.update({
         where: { id },
         data: { isActive: false },
       });
+      this.invalidateCache();
+      return deactivated;
     }
 
     // Caso contrário, deletar
-    return this.prisma.category.delete({
+    const deleted = await this.prisma.category.delete({
       where: { id },
     });
+    this.invalidateCache();
+    return deleted;
   }
 }
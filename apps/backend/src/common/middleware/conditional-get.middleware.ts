@@ -0,0 +1,97 @@
+import { Injectable, NestMiddleware } from '@nestjs/common';
+import { Request, Response, NextFunction } from 'express';
+import { createHash } from 'crypto';
+import { DataVersionService } from '../../cache/data-version.service';
+
+const WRITE_METHODS = ['POST', 'PUT', 'PATCH', 'DELETE'];
+
+/**
+ * Identifica a filial afetada por uma escrita.
+ * Se o payload referencia mais de uma filial (ex: transferência entre filiais)
+ * ou nenhuma, retorna null e a escrita invalida todas as filiais.
+ */
+function resolveWriteBranch(req: Request): string | null {
+  const body = req.body && typeof req.body === 'object' ? req.body : {};
+  const otherBranchKeys = Object.keys(body).filter(
+    (key) => key !== 'branchId' && /branchid$/i.test(key),
+  );
+  if (otherBranchKeys.length > 0) {
+    return null;
+  }
+  const branchId = body.branchId || req.query?.branchId;
+  return typeof branchId === 'string' && branchId ? branchId : null;
+}
+
+/**
+ * Registra escritas na versão de dados por filial.
+ * Aplicado em todas as rotas: qualquer POST/PUT/PATCH/DELETE concluído
+ * invalida os ETags das leituras da filial (ou de todas as filiais).
+ * Complementa o bump do PrismaService: este roda depois da resposta, quando
+ * tudo o que o handler gravou já foi confirmado.
+ */
+@Injectable()
+export class DataVersionMiddleware implements NestMiddleware {
+  constructor(private readonly dataVersion: DataVersionService) {}
+
+  use(req: Request, res: Response, next: NextFunction) {
+    if (!WRITE_METHODS.includes(req.method)) {
+      return next();
+    }
+
+    const branchId = resolveWriteBranch(req);
+    let bumped = false;
+    const bump = () => {
+      if (!bumped) {
+        bumped = true;
+        this.dataVersion.bump(branchId);
+      }
+    };
+
+    // Incrementar só depois que o handler terminou (dados já gravados).
+    // 'close' cobre requisições abortadas pelo cliente.
+    res.on('finish', bump);
+    res.on('close', bump);
+
+    next();
+  }
+}
+
+/**
+ * GET condicional com ETag forte.
+ *
+ * O ETag é derivado da versão de dados da filial (e não do corpo da resposta),
+ * então um `If-None-Match` válido retorna 304 sem executar nenhuma consulta.
+ * A URL completa e o token entram no hash para que filtros e usuários
+ * diferentes nunca partilhem o mesmo ETag.
+ */
+@Injectable()
+export class ConditionalGetMiddleware implements NestMiddleware {
+  constructor(private readonly dataVersion: DataVersionService) {}
+
+  use(req: Request, res: Response, next: NextFunction) {
+    if (req.method !== 'GET') {
+      return next();
+    }
+
+    const branchId = typeof req.query?.branchId === 'string' ? req.query.branchId : null;
+    const version = this.dataVersion.getVersion(branchId);
+    // Relatórios sem datas explícitas dependem do dia atual
+    const day = new Date().toISOString().slice(0, 10);
+    const scope = createHash('sha1')
+      .update(`${req.originalUrl}|${req.headers.authorization || ''}|${day}`)
+      .digest('base64url')
+      .slice(0, 16);
+    const etag = `"${version}-${scope}"`;
+
+    res.setHeader('ETag', etag);
+    res.setHeader('Cache-Control', 'private, no-cache');
+
+    const ifNoneMatch = req.headers['if-none-match'];
+    if (ifNoneMatch && ifNoneMatch.split(',').some((tag) => tag.trim() === etag)) {
+      res.status(304).end();
+      return;
+    }
+
+    next();
+  }
+}
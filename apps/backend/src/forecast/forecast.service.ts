@@ -1,11 +1,13 @@
 import { Injectable } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { DataVersionService } from '../cache/data-version.service';
 
 interface DemandForecast {
   productId: string;
   productName: string;
   currentStock: number;
   avgDailyDemand: number;
+  recentDailyDemand: number;
   forecastedDemand: number;
   daysUntilStockout: number;
   recommendedReorder: number;
@@ -19,80 +21,69 @@ interface SeasonalTrend {
   trend: 'high' | 'medium' | 'low';
 }
 
+/**
+ * Série diária de demanda de todo o catálogo de uma filial.
+ * As séries ficam num único Float64Array (produto × dia, por linha) e todas
+ * as métricas são calculadas em passagens lineares sobre esse array.
+ */
+interface DemandModel {
+  days: number;
+  productIds: string[];
+  productIndex: Map<string, number>;
+  products: Map<string, { name: string; costUnit: number; unitsPerBox: number }>;
+  stock: Map<string, number>;
+  // Dia da semana (0 = domingo) do primeiro dia futuro (amanhã)
+  nextDow: number;
+  totals: Float64Array;
+  // Média diária da janela recente (base da projeção)
+  recentRate: Float64Array;
+  // Média por dia da semana e fator sazonal (média do dia / média geral), produto × 7
+  dowAvg: Float64Array;
+  dowFactor: Float64Array;
+}
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+const RECENT_WINDOW_DAYS = 28;
+const REORDER_COVER_DAYS = 14; // 2 semanas de estoque
+const MAX_STOCKOUT_DAYS = 365;
+const MAX_CACHED_MODELS = 20;
+
 @Injectable()
 export class ForecastService {
-  constructor(private readonly prisma: PrismaService) {}
+  // Modelos por filial/janela, válidos enquanto a versão de dados da filial e o dia não mudarem
+  private readonly models = new Map<string, { version: string; model: Promise<DemandModel> }>();
+
+  constructor(
+    private readonly prisma: PrismaService,
+    private readonly dataVersion: DataVersionService,
+  ) {}
 
   async getDemandForecast(
     branchId: string,
     productId?: string,
     days: number = 30,
   ): Promise<DemandForecast[]> {
-    const startDate = new Date();
-    startDate.setDate(startDate.getDate() - days);
-
-    // Get historical sales data
-    const salesData = await this.prisma.saleItem.findMany({
-      where: {
-        sale: {
-          branchId,
-          createdAt: { gte: startDate },
-        },
-        ...(productId && { productId }),
-      },
-      include: {
-        product: { select: { id: true, name: true } },
-        sale: { select: { createdAt: true } },
-      },
-    });
-
-    // Group by product and calculate demand
-    const productDemand = salesData.reduce((acc, item) => {
-      const key = item.productId;
-      if (!acc[key]) {
-        acc[key] = {
-          productId: item.productId,
-          productName: item.product.name,
-          totalQuantity: 0,
-          sales: [],
-        };
-      }
-      acc[key].totalQuantity += item.qtyUnits;
-      acc[key].sales.push(item);
-      return acc;
-    }, {} as Record<string, any>);
-
-    // Get current inventory
-    const inventoryData = await this.prisma.inventoryItem.findMany({
-      where: {
-        branchId,
-        ...(productId && { productId }),
-      },
-    });
-
-    const inventoryMap = inventoryData.reduce((acc, inv) => {
-      acc[inv.productId] = inv.qtyUnits;
-      return acc;
-    }, {} as Record<string, number>);
-
-    // Calculate forecast
+    const model = await this.getModel(branchId, days);
     const forecasts: DemandForecast[] = [];
 
-    for (const [prodId, data] of Object.entries(productDemand)) {
-      const avgDailyDemand = data.totalQuantity / days;
-      const forecastedDemand = avgDailyDemand * days;
-      const currentStock = inventoryMap[prodId] || 0;
-      const daysUntilStockout = currentStock / avgDailyDemand;
-      const recommendedReorder = Math.ceil(avgDailyDemand * 14); // 2 weeks supply
+    const indexes = productId
+      ? [model.productIndex.get(productId)].filter((index): index is number => index !== undefined)
+      : model.productIds.map((_, index) => index);
+
+    for (const p of indexes) {
+      const prodId = model.productIds[p];
+      const currentStock = model.stock.get(prodId) || 0;
+      const avgDailyDemand = model.totals[p] / days;
 
       forecasts.push({
         productId: prodId,
-        productName: data.productName,
+        productName: model.products.get(prodId)?.name || '',
         currentStock,
         avgDailyDemand: Math.round(avgDailyDemand * 100) / 100,
-        forecastedDemand: Math.round(forecastedDemand),
-        daysUntilStockout: Math.round(daysUntilStockout),
-        recommendedReorder,
+        recentDailyDemand: Math.round(model.recentRate[p] * 100) / 100,
+        forecastedDemand: Math.round(this.projectDemand(model, p, days)),
+        daysUntilStockout: Math.round(this.daysUntilStockout(model, p, currentStock)),
+        recommendedReorder: Math.ceil(this.projectDemand(model, p, REORDER_COVER_DAYS)),
       });
     }
 
@@ -125,52 +116,23 @@ export class ForecastService {
     branchId: string,
     productId?: string,
   ): Promise<SeasonalTrend[]> {
-    const startDate = new Date();
-    startDate.setDate(startDate.getDate() - 90); // 3 months
-
-    const salesData = await this.prisma.saleItem.findMany({
-      where: {
-        sale: {
-          branchId,
-          createdAt: { gte: startDate },
-        },
-        ...(productId && { productId }),
-      },
-      include: {
-        product: { select: { id: true, name: true } },
-        sale: { select: { createdAt: true } },
-      },
-    });
-
-    // Group by product and day of week
-    const trends: Record<string, Record<number, { total: number; count: number }>> = {};
+    const model = await this.getModel(branchId, 90); // 3 months
+    const result: SeasonalTrend[] = [];
 
-    salesData.forEach((item) => {
-      const dayOfWeek = item.sale.createdAt.getDay();
-      const key = item.productId;
+    for (let p = 0; p < model.productIds.length; p++) {
+      const prodId = model.productIds[p];
+      if (productId && prodId !== productId) continue;
 
-      if (!trends[key]) {
-        trends[key] = {};
+      const offset = p * 7;
+      let maxAvg = 0;
+      for (let dow = 0; dow < 7; dow++) {
+        maxAvg = Math.max(maxAvg, model.dowAvg[offset + dow]);
       }
-      if (!trends[key][dayOfWeek]) {
-        trends[key][dayOfWeek] = { total: 0, count: 0 };
-      }
-      trends[key][dayOfWeek].total += item.qtyUnits;
-      trends[key][dayOfWeek].count += 1;
-    });
 
-    // Calculate averages and trends
-    const result: SeasonalTrend[] = [];
+      for (let dow = 0; dow < 7; dow++) {
+        const avgSales = model.dowAvg[offset + dow];
+        if (avgSales <= 0) continue;
 
-    for (const [prodId, dayData] of Object.entries(trends)) {
-      const product = salesData.find((s) => s.productId === prodId)?.product;
-      if (!product) continue;
-
-      for (const [day, data] of Object.entries(dayData)) {
-        const avgSales = data.total / data.count;
-        const maxAvg = Math.max(
-          ...Object.values(dayData).map((d) => d.total / d.count),
-        );
         const trend =
           avgSales > maxAvg * 0.7
             ? 'high'
@@ -180,10 +142,10 @@ export class ForecastService {
 
         result.push({
           productId: prodId,
-          productName: product.name,
-          dayOfWeek: parseInt(day),
+          productName: model.products.get(prodId)?.name || '',
+          dayOfWeek: dow,
           avgSales: Math.round(avgSales * 100) / 100,
-          trend: trend as 'high' | 'medium' | 'low',
+          trend,
         });
       }
     }
@@ -195,36 +157,25 @@ export class ForecastService {
   }
 
   async getReorderRecommendations(branchId: string) {
+    const model = await this.getModel(branchId, 30);
     const forecasts = await this.getDemandForecast(branchId, undefined, 30);
 
     // Filter items that need reordering (less than 2 weeks of stock)
     const needsReorder = forecasts.filter((f) => f.daysUntilStockout <= 14);
 
-    // Get supplier info for products
-    const productIds = needsReorder.map((f) => f.productId);
-    const products = await this.prisma.product.findMany({
-      where: { id: { in: productIds } },
-      select: {
-        id: true,
-        name: true,
-        costUnit: true,
-        unitsPerBox: true,
-      },
-    });
-
     const recommendations = needsReorder.map((forecast) => {
-      const product = products.find((p) => p.id === forecast.productId);
+      const product = model.products.get(forecast.productId);
+      const unitsPerBox = product?.unitsPerBox || 1;
+      const costUnit = product?.costUnit || 0;
+      const boxesToOrder = Math.ceil(forecast.recommendedReorder / unitsPerBox);
       const lastPurchase = null;
 
       return {
         ...forecast,
-        costUnit: product?.costUnit || 0,
-        unitsPerBox: product?.unitsPerBox || 1,
-        boxesToOrder: Math.ceil(forecast.recommendedReorder / (product?.unitsPerBox || 1)),
-        estimatedCost:
-          Math.ceil(forecast.recommendedReorder / (product?.unitsPerBox || 1)) *
-          (product?.costUnit || 0) *
-          (product?.unitsPerBox || 1),
+        costUnit,
+        unitsPerBox,
+        boxesToOrder,
+        estimatedCost: boxesToOrder * costUnit * unitsPerBox,
         lastSupplier: lastPurchase?.supplier,
         priority: forecast.daysUntilStockout <= 3 ? 'urgent' : forecast.daysUntilStockout <= 7 ? 'high' : 'medium',
       };
@@ -235,4 +186,198 @@ export class ForecastService {
       return priorityOrder[a.priority] - priorityOrder[b.priority];
     });
   }
+
+  // ==================== MODELO DE DEMANDA ====================
+
+  /**
+   * Modelo em cache por filial e janela. É recalculado quando chegam escritas
+   * na filial (vendas, estoque) ou quando o dia muda.
+   */
+  private getModel(branchId: string, days: number): Promise<DemandModel> {
+    const key = `${branchId}|${days}`;
+    const version = `${this.dataVersion.getVersion(branchId)}|${new Date().toISOString().slice(0, 10)}`;
+    const cached = this.models.get(key);
+    if (cached && cached.version === version) {
+      return cached.model;
+    }
+
+    const model = this.buildModel(branchId, days);
+    model.catch(() => {
+      if (this.models.get(key)?.model === model) {
+        this.models.delete(key);
+      }
+    });
+
+    this.models.delete(key);
+    this.models.set(key, { version, model });
+    while (this.models.size > MAX_CACHED_MODELS) {
+      this.models.delete(this.models.keys().next().value);
+    }
+    return model;
+  }
+
+  private async buildModel(branchId: string, days: number): Promise<DemandModel> {
+    // Janela de `days` dias (UTC) terminando hoje, inclusive
+    const today = new Date();
+    today.setUTCHours(0, 0, 0, 0);
+    const startDay = new Date(today.getTime() - (days - 1) * DAY_MS);
+    const startDate = startDay.toISOString().slice(0, 10);
+
+    // Demanda diária por produto, agregada no banco (uma linha por produto/dia com venda)
+    const [rows, inventory] = await Promise.all([
+      this.prisma.$queryRaw<{ productId: string; dayIndex: number; qty: bigint }[]>`
+        SELECT si.product_id AS "productId",
+               (s.created_at::date - ${startDate}::date) AS "dayIndex",
+               SUM(si.qty_units)::bigint AS qty
+        FROM "sale_items" si
+        JOIN "sales" s ON s.id = si.sale_id
+        WHERE s.branch_id = ${branchId}
+          AND s.created_at >= ${startDate}::timestamp
+        GROUP BY si.product_id, "dayIndex"
+      `,
+      this.prisma.inventoryItem.findMany({
+        where: { branchId },
+        select: { productId: true, qtyUnits: true },
+      }),
+    ]);
+
+    const productIndex = new Map<string, number>();
+    const productIds: string[] = [];
+    for (const row of rows) {
+      if (!productIndex.has(row.productId)) {
+        productIndex.set(row.productId, productIds.length);
+        productIds.push(row.productId);
+      }
+    }
+
+    const productCount = productIds.length;
+    const series = new Float64Array(productCount * days);
+    for (const row of rows) {
+      const day = Number(row.dayIndex);
+      if (day >= 0 && day < days) {
+        series[productIndex.get(row.productId)! * days + day] += Number(row.qty);
+      }
+    }
+
+    // Quantas vezes cada dia da semana aparece na janela (igual para todos os produtos)
+    const startDow = startDay.getUTCDay();
+    const dowOfDay = new Uint8Array(days);
+    const dowCount = new Float64Array(7);
+    for (let d = 0; d < days; d++) {
+      dowOfDay[d] = (startDow + d) % 7;
+      dowCount[dowOfDay[d]]++;
+    }
+
+    const recentWindow = Math.min(RECENT_WINDOW_DAYS, days);
+    const totals = new Float64Array(productCount);
+    const recentRate = new Float64Array(productCount);
+    const dowAvg = new Float64Array(productCount * 7);
+    const dowFactor = new Float64Array(productCount * 7).fill(1);
+
+    for (let p = 0; p < productCount; p++) {
+      const offset = p * days;
+      let total = 0;
+      let recent = 0;
+      for (let d = 0; d < days; d++) {
+        const qty = series[offset + d];
+        total += qty;
+        dowAvg[p * 7 + dowOfDay[d]] += qty;
+        if (d >= days - recentWindow) {
+          recent += qty;
+        }
+      }
+      totals[p] = total;
+      recentRate[p] = recent / recentWindow;
+
+      const mean = total / days;
+      for (let dow = 0; dow < 7; dow++) {
+        const index = p * 7 + dow;
+        dowAvg[index] = dowCount[dow] > 0 ? dowAvg[index] / dowCount[dow] : 0;
+        // Sazonalidade só com pelo menos 2 semanas de histórico
+        if (mean > 0 && days >= 14) {
+          dowFactor[index] = dowAvg[index] / mean;
+        }
+      }
+    }
+
+    const products = new Map<string, { name: string; costUnit: number; unitsPerBox: number }>();
+    if (productCount > 0) {
+      const productRows = await this.prisma.product.findMany({
+        where: { id: { in: productIds } },
+        select: { id: true, name: true, costUnit: true, unitsPerBox: true },
+      });
+      for (const product of productRows) {
+        products.set(product.id, product);
+      }
+    }
+
+    const stock = new Map<string, number>();
+    for (const item of inventory) {
+      stock.set(item.productId, item.qtyUnits);
+    }
+
+    return {
+      days,
+      productIds,
+      productIndex,
+      products,
+      stock,
+      nextDow: (startDow + days) % 7,
+      totals,
+      recentRate,
+      dowAvg,
+      dowFactor,
+    };
+  }
+
+  /**
+   * Demanda projetada para os próximos `horizon` dias:
+   * taxa recente × fator do dia da semana de cada dia futuro.
+   */
+  private projectDemand(model: DemandModel, p: number, horizon: number) {
+    const rate = model.recentRate[p];
+    if (rate <= 0) return 0;
+
+    const offset = p * 7;
+    let weekFactor = 0;
+    for (let dow = 0; dow < 7; dow++) {
+      weekFactor += model.dowFactor[offset + dow];
+    }
+
+    const weeks = Math.floor(horizon / 7);
+    let demand = weeks * weekFactor * rate;
+    for (let h = weeks * 7; h < horizon; h++) {
+      demand += rate * model.dowFactor[offset + ((model.nextDow + h) % 7)];
+    }
+    return demand;
+  }
+
+  /**
+   * Dias até o estoque acabar consumindo a demanda projetada dia a dia.
+   * Semanas inteiras são puladas de uma vez; só a última é percorrida.
+   */
+  private daysUntilStockout(model: DemandModel, p: number, currentStock: number) {
+    if (currentStock <= 0) return 0;
+    const rate = model.recentRate[p];
+    if (rate <= 0) return MAX_STOCKOUT_DAYS;
+
+    const weeklyDemand = this.projectDemand(model, p, 7);
+    if (weeklyDemand <= 0) return MAX_STOCKOUT_DAYS;
+
+    const weeks = Math.floor(currentStock / weeklyDemand);
+    if (weeks * 7 >= MAX_STOCKOUT_DAYS) return MAX_STOCKOUT_DAYS;
+
+    let remaining = currentStock - weeks * weeklyDemand;
+    let days = weeks * 7;
+    const offset = p * 7;
+    for (let h = 0; h < 7; h++) {
+      const demand = rate * model.dowFactor[offset + ((model.nextDow + h) % 7)];
+      if (demand >= remaining) {
+        return Math.min(days + (demand > 0 ? remaining / demand : 0), MAX_STOCKOUT_DAYS);
+      }
+      remaining -= demand;
+      days++;
+    }
+    return Math.min(days, MAX_STOCKOUT_DAYS);
+  }
 }
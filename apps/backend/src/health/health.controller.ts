@@ -1,9 +1,15 @@
 import { Controller, Get } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
+import { DataVersionService } from '../cache/data-version.service';
 
 @Controller('health')
 export class HealthController {
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private catalogCache: CatalogCacheService,
+    private dataVersion: DataVersionService,
+  ) {}
 
   @Get()
   async check() {
@@ -37,4 +43,14 @@ export class HealthController {
       timestamp: new Date().toISOString(),
     };
   }
+
+  @Get('cache')
+  cache() {
+    return {
+      status: 'ok',
+      timestamp: new Date().toISOString(),
+      catalog: this.catalogCache.getStats(),
+      dataVersion: this.dataVersion.getStats(),
+    };
+  }
 }
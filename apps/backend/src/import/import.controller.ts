@@ -1,10 +1,14 @@
 import { Controller, Post, Delete, Body, UseGuards } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 import { JwtAuthGuard } from '../auth/guards/jwt-auth.guard';
 
 @Controller('import')
 export class ImportController {
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private catalogCache: CatalogCacheService,
+  ) {}
 
   @UseGuards(JwtAuthGuard)
   @Delete('reset-database')
@@ -44,6 +48,7 @@ export class ImportController {
       await this.prisma.auditLog.deleteMany({});
       await this.prisma.notification.deleteMany({});
       // NÃO deletar users e branches para manter acesso admin
+      this.catalogCache.invalidateAll();
       
       console.log('✅ Banco limpo com sucesso!');
       return { success: true, message: 'Banco de dados limpo com sucesso' };
@@ -581,6 +586,8 @@ export class ImportController {
         });
       }
 
+      this.catalogCache.invalidateAll();
+
       return {
         success: true,
         message: 'Dados importados com sucesso',
@@ -1,4 +1,5 @@
-import { IsString, IsInt, IsOptional, Min, IsNumber } from 'class-validator';
+import { IsString, IsInt, IsOptional, Min, Max, IsNumber, IsDateString } from 'class-validator';
+import { Type } from 'class-transformer';
 
 export class AddStockDto {
   @IsString()
@@ -154,3 +155,40 @@ export class UpsertInventoryItemDto {
   @IsInt()
   suggestedReorder?: number;
 }
+
+/**
+ * Filtros, projeção e paginação de GET /inventory.
+ * Sem nenhum destes parâmetros o endpoint mantém a resposta completa
+ * (com product e branch aninhados).
+ */
+export class InventoryQueryDto {
+  @IsOptional()
+  @IsString()
+  branchId?: string;
+
+  // Um ou mais IDs separados por vírgula
+  @IsOptional()
+  @IsString()
+  productId?: string;
+
+  @IsOptional()
+  @IsDateString()
+  updatedSince?: string;
+
+  // Campos separados por vírgula, ex: productId,qtyUnits,product.name
+  @IsOptional()
+  @IsString()
+  fields?: string;
+
+  @IsOptional()
+  @Type(() => Number)
+  @IsInt()
+  @Min(1)
+  @Max(5000)
+  limit?: number;
+
+  // ID do último item da página anterior (keyset)
+  @IsOptional()
+  @IsString()
+  cursor?: string;
+}
@@ -1,18 +1,40 @@
-import { Controller, Get, Post, Put, Delete, Body, Param, Query, UseGuards } from '@nestjs/common';
+import { Controller, Get, Post, Put, Delete, Body, Param, Query, Res, UseGuards } from '@nestjs/common';
+import { Response } from 'express';
 import { InventoryService } from './inventory.service';
 import { JwtAuthGuard } from '../auth/guards/jwt-auth.guard';
-import { AddStockDto, TransferStockDto, AdjustStockDto, AdjustStockByProductDto, UpsertInventoryItemDto } from './dto';
+import { AddStockDto, TransferStockDto, AdjustStockDto, AdjustStockByProductDto, UpsertInventoryItemDto, InventoryQueryDto } from './dto';
 
 @Controller('inventory')
 @UseGuards(JwtAuthGuard)
 export class InventoryController {
   constructor(private inventoryService: InventoryService) {}
 
+  /**
+   * GET /inventory
+   * - Sem parâmetros extras: lista completa com product/branch (compatível com clientes antigos)
+   * - fields=productId,qtyUnits,product.name: projeção (só faz JOIN se pedir campos da relação)
+   * - productId=a,b / updatedSince=ISO: filtros
+   * - limit + cursor: paginação keyset; próximo cursor no header X-Next-Cursor
+   */
   @Get()
-  async findAll(@Query('branchId') branchId?: string) {
-    const items = await this.inventoryService.findAll(branchId);
-    // 🔍 LOG DIAGNÓSTICO: Ajuda a entender 200 0b
-    console.log(`[Inventory] GET /inventory - branchId: ${branchId || 'all'}, resultCount: ${items.length}`);
+  async findAll(
+    @Query() query: InventoryQueryDto,
+    @Res({ passthrough: true }) res: Response,
+  ) {
+    const { branchId, productId, updatedSince, fields, limit, cursor } = query;
+
+    if (!productId && !updatedSince && !fields && !limit && !cursor) {
+      const items = await this.inventoryService.findAll(branchId);
+      // 🔍 LOG DIAGNÓSTICO: Ajuda a entender 200 0b
+      console.log(`[Inventory] GET /inventory - branchId: ${branchId || 'all'}, resultCount: ${items.length}`);
+      return items;
+    }
+
+    const { items, nextCursor } = await this.inventoryService.findMany(query);
+    if (nextCursor) {
+      res.setHeader('X-Next-Cursor', nextCursor);
+    }
+    console.log(`[Inventory] GET /inventory - branchId: ${branchId || 'all'}, fields: ${fields || '*'}, resultCount: ${items.length}`);
     return items;
   }
 
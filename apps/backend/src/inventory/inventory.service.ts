@@ -1,6 +1,62 @@
 import { Injectable, NotFoundException, BadRequestException } from '@nestjs/common';
+import { Prisma } from '@prisma/client';
 import { PrismaService } from '../prisma/prisma.service';
-import { AddStockDto, TransferStockDto, AdjustStockDto, AdjustStockByProductDto, UpsertInventoryItemDto } from './dto';
+import { AddStockDto, TransferStockDto, AdjustStockDto, AdjustStockByProductDto, UpsertInventoryItemDto, InventoryQueryDto } from './dto';
+
+// Campos que podem ser pedidos via ?fields= (projeção direta para o select do Prisma)
+const INVENTORY_SELECTABLE_FIELDS = [
+  'id', 'productId', 'branchId', 'qtyUnits', 'qtyBoxes', 'closedBoxes', 'openBoxUnits',
+  'minStock', 'batchNumber', 'expiryDate', 'location', 'consumptionAvg7d',
+  'consumptionAvg15d', 'consumptionAvg30d', 'daysUntilStockout', 'suggestedReorder',
+  'synced', 'lastSync', 'createdAt', 'updatedAt',
+];
+
+const PRODUCT_SELECTABLE_FIELDS = [
+  'id', 'name', 'sku', 'barcode', 'categoryId', 'unitsPerBox', 'priceUnit',
+  'priceBox', 'costUnit', 'costBox', 'isActive', 'lowStockAlert',
+];
+
+const BRANCH_SELECTABLE_FIELDS = ['id', 'name', 'code'];
+
+/**
+ * Converte `fields=productId,qtyUnits,product.name` em um select do Prisma.
+ * Relações só entram no select (e na consulta) se algum campo delas for pedido.
+ */
+function buildInventorySelect(fields: string): Record<string, any> {
+  const select: Record<string, any> = {};
+  const nested: Record<string, { allowed: string[]; select: Record<string, boolean> }> = {
+    product: { allowed: PRODUCT_SELECTABLE_FIELDS, select: {} },
+    branch: { allowed: BRANCH_SELECTABLE_FIELDS, select: {} },
+  };
+
+  for (const raw of fields.split(',')) {
+    const field = raw.trim();
+    if (!field) continue;
+
+    const [relation, relationField] = field.split('.');
+    if (relationField !== undefined) {
+      const target = nested[relation];
+      if (!target || !target.allowed.includes(relationField)) {
+        throw new BadRequestException(`Campo inválido em fields: ${field}`);
+      }
+      target.select[relationField] = true;
+    } else if (INVENTORY_SELECTABLE_FIELDS.includes(field)) {
+      select[field] = true;
+    } else {
+      throw new BadRequestException(`Campo inválido em fields: ${field}`);
+    }
+  }
+
+  for (const [relation, target] of Object.entries(nested)) {
+    if (Object.keys(target.select).length > 0) {
+      select[relation] = { select: target.select };
+    }
+  }
+
+  // O id é sempre necessário para a paginação por cursor
+  select.id = true;
+  return select;
+}
 
 @Injectable()
 export class InventoryService {
@@ -17,6 +73,46 @@ export class InventoryService {
     });
   }
 
+  /**
+   * Listagem filtrada/projetada de inventário.
+   * Ordena por id para permitir paginação keyset sem JOIN com produtos.
+   */
+  async findMany(query: InventoryQueryDto): Promise<{ items: any[]; nextCursor: string | null }> {
+    const productIds = query.productId
+      ? query.productId.split(',').map((id) => id.trim()).filter(Boolean)
+      : [];
+
+    const where: Record<string, any> = {
+      ...(query.branchId && { branchId: query.branchId }),
+      ...(productIds.length === 1 && { productId: productIds[0] }),
+      ...(productIds.length > 1 && { productId: { in: productIds } }),
+      ...(query.updatedSince && { updatedAt: { gte: new Date(query.updatedSince) } }),
+      ...(query.cursor && { id: { gt: query.cursor } }),
+    };
+
+    const select = query.fields
+      ? buildInventorySelect(query.fields)
+      : undefined;
+
+    const args: Prisma.InventoryItemFindManyArgs = {
+      where,
+      ...(select
+        ? { select }
+        : { include: { product: true, branch: true } }),
+      orderBy: { id: 'asc' },
+      ...(query.limit && { take: query.limit + 1 }),
+    };
+    const items: any[] = await this.prisma.inventoryItem.findMany(args);
+
+    let nextCursor: string | null = null;
+    if (query.limit && items.length > query.limit) {
+      items.pop();
+      nextCursor = items[items.length - 1].id;
+    }
+
+    return { items, nextCursor };
+  }
+
   async findOne(id: string) {
     const item = await this.prisma.inventoryItem.findUnique({
       where: { id },
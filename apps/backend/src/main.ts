@@ -5,6 +5,7 @@ import compression from 'compression';
 import helmet from 'helmet';
 import rateLimit from 'express-rate-limit';
 import * as bodyParser from 'body-parser';
+import * as zlib from 'zlib';
 import { AppModule } from './app.module';
 import { PrismaService } from './prisma/prisma.service';
 
@@ -41,9 +42,18 @@ async function bootstrap() {
   }));
   
   // ============================================================
-  // 📦 COMPRESSION - Compressão de respostas
+  // 📦 COMPRESSION - Compressão de respostas (gzip/brotli)
+  // Brotli é negociado via Accept-Encoding (compression >= 1.8)
+  // Respostas abaixo do threshold não compensam o custo de CPU
   // ============================================================
-  app.use(compression());
+  app.use(compression({
+    threshold: parseInt(configService.get('COMPRESSION_THRESHOLD_BYTES') || '1024'),
+    brotli: {
+      params: {
+        [zlib.constants.BROTLI_PARAM_QUALITY]: 4,
+      },
+    },
+  }));
   
   // ============================================================
   // ⏱️ RATE LIMITING - Proteção contra abuso
@@ -77,7 +87,8 @@ async function bootstrap() {
     origin: corsOrigin === '*' ? true : corsOrigin?.split(',') || '*',
     credentials: true,
     methods: ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'],
-    allowedHeaders: ['Content-Type', 'Authorization', 'Accept'],
+    allowedHeaders: ['Content-Type', 'Authorization', 'Accept', 'If-None-Match'],
+    exposedHeaders: ['ETag', 'X-Next-Cursor'],
   });
 
   // Global prefix
@@ -1,8 +1,49 @@
 import { Injectable, OnModuleInit, OnModuleDestroy, INestApplication } from '@nestjs/common';
-import { PrismaClient } from '@prisma/client';
+import { Prisma, PrismaClient } from '@prisma/client';
+import { DataVersionService } from '../cache/data-version.service';
+
+const WRITE_ACTIONS = new Set<string>([
+  'create', 'createMany', 'update', 'updateMany', 'upsert', 'delete', 'deleteMany',
+  'executeRaw', 'executeRawUnsafe',
+]);
+
+/**
+ * Filial afetada por uma escrita do Prisma (data.branchId ou where.branchId).
+ * Sem filial identificável, a escrita invalida todas as filiais.
+ */
+function resolveWriteBranch(params: Prisma.MiddlewareParams): string | null {
+  const args = params.args || {};
+  const branchId = args.data?.branchId ?? args.where?.branchId;
+  return typeof branchId === 'string' && branchId ? branchId : null;
+}
 
 @Injectable()
 export class PrismaService extends PrismaClient implements OnModuleInit, OnModuleDestroy {
+  constructor(private readonly dataVersion: DataVersionService) {
+    super();
+
+    // Toda escrita no banco invalida os ETags (ver ConditionalGetMiddleware),
+    // inclusive as que não passam por uma rota HTTP: jobs agendados, filas e
+    // chamadas internas entre serviços
+    this.$use(async (params, next) => {
+      const result = await next(params);
+      if (WRITE_ACTIONS.has(params.action)) {
+        this.dataVersion.bump(resolveWriteBranch(params));
+      }
+      return result;
+    });
+
+    // Dentro de um $transaction a escrita só fica visível no commit: uma
+    // leitura entre o bump acima e o commit geraria um ETag novo com dados
+    // antigos. Incrementa de novo depois do commit.
+    const transaction = this.$transaction.bind(this) as (...args: any[]) => Promise<any>;
+    (this as any).$transaction = async (...args: any[]) => {
+      const result = await transaction(...args);
+      this.dataVersion.bump(null);
+      return result;
+    };
+  }
+
   async onModuleInit() {
     await this.$connect();
     console.log('✅ Conexão com banco de dados estabelecida');
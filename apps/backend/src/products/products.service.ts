@@ -1,5 +1,6 @@
 import { Injectable, NotFoundException, BadRequestException, InternalServerErrorException } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 import { CreateProductDto, UpdateProductDto } from './dto';
 
 // Campos válidos do modelo Product no Prisma (excluindo relações)
@@ -24,12 +25,26 @@ function sanitizeProductData(data: Record<string, any>): Record<string, any> {
 
 @Injectable()
 export class ProductsService {
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private catalogCache: CatalogCacheService,
+  ) {}
+
+  /**
+   * Invalida o cache de catálogo após qualquer escrita em produtos.
+   * O menu QR da filial também inclui produtos, por isso é invalidado junto.
+   */
+  private invalidateCache(branchId?: string | null) {
+    this.catalogCache.invalidate('products');
+    this.catalogCache.invalidate('qr-menu', branchId);
+  }
 
   async getCategories() {
-    return this.prisma.category.findMany({
-      orderBy: { name: 'asc' },
-    });
+    return this.catalogCache.wrap('categories', null, 'by-name', () =>
+      this.prisma.category.findMany({
+        orderBy: { name: 'asc' },
+      }),
+    );
   }
 
   async create(createDto: CreateProductDto) {
@@ -86,6 +101,7 @@ export class ProductsService {
             supplier: true,
           },
         });
+        this.invalidateCache(product.branchId);
         return product;
       }
 
@@ -130,6 +146,7 @@ export class ProductsService {
         });
       }
 
+      this.invalidateCache(product.branchId);
       return product;
     } catch (error) {
       // 🔴 CORREÇÃO: Tratamento de erro com mensagem detalhada
@@ -144,7 +161,8 @@ export class ProductsService {
   }
 
   async findAll(categoryId?: string, search?: string, active?: boolean) {
-    return this.prisma.product.findMany({
+    const variant = JSON.stringify([categoryId ?? null, search ?? null, active ?? null]);
+    return this.catalogCache.wrap('products', null, variant, () => this.prisma.product.findMany({
       where: {
         ...(categoryId && { categoryId }),
         ...(active !== undefined && { isActive: active }),
@@ -160,7 +178,7 @@ export class ProductsService {
         category: true,
       },
       orderBy: { name: 'asc' },
-    });
+    }));
   }
 
   async findOne(id: string) {
@@ -247,6 +265,7 @@ export class ProductsService {
         });
       }
 
+      this.invalidateCache(updated.branchId);
       return updated;
     } catch (error) {
       // 🔴 CORREÇÃO: Tratamento de erro com mensagem detalhada
@@ -270,10 +289,12 @@ export class ProductsService {
     }
 
     // Soft delete
-    return this.prisma.product.update({
+    const removed = await this.prisma.product.update({
       where: { id },
       data: { isActive: false },
     });
+    this.invalidateCache(removed.branchId);
+    return removed;
   }
 
   async getPriceHistory(id: string) {
@@ -1,10 +1,14 @@
 import { Injectable, NotFoundException } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 import { CreateMenuDto } from './dto/create-menu.dto';
 
 @Injectable()
 export class QrMenuService {
-  constructor(private readonly prisma: PrismaService) {}
+  constructor(
+    private readonly prisma: PrismaService,
+    private readonly catalogCache: CatalogCacheService,
+  ) {}
 
   async create(createMenuDto: CreateMenuDto) {
     // Verify branch exists
@@ -43,6 +47,10 @@ export class QrMenuService {
 
   async findOne(id: string) {
     const branchId = id.replace('menu-', '');
+    return this.catalogCache.wrap('qr-menu', branchId, 'menu', () => this.loadMenu(id, branchId));
+  }
+
+  private async loadMenu(id: string, branchId: string) {
     const branch = await this.prisma.branch.findUnique({
       where: { id: branchId },
       include: {
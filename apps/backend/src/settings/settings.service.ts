@@ -1,26 +1,34 @@
 import { Injectable } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 
 @Injectable()
 export class SettingsService {
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private catalogCache: CatalogCacheService,
+  ) {}
 
   async findAll() {
-    return this.prisma.setting.findMany();
+    return this.catalogCache.wrap('settings', null, 'all', () => this.prisma.setting.findMany());
   }
 
   async findOne(key: string) {
-    return this.prisma.setting.findUnique({
-      where: { key },
-    });
+    return this.catalogCache.wrap('settings', null, `key:${key}`, () =>
+      this.prisma.setting.findUnique({
+        where: { key },
+      }),
+    );
   }
 
   async upsert(key: string, value: string) {
-    return this.prisma.setting.upsert({
+    const setting = await this.prisma.setting.upsert({
       where: { key },
       update: { value },
       create: { key, value },
     });
+    this.catalogCache.invalidate('settings');
+    return setting;
   }
 
   async upsertMany(settings: Array<{ key: string; value: string }>) {
@@ -33,8 +41,10 @@ export class SettingsService {
   }
 
   async delete(key: string) {
-    return this.prisma.setting.delete({
+    const deleted = await this.prisma.setting.delete({
       where: { key },
     });
+    this.catalogCache.invalidate('settings');
+    return deleted;
   }
 }
@@ -1,10 +1,14 @@
 import { Injectable, NotFoundException, ConflictException, InternalServerErrorException } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
+import { CatalogCacheService } from '../cache/catalog-cache.service';
 import { CreateSupplierDto, UpdateSupplierDto } from './dto';
 
 @Injectable()
 export class SuppliersService {
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private catalogCache: CatalogCacheService,
+  ) {}
 
   async create(createDto: CreateSupplierDto) {
     const { branchId, id, code: providedCode, ...data } = createDto;
@@ -133,6 +137,7 @@ export class SuppliersService {
         where: { supplierId: id },
         data: { supplierId: null },
       });
+      this.catalogCache.invalidate('products');
     }
 
     return this.prisma.supplier.delete({
@@ -2,9 +2,10 @@ import { Module } from '@nestjs/common';
 import { PrismaModule } from '../prisma/prisma.module';
 import { SyncController } from './sync.controller';
 import { SyncService } from './sync.service';
+import { TablesModule } from '../tables/tables.module';
 
 @Module({
-  imports: [PrismaModule],
+  imports: [PrismaModule, TablesModule],
   controllers: [SyncController],
   providers: [SyncService],
   exports: [SyncService],
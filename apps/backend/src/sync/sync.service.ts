@@ -3,6 +3,7 @@ import { PrismaService } from '../prisma/prisma.service';
 import { CreateSyncItemDto, SyncOperation, SyncEntity } from './dto/create-sync-item.dto';
 import { BulkSyncDto } from './dto/bulk-sync.dto';
 import { SyncQueryDto } from './dto/sync-query.dto';
+import { TableStateService } from '../tables/table-state.service';
 
 interface SyncResult {
   success: number;
@@ -13,7 +14,10 @@ interface SyncResult {
 
 @Injectable()
 export class SyncService {
-  constructor(private readonly prisma: PrismaService) {}
+  constructor(
+    private readonly prisma: PrismaService,
+    private readonly tableState: TableStateService,
+  ) {}
 
   async createSyncItem(createSyncItemDto: CreateSyncItemDto) {
     return this.prisma.syncQueue.create({
@@ -338,6 +342,17 @@ export class SyncService {
   }
 
   private async processSyncItem(item: CreateSyncItemDto) {
+    const result = await this.writeSyncItem(item);
+
+    // Escrita direta em mesas/sessões: descartar o estado das mesas em memória da filial
+    if (item.entity.startsWith('table')) {
+      this.tableState.invalidate(item.branchId || undefined);
+    }
+
+    return result;
+  }
+
+  private async writeSyncItem(item: CreateSyncItemDto) {
     const entityTable = this.getEntityTable(item.entity);
     if (!entityTable) {
       throw new Error(`Unknown entity: ${item.entity}`);
@@ -1,11 +1,10 @@
 import { Module } from '@nestjs/common';
 import { TableSessionsController } from './table-sessions.controller';
-import { TablesService } from '../tables/tables.service';
-import { PrismaModule } from '../prisma/prisma.module';
+import { TablesModule } from '../tables/tables.module';
 
+// Usa o TablesService do TablesModule (mesma instância e mesmo estado das mesas em memória)
 @Module({
-  imports: [PrismaModule],
+  imports: [TablesModule],
   controllers: [TableSessionsController],
-  providers: [TablesService],
 })
 export class TableSessionsModule {}
@@ -0,0 +1,330 @@
+import { Injectable, Logger } from '@nestjs/common';
+import { PrismaService } from '../prisma/prisma.service';
+
+const DEFAULT_TTL_MS = 30 * 1000;
+
+/**
+ * Estado de uma mesa no salão, no mesmo formato do overview:
+ * mesa + status + sessão aberta (clientes e pedidos não cancelados).
+ */
+export type TableFloorState = Record<string, any> & {
+  id: string;
+  branchId: string;
+  status: 'occupied' | 'available';
+  currentSession: any | null;
+};
+
+interface BranchFloor {
+  tables: Map<string, TableFloorState>;
+  // Versão em que cada mesa mudou pela última vez (e mesas removidas)
+  changedAt: Map<string, number>;
+  removedAt: Map<string, number>;
+  // Clientes com `since` anterior a esta versão recebem o salão inteiro
+  fullSince: number;
+  loadedAt: number;
+}
+
+export interface FloorChanges {
+  version: number;
+  full: boolean;
+  tables: TableFloorState[];
+  removedTableIds: string[];
+}
+
+/**
+ * Estado das mesas em memória, por filial.
+ *
+ * O salão é carregado do banco numa única query e depois mantido pelas
+ * mutações do TablesService (abrir/fechar sessão, clientes, pedidos,
+ * pagamentos), que aplicam apenas o delta da operação. Cada alteração
+ * incrementa a versão da filial, permitindo que os clientes busquem só
+ * as mesas que mudaram desde a última versão vista.
+ *
+ * Escritas que não passam pelo TablesService (sync genérico, importação,
+ * restauração de backup) são cobertas pelo TTL: o salão é recarregado
+ * por inteiro depois de TABLE_STATE_TTL_MS.
+ */
+@Injectable()
+export class TableStateService {
+  private readonly logger = new Logger(TableStateService.name);
+  private readonly floors = new Map<string, BranchFloor>();
+  private readonly loading = new Map<string, Promise<BranchFloor>>();
+  // Mutações ocorridas durante um carregamento invalidam o resultado
+  private readonly dirtyWhileLoading = new Set<string>();
+  private readonly sessionIndex = new Map<string, { branchId: string; tableId: string }>();
+  private readonly tableIndex = new Map<string, string>();
+  private version = 0;
+
+  private readonly ttlMs = parseInt(process.env.TABLE_STATE_TTL_MS || '', 10) || DEFAULT_TTL_MS;
+  private readonly enabled = process.env.TABLE_STATE_DISABLED !== 'true';
+
+  constructor(private prisma: PrismaService) {}
+
+  async getOverview(branchId: string): Promise<TableFloorState[]> {
+    const floor = await this.getFloor(branchId);
+    return this.sortTables(Array.from(floor.tables.values()));
+  }
+
+  /**
+   * Mesas alteradas desde `since`. Sem `since` (ou com uma versão anterior
+   * ao último recarregamento do salão) retorna o salão inteiro.
+   */
+  async getChanges(branchId: string, since?: number): Promise<FloorChanges> {
+    const floor = await this.getFloor(branchId);
+    const version = this.version;
+
+    if (since === undefined || Number.isNaN(since) || since < floor.fullSince || since > version) {
+      return {
+        version,
+        full: true,
+        tables: this.sortTables(Array.from(floor.tables.values())),
+        removedTableIds: [],
+      };
+    }
+
+    const tables: TableFloorState[] = [];
+    for (const [tableId, changedAt] of floor.changedAt) {
+      const table = floor.tables.get(tableId);
+      if (changedAt > since && table) {
+        tables.push(table);
+      }
+    }
+    const removedTableIds: string[] = [];
+    for (const [tableId, removedAt] of floor.removedAt) {
+      if (removedAt > since) {
+        removedTableIds.push(tableId);
+      }
+    }
+
+    return { version, full: false, tables: this.sortTables(tables), removedTableIds };
+  }
+
+  /**
+   * Estado de uma mesa, se a filial dela estiver carregada e válida.
+   */
+  getTable(tableId: string): TableFloorState | null {
+    const branchId = this.tableIndex.get(tableId);
+    const floor = branchId ? this.freshFloor(branchId) : null;
+    return floor?.tables.get(tableId) || null;
+  }
+
+  locateSession(sessionId: string) {
+    return this.sessionIndex.get(sessionId) || null;
+  }
+
+  /**
+   * Aplica uma mutação numa mesa já carregada. Se a filial não estiver em
+   * memória não há nada a fazer (a próxima leitura carrega do banco); se a
+   * mesa não for conhecida, o salão da filial é descartado.
+   */
+  apply(branchId: string, tableId: string, mutate: (table: TableFloorState) => void) {
+    if (this.loading.has(branchId)) {
+      this.dirtyWhileLoading.add(branchId);
+      return;
+    }
+    const floor = this.floors.get(branchId);
+    if (!floor) {
+      return;
+    }
+    const table = floor.tables.get(tableId);
+    if (!table) {
+      this.invalidate(branchId);
+      return;
+    }
+
+    const previousSessionId = table.currentSession?.id;
+    try {
+      mutate(table);
+    } catch (error) {
+      this.logger.warn(`Estado da mesa ${tableId} inconsistente, recarregando filial: ${error}`);
+      this.invalidate(branchId);
+      return;
+    }
+    if (previousSessionId && table.currentSession?.id !== previousSessionId) {
+      this.sessionIndex.delete(previousSessionId);
+    }
+    this.indexSession(table);
+    this.markChanged(floor, tableId);
+  }
+
+  /**
+   * Recarrega do banco apenas as mesas indicadas (operações estruturais:
+   * transferências, junções e divisões de mesa).
+   */
+  async refreshTables(branchId: string, tableIds: string[]) {
+    if (this.loading.has(branchId)) {
+      this.dirtyWhileLoading.add(branchId);
+      return;
+    }
+    const floor = this.floors.get(branchId);
+    if (!floor) {
+      return;
+    }
+
+    const rows = await this.queryTables({ id: { in: tableIds } });
+    const found = new Set<string>();
+    for (const row of rows) {
+      const table = this.toFloorState(row);
+      found.add(table.id);
+      const previousSessionId = floor.tables.get(table.id)?.currentSession?.id;
+      if (previousSessionId && table.currentSession?.id !== previousSessionId) {
+        this.sessionIndex.delete(previousSessionId);
+      }
+      if (table.isActive && table.branchId === branchId) {
+        floor.tables.set(table.id, table);
+        floor.removedAt.delete(table.id);
+        this.tableIndex.set(table.id, branchId);
+        this.indexSession(table);
+        this.markChanged(floor, table.id);
+      } else {
+        this.removeTable(floor, table.id);
+      }
+    }
+    for (const tableId of tableIds) {
+      if (!found.has(tableId)) {
+        this.removeTable(floor, tableId);
+      }
+    }
+  }
+
+  invalidate(branchId?: string) {
+    if (branchId) {
+      this.floors.delete(branchId);
+      if (this.loading.has(branchId)) {
+        this.dirtyWhileLoading.add(branchId);
+      }
+    } else {
+      this.floors.clear();
+      for (const loadingBranch of this.loading.keys()) {
+        this.dirtyWhileLoading.add(loadingBranch);
+      }
+    }
+  }
+
+  getStats() {
+    return {
+      enabled: this.enabled,
+      ttlMs: this.ttlMs,
+      version: this.version,
+      branches: Array.from(this.floors.entries()).map(([branchId, floor]) => ({
+        branchId,
+        tables: floor.tables.size,
+        ageMs: Date.now() - floor.loadedAt,
+      })),
+    };
+  }
+
+  private freshFloor(branchId: string) {
+    const floor = this.floors.get(branchId);
+    if (floor && Date.now() - floor.loadedAt < this.ttlMs) {
+      return floor;
+    }
+    return null;
+  }
+
+  private async getFloor(branchId: string): Promise<BranchFloor> {
+    const floor = this.enabled ? this.freshFloor(branchId) : null;
+    if (floor) {
+      return floor;
+    }
+
+    const pending = this.loading.get(branchId);
+    if (pending) {
+      return pending;
+    }
+
+    const promise = this.loadFloor(branchId).finally(() => {
+      this.loading.delete(branchId);
+    });
+    this.loading.set(branchId, promise);
+    return promise;
+  }
+
+  private async loadFloor(branchId: string): Promise<BranchFloor> {
+    this.dirtyWhileLoading.delete(branchId);
+    const rows = await this.queryTables({ branchId, isActive: true });
+
+    const version = ++this.version;
+    const floor: BranchFloor = {
+      tables: new Map(),
+      changedAt: new Map(),
+      removedAt: new Map(),
+      fullSince: version,
+      loadedAt: Date.now(),
+    };
+
+    for (const [sessionId, location] of this.sessionIndex) {
+      if (location.branchId === branchId) {
+        this.sessionIndex.delete(sessionId);
+      }
+    }
+    for (const row of rows) {
+      const table = this.toFloorState(row);
+      floor.tables.set(table.id, table);
+      floor.changedAt.set(table.id, version);
+      this.tableIndex.set(table.id, branchId);
+      this.indexSession(table);
+    }
+
+    // Uma mutação chegou durante a consulta: responder com o resultado, mas não guardar
+    if (this.enabled && !this.dirtyWhileLoading.has(branchId)) {
+      this.floors.set(branchId, floor);
+    }
+    this.dirtyWhileLoading.delete(branchId);
+    return floor;
+  }
+
+  private queryTables(where: Record<string, any>) {
+    return this.prisma.table.findMany({
+      where,
+      orderBy: { number: 'asc' },
+      include: {
+        sessions: {
+          where: { status: 'open' },
+          take: 1,
+          include: {
+            customers: {
+              include: {
+                orders: {
+                  where: { status: { not: 'cancelled' } },
+                },
+              },
+            },
+          },
+        },
+      },
+    });
+  }
+
+  private toFloorState(row: any): TableFloorState {
+    const { sessions, ...table } = row;
+    const activeSession = sessions[0] || null;
+    return {
+      ...table,
+      status: activeSession ? 'occupied' : 'available',
+      currentSession: activeSession,
+    };
+  }
+
+  private indexSession(table: TableFloorState) {
+    if (table.currentSession) {
+      this.sessionIndex.set(table.currentSession.id, { branchId: table.branchId, tableId: table.id });
+    }
+  }
+
+  private markChanged(floor: BranchFloor, tableId: string) {
+    floor.changedAt.set(tableId, ++this.version);
+  }
+
+  private removeTable(floor: BranchFloor, tableId: string) {
+    if (floor.tables.delete(tableId)) {
+      floor.changedAt.delete(tableId);
+      floor.removedAt.set(tableId, ++this.version);
+    }
+    this.tableIndex.delete(tableId);
+  }
+
+  private sortTables(tables: TableFloorState[]) {
+    return tables.sort((a, b) => (a.number < b.number ? -1 : a.number > b.number ? 1 : 0));
+  }
+}
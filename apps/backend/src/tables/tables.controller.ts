@@ -217,6 +217,18 @@ export class TablesController {
     return this.tablesService.getTablesOverview(branchId);
   }
 
+  /**
+   * Polling incremental do salão: retorna só as mesas alteradas desde `since`
+   * e a versão atual (usar na próxima chamada). Sem `since`, retorna tudo.
+   */
+  @Get('overview/:branchId/changes')
+  getOverviewChanges(@Param('branchId') branchId: string, @Query('since') since?: string) {
+    return this.tablesService.getTablesOverviewChanges(
+      branchId,
+      since !== undefined ? parseInt(since, 10) : undefined,
+    );
+  }
+
   @Get(':id')
   findOne(@Param('id') id: string) {
     return this.tablesService.findOne(id);
@@ -1,12 +1,13 @@
 import { Module } from '@nestjs/common';
 import { TablesController } from './tables.controller';
 import { TablesService } from './tables.service';
+import { TableStateService } from './table-state.service';
 import { PrismaModule } from '../prisma/prisma.module';
 
 @Module({
   imports: [PrismaModule],
   controllers: [TablesController],
-  providers: [TablesService],
-  exports: [TablesService],
+  providers: [TablesService, TableStateService],
+  exports: [TablesService, TableStateService],
 })
 export class TablesModule {}
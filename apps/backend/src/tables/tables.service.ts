@@ -1,10 +1,14 @@
 import { Injectable, NotFoundException, BadRequestException } from '@nestjs/common';
 import { PrismaService } from '../prisma/prisma.service';
 import { CreateTableDto, UpdateTableDto } from './dto';
+import { TableStateService } from './table-state.service';
 
 @Injectable()
 export class TablesService {
-  constructor(private prisma: PrismaService) {}
+  constructor(
+    private prisma: PrismaService,
+    private tableState: TableStateService,
+  ) {}
 
   async create(createDto: CreateTableDto) {
     // Verificar se já existe mesa com mesmo número na mesma filial
@@ -35,9 +39,13 @@ export class TablesService {
       data.id = createDto.id;
     }
 
-    return this.prisma.table.create({
+    const table = await this.prisma.table.create({
       data,
     });
+
+    await this.tableState.refreshTables(table.branchId, [table.id]);
+
+    return table;
   }
 
   async findAll(branchId?: string) {
@@ -105,10 +113,19 @@ export class TablesService {
       throw new NotFoundException('Mesa não encontrada');
     }
 
-    return this.prisma.table.update({
+    const updated = await this.prisma.table.update({
       where: { id },
       data: updateDto,
     });
+
+    if (updated.branchId !== table.branchId) {
+      this.tableState.invalidate(table.branchId);
+      this.tableState.invalidate(updated.branchId);
+    } else {
+      await this.tableState.refreshTables(table.branchId, [id]);
+    }
+
+    return updated;
   }
 
   /**
@@ -173,14 +190,31 @@ export class TablesService {
     }
 
     // Soft delete - apenas desativar
-    return this.prisma.table.update({
+    const removed = await this.prisma.table.update({
       where: { id },
       data: { isActive: false },
     });
+
+    await this.tableState.refreshTables(table.branchId, [id]);
+
+    return removed;
   }
 
   async getTableStatus(id: string) {
+    // Servir do estado em memória (mesmo formato do overview)
+    const cached = this.tableState.getTable(id);
+    if (cached) {
+      return cached;
+    }
+
     const table = await this.findOne(id);
+    if (table.isActive) {
+      await this.tableState.getOverview(table.branchId);
+      const loaded = this.tableState.getTable(id);
+      if (loaded) {
+        return loaded;
+      }
+    }
 
     // Buscar sessão ativa na mesa
     const activeSession = await this.prisma.tableSession.findFirst({
@@ -206,35 +240,19 @@ export class TablesService {
 
   // ==================== OVERVIEW ====================
 
+  /**
+   * Salão da filial, servido do estado em memória (TableStateService).
+   */
   async getTablesOverview(branchId: string) {
-    const tables = await this.prisma.table.findMany({
-      where: { branchId, isActive: true },
-      orderBy: { number: 'asc' },
-    });
-
-    const result = [];
-    for (const table of tables) {
-      const activeSession = await this.prisma.tableSession.findFirst({
-        where: { tableId: table.id, status: 'open' },
-        include: {
-          customers: {
-            include: {
-              orders: {
-                where: { status: { not: 'cancelled' } },
-              },
-            },
-          },
-        },
-      });
-
-      result.push({
-        ...table,
-        status: activeSession ? 'occupied' : 'available',
-        currentSession: activeSession,
-      });
-    }
+    return this.tableState.getOverview(branchId);
+  }
 
-    return result;
+  /**
+   * Apenas as mesas alteradas desde a versão `since` (polling incremental).
+   * Sem `since` retorna o salão inteiro junto com a versão atual.
+   */
+  async getTablesOverviewChanges(branchId: string, since?: number) {
+    return this.tableState.getChanges(branchId, since);
   }
 
   // ==================== SESSÕES ====================
@@ -286,6 +304,11 @@ export class TablesService {
 
     const session = await this.prisma.tableSession.create({ data });
 
+    this.tableState.apply(table.branchId, tableId, (state) => {
+      state.status = 'occupied';
+      state.currentSession = { ...session, customers: [] };
+    });
+
     // Registrar ação
     await this.logAction(session.id, 'OPEN_SESSION', openedBy, 'Sessão aberta');
 
@@ -334,6 +357,13 @@ export class TablesService {
       },
     });
 
+    this.tableState.apply(session.branchId, session.tableId, (state) => {
+      if (state.currentSession?.id === sessionId) {
+        state.status = 'available';
+        state.currentSession = null;
+      }
+    });
+
     // Registrar ação
     await this.logAction(sessionId, 'CLOSE_SESSION', closedBy, 'Sessão fechada');
 
@@ -358,6 +388,8 @@ export class TablesService {
       data: { tableId: toTableId },
     });
 
+    await this.tableState.refreshTables(session.branchId, [session.tableId, toTableId]);
+
     // Registrar ação
     await this.logAction(sessionId, 'TRANSFER_TABLE', transferredBy, 
       `Mesa transferida de ${session.table.number} para ${toTable.number}`);
@@ -403,6 +435,8 @@ export class TablesService {
       }
     }
 
+    await this.tableState.refreshTables(session.branchId, [session.tableId, toTableId]);
+
     // Registrar ação
     await this.logAction(sessionId, 'TRANSFER_CUSTOMERS', transferredBy, 
       `${customerIds.length} cliente(s) transferido(s)`);
@@ -422,10 +456,12 @@ export class TablesService {
       targetSession = await this.openSession(targetTableId, firstSession.branchId, mergedBy);
     }
 
+    const affectedTableIds = [targetTableId];
     for (const sessionId of sessionIds) {
       if (sessionId === targetSession.id) continue;
 
       const session = await this.getSession(sessionId);
+      affectedTableIds.push(session.tableId);
       
       // Mover todos os clientes para a sessão destino
       await this.prisma.tableCustomer.updateMany({
@@ -454,6 +490,7 @@ export class TablesService {
 
     // Recalcular totais
     await this.recalculateSessionTotals(targetSession.id);
+    await this.tableState.refreshTables(firstSession.branchId, affectedTableIds);
 
     // Registrar ação
     await this.logAction(targetSession.id, 'MERGE_TABLES', mergedBy, 
@@ -492,6 +529,10 @@ export class TablesService {
 
     // Recalcular totais da sessão original
     await this.recalculateSessionTotals(sessionId);
+    await this.tableState.refreshTables(session.branchId, [
+      session.tableId,
+      ...distributions.map((dist) => dist.targetTableId),
+    ]);
 
     // Registrar ação
     await this.logAction(sessionId, 'SPLIT_TABLE', splitBy, 
@@ -547,6 +588,10 @@ export class TablesService {
       data: { updatedAt: new Date() },
     });
 
+    this.tableState.apply(session.branchId, session.tableId, (state) => {
+      state.currentSession?.customers.push({ ...customer, orders: [] });
+    });
+
     // Registrar ação
     await this.logAction(sessionId, 'ADD_CUSTOMER', addedBy, `Cliente "${customerName}" adicionado`);
 
@@ -576,7 +621,7 @@ export class TablesService {
     }
 
     // Validar sessão / cliente para evitar erro 500 por constraint
-    await this.getSession(sessionId);
+    const session = await this.getSession(sessionId);
     const tableCustomer = await this.prisma.tableCustomer.findUnique({
       where: { id: tableCustomerId },
     });
@@ -622,11 +667,17 @@ export class TablesService {
       include: { product: true },
     });
 
-    // Atualizar total do cliente
-    await this.recalculateCustomerTotals(tableCustomerId);
+    // Atualizar totais do cliente e da sessão pelo delta do pedido (sem somar todos os pedidos)
+    await this.applyOrderDelta(sessionId, tableCustomerId, total);
 
-    // Atualizar total da sessão
-    await this.recalculateSessionTotals(sessionId);
+    this.tableState.apply(session.branchId, session.tableId, (state) => {
+      const customer = this.findStateCustomer(state, sessionId, tableCustomerId);
+      const { product: _product, ...stateOrder } = order;
+      customer.orders.push(stateOrder);
+      customer.subtotal += total;
+      customer.total += total;
+      state.currentSession.totalAmount += total;
+    });
 
     // Registrar ação
     await this.logAction(sessionId, 'ADD_ORDER', orderedBy, 
@@ -641,13 +692,22 @@ export class TablesService {
   async cancelOrder(orderId: string, cancelledBy: string) {
     const order = await this.prisma.tableOrder.findUnique({
       where: { id: orderId },
-      include: { product: true },
+      include: {
+        product: true,
+        session: { select: { branchId: true, tableId: true } },
+      },
     });
 
     if (!order) {
       throw new NotFoundException('Pedido não encontrado');
     }
 
+    // Idempotência (reenvio do sync): não estornar duas vezes
+    if (order.status === 'cancelled') {
+      const { product: _product, session: _session, ...cancelled } = order;
+      return cancelled;
+    }
+
     if (order.status === 'paid') {
       throw new BadRequestException('Não é possível cancelar pedido já pago');
     }
@@ -661,9 +721,16 @@ export class TablesService {
       },
     });
 
-    // Recalcular totais
-    await this.recalculateCustomerTotals(order.tableCustomerId);
-    await this.recalculateSessionTotals(order.sessionId);
+    // Estornar o pedido dos totais do cliente e da sessão
+    await this.applyOrderDelta(order.sessionId, order.tableCustomerId, -order.total, -order.subtotal);
+
+    this.tableState.apply(order.session.branchId, order.session.tableId, (state) => {
+      const customer = this.findStateCustomer(state, order.sessionId, order.tableCustomerId);
+      customer.orders = customer.orders.filter((o: any) => o.id !== orderId);
+      customer.subtotal -= order.subtotal;
+      customer.total -= order.total;
+      state.currentSession.totalAmount -= order.total;
+    });
 
     // Estornar estoque
     await this.adjustStock(order.productId, order.qtyUnits, 'Cancelamento de pedido');
@@ -684,7 +751,10 @@ export class TablesService {
   ) {
     const order = await this.prisma.tableOrder.findUnique({
       where: { id: orderId },
-      include: { product: true },
+      include: {
+        product: true,
+        session: { select: { branchId: true, tableId: true } },
+      },
     });
 
     if (!order) {
@@ -730,6 +800,7 @@ export class TablesService {
     await this.recalculateCustomerTotals(fromCustomerId);
     await this.recalculateCustomerTotals(toCustomerId);
     await this.recalculateSessionTotals(order.sessionId);
+    await this.tableState.refreshTables(order.session.branchId, [order.session.tableId]);
 
     // Registrar ação
     await this.logAction(order.sessionId, 'TRANSFER_ORDER', transferredBy, 
@@ -797,6 +868,25 @@ export class TablesService {
       });
     }
 
+    const location = await this.sessionLocation(sessionId);
+    if (location && (isSessionPayment || tableCustomerId)) {
+      this.tableState.apply(location.branchId, location.tableId, (state) => {
+        if (!isSessionPayment && tableCustomerId) {
+          const customer = this.findStateCustomer(state, sessionId, tableCustomerId);
+          customer.paidAmount += amount;
+          customer.paymentStatus = customer.paidAmount >= customer.total ? 'paid' : 'partial';
+          if (customer.paidAmount >= customer.total) {
+            for (const order of customer.orders) {
+              if (order.status === 'pending') {
+                order.status = 'paid';
+              }
+            }
+          }
+        }
+        state.currentSession.paidAmount += amount;
+      });
+    }
+
     // Registrar ação
     await this.logAction(sessionId, 'PAYMENT', processedBy, 
       `Pagamento ${method}: ${amount / 100} FCFA`);
@@ -815,6 +905,18 @@ export class TablesService {
       data: { status: 'cleared' },
     });
 
+    const location = await this.sessionLocation(sessionId);
+    if (location) {
+      this.tableState.apply(location.branchId, location.tableId, (state) => {
+        const customer = this.findStateCustomer(state, sessionId, tableCustomerId);
+        for (const order of customer.orders) {
+          if (order.status === 'paid') {
+            order.status = 'cleared';
+          }
+        }
+      });
+    }
+
     // Registrar ação
     await this.logAction(sessionId, 'CLEAR_ORDERS', clearedBy, 'Pedidos pagos limpos');
 
@@ -823,6 +925,47 @@ export class TablesService {
 
   // ==================== HELPERS ====================
 
+  /**
+   * Soma (ou estorna, com valor negativo) um pedido nos totais do cliente e
+   * da sessão com increment, em vez de recalcular a partir de todos os pedidos.
+   */
+  private async applyOrderDelta(sessionId: string, tableCustomerId: string, total: number, subtotal = total) {
+    await this.prisma.tableCustomer.update({
+      where: { id: tableCustomerId },
+      data: { subtotal: { increment: subtotal }, total: { increment: total } },
+    });
+
+    await this.prisma.tableSession.update({
+      where: { id: sessionId },
+      data: { totalAmount: { increment: total } },
+    });
+  }
+
+  private async sessionLocation(sessionId: string) {
+    return (
+      this.tableState.locateSession(sessionId) ||
+      this.prisma.tableSession.findUnique({
+        where: { id: sessionId },
+        select: { branchId: true, tableId: true },
+      })
+    );
+  }
+
+  /**
+   * Cliente da sessão aberta no estado em memória. Lança erro se o estado
+   * não corresponder ao banco (o TableStateService recarrega a filial).
+   */
+  private findStateCustomer(state: any, sessionId: string, tableCustomerId: string) {
+    if (state.currentSession?.id !== sessionId) {
+      throw new Error(`sessão ${sessionId} não é a sessão aberta da mesa`);
+    }
+    const customer = state.currentSession.customers.find((c: any) => c.id === tableCustomerId);
+    if (!customer) {
+      throw new Error(`cliente ${tableCustomerId} não encontrado na sessão`);
+    }
+    return customer;
+  }
+
   private async recalculateCustomerTotals(customerId: string) {
     const orders = await this.prisma.tableOrder.findMany({
       where: { tableCustomerId: customerId, status: { not: 'cancelled' } },
@@ -0,0 +1,167 @@
+/**
+ * Benchmark do caminho de venda do DatabaseManager (vendas/segundo)
+ *
+ * Gera um banco temporário com muitos produtos e vendas históricas e compara:
+ *   - legado: createSale + addSaleItem (N vezes) + addSalePayment (uma transação por chamada)
+ *   - recordSale: venda + itens + pagamento numa única transação
+ *
+ * Uso (better-sqlite3 é compilado para o Electron):
+ *   pnpm bench:sales
+ *   BENCH_PRODUCTS=5000 BENCH_HISTORY=200000 BENCH_SALES=2000 pnpm bench:sales
+ */
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const Database = require('better-sqlite3');
+const { DatabaseManager } = require('./dist-electron/database/manager');
+
+const PRODUCTS = parseInt(process.env.BENCH_PRODUCTS || '2000', 10);
+const HISTORY = parseInt(process.env.BENCH_HISTORY || '50000', 10);
+const SALES = parseInt(process.env.BENCH_SALES || '1000', 10);
+const ITEMS_PER_SALE = parseInt(process.env.BENCH_ITEMS || '4', 10);
+const BRANCH_ID = 'main-branch';
+
+function uuid(prefix, n) {
+  return `${prefix}-${String(n).padStart(10, '0')}`;
+}
+
+function seed(db) {
+  const insertProduct = db.prepare(`
+    INSERT INTO products (id, sku, name, price_unit, cost_unit, units_per_box, is_active)
+    VALUES (?, ?, ?, 500, 300, 24, 1)
+  `);
+  const insertStock = db.prepare(`
+    INSERT INTO inventory_items (id, product_id, branch_id, qty_units, closed_boxes, open_box_units)
+    VALUES (?, ?, ?, ?, ?, 0)
+  `);
+  const insertSale = db.prepare(`
+    INSERT INTO sales (id, sale_number, branch_id, type, status, cashier_id, subtotal, total, synced, created_at)
+    VALUES (?, ?, ?, 'counter', 'paid', 'bench', ?, ?, 1, datetime('now', ?))
+  `);
+  const insertItem = db.prepare(`
+    INSERT INTO sale_items (id, sale_id, product_id, qty_units, unit_price, unit_cost, subtotal, total)
+    VALUES (?, ?, ?, 2, 500, 300, 1000, 1000)
+  `);
+  const insertPayment = db.prepare(`
+    INSERT INTO payments (id, sale_id, method, amount, status) VALUES (?, ?, 'CASH', ?, 'completed')
+  `);
+
+  const boxes = 100000;
+  db.transaction(() => {
+    for (let p = 0; p < PRODUCTS; p++) {
+      const productId = uuid('prod', p);
+      insertProduct.run(productId, `SKU-${p}`, `Produto ${p}`);
+      insertStock.run(uuid('inv', p), productId, BRANCH_ID, boxes * 24, boxes);
+    }
+    for (let s = 0; s < HISTORY; s++) {
+      const saleId = uuid('hist', s);
+      insertSale.run(saleId, `HIST-${s}`, BRANCH_ID, 2000, 2000, `-${s % 365} days`);
+      insertItem.run(uuid('hitem', s * 2), saleId, uuid('prod', s % PRODUCTS));
+      insertItem.run(uuid('hitem', s * 2 + 1), saleId, uuid('prod', (s * 7) % PRODUCTS));
+      insertPayment.run(uuid('hpay', s), saleId, 2000);
+    }
+  })();
+}
+
+function buildSale(n) {
+  const items = [];
+  for (let i = 0; i < ITEMS_PER_SALE; i++) {
+    items.push({
+      productId: uuid('prod', (n * ITEMS_PER_SALE + i) % PRODUCTS),
+      branchId: BRANCH_ID,
+      qtyUnits: 1,
+      isMuntu: false,
+      unitPrice: 500,
+      unitCost: 300,
+      subtotal: 500,
+      taxAmount: 0,
+      total: 500,
+      muntuSavings: 0,
+      cashierId: 'bench',
+    });
+  }
+  return {
+    sale: {
+      saleNumber: `BENCH-${n}`,
+      branchId: BRANCH_ID,
+      cashierId: 'bench',
+      type: 'counter',
+      paymentMethod: 'cash',
+      total: ITEMS_PER_SALE * 500,
+      status: 'completed',
+    },
+    items,
+    payments: [{ method: 'cash', amount: ITEMS_PER_SALE * 500, status: 'completed' }],
+  };
+}
+
+function measure(label, fn) {
+  // Silenciar os logs do manager durante a medição
+  const originalLog = console.log;
+  const originalWarn = console.warn;
+  console.log = () => {};
+  console.warn = () => {};
+  const start = process.hrtime.bigint();
+  try {
+    for (let n = 0; n < SALES; n++) {
+      fn(n);
+    }
+  } finally {
+    console.log = originalLog;
+    console.warn = originalWarn;
+  }
+  const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+  console.log(`   ${label.padEnd(12)} ${SALES} vendas em ${seconds.toFixed(2)}s → ${(SALES / seconds).toFixed(0)} vendas/s`);
+}
+
+async function main() {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'barmanager-bench-'));
+  const dbPath = path.join(dir, 'bench.db');
+
+  console.log('═══════════════════════════════════════════════════');
+  console.log('  BENCHMARK DE VENDAS (SQLite local)');
+  console.log('═══════════════════════════════════════════════════\n');
+  console.log(`   Produtos: ${PRODUCTS} | Vendas históricas: ${HISTORY} | Itens/venda: ${ITEMS_PER_SALE}\n`);
+
+  const manager = new DatabaseManager(dbPath);
+  try {
+    await manager.initialize();
+
+    // Gerar os dados por uma conexão separada (bulk insert numa transação)
+    const seedStart = Date.now();
+    const seedDb = new Database(dbPath);
+    try {
+      seed(seedDb);
+    } finally {
+      seedDb.close();
+    }
+    console.log(`   Banco gerado em ${((Date.now() - seedStart) / 1000).toFixed(1)}s`);
+
+    manager.openCashBox({ boxNumber: 'BENCH-BOX', branchId: BRANCH_ID, openedBy: 'bench', openingCash: 0 });
+    console.log('');
+
+    measure('legado', (n) => {
+      const data = buildSale(n);
+      const sale = manager.createSale(data.sale);
+      for (const item of data.items) {
+        manager.addSaleItem(sale.id, item);
+      }
+      manager.addSalePayment(sale.id, data.payments[0]);
+    });
+
+    measure('recordSale', (n) => {
+      manager.recordSale(buildSale(SALES + n));
+    });
+
+    console.log(`\n   Statements em cache: ${manager.getStatementCacheStats().size}`);
+  } finally {
+    manager.close();
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+}
+
+main().catch((error) => {
+  console.error('❌ Erro no benchmark:', error);
+  process.exit(1);
+});
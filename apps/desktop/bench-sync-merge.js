@@ -0,0 +1,101 @@
+/**
+ * Benchmark do merge do pull (SyncMerger.mergeEntityData) em linhas/segundo
+ *
+ * Gera payloads no formato da API (produtos e clientes) e mede duas passagens
+ * sobre um banco temporário:
+ *   - inserção: nenhuma linha existe localmente
+ *   - atualização: todas as linhas já existem (caso típico do fullPullFromServer)
+ *
+ * Uso (better-sqlite3 é compilado para o Electron):
+ *   pnpm bench:sync-merge
+ *   BENCH_ROWS=20000 pnpm bench:sync-merge
+ */
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { DatabaseManager } = require('./dist-electron/database/manager');
+const { SyncMerger } = require('./dist-electron/sync/merge');
+
+const ROWS = parseInt(process.env.BENCH_ROWS || '5000', 10);
+// Fração das linhas com item pendente na fila de sync (exercita a checagem de conflito)
+const PENDING_RATIO = parseFloat(process.env.BENCH_PENDING_RATIO || '0.05');
+
+function serverProducts(version) {
+  const updatedAt = new Date(Date.now() + version * 1000).toISOString();
+  return Array.from({ length: ROWS }, (_, n) => ({
+    id: `prod-${n}`,
+    name: `Produto ${n} v${version}`,
+    sku: `SKU-${n}`,
+    priceUnit: 500 + version,
+    costUnit: 300,
+    unitsPerBox: 24,
+    isActive: true,
+    updatedAt,
+  }));
+}
+
+function serverCustomers(version) {
+  const updatedAt = new Date(Date.now() + version * 1000).toISOString();
+  return Array.from({ length: ROWS }, (_, n) => ({
+    id: `cust-${n}`,
+    code: `CUST-${n}`,
+    fullName: `Cliente ${n} v${version}`,
+    phone: `+245${String(n).padStart(7, '0')}`,
+    creditLimit: 0,
+    isActive: true,
+    updatedAt,
+  }));
+}
+
+async function measure(label, merger, entityName, items) {
+  // Silenciar os logs do merge durante a medição
+  const originalLog = console.log;
+  const originalWarn = console.warn;
+  console.log = () => {};
+  console.warn = () => {};
+  const start = process.hrtime.bigint();
+  try {
+    await merger.mergeEntityData(entityName, items);
+  } finally {
+    console.log = originalLog;
+    console.warn = originalWarn;
+  }
+  const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+  console.log(`   ${label.padEnd(24)} ${items.length} linhas em ${seconds.toFixed(2)}s → ${(items.length / seconds).toFixed(0)} linhas/s`);
+}
+
+async function main() {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'barmanager-bench-'));
+  const dbPath = path.join(dir, 'bench.db');
+
+  console.log('═══════════════════════════════════════════════════');
+  console.log('  BENCHMARK DO MERGE DE SYNC (pull)');
+  console.log('═══════════════════════════════════════════════════\n');
+  console.log(`   Linhas por entidade: ${ROWS} | Pendentes na fila: ${(PENDING_RATIO * 100).toFixed(0)}%\n`);
+
+  const manager = new DatabaseManager(dbPath);
+  try {
+    await manager.initialize();
+    const merger = new SyncMerger(manager, () => {});
+
+    await measure('products (inserção)', merger, 'products', serverProducts(1));
+    await measure('customers (inserção)', merger, 'customers', serverCustomers(1));
+
+    const pendingCount = Math.floor(ROWS * PENDING_RATIO);
+    for (let n = 0; n < pendingCount; n++) {
+      manager.addToSyncQueue('update', 'product', `prod-${n}`, { id: `prod-${n}` });
+    }
+
+    await measure('products (atualização)', merger, 'products', serverProducts(2));
+    await measure('customers (atualização)', merger, 'customers', serverCustomers(2));
+  } finally {
+    manager.close();
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+}
+
+main().catch((error) => {
+  console.error('❌ Erro no benchmark:', error);
+  process.exit(1);
+});
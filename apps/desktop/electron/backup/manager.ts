@@ -1,6 +1,8 @@
 import * as fs from 'fs';
 import * as path from 'path';
+import { Worker } from 'worker_threads';
 import { app } from 'electron';
+import type { BackupManifest, BackupTask, RestoreTask, BackupWorkerMessage } from './worker';
 
 /**
  * Gerenciador de Backup Automático do SQLite
@@ -8,8 +10,10 @@ import { app } from 'electron';
  * Funcionalidades:
  * - Backup automático a cada 4 horas
  * - Backup antes de atualizações
- * - Retenção de últimos 7 backups
- * - Restauração de backup
+ * - Backup online (API de backup do SQLite) num worker thread, comprimido
+ * - Backups incrementais: base completa + deltas com as páginas alteradas
+ * - Retenção das últimas 3 cadeias (base + deltas) e dos últimos 7 backups antigos (.db)
+ * - Restauração de backup (base + deltas ou cópia antiga)
  */
 export class BackupManager {
   private dbPath: string;
@@ -17,6 +21,11 @@ export class BackupManager {
   private backupInterval: NodeJS.Timeout | null = null;
   private maxBackups = 7; // Manter últimos 7 backups
   private intervalHours = 4; // Backup a cada 4 horas
+  private maxChains = 3; // Cadeias base + deltas mantidas
+  private maxDeltasPerChain = 42; // ~7 dias de backups agendados antes de uma nova base
+  private maxDeltaRatio = 0.5; // Mais da metade das páginas alteradas: gravar nova base
+  private pagesPerStep = 256; // Páginas copiadas por passo da API de backup
+  private backupInProgress: Promise<string | null> | null = null;
 
   constructor(dbPath: string) {
     this.dbPath = dbPath;
@@ -29,6 +38,11 @@ export class BackupManager {
       fs.mkdirSync(this.backupDir, { recursive: true });
       console.log('📁 Diretório de backups criado:', this.backupDir);
     }
+
+    // Remover snapshots temporários de backups interrompidos (app fechado no meio)
+    for (const f of fs.readdirSync(this.backupDir).filter(f => f.endsWith('.snapshot'))) {
+      fs.rmSync(path.join(this.backupDir, f), { force: true });
+    }
   }
 
   /**
@@ -63,7 +77,17 @@ export class BackupManager {
    * @param reason - Motivo do backup (startup, scheduled, manual, pre-update)
    * @returns Caminho do arquivo de backup ou null em caso de erro
    */
-  createBackup(reason: 'startup' | 'scheduled' | 'manual' | 'pre-update'): string | null {
+  createBackup(reason: 'startup' | 'scheduled' | 'manual' | 'pre-update'): Promise<string | null> {
+    // Um backup por vez: chamadas concorrentes aguardam o mesmo resultado
+    if (!this.backupInProgress) {
+      this.backupInProgress = this.runOnlineBackup(reason).finally(() => {
+        this.backupInProgress = null;
+      });
+    }
+    return this.backupInProgress;
+  }
+
+  private async runOnlineBackup(reason: 'startup' | 'scheduled' | 'manual' | 'pre-update'): Promise<string | null> {
     try {
       // Verificar se o banco existe
       if (!fs.existsSync(this.dbPath)) {
@@ -75,36 +99,119 @@ export class BackupManager {
       const timestamp = new Date().toISOString()
         .replace(/:/g, '-')
         .replace(/\..+/, '');
-      const backupFileName = `barmanager_${reason}_${timestamp}.db`;
-      const backupPath = path.join(this.backupDir, backupFileName);
 
-      // Copiar o arquivo do banco
-      fs.copyFileSync(this.dbPath, backupPath);
-      
-      // Também copiar o WAL se existir (importante para integridade)
-      const walPath = this.dbPath + '-wal';
-      if (fs.existsSync(walPath)) {
-        fs.copyFileSync(walPath, backupPath + '-wal');
-      }
-      
-      // Copiar SHM se existir
-      const shmPath = this.dbPath + '-shm';
-      if (fs.existsSync(shmPath)) {
-        fs.copyFileSync(shmPath, backupPath + '-shm');
+      // Delta contra o último backup, a menos que a cadeia esteja longa
+      // ou seja um backup antes de atualização (sempre base completa)
+      const chains = this.loadChains();
+      const lastChain = chains[0];
+      const previous = reason !== 'pre-update' && lastChain && lastChain.length <= this.maxDeltasPerChain
+        ? lastChain[lastChain.length - 1]
+        : null;
+
+      const task: BackupTask = {
+        task: 'backup',
+        dbPath: this.dbPath,
+        backupDir: this.backupDir,
+        name: `barmanager_${reason}_${timestamp}`,
+        reason,
+        pagesPerStep: this.pagesPerStep,
+        previous,
+        maxDeltaRatio: this.maxDeltaRatio,
+      };
+      const manifest = await this.runWorker(task);
+      if (!manifest) {
+        return null;
       }
 
-      console.log(`✅ Backup criado: ${backupFileName} (${reason})`);
+      const sizeKb = (manifest.bytes / 1024).toFixed(0);
+      console.log(`✅ Backup criado: ${manifest.file} (${reason}, ${manifest.type}, ${manifest.changedPages}/${manifest.pageCount} páginas, ${sizeKb} KB, ${manifest.durationMs}ms)`);
       
       // Limpar backups antigos
       this.cleanupOldBackups();
       
-      return backupPath;
+      return path.join(this.backupDir, manifest.file);
     } catch (error) {
       console.error('❌ Erro ao criar backup:', error);
       return null;
     }
   }
 
+  /**
+   * Executa uma tarefa de backup/restauração no worker thread
+   */
+  private runWorker(task: BackupTask | RestoreTask): Promise<BackupManifest | undefined> {
+    return new Promise((resolve, reject) => {
+      // No app empacotado o worker fica fora do asar (asarUnpack no package.json)
+      const workerPath = path.join(__dirname, 'worker.js').replace('app.asar', 'app.asar.unpacked');
+      const worker = new Worker(workerPath, { workerData: task });
+      let settled = false;
+      const settle = (error: Error | null, manifest?: BackupManifest) => {
+        if (settled) return;
+        settled = true;
+        if (error) reject(error); else resolve(manifest);
+      };
+
+      worker.on('message', (message: BackupWorkerMessage) => {
+        if (message.type === 'done') {
+          settle(null, message.manifest);
+        } else if (message.type === 'error') {
+          settle(new Error(message.message));
+        }
+      });
+      worker.on('error', (error) => settle(error));
+      worker.on('exit', (code) => settle(new Error(`Worker de backup encerrou com código ${code}`)));
+    });
+  }
+
+  /**
+   * Lê os manifestos e agrupa em cadeias (base + deltas), mais recentes primeiro
+   */
+  private loadChains(): BackupManifest[][] {
+    const manifests = fs.readdirSync(this.backupDir)
+      .filter(f => f.startsWith('barmanager_') && f.endsWith('.json'))
+      .map(f => {
+        try {
+          return JSON.parse(fs.readFileSync(path.join(this.backupDir, f), 'utf-8')) as BackupManifest;
+        } catch {
+          return null;
+        }
+      })
+      .filter((m): m is BackupManifest => !!m && fs.existsSync(path.join(this.backupDir, m.file)))
+      .sort((a, b) => a.createdAt.localeCompare(b.createdAt));
+
+    const chains = new Map<string, BackupManifest[]>();
+    for (const manifest of manifests) {
+      const chain = chains.get(manifest.base) || [];
+      chain.push(manifest);
+      chains.set(manifest.base, chain);
+    }
+
+    return Array.from(chains.values())
+      .filter(chain => chain[0].type === 'base')
+      .sort((a, b) => b[0].createdAt.localeCompare(a[0].createdAt));
+  }
+
+  /**
+   * Cadeia necessária para restaurar um backup: base + deltas até ele
+   */
+  private resolveChain(file: string): BackupManifest[] | null {
+    for (const chain of this.loadChains()) {
+      const index = chain.findIndex(m => m.file === file);
+      if (index >= 0) {
+        // Deltas de uma cadeia são lineares: cada um é filho do anterior
+        return chain.slice(0, index + 1);
+      }
+    }
+    return null;
+  }
+
+  private removeBackupFiles(file: string): void {
+    for (const suffix of ['.gz', '.json', '.pages']) {
+      const filePath = path.join(this.backupDir, file.replace(/\.gz$/, suffix));
+      if (fs.existsSync(filePath)) fs.unlinkSync(filePath);
+    }
+  }
+
   /**
    * Remove backups antigos, mantendo apenas os últimos N
    */
@@ -130,6 +237,14 @@ export class BackupManager {
         if (fs.existsSync(shmPath)) fs.unlinkSync(shmPath);
         console.log(`🗑️ Backup antigo removido: ${file.name}`);
       }
+
+      // Backups incrementais: remover cadeias inteiras (deltas dependem da base)
+      for (const chain of this.loadChains().slice(this.maxChains)) {
+        for (const manifest of chain) {
+          this.removeBackupFiles(manifest.file);
+        }
+        console.log(`🗑️ Cadeia de backup antiga removida: ${chain[0].file} (+${chain.length - 1} deltas)`);
+      }
     } catch (error) {
       console.error('⚠️ Erro ao limpar backups antigos:', error);
     }
@@ -138,8 +253,18 @@ export class BackupManager {
   /**
    * Lista todos os backups disponíveis
    */
-  listBackups(): Array<{ name: string; path: string; size: number; date: Date; reason: string }> {
+  listBackups(): Array<{ name: string; path: string; size: number; date: Date; reason: string; type: string }> {
     try {
+      // Backups incrementais (tamanho = apenas o arquivo comprimido do próprio backup)
+      const incremental = this.loadChains().flat().map(manifest => ({
+        name: manifest.file,
+        path: path.join(this.backupDir, manifest.file),
+        size: manifest.bytes,
+        date: new Date(manifest.createdAt),
+        reason: manifest.reason,
+        type: manifest.type as string,
+      }));
+
       const files = fs.readdirSync(this.backupDir)
         .filter(f => f.startsWith('barmanager_') && f.endsWith('.db'))
         .map(f => {
@@ -155,12 +280,12 @@ export class BackupManager {
             path: filePath,
             size: stats.size,
             date: stats.mtime,
-            reason
+            reason,
+            type: 'copy'
           };
-        })
-        .sort((a, b) => b.date.getTime() - a.date.getTime());
+        });
 
-      return files;
+      return [...incremental, ...files].sort((a, b) => b.date.getTime() - a.date.getTime());
     } catch (error) {
       console.error('❌ Erro ao listar backups:', error);
       return [];
@@ -172,15 +297,19 @@ export class BackupManager {
    * @param backupPath - Caminho do backup a restaurar
    * @returns true se restaurado com sucesso
    */
-  restoreBackup(backupPath: string): boolean {
+  async restoreBackup(backupPath: string): Promise<boolean> {
     try {
       if (!fs.existsSync(backupPath)) {
         console.error('❌ Arquivo de backup não encontrado:', backupPath);
         return false;
       }
 
+      if (backupPath.endsWith('.gz')) {
+        return await this.restoreIncrementalBackup(backupPath);
+      }
+
       // Criar backup do estado atual antes de restaurar
-      this.createBackup('pre-update');
+      await this.createBackup('pre-update');
 
       // Copiar backup para substituir o banco atual
       fs.copyFileSync(backupPath, this.dbPath);
@@ -212,6 +341,42 @@ export class BackupManager {
     }
   }
 
+  /**
+   * Reconstrói o banco a partir da base + deltas (no worker) e substitui o atual.
+   * O arquivo reconstruído é validado pelo checksum do manifesto antes da troca.
+   */
+  private async restoreIncrementalBackup(backupPath: string): Promise<boolean> {
+    const chain = this.resolveChain(path.basename(backupPath));
+    if (!chain) {
+      console.error('❌ Manifesto/base do backup não encontrado:', backupPath);
+      return false;
+    }
+
+    const restoredPath = this.dbPath + '.restore';
+    try {
+      await this.runWorker({
+        task: 'restore',
+        backupDir: this.backupDir,
+        chain,
+        outputPath: restoredPath,
+      });
+
+      // Criar backup do estado atual antes de restaurar
+      await this.createBackup('pre-update');
+
+      fs.copyFileSync(restoredPath, this.dbPath);
+      // O snapshot não tem WAL: descartar o WAL/SHM do banco substituído
+      for (const suffix of ['-wal', '-shm']) {
+        if (fs.existsSync(this.dbPath + suffix)) fs.unlinkSync(this.dbPath + suffix);
+      }
+
+      console.log(`✅ Backup restaurado: ${path.basename(backupPath)} (base + ${chain.length - 1} deltas)`);
+      return true;
+    } finally {
+      fs.rmSync(restoredPath, { force: true });
+    }
+  }
+
   /**
    * Retorna estatísticas dos backups
    */
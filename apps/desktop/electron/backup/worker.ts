@@ -0,0 +1,262 @@
+/**
+ * Worker de backup do SQLite (executa fora do processo principal)
+ *
+ * - backup: cópia online com a API de backup do SQLite (em passos de N páginas),
+ *   comprimida com gzip. Se existir um backup anterior, grava apenas as páginas
+ *   que mudaram (delta) em relação a ele.
+ * - restore: reconstrói o banco a partir da base + deltas da cadeia.
+ *
+ * Formato de um delta (dentro do gzip): registros [uint32 BE índice da página][página]
+ */
+import * as fs from 'fs';
+import * as path from 'path';
+import * as zlib from 'zlib';
+import { createHash } from 'crypto';
+import { pipeline } from 'stream/promises';
+import { parentPort, workerData } from 'worker_threads';
+
+// Importar better-sqlite3 com fallback
+let Database: any;
+try {
+  Database = require('better-sqlite3');
+} catch (error) {
+  Database = null;
+}
+
+const HASH_BYTES = 20; // sha1 por página
+
+export interface BackupManifest {
+  format: 1;
+  type: 'base' | 'delta';
+  reason: string;
+  createdAt: string;
+  file: string;
+  base: string;
+  parent: string | null;
+  pageSize: number;
+  pageCount: number;
+  changedPages: number;
+  sha1: string;
+  bytes: number;
+  durationMs: number;
+}
+
+export interface BackupTask {
+  task: 'backup';
+  dbPath: string;
+  backupDir: string;
+  name: string;
+  reason: string;
+  pagesPerStep: number;
+  previous: BackupManifest | null;
+  // Acima desta fração de páginas alteradas um delta vira uma nova base
+  maxDeltaRatio: number;
+}
+
+export interface RestoreTask {
+  task: 'restore';
+  backupDir: string;
+  chain: BackupManifest[];
+  outputPath: string;
+}
+
+export type BackupWorkerMessage =
+  | { type: 'progress'; totalPages: number; remainingPages: number }
+  | { type: 'done'; manifest?: BackupManifest }
+  | { type: 'error'; message: string };
+
+function post(message: BackupWorkerMessage) {
+  parentPort?.postMessage(message);
+}
+
+function readPageSize(fd: number): number {
+  const header = Buffer.alloc(100);
+  fs.readSync(fd, header, 0, 100, 0);
+  const pageSize = header.readUInt16BE(16);
+  // Valor 1 representa 65536 (não cabe em 16 bits)
+  return pageSize === 1 ? 65536 : pageSize;
+}
+
+function pagesFile(backupDir: string, file: string) {
+  return path.join(backupDir, file.replace(/\.gz$/, '.pages'));
+}
+
+async function runBackup(task: BackupTask): Promise<BackupManifest> {
+  if (!Database) {
+    throw new Error('better-sqlite3 não disponível');
+  }
+
+  const startTime = Date.now();
+  const snapshotPath = path.join(task.backupDir, `${task.name}.snapshot`);
+
+  // 1. Snapshot consistente com a API de backup online (não bloqueia escritores)
+  const source = new Database(task.dbPath, { readonly: true, fileMustExist: true });
+  try {
+    await source.backup(snapshotPath, {
+      progress: ({ totalPages, remainingPages }: { totalPages: number; remainingPages: number }) => {
+        post({ type: 'progress', totalPages, remainingPages });
+        return task.pagesPerStep;
+      },
+    });
+  } finally {
+    source.close();
+  }
+
+  try {
+    // 2. Hash de cada página e comparação com o backup anterior
+    const fd = fs.openSync(snapshotPath, 'r');
+    let pageSize: number;
+    let pageCount: number;
+    let hashes: Buffer;
+    const changed: number[] = [];
+    const fileHash = createHash('sha1');
+    try {
+      pageSize = readPageSize(fd);
+      pageCount = Math.floor(fs.fstatSync(fd).size / pageSize);
+      hashes = Buffer.alloc(pageCount * HASH_BYTES);
+
+      let previousHashes: Buffer | null = null;
+      if (task.previous && task.previous.pageSize === pageSize) {
+        const previousPagesPath = pagesFile(task.backupDir, task.previous.file);
+        if (fs.existsSync(previousPagesPath)) {
+          previousHashes = fs.readFileSync(previousPagesPath);
+        }
+      }
+
+      const page = Buffer.alloc(pageSize);
+      for (let index = 0; index < pageCount; index++) {
+        fs.readSync(fd, page, 0, pageSize, index * pageSize);
+        fileHash.update(page);
+        const digest = createHash('sha1').update(page).digest();
+        digest.copy(hashes, index * HASH_BYTES);
+
+        const offset = index * HASH_BYTES;
+        if (!previousHashes || offset + HASH_BYTES > previousHashes.length ||
+            previousHashes.compare(digest, 0, HASH_BYTES, offset, offset + HASH_BYTES) !== 0) {
+          changed.push(index);
+        }
+      }
+
+      const asDelta = previousHashes !== null && changed.length <= pageCount * task.maxDeltaRatio;
+      const type: 'base' | 'delta' = asDelta ? 'delta' : 'base';
+      const file = `${task.name}.${type}.gz`;
+      const outputPath = path.join(task.backupDir, file);
+      const gzipOptions = { level: zlib.constants.Z_BEST_SPEED };
+
+      // 3. Gravar base (arquivo inteiro) ou delta (só páginas alteradas), comprimidos
+      if (type === 'base') {
+        await pipeline(
+          fs.createReadStream(snapshotPath),
+          zlib.createGzip(gzipOptions),
+          fs.createWriteStream(outputPath),
+        );
+      } else {
+        const gzip = zlib.createGzip(gzipOptions);
+        const writing = pipeline(gzip, fs.createWriteStream(outputPath));
+        const record = Buffer.alloc(4 + pageSize);
+        for (const index of changed) {
+          record.writeUInt32BE(index, 0);
+          fs.readSync(fd, record, 4, pageSize, index * pageSize);
+          if (!gzip.write(Buffer.from(record))) {
+            await new Promise(resolve => gzip.once('drain', resolve));
+          }
+        }
+        gzip.end();
+        await writing;
+      }
+
+      fs.writeFileSync(pagesFile(task.backupDir, file), hashes);
+
+      const manifest: BackupManifest = {
+        format: 1,
+        type,
+        reason: task.reason,
+        createdAt: new Date().toISOString(),
+        file,
+        base: type === 'base' ? file : task.previous!.base,
+        parent: type === 'base' ? null : task.previous!.file,
+        pageSize,
+        pageCount,
+        changedPages: type === 'base' ? pageCount : changed.length,
+        sha1: fileHash.digest('hex'),
+        bytes: fs.statSync(outputPath).size,
+        durationMs: Date.now() - startTime,
+      };
+      // Manifesto por último: um backup sem manifesto é considerado incompleto
+      fs.writeFileSync(path.join(task.backupDir, file.replace(/\.gz$/, '.json')), JSON.stringify(manifest, null, 2));
+      return manifest;
+    } finally {
+      fs.closeSync(fd);
+    }
+  } finally {
+    fs.rmSync(snapshotPath, { force: true });
+  }
+}
+
+async function applyDelta(deltaPath: string, fd: number, pageSize: number) {
+  const recordSize = 4 + pageSize;
+  let pending = Buffer.alloc(0);
+  for await (const chunk of fs.createReadStream(deltaPath).pipe(zlib.createGunzip())) {
+    pending = pending.length > 0 ? Buffer.concat([pending, chunk as Buffer]) : (chunk as Buffer);
+    let offset = 0;
+    while (pending.length - offset >= recordSize) {
+      const index = pending.readUInt32BE(offset);
+      fs.writeSync(fd, pending, offset + 4, pageSize, index * pageSize);
+      offset += recordSize;
+    }
+    pending = pending.subarray(offset);
+  }
+  if (pending.length > 0) {
+    throw new Error(`Delta corrompido: ${path.basename(deltaPath)}`);
+  }
+}
+
+async function runRestore(task: RestoreTask) {
+  const [base, ...deltas] = task.chain;
+  if (!base || base.type !== 'base') {
+    throw new Error('Cadeia de backup sem base');
+  }
+
+  await pipeline(
+    fs.createReadStream(path.join(task.backupDir, base.file)),
+    zlib.createGunzip(),
+    fs.createWriteStream(task.outputPath),
+  );
+
+  const target = task.chain[task.chain.length - 1];
+  const fd = fs.openSync(task.outputPath, 'r+');
+  try {
+    for (const delta of deltas) {
+      await applyDelta(path.join(task.backupDir, delta.file), fd, delta.pageSize);
+    }
+    // O banco pode ter encolhido (VACUUM) desde a base
+    fs.ftruncateSync(fd, target.pageCount * target.pageSize);
+  } finally {
+    fs.closeSync(fd);
+  }
+
+  const hash = createHash('sha1');
+  for await (const chunk of fs.createReadStream(task.outputPath)) {
+    hash.update(chunk as Buffer);
+  }
+  if (hash.digest('hex') !== target.sha1) {
+    fs.rmSync(task.outputPath, { force: true });
+    throw new Error(`Checksum não confere após restaurar ${target.file}`);
+  }
+}
+
+async function main() {
+  const task = workerData as BackupTask | RestoreTask;
+  if (task.task === 'backup') {
+    post({ type: 'done', manifest: await runBackup(task) });
+  } else {
+    await runRestore(task);
+    post({ type: 'done' });
+  }
+}
+
+if (parentPort) {
+  main().catch((error: any) => {
+    post({ type: 'error', message: error?.message || String(error) });
+  });
+}
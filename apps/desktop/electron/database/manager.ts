@@ -8,7 +8,7 @@ try {
 }
 import * as fs from 'fs';
 import * as path from 'path';
-import { tryNormalizePaymentMethod, isValidPaymentMethod, PaymentMethod } from '../shared/payment-methods';
+import { tryNormalizePaymentMethod, isValidPaymentMethod, PaymentMethod, PaymentMethodType } from '../shared/payment-methods';
 
 // ============================================
 // Interfaces para tipos de dados SQLite
@@ -82,8 +82,63 @@ interface CountRow {
   [key: string]: any;
 }
 
+interface SchemaMigration {
+  version: number;
+  name: string;
+  up: () => void;
+}
+
+// Limite de statements preparados mantidos em cache (SQL dinâmico gera variações)
+const STATEMENT_CACHE_LIMIT = 500;
+
+// Resultados da busca do PDV
+const PRODUCT_SEARCH_LIMIT = 50;
+
+// ============================================
+// Numeração de documentos
+// ============================================
+export type DocumentType = 'sale' | 'purchase' | 'debt';
+
+const DOCUMENT_SERIES: Record<DocumentType, {
+  table: string;
+  column: string;
+  width: number;
+  prefix: (date: Date) => string;
+}> = {
+  sale: { table: 'sales', column: 'sale_number', width: 6, prefix: () => 'SALE' },
+  purchase: {
+    table: 'purchases',
+    column: 'purchase_number',
+    width: 4,
+    // Sequência diária: CP250131-0001
+    prefix: (date) => {
+      const year = date.getFullYear().toString().slice(-2);
+      const month = (date.getMonth() + 1).toString().padStart(2, '0');
+      const day = date.getDate().toString().padStart(2, '0');
+      return `CP${year}${month}${day}`;
+    },
+  },
+  debt: { table: 'debts', column: 'debt_number', width: 6, prefix: () => 'DEBT' },
+};
+
+// Sufixos maiores são timestamps (SALE-1712345678901) e não fazem parte da sequência
+const MAX_SEQUENCE_DIGITS = 9;
+
+function parseDocumentNumber(documentNumber: string | null | undefined) {
+  const match = documentNumber ? /^([A-Z]+\d*)-(\d+)$/.exec(documentNumber) : null;
+  if (!match || match[2].length > MAX_SEQUENCE_DIGITS) {
+    return null;
+  }
+  return { prefix: match[1], value: parseInt(match[2], 10) };
+}
+
 export class DatabaseManager {
   private db: any = null;
+  // Cache de prepared statements por texto SQL (evita re-compilar SQL a cada venda)
+  private statementCache = new Map<string, any>();
+  private deviceIdCache: string | null = null;
+  // Índices FTS5 (trigram) de busca; sem FTS5 no SQLite a busca volta para LIKE
+  private searchIndexReady = false;
 
   constructor(private dbPath: string) {}
 
@@ -92,20 +147,79 @@ export class DatabaseManager {
       throw new Error('better-sqlite3 não disponível');
     }
     
-    this.db = new Database(this.dbPath, { verbose: console.log });
+    // Log de cada SQL só quando pedido: no caminho da venda o console.log custa mais que a query
+    this.db = new Database(this.dbPath, {
+      verbose: process.env.BARMANAGER_SQL_VERBOSE === 'true' ? console.log : undefined,
+    });
     
     // Enable WAL mode for better concurrency
     this.db.pragma('journal_mode = WAL');
     
-    await this.createTables();
     await this.runMigrations();
     await this.seedInitialData();
   }
 
+  /**
+   * Abre uma conexão somente leitura (workers de leitura, ver database/pool.ts).
+   * Não cria tabelas nem roda migrations: o schema é da conexão principal,
+   * que já abriu o banco em WAL antes dos workers.
+   */
+  openReadOnly() {
+    this.openExisting({ readonly: true });
+  }
+
+  /**
+   * Abre a conexão do worker de escrita (ver database/pool.ts). Como em
+   * openReadOnly, o schema e o seed já foram feitos por initialize().
+   */
+  openWriter() {
+    this.openExisting({});
+    this.db.pragma('journal_mode = WAL');
+  }
+
+  private openExisting(options: { readonly?: boolean }) {
+    if (!Database) {
+      throw new Error('better-sqlite3 não disponível');
+    }
+
+    this.db = new Database(this.dbPath, { ...options, fileMustExist: true });
+    this.searchIndexReady = !!this.db.prepare(
+      "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    ).get();
+  }
+
   isAvailable(): boolean {
     return this.db !== null;
   }
 
+  /**
+   * Retorna um prepared statement reaproveitável para o SQL informado.
+   * Statements do better-sqlite3 podem ser executados várias vezes; o cache
+   * é LRU (Map em ordem de inserção) para limitar SQL montado dinamicamente.
+   */
+  private prepareCached(sql: string): any {
+    let stmt = this.statementCache.get(sql);
+    if (stmt) {
+      this.statementCache.delete(sql);
+      this.statementCache.set(sql, stmt);
+      return stmt;
+    }
+
+    stmt = this.db.prepare(sql);
+    this.statementCache.set(sql, stmt);
+    if (this.statementCache.size > STATEMENT_CACHE_LIMIT) {
+      const oldestSql = this.statementCache.keys().next().value;
+      if (oldestSql !== undefined) {
+        this.statementCache.delete(oldestSql);
+      }
+    }
+    return stmt;
+  }
+
+  getStatementCacheStats() {
+    return { size: this.statementCache.size, limit: STATEMENT_CACHE_LIMIT };
+  }
+
   private async createTables() {
     // Tabelas principais offline-first
     this.db.exec(`
@@ -571,6 +685,15 @@ export class DatabaseManager {
         updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
       );
 
+      -- Sequências de numeração de documentos (SALE-000123, CP250101-0004, DEBT-000045)
+      CREATE TABLE IF NOT EXISTS document_counters (
+        prefix TEXT NOT NULL,
+        branch_id TEXT NOT NULL,
+        last_value INTEGER NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (prefix, branch_id)
+      );
+
       -- Índices para performance
       CREATE INDEX IF NOT EXISTS idx_products_sku ON products(sku);
       CREATE INDEX IF NOT EXISTS idx_products_barcode ON products(barcode);
@@ -579,6 +702,7 @@ export class DatabaseManager {
       CREATE INDEX IF NOT EXISTS idx_purchases_status ON purchases(status);
       CREATE INDEX IF NOT EXISTS idx_purchases_supplier ON purchases(supplier_id);
       CREATE INDEX IF NOT EXISTS idx_sync_queue_status ON sync_queue(status, priority, created_at);    
+      CREATE INDEX IF NOT EXISTS idx_sync_queue_entity ON sync_queue(entity, status, entity_id);
       CREATE INDEX IF NOT EXISTS idx_inventory_product ON inventory_items(product_id);
       CREATE INDEX IF NOT EXISTS idx_debts_customer ON debts(customer_id);
       CREATE INDEX IF NOT EXISTS idx_debts_status ON debts(status);
@@ -587,649 +711,859 @@ export class DatabaseManager {
     `);
   }
 
-  private async runMigrations() {
-    // Migration 1: Adicionar campo supplier_id à tabela products
-    try {
-      const tableInfo: any[] = this.db.pragma('table_info(products)') as any[];
-      const hasSupplierColumn = tableInfo.some((col: any) => col.name === 'supplier_id');
-      
-      if (!hasSupplierColumn) {
-        console.log('Executando migration: adicionando coluna supplier_id em products...');
-        this.db.exec('ALTER TABLE products ADD COLUMN supplier_id TEXT');
-        this.db.exec('CREATE INDEX IF NOT EXISTS idx_products_supplier ON products(supplier_id)');
-        console.log('✅ Migration supplier_id concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration supplier_id:', error);
-    }
-
-    // Migration 2: Adicionar colunas dose_enabled e doses_per_bottle
-    try {
-      const tableInfo: any[] = this.db.pragma('table_info(products)') as any[];
-      const hasDoseEnabled = tableInfo.some((col: any) => col.name === 'dose_enabled');
-      
-      if (!hasDoseEnabled) {
-        console.log('Executando migration: adicionando colunas de dose em products...');
-        this.db.exec('ALTER TABLE products ADD COLUMN dose_enabled BOOLEAN DEFAULT 0');
-        this.db.exec('ALTER TABLE products ADD COLUMN doses_per_bottle INTEGER DEFAULT 0');
-        console.log('✅ Migration dose columns concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration dose columns:', error);
-    }
-
-    // Migration 3: Adicionar colunas avançadas de inventário
-    try {
-      const invTableInfo: any[] = this.db.pragma('table_info(inventory_items)') as any[];
-      const hasClosedBoxes = invTableInfo.some((col: any) => col.name === 'closed_boxes');
-      
-      if (!hasClosedBoxes) {
-        console.log('Executando migration: adicionando colunas avançadas em inventory_items...');
-        this.db.exec(`
-          ALTER TABLE inventory_items ADD COLUMN closed_boxes INTEGER DEFAULT 0;
-          ALTER TABLE inventory_items ADD COLUMN open_box_units INTEGER DEFAULT 0;
-          ALTER TABLE inventory_items ADD COLUMN consumption_avg_7d REAL DEFAULT 0;
-          ALTER TABLE inventory_items ADD COLUMN consumption_avg_15d REAL DEFAULT 0;
-          ALTER TABLE inventory_items ADD COLUMN consumption_avg_30d REAL DEFAULT 0;
-          ALTER TABLE inventory_items ADD COLUMN days_until_stockout INTEGER DEFAULT NULL;
-          ALTER TABLE inventory_items ADD COLUMN suggested_reorder INTEGER DEFAULT 0;
-        `);
-        console.log('✅ Migration inventory advanced columns concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration inventory advanced:', error);
-    }
-
-    // Migration 4: Criar tabela stock_movements se não existir
-    try {
-      const tables: any[] = this.db.pragma('table_list') as any[];
-      const hasStockMovements = tables.some((t: any) => t.name === 'stock_movements');
-      
-      if (!hasStockMovements) {
-        console.log('Executando migration: criando tabela stock_movements...');
-        this.db.exec(`
-          CREATE TABLE IF NOT EXISTS stock_movements (
-            id TEXT PRIMARY KEY,
-            product_id TEXT NOT NULL,
-            branch_id TEXT NOT NULL,
-            type TEXT NOT NULL,
-            qty_before INTEGER NOT NULL,
-            qty_after INTEGER NOT NULL,
-            qty_changed INTEGER NOT NULL,
-            closed_boxes_before INTEGER DEFAULT 0,
-            closed_boxes_after INTEGER DEFAULT 0,
-            open_box_units_before INTEGER DEFAULT 0,
-            open_box_units_after INTEGER DEFAULT 0,
-            reason TEXT NOT NULL,
-            reference_type TEXT,
-            reference_id TEXT,
-            responsible TEXT,
-            notes TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (product_id) REFERENCES products(id)
-          );
-          CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements(product_id);
-          CREATE INDEX IF NOT EXISTS idx_stock_movements_branch ON stock_movements(branch_id);
-          CREATE INDEX IF NOT EXISTS idx_stock_movements_created ON stock_movements(created_at);
-        `);
-        console.log('✅ Migration stock_movements table concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration stock_movements:', error);
-    }
-
-    // Migration 5: Migrar dados de inventory para inventory_items
-    try {
-      // Verificar se existem dados na tabela antiga
-      const oldInventoryCount: any = this.db.prepare('SELECT COUNT(*) as count FROM inventory').get();
-      const newInventoryCount: any = this.db.prepare('SELECT COUNT(*) as count FROM inventory_items').get();
-      
-      if (oldInventoryCount.count > 0 && newInventoryCount.count === 0) {
-        console.log('Executando migration: migrando dados de inventory para inventory_items...');
-        
-        // Buscar todos os registros da tabela antiga com informações do produto
-        const oldInventory: any[] = this.db.prepare(`
-          SELECT 
-            i.id,
-            i.product_id,
-            i.branch_id,
-            i.quantity_units,
-            i.quantity_boxes,
-            i.min_stock_units,
-            i.created_at,
-            i.updated_at,
-            p.units_per_box
-          FROM inventory i
-          LEFT JOIN products p ON i.product_id = p.id
-        `).all();
-        
-        console.log(`Migrando ${oldInventory.length} registros de estoque...`);
-        
-        const insertStmt = this.db.prepare(`
-          INSERT INTO inventory_items (
-            id, product_id, branch_id, qty_units, 
-            closed_boxes, open_box_units,
-            created_at, updated_at
-          ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        `);
-        
-        for (const item of oldInventory) {
-          const unitsPerBox = item.units_per_box || 1;
-          const totalUnits = (item.quantity_boxes * unitsPerBox) + item.quantity_units;
-          
-          // Calcular caixas fechadas e unidades avulsas
-          const closedBoxes = item.quantity_boxes || 0;
-          const openBoxUnits = item.quantity_units || 0;
-          
-          insertStmt.run(
-            item.id,
-            item.product_id,
-            item.branch_id,
-            totalUnits,
-            closedBoxes,
-            openBoxUnits,
-            item.created_at,
-            item.updated_at
-          );
-        }
-        
-        console.log(`✅ Migration de ${oldInventory.length} registros concluída!`);
-      } else if (newInventoryCount.count > 0) {
-        console.log('Dados já existem em inventory_items, pulando migração de dados.');
-      }
-    } catch (error) {
-      console.error('Erro na migration de dados de inventory:', error);
-    }
-
-    // Migration 8: Corrigir valores de closed_boxes e open_box_units no estoque
-    try {
-      console.log('\nVerificando necessidade de correção de estoque (caixas/unidades)...');
-      
-      const inventoryItems: any[] = this.db.prepare(`
-        SELECT i.id, i.product_id, i.qty_units, i.closed_boxes, i.open_box_units, p.units_per_box
-        FROM inventory_items i
-        INNER JOIN products p ON i.product_id = p.id
-        WHERE i.qty_units > 0
-      `).all();
+  /**
+   * Migrations do schema local, em ordem. A versão aplicada fica em
+   * PRAGMA user_version: um banco já atualizado não executa nenhuma
+   * verificação de schema no startup. As mais antigas continuam checando
+   * table_info porque bancos sem user_version podem estar em qualquer estado.
+   * Nova migration: adicionar no fim com versão maior que a última.
+   */
+  private schemaMigrations(): SchemaMigration[] {
+    return [
+      {
+        version: 1,
+        name: 'Adicionar campo supplier_id à tabela products',
+        up: () => {
+          const tableInfo: any[] = this.db.pragma('table_info(products)') as any[];
+          const hasSupplierColumn = tableInfo.some((col: any) => col.name === 'supplier_id');
 
-      let corrected = 0;
-      
-      for (const item of inventoryItems) {
-        const unitsPerBox = item.units_per_box || 1;
-        const correctClosedBoxes = Math.floor(item.qty_units / unitsPerBox);
-        const correctOpenBoxUnits = item.qty_units % unitsPerBox;
-        
-        // Só corrigir se os valores estiverem incorretos
-        if (item.closed_boxes !== correctClosedBoxes || item.open_box_units !== correctOpenBoxUnits) {
-          this.db.prepare(`
-            UPDATE inventory_items
-            SET closed_boxes = ?,
-                open_box_units = ?,
-                updated_at = datetime('now')
-            WHERE id = ?
-          `).run(correctClosedBoxes, correctOpenBoxUnits, item.id);
-          
-          corrected++;
-          console.log(`   ✅ Corrigido: ${item.qty_units} unidades → ${correctClosedBoxes} caixas + ${correctOpenBoxUnits} avulsas`);
-        }
-      }
-      
-      if (corrected > 0) {
-        console.log(`✅ Correção de estoque concluída: ${corrected} registros atualizados!`);
-      } else {
-        console.log('✅ Estoque já está correto, nenhuma correção necessária.');
-      }
-    } catch (error) {
-      console.error('Erro na correção de estoque:', error);
-    }
+          if (!hasSupplierColumn) {
+            console.log('Executando migration: adicionando coluna supplier_id em products...');
+            this.db.exec('ALTER TABLE products ADD COLUMN supplier_id TEXT');
+            this.db.exec('CREATE INDEX IF NOT EXISTS idx_products_supplier ON products(supplier_id)');
+            console.log('✅ Migration supplier_id concluída!');
+          }
+        },
+      },
+      {
+        version: 2,
+        name: 'Adicionar colunas dose_enabled e doses_per_bottle',
+        up: () => {
+          const tableInfo: any[] = this.db.pragma('table_info(products)') as any[];
+          const hasDoseEnabled = tableInfo.some((col: any) => col.name === 'dose_enabled');
+
+          if (!hasDoseEnabled) {
+            console.log('Executando migration: adicionando colunas de dose em products...');
+            this.db.exec('ALTER TABLE products ADD COLUMN dose_enabled BOOLEAN DEFAULT 0');
+            this.db.exec('ALTER TABLE products ADD COLUMN doses_per_bottle INTEGER DEFAULT 0');
+            console.log('✅ Migration dose columns concluída!');
+          }
+        },
+      },
+      {
+        version: 3,
+        name: 'Adicionar colunas avançadas de inventário',
+        up: () => {
+          const invTableInfo: any[] = this.db.pragma('table_info(inventory_items)') as any[];
+          const hasClosedBoxes = invTableInfo.some((col: any) => col.name === 'closed_boxes');
+
+          if (!hasClosedBoxes) {
+            console.log('Executando migration: adicionando colunas avançadas em inventory_items...');
+            this.db.exec(`
+              ALTER TABLE inventory_items ADD COLUMN closed_boxes INTEGER DEFAULT 0;
+              ALTER TABLE inventory_items ADD COLUMN open_box_units INTEGER DEFAULT 0;
+              ALTER TABLE inventory_items ADD COLUMN consumption_avg_7d REAL DEFAULT 0;
+              ALTER TABLE inventory_items ADD COLUMN consumption_avg_15d REAL DEFAULT 0;
+              ALTER TABLE inventory_items ADD COLUMN consumption_avg_30d REAL DEFAULT 0;
+              ALTER TABLE inventory_items ADD COLUMN days_until_stockout INTEGER DEFAULT NULL;
+              ALTER TABLE inventory_items ADD COLUMN suggested_reorder INTEGER DEFAULT 0;
+            `);
+            console.log('✅ Migration inventory advanced columns concluída!');
+          }
+        },
+      },
+      {
+        version: 4,
+        name: 'Criar tabela stock_movements se não existir',
+        up: () => {
+          const tables: any[] = this.db.pragma('table_list') as any[];
+          const hasStockMovements = tables.some((t: any) => t.name === 'stock_movements');
+
+          if (!hasStockMovements) {
+            console.log('Executando migration: criando tabela stock_movements...');
+            this.db.exec(`
+              CREATE TABLE IF NOT EXISTS stock_movements (
+                id TEXT PRIMARY KEY,
+                product_id TEXT NOT NULL,
+                branch_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                qty_before INTEGER NOT NULL,
+                qty_after INTEGER NOT NULL,
+                qty_changed INTEGER NOT NULL,
+                closed_boxes_before INTEGER DEFAULT 0,
+                closed_boxes_after INTEGER DEFAULT 0,
+                open_box_units_before INTEGER DEFAULT 0,
+                open_box_units_after INTEGER DEFAULT 0,
+                reason TEXT NOT NULL,
+                reference_type TEXT,
+                reference_id TEXT,
+                responsible TEXT,
+                notes TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (product_id) REFERENCES products(id)
+              );
+              CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements(product_id);
+              CREATE INDEX IF NOT EXISTS idx_stock_movements_branch ON stock_movements(branch_id);
+              CREATE INDEX IF NOT EXISTS idx_stock_movements_created ON stock_movements(created_at);
+            `);
+            console.log('✅ Migration stock_movements table concluída!');
+          }
+        },
+      },
+      {
+        version: 5,
+        name: 'Migrar dados de inventory para inventory_items',
+        up: () => {
+          // Verificar se existem dados na tabela antiga
+          const oldInventoryCount: any = this.prepareCached('SELECT COUNT(*) as count FROM inventory').get();
+          const newInventoryCount: any = this.prepareCached('SELECT COUNT(*) as count FROM inventory_items').get();
+
+          if (oldInventoryCount.count > 0 && newInventoryCount.count === 0) {
+            console.log('Executando migration: migrando dados de inventory para inventory_items...');
+
+            // Buscar todos os registros da tabela antiga com informações do produto
+            const oldInventory: any[] = this.prepareCached(`
+              SELECT 
+                i.id,
+                i.product_id,
+                i.branch_id,
+                i.quantity_units,
+                i.quantity_boxes,
+                i.min_stock_units,
+                i.created_at,
+                i.updated_at,
+                p.units_per_box
+              FROM inventory i
+              LEFT JOIN products p ON i.product_id = p.id
+            `).all();
+
+            console.log(`Migrando ${oldInventory.length} registros de estoque...`);
+
+            const insertStmt = this.prepareCached(`
+              INSERT INTO inventory_items (
+                id, product_id, branch_id, qty_units, 
+                closed_boxes, open_box_units,
+                created_at, updated_at
+              ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            `);
+
+            for (const item of oldInventory) {
+              const unitsPerBox = item.units_per_box || 1;
+              const totalUnits = (item.quantity_boxes * unitsPerBox) + item.quantity_units;
+
+              // Calcular caixas fechadas e unidades avulsas
+              const closedBoxes = item.quantity_boxes || 0;
+              const openBoxUnits = item.quantity_units || 0;
+
+              insertStmt.run(
+                item.id,
+                item.product_id,
+                item.branch_id,
+                totalUnits,
+                closedBoxes,
+                openBoxUnits,
+                item.created_at,
+                item.updated_at
+              );
+            }
+
+            console.log(`✅ Migration de ${oldInventory.length} registros concluída!`);
+          } else if (newInventoryCount.count > 0) {
+            console.log('Dados já existem em inventory_items, pulando migração de dados.');
+          }
+        },
+      },
+      {
+        version: 8,
+        name: 'Corrigir valores de closed_boxes e open_box_units no estoque',
+        up: () => {
+          console.log('\nVerificando necessidade de correção de estoque (caixas/unidades)...');
+
+          const inventoryItems: any[] = this.prepareCached(`
+            SELECT i.id, i.product_id, i.qty_units, i.closed_boxes, i.open_box_units, p.units_per_box
+            FROM inventory_items i
+            INNER JOIN products p ON i.product_id = p.id
+            WHERE i.qty_units > 0
+          `).all();
+
+          let corrected = 0;
+
+          for (const item of inventoryItems) {
+            const unitsPerBox = item.units_per_box || 1;
+            const correctClosedBoxes = Math.floor(item.qty_units / unitsPerBox);
+            const correctOpenBoxUnits = item.qty_units % unitsPerBox;
+
+            // Só corrigir se os valores estiverem incorretos
+            if (item.closed_boxes !== correctClosedBoxes || item.open_box_units !== correctOpenBoxUnits) {
+              this.prepareCached(`
+                UPDATE inventory_items
+                SET closed_boxes = ?,
+                    open_box_units = ?,
+                    updated_at = datetime('now')
+                WHERE id = ?
+              `).run(correctClosedBoxes, correctOpenBoxUnits, item.id);
+
+              corrected++;
+              console.log(`   ✅ Corrigido: ${item.qty_units} unidades → ${correctClosedBoxes} caixas + ${correctOpenBoxUnits} avulsas`);
+            }
+          }
 
-    // Migration 9: Garantir que todos os clientes tenham loyalty_points = 0
-    try {
-      console.log('\nVerificando pontos de fidelidade dos clientes...');
-      
-      const result = this.db.prepare(`
-        UPDATE customers 
-        SET loyalty_points = 0 
-        WHERE loyalty_points IS NULL
-      `).run();
-      
-      if (result.changes > 0) {
-        console.log(`✅ ${result.changes} cliente(s) atualizados com loyalty_points = 0`);
-      } else {
-        console.log('✅ Todos os clientes já possuem loyalty_points definido.');
-      }
-    } catch (error) {
-      console.error('Erro na migration de loyalty_points:', error);
-    }
+          if (corrected > 0) {
+            console.log(`✅ Correção de estoque concluída: ${corrected} registros atualizados!`);
+          } else {
+            console.log('✅ Estoque já está correto, nenhuma correção necessária.');
+          }
+        },
+      },
+      {
+        version: 9,
+        name: 'Garantir que todos os clientes tenham loyalty_points = 0',
+        up: () => {
+          console.log('\nVerificando pontos de fidelidade dos clientes...');
 
-    // Migration 10: Criar tabelas para sistema de gestão de mesas
-    try {
-      console.log('\nCriando tabelas para sistema de gestão de mesas...');
-      
-      this.db.exec(`
-        -- Table Sessions (Sessões de Mesa)
-        CREATE TABLE IF NOT EXISTS table_sessions (
-          id TEXT PRIMARY KEY,
-          table_id TEXT NOT NULL,
-          branch_id TEXT NOT NULL,
-          session_number TEXT UNIQUE NOT NULL,
-          status TEXT DEFAULT 'open', -- open, awaiting_payment, closed
-          opened_by TEXT NOT NULL,
-          closed_by TEXT,
-          opened_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          closed_at DATETIME,
-          total_amount INTEGER DEFAULT 0,
-          paid_amount INTEGER DEFAULT 0,
-          notes TEXT,
-          synced BOOLEAN DEFAULT 0,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (table_id) REFERENCES tables(id),
-          FOREIGN KEY (branch_id) REFERENCES branches(id)
-        );
+          const result = this.prepareCached(`
+            UPDATE customers 
+            SET loyalty_points = 0 
+            WHERE loyalty_points IS NULL
+          `).run();
+
+          if (result.changes > 0) {
+            console.log(`✅ ${result.changes} cliente(s) atualizados com loyalty_points = 0`);
+          } else {
+            console.log('✅ Todos os clientes já possuem loyalty_points definido.');
+          }
+        },
+      },
+      {
+        version: 10,
+        name: 'Criar tabelas para sistema de gestão de mesas',
+        up: () => {
+          console.log('\nCriando tabelas para sistema de gestão de mesas...');
+
+          this.db.exec(`
+            -- Table Sessions (Sessões de Mesa)
+            CREATE TABLE IF NOT EXISTS table_sessions (
+              id TEXT PRIMARY KEY,
+              table_id TEXT NOT NULL,
+              branch_id TEXT NOT NULL,
+              session_number TEXT UNIQUE NOT NULL,
+              status TEXT DEFAULT 'open', -- open, awaiting_payment, closed
+              opened_by TEXT NOT NULL,
+              closed_by TEXT,
+              opened_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              closed_at DATETIME,
+              total_amount INTEGER DEFAULT 0,
+              paid_amount INTEGER DEFAULT 0,
+              notes TEXT,
+              synced BOOLEAN DEFAULT 0,
+              created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (table_id) REFERENCES tables(id),
+              FOREIGN KEY (branch_id) REFERENCES branches(id)
+            );
+
+            -- Table Customers (Clientes dentro de uma sessão de mesa)
+            CREATE TABLE IF NOT EXISTS table_customers (
+              id TEXT PRIMARY KEY,
+              session_id TEXT NOT NULL,
+              customer_name TEXT NOT NULL, -- Nome do cliente (pode ser "Cliente 01", "João", etc)
+              customer_id TEXT, -- Referência ao cliente cadastrado (opcional)
+              order_sequence INTEGER DEFAULT 1, -- Ordem de chegada
+              subtotal INTEGER DEFAULT 0,
+              discount INTEGER DEFAULT 0,
+              total INTEGER DEFAULT 0,
+              paid_amount INTEGER DEFAULT 0,
+              payment_status TEXT DEFAULT 'pending', -- pending, partial, paid
+              created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE,
+              FOREIGN KEY (customer_id) REFERENCES customers(id)
+            );
+
+            -- Table Orders (Pedidos individuais por cliente)
+            CREATE TABLE IF NOT EXISTS table_orders (
+              id TEXT PRIMARY KEY,
+              session_id TEXT NOT NULL,
+              table_customer_id TEXT NOT NULL,
+              product_id TEXT NOT NULL,
+              qty_units INTEGER NOT NULL,
+              is_muntu BOOLEAN DEFAULT 0,
+              unit_price INTEGER NOT NULL,
+              unit_cost INTEGER NOT NULL,
+              subtotal INTEGER NOT NULL,
+              discount INTEGER DEFAULT 0,
+              total INTEGER NOT NULL,
+              status TEXT DEFAULT 'pending', -- pending, preparing, served, cancelled
+              notes TEXT,
+              ordered_by TEXT NOT NULL, -- Usuário que fez o pedido
+              ordered_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              cancelled_at DATETIME,
+              cancelled_by TEXT,
+              synced BOOLEAN DEFAULT 0,
+              created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE,
+              FOREIGN KEY (table_customer_id) REFERENCES table_customers(id) ON DELETE CASCADE,
+              FOREIGN KEY (product_id) REFERENCES products(id)
+            );
+
+            -- Table Payments (Pagamentos por cliente na mesa)
+            CREATE TABLE IF NOT EXISTS table_payments (
+              id TEXT PRIMARY KEY,
+              session_id TEXT NOT NULL,
+              table_customer_id TEXT,
+              payment_id TEXT, -- Referência ao pagamento global
+              method TEXT NOT NULL,
+              amount INTEGER NOT NULL,
+              reference_number TEXT,
+              status TEXT DEFAULT 'completed',
+              processed_by TEXT NOT NULL,
+              processed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              notes TEXT,
+              synced BOOLEAN DEFAULT 0,
+              created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE,
+              FOREIGN KEY (table_customer_id) REFERENCES table_customers(id),
+              FOREIGN KEY (payment_id) REFERENCES payments(id)
+            );
+
+            -- Table Actions (Auditoria de ações nas mesas)
+            CREATE TABLE IF NOT EXISTS table_actions (
+              id TEXT PRIMARY KEY,
+              session_id TEXT NOT NULL,
+              action_type TEXT NOT NULL, -- open_table, add_customer, add_order, cancel_order, transfer_item, split_item, transfer_table, payment, close_table
+              performed_by TEXT NOT NULL,
+              description TEXT NOT NULL,
+              metadata TEXT, -- JSON com detalhes da ação
+              performed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE
+            );
+
+            -- Índices para performance
+            CREATE INDEX IF NOT EXISTS idx_table_sessions_table ON table_sessions(table_id);
+            CREATE INDEX IF NOT EXISTS idx_table_sessions_status ON table_sessions(status);
+            CREATE INDEX IF NOT EXISTS idx_table_customers_session ON table_customers(session_id);
+            CREATE INDEX IF NOT EXISTS idx_table_orders_session ON table_orders(session_id);
+            CREATE INDEX IF NOT EXISTS idx_table_orders_customer ON table_orders(table_customer_id);
+            CREATE INDEX IF NOT EXISTS idx_table_payments_session ON table_payments(session_id);
+            CREATE INDEX IF NOT EXISTS idx_table_actions_session ON table_actions(session_id);
+          `);
+
+          console.log('✅ Tabelas de gestão de mesas criadas com sucesso!');
+        },
+      },
+      {
+        version: 11,
+        name: 'Adicionar coluna payment_method à tabela sales',
+        up: () => {
+        // CRÍTICO: Necessário para rastrear método de pagamento original (especialmente VALE)
+          const salesTableInfo: any[] = this.db.pragma('table_info(sales)') as any[];
+          const hasPaymentMethod = salesTableInfo.some((col: any) => col.name === 'payment_method');
+
+          if (!hasPaymentMethod) {
+            console.log('Executando migration: adicionando coluna payment_method em sales...');
+            this.db.exec('ALTER TABLE sales ADD COLUMN payment_method TEXT');
+            console.log('✅ Migration payment_method em sales concluída!');
+          }
+        },
+      },
+      {
+        version: 12,
+        name: 'Adicionar coluna amount à tabela debts',
+        up: () => {
+        // CRÍTICO: Necessário para sincronização de dívidas do servidor Railway
+          const debtsTableInfo: any[] = this.db.pragma('table_info(debts)') as any[];
+          const hasAmount = debtsTableInfo.some((col: any) => col.name === 'amount');
+
+          if (!hasAmount) {
+            console.log('Executando migration: adicionando coluna amount em debts...');
+            this.db.exec('ALTER TABLE debts ADD COLUMN amount INTEGER DEFAULT 0');
+            // Atualizar registros existentes: amount = original_amount
+            this.db.exec('UPDATE debts SET amount = original_amount WHERE amount IS NULL OR amount = 0');
+            console.log('✅ Migration amount em debts concluída!');
+          }
+        },
+      },
+      {
+        version: 13,
+        name: 'Adicionar coluna allowed_tabs para controle de acesso por abas',
+        up: () => {
+        // IMPORTANTE: Permite que administradores definam quais abas cada usuário pode acessar
+          const usersTableInfo: any[] = this.db.pragma('table_info(users)') as any[];
+          const hasAllowedTabs = usersTableInfo.some((col: any) => col.name === 'allowed_tabs');
+
+          if (!hasAllowedTabs) {
+            console.log('Executando migration: adicionando coluna allowed_tabs em users...');
+            // JSON array com as abas permitidas. NULL significa todas as abas (para admins)
+            this.db.exec('ALTER TABLE users ADD COLUMN allowed_tabs TEXT');
+            console.log('✅ Migration allowed_tabs em users concluída!');
+          }
+        },
+      },
+      {
+        version: 14,
+        name: 'Criar tabela backup_history para histórico de backups',
+        up: () => {
+          const tables: any[] = this.db.pragma('table_list') as any[];
+          const hasBackupHistory = tables.some((t: any) => t.name === 'backup_history');
+
+          if (!hasBackupHistory) {
+            console.log('Executando migration: criando tabela backup_history...');
+            this.db.exec(`
+              CREATE TABLE IF NOT EXISTS backup_history (
+                id TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                file_size INTEGER DEFAULT 0,
+                backup_type TEXT DEFAULT 'manual', -- manual, automatic
+                status TEXT DEFAULT 'completed', -- completed, failed
+                error_message TEXT,
+                created_by TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+              );
+              CREATE INDEX IF NOT EXISTS idx_backup_history_created ON backup_history(created_at);
+            `);
+            console.log('✅ Migration backup_history table concluída!');
+          }
+        },
+      },
+      {
+        version: 15,
+        name: 'Adicionar colunas name e status à tabela tables',
+        up: () => {
+          const tablesInfo: any[] = this.db.pragma('table_info(tables)') as any[];
+          const hasName = tablesInfo.some((col: any) => col.name === 'name');
+          const hasStatus = tablesInfo.some((col: any) => col.name === 'status');
+
+          if (!hasName) {
+            console.log('Executando migration: adicionando coluna name em tables...');
+            this.db.exec('ALTER TABLE tables ADD COLUMN name TEXT');
+            // Atualizar registros existentes com nome padrão
+            this.db.exec(`UPDATE tables SET name = 'Mesa ' || number WHERE name IS NULL`);
+            console.log('✅ Migration tables.name concluída!');
+          }
 
-        -- Table Customers (Clientes dentro de uma sessão de mesa)
-        CREATE TABLE IF NOT EXISTS table_customers (
-          id TEXT PRIMARY KEY,
-          session_id TEXT NOT NULL,
-          customer_name TEXT NOT NULL, -- Nome do cliente (pode ser "Cliente 01", "João", etc)
-          customer_id TEXT, -- Referência ao cliente cadastrado (opcional)
-          order_sequence INTEGER DEFAULT 1, -- Ordem de chegada
-          subtotal INTEGER DEFAULT 0,
-          discount INTEGER DEFAULT 0,
-          total INTEGER DEFAULT 0,
-          paid_amount INTEGER DEFAULT 0,
-          payment_status TEXT DEFAULT 'pending', -- pending, partial, paid
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE,
-          FOREIGN KEY (customer_id) REFERENCES customers(id)
-        );
+          if (!hasStatus) {
+            console.log('Executando migration: adicionando coluna status em tables...');
+            this.db.exec("ALTER TABLE tables ADD COLUMN status TEXT DEFAULT 'available'");
+            console.log('✅ Migration tables.status concluída!');
+          }
+        },
+      },
+      {
+        version: 16,
+        name: 'Adicionar coluna updated_at à tabela sync_queue',
+        up: () => {
+          const syncQueueInfo: any[] = this.db.pragma('table_info(sync_queue)') as any[];
+          const hasUpdatedAt = syncQueueInfo.some((col: any) => col.name === 'updated_at');
+
+          if (!hasUpdatedAt) {
+            console.log('Executando migration: adicionando coluna updated_at em sync_queue...');
+            // SQLite não permite DEFAULT com função em ALTER TABLE, então adicionamos como NULL e depois atualizamos
+            this.db.exec('ALTER TABLE sync_queue ADD COLUMN updated_at DATETIME');
+            this.db.exec("UPDATE sync_queue SET updated_at = created_at WHERE updated_at IS NULL");
+            console.log('✅ Migration sync_queue.updated_at concluída!');
+          }
+          // Monitores externos leem a fila incrementalmente por updated_at
+          this.db.exec('CREATE INDEX IF NOT EXISTS idx_sync_queue_updated ON sync_queue(updated_at)');
+        },
+      },
+      {
+        version: 17,
+        name: 'Adicionar campos de controle de sincronização à tabela users',
+        up: () => {
+          const usersInfo: any[] = this.db.pragma('table_info(users)') as any[];
+          const hasSyncStatus = usersInfo.some((col: any) => col.name === 'sync_status');
+          const hasServerId = usersInfo.some((col: any) => col.name === 'server_id');
+          const hasLastSyncAttempt = usersInfo.some((col: any) => col.name === 'last_sync_attempt');
+          const hasSyncError = usersInfo.some((col: any) => col.name === 'sync_error');
+          const hasAllowedTabs = usersInfo.some((col: any) => col.name === 'allowed_tabs');
+
+          if (!hasSyncStatus) {
+            console.log('Executando migration: adicionando coluna sync_status em users...');
+            this.db.exec("ALTER TABLE users ADD COLUMN sync_status TEXT DEFAULT 'PENDING'");
+            // Marcar usuários já sincronizados
+            this.db.exec("UPDATE users SET sync_status = 'SYNCED' WHERE synced = 1");
+            this.db.exec("UPDATE users SET sync_status = 'PENDING' WHERE synced = 0 OR synced IS NULL");
+            console.log('✅ Migration users.sync_status concluída!');
+          }
 
-        -- Table Orders (Pedidos individuais por cliente)
-        CREATE TABLE IF NOT EXISTS table_orders (
-          id TEXT PRIMARY KEY,
-          session_id TEXT NOT NULL,
-          table_customer_id TEXT NOT NULL,
-          product_id TEXT NOT NULL,
-          qty_units INTEGER NOT NULL,
-          is_muntu BOOLEAN DEFAULT 0,
-          unit_price INTEGER NOT NULL,
-          unit_cost INTEGER NOT NULL,
-          subtotal INTEGER NOT NULL,
-          discount INTEGER DEFAULT 0,
-          total INTEGER NOT NULL,
-          status TEXT DEFAULT 'pending', -- pending, preparing, served, cancelled
-          notes TEXT,
-          ordered_by TEXT NOT NULL, -- Usuário que fez o pedido
-          ordered_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          cancelled_at DATETIME,
-          cancelled_by TEXT,
-          synced BOOLEAN DEFAULT 0,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE,
-          FOREIGN KEY (table_customer_id) REFERENCES table_customers(id) ON DELETE CASCADE,
-          FOREIGN KEY (product_id) REFERENCES products(id)
-        );
+          if (!hasServerId) {
+            console.log('Executando migration: adicionando coluna server_id em users...');
+            this.db.exec('ALTER TABLE users ADD COLUMN server_id TEXT');
+            // Para usuários já sincronizados, o server_id é o próprio id (pois usamos o mesmo ID)
+            this.db.exec("UPDATE users SET server_id = id WHERE synced = 1");
+            console.log('✅ Migration users.server_id concluída!');
+          }
 
-        -- Table Payments (Pagamentos por cliente na mesa)
-        CREATE TABLE IF NOT EXISTS table_payments (
-          id TEXT PRIMARY KEY,
-          session_id TEXT NOT NULL,
-          table_customer_id TEXT,
-          payment_id TEXT, -- Referência ao pagamento global
-          method TEXT NOT NULL,
-          amount INTEGER NOT NULL,
-          reference_number TEXT,
-          status TEXT DEFAULT 'completed',
-          processed_by TEXT NOT NULL,
-          processed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          notes TEXT,
-          synced BOOLEAN DEFAULT 0,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE,
-          FOREIGN KEY (table_customer_id) REFERENCES table_customers(id),
-          FOREIGN KEY (payment_id) REFERENCES payments(id)
-        );
+          if (!hasLastSyncAttempt) {
+            console.log('Executando migration: adicionando coluna last_sync_attempt em users...');
+            this.db.exec('ALTER TABLE users ADD COLUMN last_sync_attempt DATETIME');
+            console.log('✅ Migration users.last_sync_attempt concluída!');
+          }
 
-        -- Table Actions (Auditoria de ações nas mesas)
-        CREATE TABLE IF NOT EXISTS table_actions (
-          id TEXT PRIMARY KEY,
-          session_id TEXT NOT NULL,
-          action_type TEXT NOT NULL, -- open_table, add_customer, add_order, cancel_order, transfer_item, split_item, transfer_table, payment, close_table
-          performed_by TEXT NOT NULL,
-          description TEXT NOT NULL,
-          metadata TEXT, -- JSON com detalhes da ação
-          performed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (session_id) REFERENCES table_sessions(id) ON DELETE CASCADE
-        );
+          if (!hasSyncError) {
+            console.log('Executando migration: adicionando coluna sync_error em users...');
+            this.db.exec('ALTER TABLE users ADD COLUMN sync_error TEXT');
+            console.log('✅ Migration users.sync_error concluída!');
+          }
 
-        -- Índices para performance
-        CREATE INDEX IF NOT EXISTS idx_table_sessions_table ON table_sessions(table_id);
-        CREATE INDEX IF NOT EXISTS idx_table_sessions_status ON table_sessions(status);
-        CREATE INDEX IF NOT EXISTS idx_table_customers_session ON table_customers(session_id);
-        CREATE INDEX IF NOT EXISTS idx_table_orders_session ON table_orders(session_id);
-        CREATE INDEX IF NOT EXISTS idx_table_orders_customer ON table_orders(table_customer_id);
-        CREATE INDEX IF NOT EXISTS idx_table_payments_session ON table_payments(session_id);
-        CREATE INDEX IF NOT EXISTS idx_table_actions_session ON table_actions(session_id);
-      `);
-      
-      console.log('✅ Tabelas de gestão de mesas criadas com sucesso!');
-    } catch (error) {
-      console.error('Erro ao criar tabelas de gestão de mesas:', error);
-    }
+          if (!hasAllowedTabs) {
+            console.log('Executando migration: adicionando coluna allowed_tabs em users...');
+            this.db.exec('ALTER TABLE users ADD COLUMN allowed_tabs TEXT');
+            console.log('✅ Migration users.allowed_tabs concluída!');
+          }
+        },
+      },
+      {
+        version: 18,
+        name: 'Adicionar coluna version para detecção de conflitos (versionamento otimista)',
+        up: () => {
+          // Adicionar version em sales
+          const salesInfo: any[] = this.db.pragma('table_info(sales)') as any[];
+          const salesHasVersion = salesInfo.some((col: any) => col.name === 'version');
+          if (!salesHasVersion) {
+            console.log('Executando migration: adicionando coluna version em sales...');
+            this.db.exec('ALTER TABLE sales ADD COLUMN version INTEGER DEFAULT 1');
+            console.log('✅ Migration sales.version concluída!');
+          }
 
-    // Migration 11: Adicionar coluna payment_method à tabela sales
-    // CRÍTICO: Necessário para rastrear método de pagamento original (especialmente VALE)
-    try {
-      const salesTableInfo: any[] = this.db.pragma('table_info(sales)') as any[];
-      const hasPaymentMethod = salesTableInfo.some((col: any) => col.name === 'payment_method');
-      
-      if (!hasPaymentMethod) {
-        console.log('Executando migration: adicionando coluna payment_method em sales...');
-        this.db.exec('ALTER TABLE sales ADD COLUMN payment_method TEXT');
-        console.log('✅ Migration payment_method em sales concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration payment_method:', error);
-    }
+          // Adicionar version em customers
+          const customersInfo: any[] = this.db.pragma('table_info(customers)') as any[];
+          const customersHasVersion = customersInfo.some((col: any) => col.name === 'version');
+          if (!customersHasVersion) {
+            console.log('Executando migration: adicionando coluna version em customers...');
+            this.db.exec('ALTER TABLE customers ADD COLUMN version INTEGER DEFAULT 1');
+            console.log('✅ Migration customers.version concluída!');
+          }
 
-    // Migration 12: Adicionar coluna amount à tabela debts
-    // CRÍTICO: Necessário para sincronização de dívidas do servidor Railway
-    try {
-      const debtsTableInfo: any[] = this.db.pragma('table_info(debts)') as any[];
-      const hasAmount = debtsTableInfo.some((col: any) => col.name === 'amount');
-      
-      if (!hasAmount) {
-        console.log('Executando migration: adicionando coluna amount em debts...');
-        this.db.exec('ALTER TABLE debts ADD COLUMN amount INTEGER DEFAULT 0');
-        // Atualizar registros existentes: amount = original_amount
-        this.db.exec('UPDATE debts SET amount = original_amount WHERE amount IS NULL OR amount = 0');
-        console.log('✅ Migration amount em debts concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration amount em debts:', error);
-    }
+          // Adicionar version em inventory_items
+          const inventoryInfo: any[] = this.db.pragma('table_info(inventory_items)') as any[];
+          const inventoryHasVersion = inventoryInfo.some((col: any) => col.name === 'version');
+          if (!inventoryHasVersion) {
+            console.log('Executando migration: adicionando coluna version em inventory_items...');
+            this.db.exec('ALTER TABLE inventory_items ADD COLUMN version INTEGER DEFAULT 1');
+            console.log('✅ Migration inventory_items.version concluída!');
+          }
 
-    // Migration 13: Adicionar coluna allowed_tabs para controle de acesso por abas
-    // IMPORTANTE: Permite que administradores definam quais abas cada usuário pode acessar
-    try {
-      const usersTableInfo: any[] = this.db.pragma('table_info(users)') as any[];
-      const hasAllowedTabs = usersTableInfo.some((col: any) => col.name === 'allowed_tabs');
-      
-      if (!hasAllowedTabs) {
-        console.log('Executando migration: adicionando coluna allowed_tabs em users...');
-        // JSON array com as abas permitidas. NULL significa todas as abas (para admins)
-        this.db.exec('ALTER TABLE users ADD COLUMN allowed_tabs TEXT');
-        console.log('✅ Migration allowed_tabs em users concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration allowed_tabs:', error);
-    }
+          // Adicionar version em products
+          const productsInfo: any[] = this.db.pragma('table_info(products)') as any[];
+          const productsHasVersion = productsInfo.some((col: any) => col.name === 'version');
+          if (!productsHasVersion) {
+            console.log('Executando migration: adicionando coluna version em products...');
+            this.db.exec('ALTER TABLE products ADD COLUMN version INTEGER DEFAULT 1');
+            console.log('✅ Migration products.version concluída!');
+          }
 
-    // Migration 14: Criar tabela backup_history para histórico de backups
-    try {
-      const tables: any[] = this.db.pragma('table_list') as any[];
-      const hasBackupHistory = tables.some((t: any) => t.name === 'backup_history');
-      
-      if (!hasBackupHistory) {
-        console.log('Executando migration: criando tabela backup_history...');
-        this.db.exec(`
-          CREATE TABLE IF NOT EXISTS backup_history (
-            id TEXT PRIMARY KEY,
-            file_name TEXT NOT NULL,
-            file_path TEXT NOT NULL,
-            file_size INTEGER DEFAULT 0,
-            backup_type TEXT DEFAULT 'manual', -- manual, automatic
-            status TEXT DEFAULT 'completed', -- completed, failed
-            error_message TEXT,
-            created_by TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-          );
-          CREATE INDEX IF NOT EXISTS idx_backup_history_created ON backup_history(created_at);
-        `);
-        console.log('✅ Migration backup_history table concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration backup_history:', error);
-    }
+          // Adicionar version em purchases
+          const purchasesInfo: any[] = this.db.pragma('table_info(purchases)') as any[];
+          const purchasesHasVersion = purchasesInfo.some((col: any) => col.name === 'version');
+          if (!purchasesHasVersion) {
+            console.log('Executando migration: adicionando coluna version em purchases...');
+            this.db.exec('ALTER TABLE purchases ADD COLUMN version INTEGER DEFAULT 1');
+            console.log('✅ Migration purchases.version concluída!');
+          }
 
-    // Migration 15: Adicionar colunas name e status à tabela tables
-    try {
-      const tablesInfo: any[] = this.db.pragma('table_info(tables)') as any[];
-      const hasName = tablesInfo.some((col: any) => col.name === 'name');
-      const hasStatus = tablesInfo.some((col: any) => col.name === 'status');
-      
-      if (!hasName) {
-        console.log('Executando migration: adicionando coluna name em tables...');
-        this.db.exec('ALTER TABLE tables ADD COLUMN name TEXT');
-        // Atualizar registros existentes com nome padrão
-        this.db.exec(`UPDATE tables SET name = 'Mesa ' || number WHERE name IS NULL`);
-        console.log('✅ Migration tables.name concluída!');
-      }
-      
-      if (!hasStatus) {
-        console.log('Executando migration: adicionando coluna status em tables...');
-        this.db.exec("ALTER TABLE tables ADD COLUMN status TEXT DEFAULT 'available'");
-        console.log('✅ Migration tables.status concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration tables name/status:', error);
-    }
+          // Adicionar version em debts
+          const debtsInfo: any[] = this.db.pragma('table_info(debts)') as any[];
+          const debtsHasVersion = debtsInfo.some((col: any) => col.name === 'version');
+          if (!debtsHasVersion) {
+            console.log('Executando migration: adicionando coluna version em debts...');
+            this.db.exec('ALTER TABLE debts ADD COLUMN version INTEGER DEFAULT 1');
+            console.log('✅ Migration debts.version concluída!');
+          }
+        },
+      },
+      {
+        version: 19,
+        name: 'Adicionar coluna qty_boxes na tabela purchase_items',
+        up: () => {
+        // CRÍTICO: Necessário para sincronização de itens de compra do servidor Railway
+          const purchaseItemsInfo: any[] = this.db.pragma('table_info(purchase_items)') as any[];
+          const hasQtyBoxes = purchaseItemsInfo.some((col: any) => col.name === 'qty_boxes');
+
+          if (!hasQtyBoxes) {
+            console.log('Executando migration: adicionando coluna qty_boxes em purchase_items...');
+            this.db.exec('ALTER TABLE purchase_items ADD COLUMN qty_boxes INTEGER DEFAULT 0');
+            console.log('✅ Migration purchase_items.qty_boxes concluída!');
+          }
+        },
+      },
+      {
+        version: 20,
+        name: 'Criar tabela inventory_movements se não existir',
+        up: () => {
+        // CRÍTICO: Necessário para sincronização e rastreamento de movimentações de estoque
+          const tables: any[] = this.db.pragma('table_list') as any[];
+          const hasInventoryMovements = tables.some((t: any) => t.name === 'inventory_movements');
+
+          if (!hasInventoryMovements) {
+            console.log('Executando migration: criando tabela inventory_movements...');
+            this.db.exec(`
+              CREATE TABLE IF NOT EXISTS inventory_movements (
+                id TEXT PRIMARY KEY,
+                product_id TEXT NOT NULL,
+                branch_id TEXT NOT NULL,
+                type TEXT NOT NULL, -- 'entrada', 'saida', 'ajuste', 'transferencia'
+                qty_before INTEGER NOT NULL,
+                qty_after INTEGER NOT NULL,
+                qty_changed INTEGER NOT NULL,
+                closed_boxes_before INTEGER DEFAULT 0,
+                closed_boxes_after INTEGER DEFAULT 0,
+                open_box_units_before INTEGER DEFAULT 0,
+                open_box_units_after INTEGER DEFAULT 0,
+                reason TEXT NOT NULL,
+                reference_type TEXT, -- 'sale', 'purchase', 'adjustment', 'transfer'
+                reference_id TEXT,
+                responsible TEXT,
+                notes TEXT,
+                synced BOOLEAN DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (product_id) REFERENCES products(id),
+                FOREIGN KEY (branch_id) REFERENCES branches(id)
+              );
+              CREATE INDEX IF NOT EXISTS idx_inventory_movements_product ON inventory_movements(product_id);
+              CREATE INDEX IF NOT EXISTS idx_inventory_movements_branch ON inventory_movements(branch_id);
+              CREATE INDEX IF NOT EXISTS idx_inventory_movements_type ON inventory_movements(type);
+              CREATE INDEX IF NOT EXISTS idx_inventory_movements_created ON inventory_movements(created_at);
+            `);
+            console.log('✅ Migration inventory_movements table concluída!');
+          }
+        },
+      },
+      {
+        version: 21,
+        name: 'Adicionar coluna needs_online_auth para usuários sincronizados do servidor',
+        up: () => {
+        // CRÍTICO: Permite identificar usuários que precisam fazer login online primeiro
+          const usersTableInfo: any[] = this.db.pragma('table_info(users)') as any[];
+          const hasNeedsOnlineAuth = usersTableInfo.some((col: any) => col.name === 'needs_online_auth');
+
+          if (!hasNeedsOnlineAuth) {
+            console.log('Executando migration: adicionando coluna needs_online_auth em users...');
+            this.db.exec('ALTER TABLE users ADD COLUMN needs_online_auth BOOLEAN DEFAULT 0');
+            console.log('✅ Migration needs_online_auth em users concluída!');
+          }
+        },
+      },
+      {
+        version: 22,
+        name: 'Adicionar coluna synced para settings globais',
+        up: () => {
+        // CORREÇÃO F5: Permite sincronizar configurações entre PCs
+          const settingsTableInfo: any[] = this.db.pragma('table_info(settings)') as any[];
+          const hasSettingsSynced = settingsTableInfo.some((col: any) => col.name === 'synced');
+
+          if (!hasSettingsSynced) {
+            console.log('Executando migration: adicionando coluna synced em settings...');
+            this.db.exec('ALTER TABLE settings ADD COLUMN synced BOOLEAN DEFAULT 0');
+            // Marcar settings existentes como não sincronizadas
+            this.db.exec('UPDATE settings SET synced = 0');
+            console.log('✅ Migration synced em settings concluída!');
+          }
+        },
+      },
+      {
+        version: 23,
+        name: 'Listagem de vendas indexada (último método de pagamento desnormalizado)',
+        up: () => {
+          const salesTableInfo: any[] = this.db.pragma('table_info(sales)') as any[];
+          const hasLastPaymentMethod = salesTableInfo.some((col: any) => col.name === 'last_payment_method');
+
+          this.db.exec(`
+            CREATE INDEX IF NOT EXISTS idx_payments_sale_created ON payments(sale_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id);
+            CREATE INDEX IF NOT EXISTS idx_sales_branch_created ON sales(branch_id, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_sales_created ON sales(created_at, id);
+          `);
+
+          if (!hasLastPaymentMethod) {
+            console.log('Executando migration: adicionando last_payment_method em sales...');
+            this.db.exec('ALTER TABLE sales ADD COLUMN last_payment_method TEXT');
+            this.db.exec('ALTER TABLE sales ADD COLUMN last_payment_at DATETIME');
+            this.db.exec(`
+              UPDATE sales SET (last_payment_method, last_payment_at) = (
+                SELECT method, created_at FROM payments
+                WHERE sale_id = sales.id
+                ORDER BY created_at DESC, rowid DESC LIMIT 1
+              )
+              WHERE id IN (SELECT DISTINCT sale_id FROM payments WHERE sale_id IS NOT NULL)
+            `);
+            console.log('✅ Migration sales.last_payment_method concluída!');
+          }
 
-    // Migration 16: Adicionar coluna updated_at à tabela sync_queue
-    try {
-      const syncQueueInfo: any[] = this.db.pragma('table_info(sync_queue)') as any[];
-      const hasUpdatedAt = syncQueueInfo.some((col: any) => col.name === 'updated_at');
-      
-      if (!hasUpdatedAt) {
-        console.log('Executando migration: adicionando coluna updated_at em sync_queue...');
-        // SQLite não permite DEFAULT com função em ALTER TABLE, então adicionamos como NULL e depois atualizamos
-        this.db.exec('ALTER TABLE sync_queue ADD COLUMN updated_at DATETIME');
-        this.db.exec("UPDATE sync_queue SET updated_at = created_at WHERE updated_at IS NULL");
-        console.log('✅ Migration sync_queue.updated_at concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration sync_queue updated_at:', error);
-    }
+          // Triggers cobrem todos os caminhos de escrita em payments (PDV, mesas, sync)
+          this.db.exec(`
+            CREATE TRIGGER IF NOT EXISTS trg_payments_last_method_insert
+            AFTER INSERT ON payments
+            WHEN NEW.sale_id IS NOT NULL
+            BEGIN
+              UPDATE sales
+              SET last_payment_method = NEW.method, last_payment_at = NEW.created_at
+              WHERE id = NEW.sale_id
+                AND (last_payment_at IS NULL OR NEW.created_at >= last_payment_at);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_payments_last_method_update
+            AFTER UPDATE OF method, sale_id, created_at ON payments
+            BEGIN
+              UPDATE sales SET (last_payment_method, last_payment_at) = (
+                SELECT method, created_at FROM payments
+                WHERE sale_id = sales.id
+                ORDER BY created_at DESC, rowid DESC LIMIT 1
+              )
+              WHERE id IN (OLD.sale_id, NEW.sale_id);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_payments_last_method_delete
+            AFTER DELETE ON payments
+            WHEN OLD.sale_id IS NOT NULL
+            BEGIN
+              UPDATE sales SET (last_payment_method, last_payment_at) = (
+                SELECT method, created_at FROM payments
+                WHERE sale_id = sales.id
+                ORDER BY created_at DESC, rowid DESC LIMIT 1
+              )
+              WHERE id = OLD.sale_id;
+            END;
+          `);
+        },
+      },
+      {
+        version: 24,
+        name: 'Índices de busca FTS5 (produtos, clientes e dívidas)',
+        up: () => {
+          // Sem FTS5 no SQLite do build a busca continua com LIKE; não bloqueia as próximas
+          try {
+            this.createSearchIndexes();
+          } catch (error) {
+            console.error('Erro na migration de índices de busca (FTS5), usando LIKE:', error);
+          }
+        },
+      },
+      {
+        version: 25,
+        name: 'Índices para o razão de estoque incremental',
+        up: () => {
+          // barmanager_tools.stock_ledger agrega só as compras/vendas alteradas desde o checkpoint
+          this.db.exec(`
+            CREATE INDEX IF NOT EXISTS idx_purchase_items_purchase ON purchase_items(purchase_id);
+            CREATE INDEX IF NOT EXISTS idx_sales_updated ON sales(updated_at);
+            CREATE INDEX IF NOT EXISTS idx_purchases_updated ON purchases(updated_at);
+          `);
+        },
+      },
+    ];
+  }
 
-    // Migration 17: Adicionar campos de controle de sincronização à tabela users
-    try {
-      const usersInfo: any[] = this.db.pragma('table_info(users)') as any[];
-      const hasSyncStatus = usersInfo.some((col: any) => col.name === 'sync_status');
-      const hasServerId = usersInfo.some((col: any) => col.name === 'server_id');
-      const hasLastSyncAttempt = usersInfo.some((col: any) => col.name === 'last_sync_attempt');
-      const hasSyncError = usersInfo.some((col: any) => col.name === 'sync_error');
-      const hasAllowedTabs = usersInfo.some((col: any) => col.name === 'allowed_tabs');
-      
-      if (!hasSyncStatus) {
-        console.log('Executando migration: adicionando coluna sync_status em users...');
-        this.db.exec("ALTER TABLE users ADD COLUMN sync_status TEXT DEFAULT 'PENDING'");
-        // Marcar usuários já sincronizados
-        this.db.exec("UPDATE users SET sync_status = 'SYNCED' WHERE synced = 1");
-        this.db.exec("UPDATE users SET sync_status = 'PENDING' WHERE synced = 0 OR synced IS NULL");
-        console.log('✅ Migration users.sync_status concluída!');
-      }
-      
-      if (!hasServerId) {
-        console.log('Executando migration: adicionando coluna server_id em users...');
-        this.db.exec('ALTER TABLE users ADD COLUMN server_id TEXT');
-        // Para usuários já sincronizados, o server_id é o próprio id (pois usamos o mesmo ID)
-        this.db.exec("UPDATE users SET server_id = id WHERE synced = 1");
-        console.log('✅ Migration users.server_id concluída!');
-      }
-      
-      if (!hasLastSyncAttempt) {
-        console.log('Executando migration: adicionando coluna last_sync_attempt em users...');
-        this.db.exec('ALTER TABLE users ADD COLUMN last_sync_attempt DATETIME');
-        console.log('✅ Migration users.last_sync_attempt concluída!');
-      }
-      
-      if (!hasSyncError) {
-        console.log('Executando migration: adicionando coluna sync_error em users...');
-        this.db.exec('ALTER TABLE users ADD COLUMN sync_error TEXT');
-        console.log('✅ Migration users.sync_error concluída!');
-      }
-      
-      if (!hasAllowedTabs) {
-        console.log('Executando migration: adicionando coluna allowed_tabs em users...');
-        this.db.exec('ALTER TABLE users ADD COLUMN allowed_tabs TEXT');
-        console.log('✅ Migration users.allowed_tabs concluída!');
+  /**
+   * Aplica as migrations com versão acima de user_version, cada uma na sua
+   * transação junto com a atualização de user_version. Se uma falhar, ela é
+   * desfeita e as seguintes ficam para o próximo startup.
+   */
+  private async runMigrations() {
+    const migrations = this.schemaMigrations();
+    const targetVersion = migrations[migrations.length - 1].version;
+    const currentVersion = this.db.pragma('user_version', { simple: true }) as number;
+
+    if (currentVersion < targetVersion) {
+      const schemaStart = Date.now();
+      console.log(`Atualizando schema local: v${currentVersion} → v${targetVersion}...`);
+      await this.createTables();
+      console.log(`   Tabelas base verificadas em ${Date.now() - schemaStart}ms`);
+
+      for (const migration of migrations) {
+        if (migration.version <= currentVersion) {
+          continue;
+        }
+        const startedAt = Date.now();
+        try {
+          this.db.transaction(() => {
+            migration.up();
+            this.db.pragma(`user_version = ${migration.version}`);
+          })();
+        } catch (error) {
+          console.error(`Erro na migration ${migration.version} (${migration.name}), schema continua na v${this.db.pragma('user_version', { simple: true })}:`, error);
+          break;
+        }
+        console.log(`   Migration ${migration.version} (${migration.name}) em ${Date.now() - startedAt}ms`);
       }
-    } catch (error) {
-      console.error('Erro na migration users sync fields:', error);
+      console.log(`✅ Schema local atualizado em ${Date.now() - schemaStart}ms`);
     }
 
-    // Migration 18: Adicionar coluna version para detecção de conflitos (versionamento otimista)
-    try {
-      // Adicionar version em sales
-      const salesInfo: any[] = this.db.pragma('table_info(sales)') as any[];
-      const salesHasVersion = salesInfo.some((col: any) => col.name === 'version');
-      if (!salesHasVersion) {
-        console.log('Executando migration: adicionando coluna version em sales...');
-        this.db.exec('ALTER TABLE sales ADD COLUMN version INTEGER DEFAULT 1');
-        console.log('✅ Migration sales.version concluída!');
-      }
+    this.searchIndexReady = !!this.db.prepare(
+      "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    ).get();
+  }
 
-      // Adicionar version em customers
-      const customersInfo: any[] = this.db.pragma('table_info(customers)') as any[];
-      const customersHasVersion = customersInfo.some((col: any) => col.name === 'version');
-      if (!customersHasVersion) {
-        console.log('Executando migration: adicionando coluna version em customers...');
-        this.db.exec('ALTER TABLE customers ADD COLUMN version INTEGER DEFAULT 1');
-        console.log('✅ Migration customers.version concluída!');
-      }
+  /**
+   * Tabelas FTS5 com tokenizer trigram (substring em qualquer posição, sem
+   * diferenciar maiúsculas) sobre products, customers e debts. São tabelas de
+   * conteúdo externo: guardam só o índice, e os triggers repetem cada
+   * INSERT/UPDATE/DELETE da tabela original.
+   */
+  private createSearchIndexes() {
+    const indexes = [
+      { fts: 'products_fts', table: 'products', columns: ['name', 'sku', 'barcode', 'name_kriol', 'name_fr'] },
+      { fts: 'customers_fts', table: 'customers', columns: ['full_name', 'phone', 'email', 'code'] },
+      { fts: 'debts_fts', table: 'debts', columns: ['debt_number'] },
+    ];
 
-      // Adicionar version em inventory_items
-      const inventoryInfo: any[] = this.db.pragma('table_info(inventory_items)') as any[];
-      const inventoryHasVersion = inventoryInfo.some((col: any) => col.name === 'version');
-      if (!inventoryHasVersion) {
-        console.log('Executando migration: adicionando coluna version em inventory_items...');
-        this.db.exec('ALTER TABLE inventory_items ADD COLUMN version INTEGER DEFAULT 1');
-        console.log('✅ Migration inventory_items.version concluída!');
-      }
+    for (const { fts, table, columns } of indexes) {
+      const exists = this.db.prepare(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+      ).get(fts);
+      const cols = columns.join(', ');
+      const newCols = columns.map((col) => `new.${col}`).join(', ');
+      const oldCols = columns.map((col) => `old.${col}`).join(', ');
 
-      // Adicionar version em products
-      const productsInfo: any[] = this.db.pragma('table_info(products)') as any[];
-      const productsHasVersion = productsInfo.some((col: any) => col.name === 'version');
-      if (!productsHasVersion) {
-        console.log('Executando migration: adicionando coluna version em products...');
-        this.db.exec('ALTER TABLE products ADD COLUMN version INTEGER DEFAULT 1');
-        console.log('✅ Migration products.version concluída!');
-      }
+      this.db.exec(`
+        CREATE VIRTUAL TABLE IF NOT EXISTS ${fts} USING fts5(
+          ${cols}, content='${table}', content_rowid='rowid', tokenize='trigram'
+        );
 
-      // Adicionar version em purchases
-      const purchasesInfo: any[] = this.db.pragma('table_info(purchases)') as any[];
-      const purchasesHasVersion = purchasesInfo.some((col: any) => col.name === 'version');
-      if (!purchasesHasVersion) {
-        console.log('Executando migration: adicionando coluna version em purchases...');
-        this.db.exec('ALTER TABLE purchases ADD COLUMN version INTEGER DEFAULT 1');
-        console.log('✅ Migration purchases.version concluída!');
-      }
+        CREATE TRIGGER IF NOT EXISTS ${fts}_ai AFTER INSERT ON ${table} BEGIN
+          INSERT INTO ${fts}(rowid, ${cols}) VALUES (new.rowid, ${newCols});
+        END;
 
-      // Adicionar version em debts
-      const debtsInfo: any[] = this.db.pragma('table_info(debts)') as any[];
-      const debtsHasVersion = debtsInfo.some((col: any) => col.name === 'version');
-      if (!debtsHasVersion) {
-        console.log('Executando migration: adicionando coluna version em debts...');
-        this.db.exec('ALTER TABLE debts ADD COLUMN version INTEGER DEFAULT 1');
-        console.log('✅ Migration debts.version concluída!');
-      }
+        CREATE TRIGGER IF NOT EXISTS ${fts}_ad AFTER DELETE ON ${table} BEGIN
+          INSERT INTO ${fts}(${fts}, rowid, ${cols}) VALUES ('delete', old.rowid, ${oldCols});
+        END;
 
-    } catch (error) {
-      console.error('Erro na migration version columns:', error);
-    }
+        CREATE TRIGGER IF NOT EXISTS ${fts}_au AFTER UPDATE OF ${cols} ON ${table} BEGIN
+          INSERT INTO ${fts}(${fts}, rowid, ${cols}) VALUES ('delete', old.rowid, ${oldCols});
+          INSERT INTO ${fts}(rowid, ${cols}) VALUES (new.rowid, ${newCols});
+        END;
+      `);
 
-    // Migration 19: Adicionar coluna qty_boxes na tabela purchase_items
-    // CRÍTICO: Necessário para sincronização de itens de compra do servidor Railway
-    try {
-      const purchaseItemsInfo: any[] = this.db.pragma('table_info(purchase_items)') as any[];
-      const hasQtyBoxes = purchaseItemsInfo.some((col: any) => col.name === 'qty_boxes');
-      
-      if (!hasQtyBoxes) {
-        console.log('Executando migration: adicionando coluna qty_boxes em purchase_items...');
-        this.db.exec('ALTER TABLE purchase_items ADD COLUMN qty_boxes INTEGER DEFAULT 0');
-        console.log('✅ Migration purchase_items.qty_boxes concluída!');
+      if (!exists) {
+        console.log(`Executando migration: indexando ${table} para busca (${fts})...`);
+        this.db.exec(`INSERT INTO ${fts}(${fts}) VALUES ('rebuild')`);
+        console.log(`✅ Migration ${fts} concluída!`);
       }
-    } catch (error) {
-      console.error('Erro na migration qty_boxes:', error);
     }
 
-    // Migration 20: Criar tabela inventory_movements se não existir
-    // CRÍTICO: Necessário para sincronização e rastreamento de movimentações de estoque
-    try {
-      const tables: any[] = this.db.pragma('table_list') as any[];
-      const hasInventoryMovements = tables.some((t: any) => t.name === 'inventory_movements');
-      
-      if (!hasInventoryMovements) {
-        console.log('Executando migration: criando tabela inventory_movements...');
-        this.db.exec(`
-          CREATE TABLE IF NOT EXISTS inventory_movements (
-            id TEXT PRIMARY KEY,
-            product_id TEXT NOT NULL,
-            branch_id TEXT NOT NULL,
-            type TEXT NOT NULL, -- 'entrada', 'saida', 'ajuste', 'transferencia'
-            qty_before INTEGER NOT NULL,
-            qty_after INTEGER NOT NULL,
-            qty_changed INTEGER NOT NULL,
-            closed_boxes_before INTEGER DEFAULT 0,
-            closed_boxes_after INTEGER DEFAULT 0,
-            open_box_units_before INTEGER DEFAULT 0,
-            open_box_units_after INTEGER DEFAULT 0,
-            reason TEXT NOT NULL,
-            reference_type TEXT, -- 'sale', 'purchase', 'adjustment', 'transfer'
-            reference_id TEXT,
-            responsible TEXT,
-            notes TEXT,
-            synced BOOLEAN DEFAULT 0,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (product_id) REFERENCES products(id),
-            FOREIGN KEY (branch_id) REFERENCES branches(id)
-          );
-          CREATE INDEX IF NOT EXISTS idx_inventory_movements_product ON inventory_movements(product_id);
-          CREATE INDEX IF NOT EXISTS idx_inventory_movements_branch ON inventory_movements(branch_id);
-          CREATE INDEX IF NOT EXISTS idx_inventory_movements_type ON inventory_movements(type);
-          CREATE INDEX IF NOT EXISTS idx_inventory_movements_created ON inventory_movements(created_at);
-        `);
-        console.log('✅ Migration inventory_movements table concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration inventory_movements:', error);
-    }
+    // Buscas curtas (1-2 letras) não passam pelo trigram: prefixo do nome via índice NOCASE
+    this.db.exec('CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products(name COLLATE NOCASE)');
+  }
 
-    // Migration 21: Adicionar coluna needs_online_auth para usuários sincronizados do servidor
-    // CRÍTICO: Permite identificar usuários que precisam fazer login online primeiro
-    try {
-      const usersTableInfo: any[] = this.db.pragma('table_info(users)') as any[];
-      const hasNeedsOnlineAuth = usersTableInfo.some((col: any) => col.name === 'needs_online_auth');
-      
-      if (!hasNeedsOnlineAuth) {
-        console.log('Executando migration: adicionando coluna needs_online_auth em users...');
-        this.db.exec('ALTER TABLE users ADD COLUMN needs_online_auth BOOLEAN DEFAULT 0');
-        console.log('✅ Migration needs_online_auth em users concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration needs_online_auth:', error);
-    }
-    
-    // Migration 22: Adicionar coluna synced para settings globais
-    // CORREÇÃO F5: Permite sincronizar configurações entre PCs
-    try {
-      const settingsTableInfo: any[] = this.db.pragma('table_info(settings)') as any[];
-      const hasSettingsSynced = settingsTableInfo.some((col: any) => col.name === 'synced');
-      
-      if (!hasSettingsSynced) {
-        console.log('Executando migration: adicionando coluna synced em settings...');
-        this.db.exec('ALTER TABLE settings ADD COLUMN synced BOOLEAN DEFAULT 0');
-        // Marcar settings existentes como não sincronizadas
-        this.db.exec('UPDATE settings SET synced = 0');
-        console.log('✅ Migration synced em settings concluída!');
-      }
-    } catch (error) {
-      console.error('Erro na migration synced em settings:', error);
+  /**
+   * Converte o texto digitado numa consulta FTS5: cada palavra com 3+
+   * caracteres vira uma frase entre aspas (AND implícito). Retorna null se
+   * não houver palavra que o trigram consiga buscar.
+   */
+  private buildSearchMatch(search: string, columns?: string[]): string | null {
+    const terms = search
+      .trim()
+      .split(/\s+/)
+      .filter((term) => [...term].length >= 3)
+      .map((term) => `"${term.replace(/"/g, '""')}"`);
+    if (!this.searchIndexReady || terms.length === 0) {
+      return null;
     }
+    const match = terms.join(' ');
+    return columns ? `{${columns.join(' ')}} : (${match})` : match;
   }
 
   // ============================================
@@ -1239,15 +1573,28 @@ export class DatabaseManager {
   /**
    * 🔴 TRANSAÇÃO ATÔMICA: Wrapper para operações que precisam ser atômicas
    * Garante rollback automático em caso de erro
+   * (chamadas aninhadas viram SAVEPOINTs no better-sqlite3)
+   *
+   * BEGIN IMMEDIATE: com o worker de escrita e a conexão principal gravando no
+   * mesmo arquivo, a transação pega o lock de escrita já no início e espera o
+   * busy timeout, em vez de falhar com SQLITE_BUSY ao passar de leitura a escrita.
    */
-  private runInTransaction<T>(operation: () => T): T {
+  runInTransaction<T>(operation: () => T): T {
     const transaction = this.db.transaction(() => {
       return operation();
     });
-    return transaction();
+    return transaction.immediate();
   }
 
   createSale(data: any, skipSyncQueue: boolean = false) {
+    const id = this.insertSale(data, skipSyncQueue);
+    return this.getSaleById(id);
+  }
+
+  /**
+   * Insere a venda (e a entrada na fila de sync) e retorna o ID
+   */
+  private insertSale(data: any, skipSyncQueue: boolean = false): string {
     // Se o ID já existe (vindo do servidor), usar ele; senão gerar novo
     const id = data.id || this.generateUUID();
     
@@ -1255,7 +1602,7 @@ export class DatabaseManager {
     const rawPaymentMethod = data.paymentMethod || data.payment_method;
     const paymentMethod = rawPaymentMethod ? tryNormalizePaymentMethod(rawPaymentMethod) : null;
     
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       INSERT INTO sales (
         id, sale_number, branch_id, type, status, table_id, customer_id,
         cashier_id, subtotal, discount_total, tax_total, total,
@@ -1266,7 +1613,7 @@ export class DatabaseManager {
     
     stmt.run(
       id,
-      data.saleNumber || data.sale_number || `SALE-${Date.now()}`,
+      data.saleNumber || data.sale_number || this.allocateDocumentNumber('sale', data.branchId || data.branch_id || 'main-branch'),
       data.branchId || data.branch_id || 'main-branch',
       data.type || 'counter',
       data.status || 'open',
@@ -1294,10 +1641,24 @@ export class DatabaseManager {
       this.addToSyncQueue('create', 'sale', id, syncData, 1); // Alta prioridade
     }
     
-    return this.getSaleById(id);
+    return id;
   }
 
   addSaleItem(saleId: string, itemData: any) {
+    this.validateSaleItem(itemData);
+
+    // 🔴 CORREÇÃO CRÍTICA: Envolver em transação atômica
+    // Se qualquer operação falhar (insert, update totais, deduct estoque),
+    // todas as mudanças são revertidas automaticamente
+    return this.runInTransaction(() => {
+      const item = this.insertSaleItem(saleId, itemData);
+      // Atualizar totais da venda
+      this.updateSaleTotals(saleId);
+      return item;
+    });
+  }
+
+  private validateSaleItem(itemData: any) {
     // Validar dados obrigatórios
     if (!itemData || !itemData.productId) {
       throw new Error('Dados do item inválidos: productId é obrigatório');
@@ -1306,110 +1667,161 @@ export class DatabaseManager {
     if (!itemData.branchId) {
       throw new Error('Dados do item inválidos: branchId é obrigatório');
     }
+  }
+
+  /**
+   * Insere o item, deduz o estoque e enfileira o sync.
+   * Deve ser chamado dentro de uma transação; não recalcula os totais da venda.
+   */
+  private insertSaleItem(saleId: string, itemData: any) {
+    const id = this.generateUUID();
+    const stmt = this.prepareCached(`
+      INSERT INTO sale_items 
+      (id, sale_id, product_id, qty_units, is_muntu, unit_price, unit_cost, 
+       subtotal, tax_amount, total, muntu_savings)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    `);
+    
+    stmt.run(id, saleId, itemData.productId, itemData.qtyUnits, 
+             itemData.isMuntu ? 1 : 0, itemData.unitPrice, itemData.unitCost,
+             itemData.subtotal, itemData.taxAmount, itemData.total, itemData.muntuSavings);
+    
+    // Deduzir estoque usando o sistema avançado com abertura automática de caixas
+    // Se falhar, a exceção será propagada e TODA a transação será revertida
+    this.deductInventoryAdvanced(
+      itemData.productId, 
+      itemData.branchId, 
+      itemData.qtyUnits,
+      itemData.isMuntu || false,
+      saleId,
+      itemData.cashierId || 'system'
+    );
+    
+    // Adicionar à fila - incluir saleId nos dados
+    this.addToSyncQueue('create', 'sale_item', id, { ...itemData, saleId }, 1);
+    
+    return { id, ...itemData };
+  }
 
+  addSalePayment(saleId: string, paymentData: any) {
+    const normalizedMethod = this.validatePaymentMethod(paymentData);
+    
     // 🔴 CORREÇÃO CRÍTICA: Envolver em transação atômica
-    // Se qualquer operação falhar (insert, update totais, deduct estoque),
-    // todas as mudanças são revertidas automaticamente
+    // Garante que pagamento, atualização de venda e caixa são atômicos
     return this.runInTransaction(() => {
-      const id = this.generateUUID();
-      const stmt = this.db.prepare(`
-        INSERT INTO sale_items 
-        (id, sale_id, product_id, qty_units, is_muntu, unit_price, unit_cost, 
-         subtotal, tax_amount, total, muntu_savings)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-      `);
-      
-      stmt.run(id, saleId, itemData.productId, itemData.qtyUnits, 
-               itemData.isMuntu ? 1 : 0, itemData.unitPrice, itemData.unitCost,
-               itemData.subtotal, itemData.taxAmount, itemData.total, itemData.muntuSavings);
-      
-      // Atualizar totais da venda
-      this.updateSaleTotals(saleId);
-      
-      // Deduzir estoque usando o sistema avançado com abertura automática de caixas
-      // Se falhar, a exceção será propagada e TODA a transação será revertida
-      this.deductInventoryAdvanced(
-        itemData.productId, 
-        itemData.branchId, 
-        itemData.qtyUnits,
-        itemData.isMuntu || false,
-        saleId,
-        itemData.cashierId || 'system'
-      );
-      
-      // Adicionar à fila - incluir saleId nos dados
-      this.addToSyncQueue('create', 'sale_item', id, { ...itemData, saleId }, 1);
-      
-      return { id, ...itemData };
+      return this.insertSalePayment(saleId, paymentData, normalizedMethod, this.getCurrentCashBox());
     });
   }
 
-  addSalePayment(saleId: string, paymentData: any) {
+  private validatePaymentMethod(paymentData: any): PaymentMethodType {
     // Validar método de pagamento - NUNCA usar fallback
-    const normalizedMethod = tryNormalizePaymentMethod(paymentData.method);
+    const normalizedMethod = tryNormalizePaymentMethod(paymentData?.method);
     if (!normalizedMethod) {
-      console.error(`❌ Método de pagamento inválido: ${paymentData.method}`);
-      throw new Error(`Método de pagamento inválido: ${paymentData.method}`);
+      console.error(`❌ Método de pagamento inválido: ${paymentData?.method}`);
+      throw new Error(`Método de pagamento inválido: ${paymentData?.method}`);
     }
+    return normalizedMethod;
+  }
+
+  /**
+   * Insere o pagamento, marca a venda como paga, atualiza o caixa e enfileira o sync.
+   * Deve ser chamado dentro de uma transação.
+   */
+  private insertSalePayment(saleId: string, paymentData: any, normalizedMethod: PaymentMethodType, currentCashBox: any) {
+    const id = this.generateUUID();
+    const stmt = this.prepareCached(`
+      INSERT INTO payments 
+      (id, sale_id, method, provider, amount, reference_number, transaction_id, status, notes)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    `);
     
-    // 🔴 CORREÇÃO CRÍTICA: Envolver em transação atômica
-    // Garante que pagamento, atualização de venda e caixa são atômicos
-    return this.runInTransaction(() => {
-      const id = this.generateUUID();
-      const stmt = this.db.prepare(`
-        INSERT INTO payments 
-        (id, sale_id, method, provider, amount, reference_number, transaction_id, status, notes)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-      `);
-      
-      stmt.run(
-        id, 
-        saleId, 
-        normalizedMethod, // Método validado e normalizado
-        paymentData.provider || null,
-        paymentData.amount,
-        paymentData.referenceNumber || null,
-        paymentData.transactionId || null,
-        paymentData.status || 'completed',
-        paymentData.notes || null
-      );
-      
-      // Atualizar status da venda para 'paid' e incrementar versão
-      this.db.prepare(`
-        UPDATE sales 
-        SET status = 'paid', 
-            updated_at = datetime('now'),
-            synced = 0,
-            version = COALESCE(version, 0) + 1
-        WHERE id = ?
-      `).run(saleId);
-      
-      // IMPORTANTE: Atualizar totais do caixa
-      const currentCashBox: any = this.getCurrentCashBox();
-      if (currentCashBox) {
-        this.updateCashBoxTotals(currentCashBox.id, paymentData.amount, normalizedMethod);
-        console.log(`[CASH-BOX] Atualizado: +${paymentData.amount/100} FCFA (${normalizedMethod})`);
-      } else {
-        console.warn('[CASH-BOX] Nenhum caixa aberto - totais não atualizados');
+    stmt.run(
+      id, 
+      saleId, 
+      normalizedMethod, // Método validado e normalizado
+      paymentData.provider || null,
+      paymentData.amount,
+      paymentData.referenceNumber || null,
+      paymentData.transactionId || null,
+      paymentData.status || 'completed',
+      paymentData.notes || null
+    );
+    
+    // Atualizar status da venda para 'paid' e incrementar versão
+    this.prepareCached(`
+      UPDATE sales 
+      SET status = 'paid', 
+          updated_at = datetime('now'),
+          synced = 0,
+          version = COALESCE(version, 0) + 1
+      WHERE id = ?
+    `).run(saleId);
+    
+    // IMPORTANTE: Atualizar totais do caixa
+    if (currentCashBox) {
+      this.updateCashBoxTotals(currentCashBox.id, paymentData.amount, normalizedMethod);
+      console.log(`[CASH-BOX] Atualizado: +${paymentData.amount/100} FCFA (${normalizedMethod})`);
+    } else {
+      console.warn('[CASH-BOX] Nenhum caixa aberto - totais não atualizados');
+    }
+    
+    // Adicionar à fila - incluir saleId nos dados
+    this.addToSyncQueue('create', 'payment', id, { ...paymentData, saleId }, 1);
+    
+    return { id, ...paymentData };
+  }
+
+  /**
+   * ⚡ Registra uma venda completa (venda + itens + pagamentos) em UMA transação.
+   * Mesmo efeito de createSale + addSaleItem (N vezes) + addSalePayment,
+   * mas com um único commit, statements reaproveitados, caixa consultado
+   * uma vez e totais da venda recalculados uma só vez.
+   */
+  recordSale(data: { sale: any; items: any[]; payments?: any[] }) {
+    const items = data.items || [];
+    const payments = data.payments || [];
+    items.forEach(item => this.validateSaleItem(item));
+    const paymentMethods = payments.map(payment => this.validatePaymentMethod(payment));
+
+    const saleId = this.runInTransaction(() => {
+      const id = this.insertSale(data.sale);
+
+      for (const item of items) {
+        this.insertSaleItem(id, item);
       }
-      
-      // Adicionar à fila - incluir saleId nos dados
-      this.addToSyncQueue('create', 'payment', id, { ...paymentData, saleId }, 1);
-      
-      return { id, ...paymentData };
+      if (items.length > 0) {
+        this.updateSaleTotals(id);
+      }
+
+      if (payments.length > 0) {
+        const currentCashBox = this.getCurrentCashBox();
+        payments.forEach((payment, index) => {
+          this.insertSalePayment(id, payment, paymentMethods[index], currentCashBox);
+        });
+      }
+
+      return id;
     });
+
+    return this.getSaleById(saleId);
   }
 
+  /**
+   * Lista de vendas paginada por chave (created_at, id), mais recentes primeiro.
+   *
+   * Filtros: branchId, status, cashierId, paymentMethod, dateFrom/dateTo
+   * (YYYY-MM-DD, dateTo exclusivo), limit (padrão 100, máximo 500) e
+   * before: { createdAt, id } da última venda da página anterior.
+   * O método de pagamento vem de sales.last_payment_method (mantido por
+   * trigger em payments), sem subconsulta por linha.
+   */
   getSales(filters: any = {}) {
     // IMPORTANTE: NUNCA usar CASH como fallback - isso causa bug de VALE aparecer como CASH
     // Prioridade: 1) Payment.method, 2) Sale.payment_method original, 3) NULL (não classificar)
     let query = `
       SELECT 
         s.*,
-        COALESCE(
-          (SELECT method FROM payments WHERE sale_id = s.id ORDER BY created_at DESC LIMIT 1),
-          s.payment_method
-        ) as payment_method
+        COALESCE(s.last_payment_method, s.payment_method) as payment_method
       FROM sales s
       WHERE 1=1
     `;
@@ -1424,10 +1836,39 @@ export class DatabaseManager {
       query += ' AND s.status = ?';
       params.push(filters.status);
     }
+
+    if (filters.cashierId) {
+      query += ' AND s.cashier_id = ?';
+      params.push(filters.cashierId);
+    }
+
+    if (filters.paymentMethod) {
+      query += ' AND COALESCE(s.last_payment_method, s.payment_method) = ?';
+      params.push(filters.paymentMethod);
+    }
+
+    // created_at mistura ISO (2025-01-31T10:00:00Z) e datetime('now') (2025-01-31 10:00:00):
+    // limites só com a data comparam certo nos dois formatos
+    if (filters.dateFrom) {
+      query += ' AND s.created_at >= ?';
+      params.push(String(filters.dateFrom).slice(0, 10));
+    }
+
+    if (filters.dateTo) {
+      query += ' AND s.created_at < ?';
+      params.push(String(filters.dateTo).slice(0, 10));
+    }
+
+    if (filters.before?.createdAt && filters.before?.id) {
+      query += ' AND (s.created_at, s.id) < (?, ?)';
+      params.push(filters.before.createdAt, filters.before.id);
+    }
+
+    const limit = Math.min(Math.max(parseInt(filters.limit, 10) || 100, 1), 500);
+    query += ' ORDER BY s.created_at DESC, s.id DESC LIMIT ?';
+    params.push(limit);
     
-    query += ' ORDER BY s.created_at DESC LIMIT 100';
-    
-    const results = this.db.prepare(query).all(...params);
+    const results = this.prepareCached(query).all(...params);
     
     // 🔴 LOG FASE 11: Electron lendo vendas do banco
     console.log('\\n═══════════════════════════════════════════════════════');
@@ -1441,17 +1882,17 @@ export class DatabaseManager {
   }
 
   getSaleById(id: string) {
-    const sale = this.db.prepare('SELECT * FROM sales WHERE id = ?').get(id);
+    const sale = this.prepareCached('SELECT * FROM sales WHERE id = ?').get(id);
     if (!sale) return null;
     
-    const items = this.db.prepare(`
+    const items = this.prepareCached(`
       SELECT si.*, p.name as product_name 
       FROM sale_items si 
       LEFT JOIN products p ON si.product_id = p.id 
       WHERE si.sale_id = ?
     `).all(id);
     
-    const payments = this.db.prepare('SELECT * FROM payments WHERE sale_id = ?').all(id);
+    const payments = this.prepareCached('SELECT * FROM payments WHERE sale_id = ?').all(id);
     
     return { ...(sale as object), items, payments };
   }
@@ -1467,22 +1908,81 @@ export class DatabaseManager {
     
     query += ' ORDER BY name';
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
+  /**
+   * Busca do PDV. Ordem: código de barras/SKU exato (índices UNIQUE),
+   * nomes que começam com o texto (índice NOCASE), depois os produtos ativos
+   * do índice FTS5 trigram por relevância bm25 (texto no nome pesa mais que
+   * SKU/código/traduções). Buscas de 1-2 letras usam só o prefixo do nome.
+   */
   searchProducts(query: string) {
-    return this.db.prepare(`
-      SELECT * FROM products 
-      WHERE is_active = 1 
-        AND (name LIKE ? OR sku LIKE ? OR barcode LIKE ?)
-      ORDER BY name
-      LIMIT 50
-    `).all(`%${query}%`, `%${query}%`, `%${query}%`);
+    const search = (query || '').trim();
+    if (!search) {
+      return this.prepareCached(`
+        SELECT * FROM products WHERE is_active = 1 ORDER BY name LIMIT ${PRODUCT_SEARCH_LIMIT}
+      `).all();
+    }
+
+    const exact = this.prepareCached(`
+      SELECT * FROM products
+      WHERE is_active = 1 AND (barcode = ? OR sku = ?)
+    `).all(search, search) as any[];
+
+    const match = this.buildSearchMatch(search);
+    let matches: any[];
+    if (match) {
+      const prefixed = this.prepareCached(`
+        SELECT * FROM products
+        WHERE is_active = 1 AND name LIKE ?
+        ORDER BY name COLLATE NOCASE
+        LIMIT ${PRODUCT_SEARCH_LIMIT}
+      `).all(`${search}%`) as any[];
+      if (prefixed.length >= PRODUCT_SEARCH_LIMIT) {
+        // Os prefixos já enchem a lista e vêm antes do bm25: o resultado seria o mesmo
+        matches = prefixed;
+      } else {
+        // Filtro de ativos no join, antes do LIMIT: inativos não ocupam vagas do ranking
+        const ranked = this.prepareCached(`
+          SELECT p.*
+          FROM products_fts f
+          JOIN products p ON p.rowid = f.rowid
+          WHERE products_fts MATCH ? AND p.is_active = 1
+          ORDER BY bm25(products_fts, 10.0, 4.0, 4.0, 2.0, 2.0), p.name
+          LIMIT ${PRODUCT_SEARCH_LIMIT}
+        `).all(match) as any[];
+        const prefixedIds = new Set(prefixed.map((product) => product.id));
+        matches = [...prefixed, ...ranked.filter((product) => !prefixedIds.has(product.id))]
+          .slice(0, PRODUCT_SEARCH_LIMIT);
+      }
+    } else if (this.searchIndexReady) {
+      matches = this.prepareCached(`
+        SELECT * FROM products
+        WHERE is_active = 1 AND name LIKE ?
+        ORDER BY name COLLATE NOCASE
+        LIMIT ${PRODUCT_SEARCH_LIMIT}
+      `).all(`${search}%`);
+    } else {
+      matches = this.prepareCached(`
+        SELECT * FROM products 
+        WHERE is_active = 1 
+          AND (name LIKE ? OR sku LIKE ? OR barcode LIKE ?)
+        ORDER BY name
+        LIMIT ${PRODUCT_SEARCH_LIMIT}
+      `).all(`%${search}%`, `%${search}%`, `%${search}%`);
+    }
+
+    if (exact.length === 0) {
+      return matches;
+    }
+    const exactIds = new Set(exact.map((product) => product.id));
+    return [...exact, ...matches.filter((product) => !exactIds.has(product.id))].slice(0, PRODUCT_SEARCH_LIMIT);
   }
 
   createProduct(productData: any, skipSyncQueue: boolean = false) {
     const id = productData.id || this.generateUUID();
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       INSERT INTO products (
         id, sku, barcode, name, category_id, supplier_id, price_unit, price_box, cost_unit, 
         cost_box, units_per_box, box_enabled, is_muntu_eligible, muntu_quantity, 
@@ -1518,7 +2018,7 @@ export class DatabaseManager {
     
     // Criar registro inicial de inventário
     const branchId = 'main-branch'; // Filial padrão
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO inventory (
         id, product_id, branch_id, quantity_units, quantity_boxes, 
         min_stock_units, created_at, updated_at
@@ -1618,7 +2118,7 @@ export class DatabaseManager {
     }
     values.push(id);
 
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       UPDATE products 
       SET ${fields.join(', ')}
       WHERE id = ?
@@ -1633,12 +2133,12 @@ export class DatabaseManager {
   }
 
   getProductById(id: string) {
-    return this.db.prepare('SELECT * FROM products WHERE id = ?').get(id);
+    return this.prepareCached('SELECT * FROM products WHERE id = ?').get(id);
   }
 
   deleteProduct(id: string) {
     // Buscar produto antes de deletar para ter os dados completos
-    const product = this.db.prepare('SELECT * FROM products WHERE id = ?').get(id) as any;
+    const product = this.prepareCached('SELECT * FROM products WHERE id = ?').get(id) as any;
     
     if (!product) {
       console.warn(`⚠️ Produto ${id} não encontrado para exclusão`);
@@ -1646,7 +2146,7 @@ export class DatabaseManager {
     }
     
     // Soft delete - apenas marca como inativo e incrementa versão
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       UPDATE products 
       SET is_active = 0, synced = 0, updated_at = datetime('now'), version = COALESCE(version, 0) + 1
       WHERE id = ?
@@ -1686,12 +2186,12 @@ export class DatabaseManager {
     }
 
     query += ' ORDER BY sort_order, name';
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   createCategory(categoryData: any, skipSyncQueue: boolean = false) {
     const id = categoryData.id || this.generateUUID();
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       INSERT INTO categories (id, name, description, parent_id, sort_order, is_active, synced, created_at, updated_at)
       VALUES (?, ?, ?, ?, ?, 1, ?, datetime('now'), datetime('now'))
     `);
@@ -1743,7 +2243,7 @@ export class DatabaseManager {
     fields.push('updated_at = datetime(\'now\')');
     values.push(id);
 
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       UPDATE categories 
       SET ${fields.join(', ')}
       WHERE id = ?
@@ -1761,16 +2261,16 @@ export class DatabaseManager {
 
   deleteCategory(id: string) {
     // Verificar se há produtos usando esta categoria
-    const productsCount = this.db.prepare('SELECT COUNT(*) as count FROM products WHERE category_id = ?').get(id) as { count: number };
+    const productsCount = this.prepareCached('SELECT COUNT(*) as count FROM products WHERE category_id = ?').get(id) as { count: number };
     
     if (productsCount.count > 0) {
       throw new Error('Não é possível deletar categoria com produtos associados');
     }
 
     // Buscar categoria antes de deletar
-    const category = this.db.prepare('SELECT * FROM categories WHERE id = ?').get(id) as any;
+    const category = this.prepareCached('SELECT * FROM categories WHERE id = ?').get(id) as any;
 
-    this.db.prepare('DELETE FROM categories WHERE id = ?').run(id);
+    this.prepareCached('DELETE FROM categories WHERE id = ?').run(id);
     
     // 🔴 CORREÇÃO: Incluir dados completos para sincronização
     this.addToSyncQueue('delete', 'category', id, {
@@ -1786,12 +2286,12 @@ export class DatabaseManager {
   // ============================================
 
   getSuppliers() {
-    return this.db.prepare('SELECT * FROM suppliers WHERE is_active = 1 ORDER BY name').all();
+    return this.prepareCached('SELECT * FROM suppliers WHERE is_active = 1 ORDER BY name').all();
   }
 
   createSupplier(supplierData: any, skipSyncQueue: boolean = false) {
     const id = supplierData.id || this.generateUUID();
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       INSERT INTO suppliers (
         id, code, name, contact_person, phone, email, address, 
         tax_id, payment_terms, notes, is_active, created_at, updated_at
@@ -1868,7 +2368,7 @@ export class DatabaseManager {
     fields.push('synced = 0');
     values.push(id);
 
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       UPDATE suppliers 
       SET ${fields.join(', ')}
       WHERE id = ?
@@ -1880,15 +2380,15 @@ export class DatabaseManager {
     if (!skipSyncQueue) {
       this.addToSyncQueue('update', 'supplier', id, { id, ...supplierData });
     }
-    return this.db.prepare('SELECT * FROM suppliers WHERE id = ?').get(id);
+    return this.prepareCached('SELECT * FROM suppliers WHERE id = ?').get(id);
   }
 
   deleteSupplier(id: string) {
     // Buscar fornecedor antes de deletar
-    const supplier = this.db.prepare('SELECT * FROM suppliers WHERE id = ?').get(id) as any;
+    const supplier = this.prepareCached('SELECT * FROM suppliers WHERE id = ?').get(id) as any;
     
     // Soft delete
-    this.db.prepare('UPDATE suppliers SET is_active = 0, synced = 0, updated_at = datetime(\'now\') WHERE id = ?').run(id);
+    this.prepareCached('UPDATE suppliers SET is_active = 0, synced = 0, updated_at = datetime(\'now\') WHERE id = ?').run(id);
     
     // 🔴 CORREÇÃO: Incluir dados completos para sincronização
     this.addToSyncQueue('delete', 'supplier', id, {
@@ -1930,11 +2430,11 @@ export class DatabaseManager {
 
     query += ' ORDER BY p.created_at DESC LIMIT 100';
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   getPurchaseById(id: string) {
-    const purchase: any = this.db.prepare(`
+    const purchase: any = this.prepareCached(`
       SELECT p.*
       FROM purchases p
       WHERE p.id = ?
@@ -1943,14 +2443,14 @@ export class DatabaseManager {
     if (!purchase) return null;
 
     // Buscar informações do fornecedor
-    const supplier: any = this.db.prepare(`
+    const supplier: any = this.prepareCached(`
       SELECT id, name, code, phone, email
       FROM suppliers
       WHERE id = ?
     `).get(purchase.supplier_id);
 
     // Buscar itens da compra (incluindo units_per_box para calcular quantidade de caixas)
-    const items = this.db.prepare(`
+    const items = this.prepareCached(`
       SELECT pi.*, p.name as product_name, p.sku as product_sku, p.units_per_box
       FROM purchase_items pi
       LEFT JOIN products p ON pi.product_id = p.id
@@ -1966,9 +2466,9 @@ export class DatabaseManager {
 
   createPurchase(purchaseData: any) {
     const id = this.generateUUID();
-    const purchaseNumber = this.generatePurchaseNumber();
+    const purchaseNumber = this.allocateDocumentNumber('purchase', purchaseData.branchId || 'main-branch');
     
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       INSERT INTO purchases (
         id, purchase_number, branch_id, supplier_id, status, 
         payment_method, payment_status, notes, received_by, created_at, updated_at
@@ -1995,7 +2495,7 @@ export class DatabaseManager {
 
   addPurchaseItem(purchaseId: string, itemData: any) {
     const id = this.generateUUID();
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       INSERT INTO purchase_items (
         id, purchase_id, product_id, qty_units, unit_cost, 
         subtotal, tax_amount, total, batch_number, expiry_date, created_at, updated_at
@@ -2027,14 +2527,14 @@ export class DatabaseManager {
 
   completePurchase(purchaseId: string, receivedBy: string) {
     // Obter itens da compra ANTES da transação para evitar problemas
-    const items = this.db.prepare(`
+    const items = this.prepareCached(`
       SELECT product_id, qty_units, batch_number, expiry_date
       FROM purchase_items
       WHERE purchase_id = ?
     `).all(purchaseId);
 
     // Obter branch_id da compra
-    const purchase: any = this.db.prepare('SELECT branch_id FROM purchases WHERE id = ?').get(purchaseId);
+    const purchase: any = this.prepareCached('SELECT branch_id FROM purchases WHERE id = ?').get(purchaseId);
 
     if (!purchase) {
       throw new Error('Compra não encontrada');
@@ -2044,7 +2544,7 @@ export class DatabaseManager {
     // Garante que status da compra e estoque são atualizados juntos
     return this.runInTransaction(() => {
       // Atualizar status da compra
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE purchases 
         SET status = 'completed', 
             received_by = ?,
@@ -2065,7 +2565,7 @@ export class DatabaseManager {
   }
 
   private updatePurchaseTotals(purchaseId: string) {
-    const totals: any = this.db.prepare(`
+    const totals: any = this.prepareCached(`
       SELECT 
         SUM(subtotal) as subtotal,
         SUM(tax_amount) as tax_total,
@@ -2074,7 +2574,7 @@ export class DatabaseManager {
       WHERE purchase_id = ?
     `).get(purchaseId);
 
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE purchases
       SET subtotal = ?,
           tax_total = ?,
@@ -2090,22 +2590,6 @@ export class DatabaseManager {
     );
   }
 
-  private generatePurchaseNumber(): string {
-    const date = new Date();
-    const year = date.getFullYear().toString().slice(-2);
-    const month = (date.getMonth() + 1).toString().padStart(2, '0');
-    const day = date.getDate().toString().padStart(2, '0');
-    
-    const count: any = this.db.prepare(`
-      SELECT COUNT(*) as count 
-      FROM purchases 
-      WHERE DATE(created_at) = DATE('now')
-    `).get();
-    
-    const sequence = (count.count + 1).toString().padStart(4, '0');
-    return `CP${year}${month}${day}-${sequence}`;
-  }
-
   getInventory(filters: any = {}) {
     let query = `
       SELECT 
@@ -2140,16 +2624,16 @@ export class DatabaseManager {
     
     query += ' ORDER BY p.name ASC';
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   updateInventory(productId: string, branchId: string, quantity: number, reason: string) {
     // Buscar produto para pegar units_per_box
-    const product: any = this.db.prepare('SELECT units_per_box FROM products WHERE id = ?').get(productId);
+    const product: any = this.prepareCached('SELECT units_per_box FROM products WHERE id = ?').get(productId);
     const unitsPerBox = product?.units_per_box || 1;
     
     // Verificar se já existe registro de estoque
-    const existing: any = this.db.prepare(`
+    const existing: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2162,7 +2646,7 @@ export class DatabaseManager {
       const newOpenBoxUnits = newQtyUnits % unitsPerBox;
       
       // Atualizar existente e incrementar versão
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE inventory_items 
         SET qty_units = ?, 
             closed_boxes = ?,
@@ -2179,7 +2663,7 @@ export class DatabaseManager {
       
       // Criar novo registro
       const id = this.generateUUID();
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO inventory_items (
           id, product_id, branch_id, qty_units, closed_boxes, open_box_units,
           created_at, updated_at
@@ -2198,12 +2682,12 @@ export class DatabaseManager {
 
   private addInventory(productId: string, branchId: string, qtyUnits: number, batchNumber?: string, expiryDate?: string) {
     // Buscar produto para pegar units_per_box
-    const product: any = this.db.prepare('SELECT units_per_box FROM products WHERE id = ?').get(productId);
+    const product: any = this.prepareCached('SELECT units_per_box FROM products WHERE id = ?').get(productId);
     const unitsPerBox = product?.units_per_box || 1;
 
     if (batchNumber) {
       // Adicionar com lote específico
-      const existing = this.db.prepare(`
+      const existing = this.prepareCached(`
         SELECT id, qty_units, closed_boxes, open_box_units 
         FROM inventory_items 
         WHERE product_id = ? AND branch_id = ? AND batch_number = ?
@@ -2217,7 +2701,7 @@ export class DatabaseManager {
         const newClosedBoxes = (existing as any).closed_boxes + closedBoxes;
         const newOpenBoxUnits = (existing as any).open_box_units + openBoxUnits;
 
-        this.db.prepare(`
+        this.prepareCached(`
           UPDATE inventory_items 
           SET qty_units = ?,
               closed_boxes = ?,
@@ -2243,7 +2727,7 @@ export class DatabaseManager {
         const closedBoxes = Math.floor(qtyUnits / unitsPerBox);
         const openBoxUnits = qtyUnits % unitsPerBox;
 
-        this.db.prepare(`
+        this.prepareCached(`
           INSERT INTO inventory_items (
             id, product_id, branch_id, qty_units, closed_boxes, open_box_units,
             batch_number, expiry_date, created_at, updated_at
@@ -2263,7 +2747,7 @@ export class DatabaseManager {
       }
     } else {
       // Adicionar ao estoque geral (sem lote) usando sistema de caixas
-      const existing = this.db.prepare(`
+      const existing = this.prepareCached(`
         SELECT id, qty_units, closed_boxes, open_box_units 
         FROM inventory_items 
         WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2277,7 +2761,7 @@ export class DatabaseManager {
         const closedBoxesBefore = (existing as any).closed_boxes;
         const openBoxBefore = (existing as any).open_box_units;
 
-        this.db.prepare(`
+        this.prepareCached(`
           UPDATE inventory_items 
           SET qty_units = qty_units + ?,
               closed_boxes = closed_boxes + ?,
@@ -2320,7 +2804,7 @@ export class DatabaseManager {
       } else {
         const id = this.generateUUID();
 
-        this.db.prepare(`
+        this.prepareCached(`
           INSERT INTO inventory_items (
             id, product_id, branch_id, qty_units, closed_boxes, open_box_units,
             created_at, updated_at
@@ -2367,13 +2851,13 @@ export class DatabaseManager {
    */
   getInventoryItemByProductId(productId: string, branchId?: string): any {
     if (branchId) {
-      return this.db.prepare(`
+      return this.prepareCached(`
         SELECT * FROM inventory_items 
         WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
       `).get(productId, branchId);
     }
     // Se não especificar branch, retorna o primeiro encontrado
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM inventory_items 
       WHERE product_id = ? AND batch_number IS NULL
       ORDER BY created_at DESC
@@ -2398,14 +2882,14 @@ export class DatabaseManager {
     }
 
     // Buscar produto para pegar units_per_box
-    const product: any = this.db.prepare('SELECT units_per_box FROM products WHERE id = ?').get(productId);
+    const product: any = this.prepareCached('SELECT units_per_box FROM products WHERE id = ?').get(productId);
     const unitsPerBox = product?.units_per_box || 1;
     
     // Calcular closed_boxes e open_box_units se não fornecidos
     const closedBoxes = data.closedBoxes ?? Math.floor(data.qtyUnits / unitsPerBox);
     const openBoxUnits = data.openBoxUnits ?? (data.qtyUnits % unitsPerBox);
 
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE inventory_items 
       SET qty_units = ?,
           closed_boxes = ?,
@@ -2430,14 +2914,14 @@ export class DatabaseManager {
     data: { qtyUnits: number; closedBoxes?: number; openBoxUnits?: number }
   ): string {
     // Buscar produto para pegar units_per_box
-    const product: any = this.db.prepare('SELECT units_per_box FROM products WHERE id = ?').get(productId);
+    const product: any = this.prepareCached('SELECT units_per_box FROM products WHERE id = ?').get(productId);
     const unitsPerBox = product?.units_per_box || 1;
     
     const closedBoxes = data.closedBoxes ?? Math.floor(data.qtyUnits / unitsPerBox);
     const openBoxUnits = data.openBoxUnits ?? (data.qtyUnits % unitsPerBox);
 
     const id = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO inventory_items (
         id, product_id, branch_id, qty_units, closed_boxes, open_box_units,
         synced, last_sync, created_at, updated_at
@@ -2459,8 +2943,8 @@ export class DatabaseManager {
    */
   private openBoxAutomatically(productId: string, branchId: string, reason: string, responsible?: string, saleId?: string) {
     // Buscar produto e estoque
-    const product: any = this.db.prepare('SELECT units_per_box FROM products WHERE id = ?').get(productId);
-    const inventory: any = this.db.prepare(`
+    const product: any = this.prepareCached('SELECT units_per_box FROM products WHERE id = ?').get(productId);
+    const inventory: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2476,7 +2960,7 @@ export class DatabaseManager {
     const openBoxBefore = inventory.open_box_units;
 
     // Atualizar estoque
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE inventory_items 
       SET closed_boxes = closed_boxes - 1,
           open_box_units = open_box_units + ?,
@@ -2523,8 +3007,8 @@ export class DatabaseManager {
     saleId?: string,
     responsible?: string
   ) {
-    const product: any = this.db.prepare('SELECT units_per_box, dose_enabled, doses_per_bottle FROM products WHERE id = ?').get(productId);
-    const inventory: any = this.db.prepare(`
+    const product: any = this.prepareCached('SELECT units_per_box, dose_enabled, doses_per_bottle FROM products WHERE id = ?').get(productId);
+    const inventory: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2556,7 +3040,7 @@ export class DatabaseManager {
     if (inventory.open_box_units > 0) {
       const fromOpen = Math.min(inventory.open_box_units, remaining);
       
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE inventory_items 
         SET open_box_units = open_box_units - ?,
             qty_units = qty_units - ?,
@@ -2583,7 +3067,7 @@ export class DatabaseManager {
       // Deduzir da caixa recém aberta
       const fromNewOpen = Math.min(openResult.unitsAdded, remaining);
       
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE inventory_items 
         SET open_box_units = open_box_units - ?,
             qty_units = qty_units - ?,
@@ -2596,7 +3080,7 @@ export class DatabaseManager {
     }
 
     // Registrar movimento final de venda
-    const inventoryAfter: any = this.db.prepare(`
+    const inventoryAfter: any = this.prepareCached(`
       SELECT qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE id = ?
@@ -2666,7 +3150,7 @@ export class DatabaseManager {
   }) {
     const id = this.generateUUID();
     
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO stock_movements (
         id, product_id, branch_id, movement_type, quantity,
         quantity_before, quantity_after, closed_boxes_before, closed_boxes_after,
@@ -2705,7 +3189,7 @@ export class DatabaseManager {
    */
   markStockMovementSynced(movementId: string) {
     try {
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE stock_movements 
         SET synced = 1
         WHERE id = ?
@@ -2719,7 +3203,7 @@ export class DatabaseManager {
    * Registrar perda de produto
    */
   registerLoss(productId: string, branchId: string, quantity: number, reason: string, responsible: string, notes?: string) {
-    const inventory: any = this.db.prepare(`
+    const inventory: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2741,7 +3225,7 @@ export class DatabaseManager {
     const fromOpen = Math.min(openBoxBefore, quantity);
     const fromClosed = quantity - fromOpen;
 
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE inventory_items 
       SET open_box_units = open_box_units - ?,
           qty_units = qty_units - ?,
@@ -2778,7 +3262,7 @@ export class DatabaseManager {
    * Registrar quebra de produto
    */
   registerBreakage(productId: string, branchId: string, quantity: number, reason: string, responsible: string, notes?: string) {
-    const inventory: any = this.db.prepare(`
+    const inventory: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2799,7 +3283,7 @@ export class DatabaseManager {
     // Deduzir da caixa aberta primeiro
     const fromOpen = Math.min(openBoxBefore, quantity);
 
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE inventory_items 
       SET open_box_units = open_box_units - ?,
           qty_units = qty_units - ?,
@@ -2836,7 +3320,7 @@ export class DatabaseManager {
    * Ajuste manual de estoque com log obrigatório
    */
   manualAdjustment(productId: string, branchId: string, quantity: number, reason: string, responsible: string, notes?: string) {
-    const inventory: any = this.db.prepare(`
+    const inventory: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2851,7 +3335,7 @@ export class DatabaseManager {
     const openBoxBefore = inventory.open_box_units;
 
     // Ajustar na caixa aberta se quantidade positiva, ou deduzir se negativa
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE inventory_items 
       SET open_box_units = open_box_units + ?,
           qty_units = qty_units + ?,
@@ -2890,7 +3374,7 @@ export class DatabaseManager {
    */
   adjustBoxes(productId: string, branchId: string, boxes: number, reason: string, responsible: string, notes?: string) {
     // Buscar dados do produto incluindo units_per_box
-    const product: any = this.db.prepare(`
+    const product: any = this.prepareCached(`
       SELECT id, name, units_per_box 
       FROM products 
       WHERE id = ?
@@ -2904,7 +3388,7 @@ export class DatabaseManager {
       throw new Error(`Produto "${product.name}" não tem unidades por caixa definidas. Configure primeiro no cadastro do produto.`);
     }
 
-    const inventory: any = this.db.prepare(`
+    const inventory: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -2930,7 +3414,7 @@ export class DatabaseManager {
     // Para ajuste de caixas: atualiza closed_boxes diretamente
     const newClosedBoxes = closedBoxesBefore + boxes;
     
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE inventory_items 
       SET closed_boxes = ?,
           qty_units = qty_units + ?,
@@ -2978,7 +3462,7 @@ export class DatabaseManager {
     const date30d = new Date(now.getTime() - 30 * 24 * 60 * 60 * 1000);
 
     // Calcular consumo por período
-    const consumption7d: any = this.db.prepare(`
+    const consumption7d: any = this.prepareCached(`
       SELECT SUM(ABS(quantity)) as total 
       FROM stock_movements 
       WHERE product_id = ? AND branch_id = ? 
@@ -2986,7 +3470,7 @@ export class DatabaseManager {
         AND created_at >= ?
     `).get(productId, branchId, date7d.toISOString());
 
-    const consumption15d: any = this.db.prepare(`
+    const consumption15d: any = this.prepareCached(`
       SELECT SUM(ABS(quantity)) as total 
       FROM stock_movements 
       WHERE product_id = ? AND branch_id = ? 
@@ -2994,7 +3478,7 @@ export class DatabaseManager {
         AND created_at >= ?
     `).get(productId, branchId, date15d.toISOString());
 
-    const consumption30d: any = this.db.prepare(`
+    const consumption30d: any = this.prepareCached(`
       SELECT SUM(ABS(quantity)) as total 
       FROM stock_movements 
       WHERE product_id = ? AND branch_id = ? 
@@ -3007,7 +3491,7 @@ export class DatabaseManager {
     const avg30d = (consumption30d.total || 0) / 30;
 
     // Buscar estoque atual
-    const inventory: any = this.db.prepare(`
+    const inventory: any = this.prepareCached(`
       SELECT qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
@@ -3025,7 +3509,7 @@ export class DatabaseManager {
     const suggestedReorder = Math.max(0, Math.ceil((targetDays * avg15d) - inventory.qty_units));
 
     // Atualizar inventory_items
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE inventory_items 
       SET consumption_avg_7d = ?,
           consumption_avg_15d = ?,
@@ -3092,20 +3576,20 @@ export class DatabaseManager {
 
     query += ' ORDER BY sm.created_at DESC LIMIT 200';
 
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   /**
    * Validador de consistência de estoque
    */
   validateInventoryConsistency(productId: string, branchId: string) {
-    const inventory: any = this.db.prepare(`
+    const inventory: any = this.prepareCached(`
       SELECT id, qty_units, closed_boxes, open_box_units 
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND batch_number IS NULL
     `).get(productId, branchId);
 
-    const product: any = this.db.prepare('SELECT units_per_box FROM products WHERE id = ?').get(productId);
+    const product: any = this.prepareCached('SELECT units_per_box FROM products WHERE id = ?').get(productId);
 
     if (!inventory || !product) {
       return { valid: false, errors: ['Produto ou estoque não encontrado'] };
@@ -3132,7 +3616,7 @@ export class DatabaseManager {
       const extraBoxes = Math.floor(inventory.open_box_units / product.units_per_box);
       const remainingOpen = inventory.open_box_units % product.units_per_box;
 
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE inventory_items 
         SET closed_boxes = closed_boxes + ?,
             open_box_units = ?,
@@ -3170,7 +3654,7 @@ export class DatabaseManager {
     console.log(`[deductInventory] Deduzindo ${qtyUnits} unidades do produto ${productId} na filial ${branchId}`);
     
     // Deduzir primeiro dos lotes mais antigos (FIFO)
-    const batches: any[] = this.db.prepare(`
+    const batches: any[] = this.prepareCached(`
       SELECT id, qty_units, batch_number
       FROM inventory_items 
       WHERE product_id = ? AND branch_id = ? AND qty_units > 0
@@ -3182,7 +3666,7 @@ export class DatabaseManager {
     if (batches.length === 0) {
       console.warn(`[deductInventory] NENHUM LOTE ENCONTRADO! Verifique se o branch_id '${branchId}' existe no inventário.`);
       // Verificar todos os registros do produto
-      const allItems = this.db.prepare(`SELECT * FROM inventory_items WHERE product_id = ?`).all(productId);
+      const allItems = this.prepareCached(`SELECT * FROM inventory_items WHERE product_id = ?`).all(productId);
       console.log(`[deductInventory] Todos os registros de inventário para este produto:`, allItems);
       return;
     }
@@ -3194,7 +3678,7 @@ export class DatabaseManager {
 
       const toDeduct = Math.min(batch.qty_units, remaining);
       
-      const result = this.db.prepare(`
+      const result = this.prepareCached(`
         UPDATE inventory_items 
         SET qty_units = qty_units - ?,
             updated_at = datetime('now'),
@@ -3209,7 +3693,7 @@ export class DatabaseManager {
     }
 
     // Verificar estoque após dedução
-    const afterDeduct = this.db.prepare(`SELECT qty_units FROM inventory_items WHERE product_id = ? AND branch_id = ?`).get(productId, branchId) as any;
+    const afterDeduct = this.prepareCached(`SELECT qty_units FROM inventory_items WHERE product_id = ? AND branch_id = ?`).get(productId, branchId) as any;
     console.log(`[deductInventory] Estoque APÓS dedução:`, afterDeduct?.qty_units);
 
     if (remaining > 0) {
@@ -3218,17 +3702,17 @@ export class DatabaseManager {
   }
 
   private updateSaleTotals(saleId: string) {
-    this.db.exec(`
+    this.prepareCached(`
       UPDATE sales 
-      SET subtotal = (SELECT SUM(subtotal) FROM sale_items WHERE sale_id = '${saleId}'),
-          tax_total = (SELECT SUM(tax_amount) FROM sale_items WHERE sale_id = '${saleId}'),
-          total = (SELECT SUM(total) FROM sale_items WHERE sale_id = '${saleId}'),
-          muntu_savings = (SELECT SUM(muntu_savings) FROM sale_items WHERE sale_id = '${saleId}'),
+      SET subtotal = (SELECT SUM(subtotal) FROM sale_items WHERE sale_id = @saleId),
+          tax_total = (SELECT SUM(tax_amount) FROM sale_items WHERE sale_id = @saleId),
+          total = (SELECT SUM(total) FROM sale_items WHERE sale_id = @saleId),
+          muntu_savings = (SELECT SUM(muntu_savings) FROM sale_items WHERE sale_id = @saleId),
           updated_at = CURRENT_TIMESTAMP,
           synced = 0,
           version = COALESCE(version, 0) + 1
-      WHERE id = '${saleId}'
-    `);
+      WHERE id = @saleId
+    `).run({ saleId });
   }
 
   // ============================================
@@ -3239,18 +3723,27 @@ export class DatabaseManager {
     let query = 'SELECT id, code, full_name as name, phone, email, credit_limit, current_debt, is_blocked, loyalty_points FROM customers';
     const params: any[] = [];
     
-    if (filters.search) {
+    const match = filters.search ? this.buildSearchMatch(String(filters.search)) : null;
+    if (match) {
+      query += ' WHERE rowid IN (SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?)';
+      params.push(match);
+    } else if (filters.search) {
       query += ' WHERE (full_name LIKE ? OR phone LIKE ? OR email LIKE ? OR code LIKE ?)';
       params.push(`%${filters.search}%`, `%${filters.search}%`, `%${filters.search}%`, `%${filters.search}%`);
     }
     
     query += ' ORDER BY full_name';
+    // Limite só quando pedido, e depois da ordenação (a tela de clientes lista todos)
+    if (filters.limit) {
+      query += ' LIMIT ?';
+      params.push(filters.limit);
+    }
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   getCustomerById(id: string) {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT id, code, full_name as name, phone, email, credit_limit, current_debt, is_blocked, loyalty_points, synced 
       FROM customers WHERE id = ?
     `).get(id);
@@ -3267,7 +3760,7 @@ export class DatabaseManager {
     const currentDebt = data.current_debt ?? data.currentDebt ?? 0;
     const creditLimit = data.creditLimit ?? data.credit_limit ?? 0;
     
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       INSERT INTO customers (id, code, full_name, phone, email, credit_limit, current_debt, is_blocked, loyalty_points)
       VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
     `);
@@ -3343,7 +3836,7 @@ export class DatabaseManager {
     }
     
     params.push(id);
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       UPDATE customers 
       SET ${updates.join(', ')}
       WHERE id = ?
@@ -3361,7 +3854,7 @@ export class DatabaseManager {
 
   deleteCustomer(id: string) {
     // Soft delete - apenas marca como inativo e incrementa versão
-    const stmt = this.db.prepare(`
+    const stmt = this.prepareCached(`
       UPDATE customers 
       SET is_blocked = 1, updated_at = datetime('now'), synced = 0, version = COALESCE(version, 0) + 1
       WHERE id = ?
@@ -3410,12 +3903,12 @@ export class DatabaseManager {
       params.push(filters.limit);
     }
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   getCustomerStats(customerId: string) {
     // Total de compras
-    const totalPurchases = this.db.prepare(`
+    const totalPurchases = this.prepareCached(`
       SELECT 
         COUNT(*) as total_orders,
         COALESCE(SUM(total), 0) as total_spent,
@@ -3425,7 +3918,7 @@ export class DatabaseManager {
     `).get(customerId) as any;
 
     // Última compra
-    const lastPurchase = this.db.prepare(`
+    const lastPurchase = this.prepareCached(`
       SELECT created_at as last_purchase_date
       FROM sales
       WHERE customer_id = ?
@@ -3434,7 +3927,7 @@ export class DatabaseManager {
     `).get(customerId) as any;
 
     // Top produtos comprados
-    const topProducts = this.db.prepare(`
+    const topProducts = this.prepareCached(`
       SELECT 
         p.name as product_name,
         SUM(si.qty_units) as total_quantity,
@@ -3472,7 +3965,7 @@ export class DatabaseManager {
     }
 
     // Buscar cliente atual
-    const customer = this.db.prepare(`
+    const customer = this.prepareCached(`
       SELECT id, full_name, loyalty_points FROM customers WHERE id = ?
     `).get(customerId) as any;
 
@@ -3484,7 +3977,7 @@ export class DatabaseManager {
     const newPoints = previousPoints + pointsToAdd;
 
     // Atualizar pontos do cliente
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE customers 
       SET loyalty_points = ?, updated_at = datetime('now'), synced = 0
       WHERE id = ?
@@ -3510,7 +4003,7 @@ export class DatabaseManager {
    * Obtém informações de pontos de fidelidade de um cliente
    */
   getCustomerLoyalty(customerId: string) {
-    const customer = this.db.prepare(`
+    const customer = this.prepareCached(`
       SELECT id, code, full_name, loyalty_points FROM customers WHERE id = ?
     `).get(customerId) as any;
 
@@ -3564,7 +4057,7 @@ export class DatabaseManager {
     // Converter array de abas para JSON string
     const allowedTabsJson = data.allowedTabs ? JSON.stringify(data.allowedTabs) : null;
     
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO users (
         id, username, email, full_name, password_hash, role, branch_id, phone, allowed_tabs,
         synced, sync_status
@@ -3640,7 +4133,7 @@ export class DatabaseManager {
     const NEEDS_ONLINE_LOGIN_HASH = '$NEEDS_ONLINE_LOGIN$';
     
     try {
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO users (
           id, username, email, full_name, password_hash, role, branch_id, phone, 
           allowed_tabs, synced, sync_status, is_active, needs_online_auth,
@@ -3687,7 +4180,7 @@ export class DatabaseManager {
    */
   updateUserPasswordLocal(userId: string, passwordHash: string) {
     try {
-      const result = this.db.prepare(`
+      const result = this.prepareCached(`
         UPDATE users 
         SET password_hash = ?,
             needs_online_auth = 0,
@@ -3750,14 +4243,14 @@ export class DatabaseManager {
 
     query += ' ORDER BY u.full_name ASC';
 
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   /**
    * Busca um usuário por ID
    */
   getUserById(id: string) {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT 
         u.*,
         b.name as branch_name
@@ -3771,7 +4264,7 @@ export class DatabaseManager {
    * Busca um usuário por username
    */
   getUserByUsername(username: string) {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM users WHERE username = ?
     `).get(username);
   }
@@ -3780,7 +4273,7 @@ export class DatabaseManager {
    * Busca um usuário por email
    */
   getUserByEmail(email: string) {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM users WHERE email = ?
     `).get(email);
   }
@@ -3851,7 +4344,7 @@ export class DatabaseManager {
 
     params.push(id);
 
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE users 
       SET ${updates.join(', ')}
       WHERE id = ?
@@ -3869,7 +4362,7 @@ export class DatabaseManager {
    * @param originalPassword - Senha original em texto para sincronização com o backend (opcional)
    */
   resetUserPassword(id: string, newPasswordHash: string, originalPassword?: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE users 
       SET password_hash = ?, updated_at = datetime('now'), synced = 0
       WHERE id = ?
@@ -3890,7 +4383,7 @@ export class DatabaseManager {
    * Atualiza o último login do usuário
    */
   updateUserLastLogin(id: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE users 
       SET last_login = datetime('now')
       WHERE id = ?
@@ -3901,7 +4394,7 @@ export class DatabaseManager {
    * Deleta (desativa) um usuário
    */
   deleteUser(id: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE users 
       SET is_active = 0, updated_at = datetime('now'), synced = 0
       WHERE id = ?
@@ -3920,7 +4413,7 @@ export class DatabaseManager {
    * Retorna todos os usuários que ainda não foram sincronizados com o servidor
    */
   getUnsyncedUsers(): any[] {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM users 
       WHERE synced = 0 OR sync_status = 'PENDING' OR sync_status = 'ERROR' OR sync_status IS NULL
       ORDER BY created_at ASC
@@ -3931,7 +4424,7 @@ export class DatabaseManager {
    * Retorna estatísticas de sincronização de usuários
    */
   getUserSyncStats(): { total: number; synced: number; pending: number; error: number } {
-    const stats = this.db.prepare(`
+    const stats = this.prepareCached(`
       SELECT 
         COUNT(*) as total,
         SUM(CASE WHEN sync_status = 'SYNCED' OR synced = 1 THEN 1 ELSE 0 END) as synced,
@@ -3952,7 +4445,7 @@ export class DatabaseManager {
    * Marca usuário como sincronizado com sucesso
    */
   markUserSynced(id: string, serverId?: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE users 
       SET synced = 1, 
           sync_status = 'SYNCED', 
@@ -3967,7 +4460,7 @@ export class DatabaseManager {
    * Marca usuário com erro de sincronização
    */
   markUserSyncError(id: string, errorMessage: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE users 
       SET sync_status = 'ERROR', 
           last_sync_attempt = datetime('now'),
@@ -4001,7 +4494,7 @@ export class DatabaseManager {
     };
 
     // Verificar se já está na fila
-    const existingInQueue = this.db.prepare(`
+    const existingInQueue = this.prepareCached(`
       SELECT id FROM sync_queue 
       WHERE entity = 'user' AND entity_id = ? AND status = 'pending'
     `).get(userId);
@@ -4029,7 +4522,7 @@ export class DatabaseManager {
 
     for (const user of unsyncedUsers) {
       // Verificar se já está na fila
-      const existingInQueue = this.db.prepare(`
+      const existingInQueue = this.prepareCached(`
         SELECT id FROM sync_queue 
         WHERE entity = 'user' AND entity_id = ? AND status = 'pending'
       `).get(user.id);
@@ -4079,10 +4572,9 @@ export class DatabaseManager {
     createdBy: string;
   }) {
     const id = this.generateUUID();
-    const debtNumber = `DEBT-${Date.now().toString().slice(-8)}`;
 
     // Verificar limite de crédito do cliente
-    const customer = this.db.prepare(`
+    const customer = this.prepareCached(`
       SELECT credit_limit, current_debt FROM customers WHERE id = ?
     `).get(data.customerId) as any;
 
@@ -4096,7 +4588,8 @@ export class DatabaseManager {
     }
 
     // Criar dívida
-    this.db.prepare(`
+    const debtNumber = this.allocateDocumentNumber('debt', data.branchId);
+    this.prepareCached(`
       INSERT INTO debts (
         id, debt_number, customer_id, sale_id, branch_id,
         original_amount, balance, status, due_date, notes, created_by
@@ -4108,7 +4601,7 @@ export class DatabaseManager {
     );
 
     // Atualizar dívida atual do cliente
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE customers 
       SET current_debt = current_debt + ?, updated_at = datetime('now')
       WHERE id = ?
@@ -4157,21 +4650,30 @@ export class DatabaseManager {
       params.push(filters.branchId);
     }
 
-    if (filters.search) {
+    const customerMatch = filters.search
+      ? this.buildSearchMatch(String(filters.search), ['full_name', 'code'])
+      : null;
+    if (customerMatch) {
+      query += ` AND (
+        c.rowid IN (SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?)
+        OR d.rowid IN (SELECT rowid FROM debts_fts WHERE debts_fts MATCH ?)
+      )`;
+      params.push(customerMatch, this.buildSearchMatch(String(filters.search)));
+    } else if (filters.search) {
       query += ' AND (c.full_name LIKE ? OR c.code LIKE ? OR d.debt_number LIKE ?)';
       params.push(`%${filters.search}%`, `%${filters.search}%`, `%${filters.search}%`);
     }
 
     query += ' ORDER BY d.created_at DESC';
 
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   /**
    * Busca uma dívida por ID
    */
   getDebtById(id: string) {
-    const debt = this.db.prepare(`
+    const debt = this.prepareCached(`
       SELECT 
         d.*,
         c.full_name as customer_name,
@@ -4189,7 +4691,7 @@ export class DatabaseManager {
     if (!debt) return null;
 
     // Buscar pagamentos da dívida
-    const payments = this.db.prepare(`
+    const payments = this.prepareCached(`
       SELECT * FROM debt_payments WHERE debt_id = ? ORDER BY created_at DESC
     `).all(id);
 
@@ -4201,7 +4703,7 @@ export class DatabaseManager {
    * Retorna um mapa com customer_id => total de vales pendentes
    */
   getTablePendingDebts(tableNumber: string): Map<string, number> {
-    const debts = this.db.prepare(`
+    const debts = this.prepareCached(`
       SELECT 
         d.customer_id,
         d.balance
@@ -4236,7 +4738,7 @@ export class DatabaseManager {
     if (customerIds.length === 0) return [];
     
     const placeholders = customerIds.map(() => '?').join(',');
-    const debts = this.db.prepare(`
+    const debts = this.prepareCached(`
       SELECT 
         d.id as debt_id,
         d.customer_id,
@@ -4278,7 +4780,7 @@ export class DatabaseManager {
     notes?: string;
     receivedBy: string;
   }) {
-    const debt = this.db.prepare(`
+    const debt = this.prepareCached(`
       SELECT * FROM debts WHERE id = ?
     `).get(data.debtId) as any;
 
@@ -4302,7 +4804,7 @@ export class DatabaseManager {
       const newStatus = newBalance === 0 ? 'paid' : 'partial';
 
       // Registrar pagamento da dívida
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO debt_payments (id, debt_id, amount, method, reference, notes, received_by)
         VALUES (?, ?, ?, ?, ?, ?, ?)
       `).run(
@@ -4312,7 +4814,7 @@ export class DatabaseManager {
 
       // Atualizar dívida - incluir synced = 0 para garantir sincronização
       const newPaidAmount = debt.paid_amount + data.amount;
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE debts 
         SET paid_amount = ?,
             balance = ?,
@@ -4323,7 +4825,7 @@ export class DatabaseManager {
       `).run(newPaidAmount, newBalance, newStatus, data.debtId);
 
       // Atualizar dívida atual do cliente - incluir synced = 0
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE customers 
         SET current_debt = current_debt - ?,
             synced = 0,
@@ -4333,7 +4835,7 @@ export class DatabaseManager {
 
       // Registrar pagamento geral (para rastreabilidade)
       const generalPaymentId = this.generateUUID();
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO payments (id, debt_id, method, amount, status, notes)
         VALUES (?, ?, ?, ?, 'completed', ?)
       `).run(
@@ -4375,7 +4877,7 @@ export class DatabaseManager {
    * Cancela uma dívida (apenas se não tiver pagamentos)
    */
   cancelDebt(debtId: string, reason: string) {
-    const debt = this.db.prepare(`
+    const debt = this.prepareCached(`
       SELECT * FROM debts WHERE id = ?
     `).get(debtId) as any;
 
@@ -4388,7 +4890,7 @@ export class DatabaseManager {
     }
 
     // Marcar como cancelada
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE debts 
       SET status = 'cancelled',
           notes = COALESCE(notes || ' | ', '') || 'Cancelada: ' || ?,
@@ -4397,7 +4899,7 @@ export class DatabaseManager {
     `).run(reason, debtId);
 
     // Reverter dívida atual do cliente
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE customers 
       SET current_debt = current_debt - ?,
           updated_at = datetime('now')
@@ -4413,7 +4915,7 @@ export class DatabaseManager {
    * Busca estatísticas de dívidas de um cliente
    */
   getCustomerDebtStats(customerId: string) {
-    const stats = this.db.prepare(`
+    const stats = this.prepareCached(`
       SELECT 
         COUNT(*) as total_debts,
         COALESCE(SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END), 0) as pending_debts,
@@ -4435,7 +4937,7 @@ export class DatabaseManager {
 
   openCashBox(data: any) {
     const id = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO cash_boxes (id, box_number, branch_id, opened_by, opening_cash)
       VALUES (?, ?, ?, ?, ?)
     `).run(id, data.boxNumber, data.branchId, data.openedBy, data.openingCash || 0);
@@ -4480,7 +4982,7 @@ export class DatabaseManager {
   }) {
     try {
       // Verificar se já existe
-      const existing = this.db.prepare('SELECT id FROM cash_boxes WHERE id = ?').get(data.id);
+      const existing = this.prepareCached('SELECT id FROM cash_boxes WHERE id = ?').get(data.id);
       if (existing) {
         console.log(`📦 CashBox ${data.id} já existe localmente`);
         return this.getCashBoxById(data.id);
@@ -4489,7 +4991,7 @@ export class DatabaseManager {
       // Garantir que opened_at tenha um valor válido
       const openedAt = data.openedAt || new Date().toISOString();
       
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO cash_boxes (
           id, box_number, branch_id, opened_by, opening_cash, status, synced,
           opened_at, total_sales, total_cash, total_card, total_mobile_money, total_debt,
@@ -4533,7 +5035,7 @@ export class DatabaseManager {
    */
   updateCashBoxFromServer(cashBoxId: string, serverData: any) {
     try {
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE cash_boxes 
         SET status = COALESCE(?, status),
             opening_cash = COALESCE(?, opening_cash),
@@ -4574,7 +5076,7 @@ export class DatabaseManager {
   }
 
   closeCashBox(cashBoxId: string, closingData: any) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE cash_boxes 
       SET status = 'closed',
           closed_at = CURRENT_TIMESTAMP,
@@ -4598,7 +5100,7 @@ export class DatabaseManager {
   }
 
   getCurrentCashBox() {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM cash_boxes 
       WHERE status = 'open' 
       ORDER BY opened_at DESC 
@@ -4637,15 +5139,15 @@ export class DatabaseManager {
 
     query += ' GROUP BY cb.id ORDER BY cb.closed_at DESC LIMIT 50';
 
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   getCashBoxById(id: string) {
-    const cashBox: any = this.db.prepare('SELECT * FROM cash_boxes WHERE id = ?').get(id);
+    const cashBox: any = this.prepareCached('SELECT * FROM cash_boxes WHERE id = ?').get(id);
     if (!cashBox) return null;
 
     // Buscar vendas do período do caixa
-    const sales = this.db.prepare(`
+    const sales = this.prepareCached(`
       SELECT s.*, p.method as payment_method
       FROM sales s
       LEFT JOIN payments p ON s.id = p.sale_id
@@ -4659,7 +5161,7 @@ export class DatabaseManager {
     // CRÍTICO: Incluir AMBOS payments E table_payments!
     if (!cashBox.total_debt || cashBox.total_debt === 0) {
       // Pagamentos normais (Payment via Sales)
-      const valeTotal = this.db.prepare(`
+      const valeTotal = this.prepareCached(`
         SELECT COALESCE(SUM(s.total), 0) as total_vale
         FROM sales s
         INNER JOIN payments p ON s.id = p.sale_id
@@ -4670,7 +5172,7 @@ export class DatabaseManager {
       `).get(cashBox.opened_at, cashBox.closed_at, cashBox.closed_at, cashBox.branch_id) as any;
       
       // CRÍTICO: Pagamentos de mesas (TablePayment) - não passam pela tabela Payment!
-      const tableValeTotal = this.db.prepare(`
+      const tableValeTotal = this.prepareCached(`
         SELECT COALESCE(SUM(tp.amount), 0) as total_vale
         FROM table_payments tp
         INNER JOIN table_sessions ts ON tp.session_id = ts.id
@@ -4691,7 +5193,7 @@ export class DatabaseManager {
 
   calculateCashBoxProfitMetrics(cashBoxId: string, cashBox: any) {
     // Buscar todos os itens vendidos durante o período do caixa (incluindo vendas sem método de pagamento)
-    const salesItems = this.db.prepare(`
+    const salesItems = this.prepareCached(`
       SELECT 
         si.product_id,
         p.name as product_name,
@@ -4723,7 +5225,7 @@ export class DatabaseManager {
     const profitMargin = totalRevenue > 0 ? (grossProfit / totalRevenue) * 100 : 0;
 
     // Buscar estoque atual para calcular reposição
-    const lowStockItems = this.db.prepare(`
+    const lowStockItems = this.prepareCached(`
       SELECT 
         p.id,
         p.name,
@@ -4810,7 +5312,7 @@ export class DatabaseManager {
     }
 
     if (paymentField) {
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE cash_boxes 
         SET total_sales = total_sales + ?,
             ${paymentField} = ${paymentField} + ?,
@@ -4820,7 +5322,7 @@ export class DatabaseManager {
       `).run(saleTotal, saleTotal, cashBoxId);
     } else {
       // Método desconhecido, apenas incrementa total_sales
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE cash_boxes 
         SET total_sales = total_sales + ?,
             synced = 0, 
@@ -4845,14 +5347,14 @@ export class DatabaseManager {
       _timestamp: new Date().toISOString(),
     };
     
-    this.db.prepare(`
-      INSERT INTO sync_queue (id, operation, entity, entity_id, data, priority)
-      VALUES (?, ?, ?, ?, ?, ?)
+    this.prepareCached(`
+      INSERT INTO sync_queue (id, operation, entity, entity_id, data, priority, updated_at)
+      VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
     `).run(id, operation, entity, entityId, JSON.stringify(enrichedData), priority);
   }
 
   getPendingSyncItems() {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM sync_queue 
       WHERE status = 'pending' 
       ORDER BY priority ASC, created_at ASC
@@ -4860,10 +5362,22 @@ export class DatabaseManager {
     `).all();
   }
 
+  /**
+   * IDs de uma entidade com itens pendentes na fila de sync.
+   * Usado pelo merge do pull para checar conflitos em lote (um SELECT por lote).
+   */
+  getPendingSyncEntityIds(entity: string): Set<string> {
+    const rows = this.prepareCached(`
+      SELECT DISTINCT entity_id FROM sync_queue 
+      WHERE status = 'pending' AND entity = ?
+    `).all(entity) as { entity_id: string }[];
+    return new Set(rows.map(row => row.entity_id));
+  }
+
   markSyncItemCompleted(id: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE sync_queue 
-      SET status = 'completed', processed_at = CURRENT_TIMESTAMP 
+      SET status = 'completed', processed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
       WHERE id = ?
     `).run(id);
   }
@@ -4876,9 +5390,9 @@ export class DatabaseManager {
     }
     // Converter array de erros para string
     const errorStr = Array.isArray(error) ? error.join(', ') : String(error);
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE sync_queue 
-      SET status = 'failed', retry_count = retry_count + 1, last_error = ? 
+      SET status = 'failed', retry_count = retry_count + 1, last_error = ?, updated_at = CURRENT_TIMESTAMP
       WHERE id = ?
     `).run(errorStr, id);
   }
@@ -4889,9 +5403,9 @@ export class DatabaseManager {
    */
   retryFailedSyncItems(maxRetries: number = 3) {
     // Resetar itens falhados que ainda não atingiram o limite de retentativas
-    const result = this.db.prepare(`
+    const result = this.prepareCached(`
       UPDATE sync_queue 
-      SET status = 'pending', last_error = NULL 
+      SET status = 'pending', last_error = NULL, updated_at = CURRENT_TIMESTAMP
       WHERE status = 'failed' AND retry_count < ?
     `).run(maxRetries);
     
@@ -4903,7 +5417,7 @@ export class DatabaseManager {
    * Obtém contagem de itens falhados por entidade
    */
   getFailedSyncStats() {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT entity, COUNT(*) as count, MAX(last_error) as last_error
       FROM sync_queue 
       WHERE status = 'failed'
@@ -4911,6 +5425,31 @@ export class DatabaseManager {
     `).all();
   }
 
+  /**
+   * Zera as tentativas dos itens de uma entidade na sync_queue
+   * (tela de DLQ: itens com retry_count >= 10 ainda na fila)
+   */
+  resetSyncQueueRetries(entityId: string) {
+    return this.prepareCached(`
+      UPDATE sync_queue SET retry_count = 0, last_error = NULL 
+      WHERE entity_id = ?
+    `).run(entityId).changes;
+  }
+
+  /**
+   * Remove da sync_queue todos os itens de uma entidade
+   */
+  removeSyncQueueEntity(entityId: string) {
+    return this.prepareCached('DELETE FROM sync_queue WHERE entity_id = ?').run(entityId).changes;
+  }
+
+  /**
+   * Remove da sync_queue os itens que atingiram o limite de tentativas
+   */
+  clearExhaustedSyncItems(minRetries: number = 10) {
+    return this.prepareCached('DELETE FROM sync_queue WHERE retry_count >= ?').run(minRetries).changes;
+  }
+
   // ============================================
   // Dead Letter Queue (DLQ)
   // ============================================
@@ -4920,7 +5459,7 @@ export class DatabaseManager {
    * Isso limpa a sync_queue e preserva os dados para análise/recuperação manual
    */
   moveToDeadLetterQueue(maxRetries: number = 10) {
-    const failedItems = this.db.prepare(`
+    const failedItems = this.prepareCached(`
       SELECT * FROM sync_queue 
       WHERE status = 'failed' AND retry_count >= ?
     `).all(maxRetries) as any[];
@@ -4929,7 +5468,7 @@ export class DatabaseManager {
     for (const item of failedItems) {
       const dlqId = this.generateUUID();
       
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO sync_dead_letter (
           id, original_item_id, operation, entity, entity_id, data,
           priority, retry_count, last_error, original_created_at, reason
@@ -4949,7 +5488,7 @@ export class DatabaseManager {
       );
 
       // Remover da fila principal
-      this.db.prepare('DELETE FROM sync_queue WHERE id = ?').run(item.id);
+      this.prepareCached('DELETE FROM sync_queue WHERE id = ?').run(item.id);
       movedCount++;
     }
 
@@ -4963,7 +5502,7 @@ export class DatabaseManager {
    * Lista itens na Dead Letter Queue para análise
    */
   getDeadLetterItems(limit: number = 100) {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM sync_dead_letter 
       WHERE resolved_at IS NULL
       ORDER BY moved_at DESC
@@ -4976,7 +5515,7 @@ export class DatabaseManager {
    * Move de volta para sync_queue com retry_count zerado
    */
   retryDeadLetterItem(dlqId: string) {
-    const item = this.db.prepare(
+    const item = this.prepareCached(
       'SELECT * FROM sync_dead_letter WHERE id = ?'
     ).get(dlqId) as any;
 
@@ -4986,10 +5525,10 @@ export class DatabaseManager {
 
     // Criar novo item na sync_queue
     const newId = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO sync_queue (
-        id, operation, entity, entity_id, data, priority, status, retry_count
-      ) VALUES (?, ?, ?, ?, ?, ?, 'pending', 0)
+        id, operation, entity, entity_id, data, priority, status, retry_count, updated_at
+      ) VALUES (?, ?, ?, ?, ?, ?, 'pending', 0, CURRENT_TIMESTAMP)
     `).run(
       newId,
       item.operation,
@@ -5000,7 +5539,7 @@ export class DatabaseManager {
     );
 
     // Marcar DLQ item como resolvido
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE sync_dead_letter 
       SET resolved_at = CURRENT_TIMESTAMP, resolution_action = 'retry'
       WHERE id = ?
@@ -5014,7 +5553,7 @@ export class DatabaseManager {
    * Descarta permanentemente um item da Dead Letter Queue
    */
   discardDeadLetterItem(dlqId: string, resolvedBy: string, reason: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE sync_dead_letter 
       SET resolved_at = CURRENT_TIMESTAMP, 
           resolved_by = ?,
@@ -5030,7 +5569,7 @@ export class DatabaseManager {
    * Estatísticas da Dead Letter Queue
    */
   getDeadLetterStats() {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT 
         entity,
         COUNT(*) as total,
@@ -5070,7 +5609,7 @@ export class DatabaseManager {
     
     query += ' GROUP BY DATE(opened_at) ORDER BY date DESC';
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   getInventoryReport(branchId?: string) {
@@ -5096,7 +5635,7 @@ export class DatabaseManager {
       params.push(branchId);
     }
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   // ============================================
@@ -5109,7 +5648,7 @@ export class DatabaseManager {
   createTable(data: { branchId: string; number: string; seats: number; area?: string }) {
     const id = this.generateUUID();
     
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO tables (id, branch_id, number, seats, area, is_active)
       VALUES (?, ?, ?, ?, ?, 1)
     `).run(id, data.branchId, data.number, data.seats, data.area || null);
@@ -5117,7 +5656,7 @@ export class DatabaseManager {
     // Prioridade 0 - mesas devem ser sincronizadas ANTES das vendas (prioridade 1)
     this.addToSyncQueue('create', 'table', id, data, 0);
     
-    return this.db.prepare('SELECT * FROM tables WHERE id = ?').get(id);
+    return this.prepareCached('SELECT * FROM tables WHERE id = ?').get(id);
   }
 
   /**
@@ -5139,14 +5678,14 @@ export class DatabaseManager {
     
     query += ' ORDER BY number ASC';
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   /**
    * Buscar mesa por ID
    */
   getTableById(id: string) {
-    return this.db.prepare('SELECT * FROM tables WHERE id = ?').get(id);
+    return this.prepareCached('SELECT * FROM tables WHERE id = ?').get(id);
   }
 
   /**
@@ -5183,7 +5722,7 @@ export class DatabaseManager {
       updates.push('synced = 0');
       params.push(id);
 
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE tables SET ${updates.join(', ')} WHERE id = ?
       `).run(...params);
 
@@ -5203,7 +5742,7 @@ export class DatabaseManager {
    * Isso adiciona mesas com synced=0 à fila de sync
    */
   resyncUnsyncedTables() {
-    const unsyncedTables = this.db.prepare(`
+    const unsyncedTables = this.prepareCached(`
       SELECT * FROM tables WHERE synced = 0
     `).all() as any[];
 
@@ -5211,7 +5750,7 @@ export class DatabaseManager {
 
     for (const table of unsyncedTables) {
       // Verificar se já está na fila
-      const inQueue = this.db.prepare(`
+      const inQueue = this.prepareCached(`
         SELECT id FROM sync_queue 
         WHERE entity = 'table' AND entity_id = ? AND status != 'completed'
       `).get(table.id);
@@ -5238,7 +5777,7 @@ export class DatabaseManager {
    */
   retryFailedTableSales() {
     // Buscar vendas de mesa que falharam com erro de FK
-    const failedSales = this.db.prepare(`
+    const failedSales = this.prepareCached(`
       SELECT * FROM sync_queue 
       WHERE entity = 'sale' 
       AND status = 'failed'
@@ -5250,7 +5789,7 @@ export class DatabaseManager {
     let retried = 0;
     for (const sale of failedSales) {
       // Resetar status para pending
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE sync_queue 
         SET status = 'pending', 
             retry_count = 0, 
@@ -5263,7 +5802,7 @@ export class DatabaseManager {
     }
 
     // Também re-tentar itens e pagamentos relacionados
-    const failedItems = this.db.prepare(`
+    const failedItems = this.prepareCached(`
       UPDATE sync_queue 
       SET status = 'pending', 
           retry_count = 0, 
@@ -5296,7 +5835,7 @@ export class DatabaseManager {
     }
     
     // Verificar se mesa já está ocupada
-    const existingSession = this.db.prepare(`
+    const existingSession = this.prepareCached(`
       SELECT * FROM table_sessions 
       WHERE table_id = ? AND status IN ('open', 'awaiting_payment')
       ORDER BY opened_at DESC LIMIT 1
@@ -5307,7 +5846,7 @@ export class DatabaseManager {
     }
     
     // Gerar número sequencial da sessão
-    const lastSession = this.db.prepare(`
+    const lastSession = this.prepareCached(`
       SELECT session_number FROM table_sessions 
       WHERE branch_id = ? 
       ORDER BY created_at DESC LIMIT 1
@@ -5316,7 +5855,7 @@ export class DatabaseManager {
     const sessionNumber = this.generateSequentialNumber(lastSession?.session_number, 'SESSION');
     
     // Criar sessão
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO table_sessions (
         id, table_id, branch_id, session_number, status, opened_by, notes
       ) VALUES (?, ?, ?, ?, 'open', ?, ?)
@@ -5340,7 +5879,7 @@ export class DatabaseManager {
    * Buscar sessão de mesa por ID
    */
   getTableSessionById(id: string): SessionRow | null {
-    const session = this.db.prepare(`
+    const session = this.prepareCached(`
       SELECT 
         ts.*,
         t.number as table_number,
@@ -5353,13 +5892,13 @@ export class DatabaseManager {
     if (!session) return null;
     
     // Buscar clientes da sessão
-    const customers = this.db.prepare(`
+    const customers = this.prepareCached(`
       SELECT * FROM table_customers WHERE session_id = ? ORDER BY order_sequence ASC
     `).all(id) as CustomerRow[];
     
     // Buscar pedidos de cada cliente
     for (const customer of customers) {
-      customer.orders = this.db.prepare(`
+      customer.orders = this.prepareCached(`
         SELECT 
           o.*,
           p.name as product_name,
@@ -5413,11 +5952,11 @@ export class DatabaseManager {
     
     query += ' ORDER BY ts.opened_at DESC';
     
-    const sessions = this.db.prepare(query).all(...params) as SessionRow[];
+    const sessions = this.prepareCached(query).all(...params) as SessionRow[];
     
     // Adicionar contagem de clientes para cada sessão
     for (const session of sessions) {
-      const stats = this.db.prepare(`
+      const stats = this.prepareCached(`
         SELECT 
           COUNT(*) as customer_count,
           SUM(total) as total_amount
@@ -5454,7 +5993,7 @@ export class DatabaseManager {
     }
     
     // Determinar sequence
-    const lastCustomer = this.db.prepare(`
+    const lastCustomer = this.prepareCached(`
       SELECT order_sequence FROM table_customers 
       WHERE session_id = ? 
       ORDER BY order_sequence DESC LIMIT 1
@@ -5463,7 +6002,7 @@ export class DatabaseManager {
     const orderSequence = lastCustomer ? (lastCustomer.order_sequence || 0) + 1 : 1;
     
     // Adicionar cliente
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO table_customers (
         id, session_id, customer_name, customer_id, order_sequence
       ) VALUES (?, ?, ?, ?, ?)
@@ -5487,7 +6026,7 @@ export class DatabaseManager {
       addedBy: data.addedBy,
     }, 2);
     
-    return this.db.prepare('SELECT * FROM table_customers WHERE id = ?').get(id) as CustomerRow;
+    return this.prepareCached('SELECT * FROM table_customers WHERE id = ?').get(id) as CustomerRow;
   }
 
   /**
@@ -5561,7 +6100,7 @@ export class DatabaseManager {
     }
     
     // Criar pedido
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO table_orders (
         id, session_id, table_customer_id, product_id, 
         qty_units, is_muntu, unit_price, unit_cost, subtotal, total,
@@ -5603,7 +6142,7 @@ export class DatabaseManager {
       orderedBy: data.orderedBy,
     }, 3);
     
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT o.*, p.name as product_name 
       FROM table_orders o
       LEFT JOIN products p ON o.product_id = p.id
@@ -5619,7 +6158,7 @@ export class DatabaseManager {
     cancelledBy: string;
     reason?: string;
   }) {
-    const order = this.db.prepare('SELECT * FROM table_orders WHERE id = ?').get(data.orderId) as OrderRow | undefined;
+    const order = this.prepareCached('SELECT * FROM table_orders WHERE id = ?').get(data.orderId) as OrderRow | undefined;
     
     if (!order) {
       throw new Error('Pedido não encontrado');
@@ -5632,7 +6171,7 @@ export class DatabaseManager {
     // Retornar ao estoque
     const session = this.getTableSessionById(order.session_id!);
     if (session) {
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE inventory_items 
         SET qty_units = qty_units + ?, updated_at = datetime('now')
         WHERE product_id = ? AND branch_id = ?
@@ -5640,7 +6179,7 @@ export class DatabaseManager {
     }
     
     // Cancelar pedido
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_orders 
       SET status = 'cancelled', cancelled_by = ?, cancelled_at = datetime('now'), updated_at = datetime('now')
       WHERE id = ?
@@ -5672,7 +6211,7 @@ export class DatabaseManager {
     qtyUnits?: number; // Se não especificado, transfere tudo
     transferredBy: string;
   }) {
-    const order = this.db.prepare('SELECT * FROM table_orders WHERE id = ?').get(data.orderId) as OrderRow | undefined;
+    const order = this.prepareCached('SELECT * FROM table_orders WHERE id = ?').get(data.orderId) as OrderRow | undefined;
     
     if (!order) {
       throw new Error('Pedido não encontrado');
@@ -5689,8 +6228,8 @@ export class DatabaseManager {
     }
     
     // Verificar se clientes estão na mesma sessão
-    const fromCustomer = this.db.prepare('SELECT * FROM table_customers WHERE id = ?').get(data.fromCustomerId) as CustomerRow | undefined;
-    const toCustomer = this.db.prepare('SELECT * FROM table_customers WHERE id = ?').get(data.toCustomerId) as CustomerRow | undefined;
+    const fromCustomer = this.prepareCached('SELECT * FROM table_customers WHERE id = ?').get(data.fromCustomerId) as CustomerRow | undefined;
+    const toCustomer = this.prepareCached('SELECT * FROM table_customers WHERE id = ?').get(data.toCustomerId) as CustomerRow | undefined;
     
     if (!fromCustomer || !toCustomer || fromCustomer.session_id !== toCustomer.session_id) {
       throw new Error('Clientes devem estar na mesma mesa');
@@ -5698,7 +6237,7 @@ export class DatabaseManager {
     
     if (qtyToTransfer === order.qty_units) {
       // Transferir pedido inteiro
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_orders 
         SET table_customer_id = ?, updated_at = datetime('now')
         WHERE id = ?
@@ -5706,7 +6245,7 @@ export class DatabaseManager {
     } else {
       // Dividir pedido
       // Reduzir quantidade do pedido original
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_orders 
         SET qty_units = qty_units - ?,
             subtotal = unit_price * (qty_units - ?),
@@ -5718,7 +6257,7 @@ export class DatabaseManager {
       // Criar novo pedido para o cliente destino
       const newOrderId = this.generateUUID();
       const unitPriceVal = order.unit_price || 0;
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO table_orders (
           id, session_id, table_customer_id, product_id,
           qty_units, is_muntu, unit_price, unit_cost, 
@@ -5761,7 +6300,7 @@ export class DatabaseManager {
     splits: Array<{ customerId: string; qtyUnits: number }>;
     splitBy: string;
   }) {
-    const order = this.db.prepare('SELECT * FROM table_orders WHERE id = ?').get(data.orderId) as OrderRow | undefined;
+    const order = this.prepareCached('SELECT * FROM table_orders WHERE id = ?').get(data.orderId) as OrderRow | undefined;
     
     if (!order) {
       throw new Error('Pedido não encontrado');
@@ -5774,7 +6313,7 @@ export class DatabaseManager {
     }
     
     // Cancelar pedido original
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_orders 
       SET status = 'cancelled', updated_at = datetime('now')
       WHERE id = ?
@@ -5784,7 +6323,7 @@ export class DatabaseManager {
     const unitPriceVal = order.unit_price || 0;
     for (const split of data.splits) {
       const newOrderId = this.generateUUID();
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO table_orders (
           id, session_id, table_customer_id, product_id,
           qty_units, is_muntu, unit_price, unit_cost,
@@ -5827,7 +6366,7 @@ export class DatabaseManager {
     }
     
     // Verificar se mesa destino está disponível
-    const existingSession = this.db.prepare(`
+    const existingSession = this.prepareCached(`
       SELECT * FROM table_sessions 
       WHERE table_id = ? AND status IN ('open', 'awaiting_payment')
     `).get(data.toTableId) as SessionRow | undefined;
@@ -5837,7 +6376,7 @@ export class DatabaseManager {
     }
     
     // Atualizar table_id da sessão
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_sessions 
       SET table_id = ?, updated_at = datetime('now')
       WHERE id = ?
@@ -5878,7 +6417,7 @@ export class DatabaseManager {
     }
 
     // Verificar se todos os clientes pertencem à sessão
-    const customers = this.db.prepare(`
+    const customers = this.prepareCached(`
       SELECT * FROM table_customers 
       WHERE id IN (${data.customerIds.map(() => '?').join(',')}) 
       AND session_id = ?
@@ -5889,7 +6428,7 @@ export class DatabaseManager {
     }
 
     // Verificar se mesa destino já tem sessão aberta
-    let targetSession = this.db.prepare(`
+    let targetSession = this.prepareCached(`
       SELECT * FROM table_sessions 
       WHERE table_id = ? AND status IN ('open', 'awaiting_payment')
       ORDER BY opened_at DESC LIMIT 1
@@ -5900,7 +6439,7 @@ export class DatabaseManager {
       const newSessionId = this.generateUUID();
       
       // Gerar número sequencial da sessão
-      const lastSession = this.db.prepare(`
+      const lastSession = this.prepareCached(`
         SELECT session_number FROM table_sessions 
         WHERE branch_id = ? 
         ORDER BY created_at DESC LIMIT 1
@@ -5908,13 +6447,13 @@ export class DatabaseManager {
       
       const sessionNumber = this.generateSequentialNumber(lastSession?.session_number, 'SESSION');
       
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO table_sessions (
           id, table_id, branch_id, session_number, status, opened_by
         ) VALUES (?, ?, ?, ?, 'open', ?)
       `).run(newSessionId, data.toTableId, session.branch_id, sessionNumber, data.transferredBy);
 
-      targetSession = this.db.prepare('SELECT * FROM table_sessions WHERE id = ?').get(newSessionId) as SessionRow;
+      targetSession = this.prepareCached('SELECT * FROM table_sessions WHERE id = ?').get(newSessionId) as SessionRow;
 
       this.logTableAction({
         sessionId: newSessionId,
@@ -5928,14 +6467,14 @@ export class DatabaseManager {
     // Transferir cada cliente e seus pedidos
     for (const customerId of data.customerIds) {
       // Atualizar session_id do cliente
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_customers 
         SET session_id = ?, updated_at = datetime('now')
         WHERE id = ?
       `).run(targetSession.id, customerId);
 
       // Atualizar session_id de todos os pedidos do cliente
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_orders 
         SET session_id = ?, updated_at = datetime('now')
         WHERE table_customer_id = ?
@@ -5974,12 +6513,12 @@ export class DatabaseManager {
     });
 
     // Se não restaram clientes na sessão original, fechar automaticamente
-    const remainingCustomers = this.db.prepare(
+    const remainingCustomers = this.prepareCached(
       'SELECT COUNT(*) as count FROM table_customers WHERE session_id = ?'
     ).get(data.sessionId) as { count: number };
 
     if (remainingCustomers.count === 0) {
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_sessions 
         SET status = 'closed', closed_at = datetime('now'), closed_by = ?
         WHERE id = ?
@@ -6014,7 +6553,7 @@ export class DatabaseManager {
     }
 
     // Buscar todas as sessões
-    const sessions = this.db.prepare(`
+    const sessions = this.prepareCached(`
       SELECT * FROM table_sessions 
       WHERE id IN (${data.sessionIds.map(() => '?').join(',')}) 
       AND status IN ('open', 'awaiting_payment')
@@ -6039,7 +6578,7 @@ export class DatabaseManager {
       targetSession = sessions.find(s => s.table_id === data.targetTableId);
     } else {
       // Verificar se mesa destino está livre
-      const existingSession = this.db.prepare(`
+      const existingSession = this.prepareCached(`
         SELECT * FROM table_sessions 
         WHERE table_id = ? AND status IN ('open', 'awaiting_payment')
       `).get(data.targetTableId) as SessionRow | undefined;
@@ -6052,7 +6591,7 @@ export class DatabaseManager {
       const newSessionId = this.generateUUID();
       
       // Gerar número sequencial da sessão
-      const lastSession = this.db.prepare(`
+      const lastSession = this.prepareCached(`
         SELECT session_number FROM table_sessions 
         WHERE branch_id = ? 
         ORDER BY created_at DESC LIMIT 1
@@ -6060,13 +6599,13 @@ export class DatabaseManager {
       
       const sessionNumber = this.generateSequentialNumber(lastSession?.session_number, 'SESSION');
       
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO table_sessions (
           id, table_id, branch_id, session_number, status, opened_by
         ) VALUES (?, ?, ?, ?, 'open', ?)
       `).run(newSessionId, data.targetTableId, sessions[0].branch_id, sessionNumber, data.mergedBy);
 
-      targetSession = this.db.prepare('SELECT * FROM table_sessions WHERE id = ?').get(newSessionId) as SessionRow;
+      targetSession = this.prepareCached('SELECT * FROM table_sessions WHERE id = ?').get(newSessionId) as SessionRow;
 
       this.logTableAction({
         sessionId: newSessionId,
@@ -6088,11 +6627,11 @@ export class DatabaseManager {
 
     for (const session of sessionsToClose) {
       // Contar clientes e pedidos
-      const customerCount = this.db.prepare(
+      const customerCount = this.prepareCached(
         'SELECT COUNT(*) as count FROM table_customers WHERE session_id = ?'
       ).get(session.id) as { count: number };
 
-      const orderCount = this.db.prepare(
+      const orderCount = this.prepareCached(
         "SELECT COUNT(*) as count FROM table_orders WHERE session_id = ? AND status != 'cancelled'"
       ).get(session.id) as { count: number };
 
@@ -6100,14 +6639,14 @@ export class DatabaseManager {
       totalOrdersMerged += orderCount.count;
 
       // Transferir clientes
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_customers 
         SET session_id = ?, updated_at = datetime('now')
         WHERE session_id = ?
       `).run(targetSession.id, session.id);
 
       // Transferir pedidos
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_orders 
         SET session_id = ?, updated_at = datetime('now')
         WHERE session_id = ?
@@ -6128,7 +6667,7 @@ export class DatabaseManager {
       });
 
       // Fechar sessão antiga
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_sessions 
         SET status = 'closed', closed_at = datetime('now'), closed_by = ?
         WHERE id = ?
@@ -6194,7 +6733,7 @@ export class DatabaseManager {
 
     // Validar que todos os clientes pertencem à sessão
     const allCustomerIds = data.distributions.flatMap(d => d.customerIds);
-    const customers = this.db.prepare(`
+    const customers = this.prepareCached(`
       SELECT id FROM table_customers 
       WHERE id IN (${allCustomerIds.map(() => '?').join(',')}) 
       AND session_id = ?
@@ -6225,7 +6764,7 @@ export class DatabaseManager {
         targetSession = session;
       } else {
         // Verificar se mesa destino já tem sessão aberta
-        targetSession = this.db.prepare(`
+        targetSession = this.prepareCached(`
           SELECT * FROM table_sessions 
           WHERE table_id = ? AND status IN ('open', 'awaiting_payment')
           ORDER BY opened_at DESC LIMIT 1
@@ -6236,7 +6775,7 @@ export class DatabaseManager {
           const newSessionId = this.generateUUID();
           
           // Gerar número sequencial da sessão
-          const lastSession = this.db.prepare(`
+          const lastSession = this.prepareCached(`
             SELECT session_number FROM table_sessions 
             WHERE branch_id = ? 
             ORDER BY created_at DESC LIMIT 1
@@ -6244,13 +6783,13 @@ export class DatabaseManager {
           
           const sessionNumber = this.generateSequentialNumber(lastSession?.session_number, 'SESSION');
           
-          this.db.prepare(`
+          this.prepareCached(`
             INSERT INTO table_sessions (
               id, table_id, branch_id, session_number, status, opened_by
             ) VALUES (?, ?, ?, ?, 'open', ?)
           `).run(newSessionId, distribution.tableId, session.branch_id, sessionNumber, data.splitBy);
 
-          targetSession = this.db.prepare('SELECT * FROM table_sessions WHERE id = ?').get(newSessionId) as SessionRow;
+          targetSession = this.prepareCached('SELECT * FROM table_sessions WHERE id = ?').get(newSessionId) as SessionRow;
 
           this.logTableAction({
             sessionId: newSessionId,
@@ -6267,14 +6806,14 @@ export class DatabaseManager {
         // Só transferir se não estiver na mesma sessão
         if (targetSession.id !== data.sessionId) {
           // Atualizar session_id do cliente
-          this.db.prepare(`
+          this.prepareCached(`
             UPDATE table_customers 
             SET session_id = ?, updated_at = datetime('now')
             WHERE id = ?
           `).run(targetSession.id, customerId);
 
           // Atualizar session_id de todos os pedidos do cliente
-          this.db.prepare(`
+          this.prepareCached(`
             UPDATE table_orders 
             SET session_id = ?, updated_at = datetime('now')
             WHERE table_customer_id = ?
@@ -6305,13 +6844,13 @@ export class DatabaseManager {
     });
 
     // Verificar se restaram clientes na sessão original
-    const remainingCustomers = this.db.prepare(
+    const remainingCustomers = this.prepareCached(
       'SELECT COUNT(*) as count FROM table_customers WHERE session_id = ?'
     ).get(data.sessionId) as { count: number };
 
     if (remainingCustomers.count === 0) {
       // Fechar sessão original se não restaram clientes
-      this.db.prepare(`
+      this.prepareCached(`
         UPDATE table_sessions 
         SET status = 'closed', closed_at = datetime('now'), closed_by = ?
         WHERE id = ?
@@ -6337,13 +6876,13 @@ export class DatabaseManager {
    * Atualizar totais de uma sessão (helper method)
    */
   private updateTableSessionTotals(sessionId: string) {
-    const totals = this.db.prepare(`
+    const totals = this.prepareCached(`
       SELECT COALESCE(SUM(total), 0) as total_amount
       FROM table_customers
       WHERE session_id = ?
     `).get(sessionId) as { total_amount: number };
 
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_sessions
       SET total_amount = ?, updated_at = datetime('now')
       WHERE id = ?
@@ -6367,13 +6906,13 @@ export class DatabaseManager {
       throw new Error('Sessão não encontrada');
     }
 
-    const customer = this.db.prepare('SELECT * FROM table_customers WHERE id = ?').get(data.tableCustomerId) as any;
+    const customer = this.prepareCached('SELECT * FROM table_customers WHERE id = ?').get(data.tableCustomerId) as any;
     if (!customer) {
       throw new Error('Cliente não encontrado');
     }
 
     // Buscar apenas pedidos PENDENTES do cliente (não cancelados E não pagos)
-    const orders = this.db.prepare(`
+    const orders = this.prepareCached(`
       SELECT o.*, p.name as product_name
       FROM table_orders o
       LEFT JOIN products p ON o.product_id = p.id
@@ -6387,12 +6926,11 @@ export class DatabaseManager {
     // Calcular total dos pedidos PENDENTES (não usar customer.total que inclui pagos)
     const pendingTotal = orders.reduce((sum, o) => sum + (o.total || 0), 0);
 
-    // Gerar número de venda único - usar MAX para evitar duplicação após sync
-    const saleNumber = this.generateUniqueSaleNumber();
+    const saleNumber = this.allocateDocumentNumber('sale', session.branch_id);
 
     // Criar venda (SALE) - usar pendingTotal em vez de customer.total
     const saleId = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO sales (
         id, sale_number, branch_id, type, table_id, customer_id, 
         cashier_id, status, subtotal, total, muntu_savings, 
@@ -6418,7 +6956,7 @@ export class DatabaseManager {
       // Calcular economia Muntu
       let muntuSavings = 0;
       if (order.is_muntu) {
-        const product: any = this.db.prepare('SELECT price_unit, muntu_quantity FROM products WHERE id = ?').get(order.product_id);
+        const product: any = this.prepareCached('SELECT price_unit, muntu_quantity FROM products WHERE id = ?').get(order.product_id);
         if (product) {
           const regularPrice = product.price_unit * order.qty_units;
           muntuSavings = regularPrice - order.total;
@@ -6426,7 +6964,7 @@ export class DatabaseManager {
         }
       }
 
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO sale_items (
           id, sale_id, product_id, qty_units, is_muntu, 
           unit_price, unit_cost, subtotal, total, muntu_savings
@@ -6460,12 +6998,12 @@ export class DatabaseManager {
 
     // Atualizar economia Muntu na venda
     if (totalMuntuSavings > 0) {
-      this.db.prepare('UPDATE sales SET muntu_savings = ? WHERE id = ?').run(totalMuntuSavings, saleId);
+      this.prepareCached('UPDATE sales SET muntu_savings = ? WHERE id = ?').run(totalMuntuSavings, saleId);
     }
 
     // Criar pagamento vinculado à venda
     const paymentId = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO payments (
         id, sale_id, method, amount, reference_number, status, processed_at
       ) VALUES (?, ?, ?, ?, ?, 'completed', datetime('now'))
@@ -6482,7 +7020,7 @@ export class DatabaseManager {
 
     // Criar pagamento de mesa (table_payments) para rastreamento
     const tablePaymentId = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO table_payments (
         id, session_id, table_customer_id, payment_id, method, amount, 
         reference_number, processed_by
@@ -6511,14 +7049,14 @@ export class DatabaseManager {
     }, 4);
 
     // Atualizar status dos pedidos para 'paid'
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_orders 
       SET status = 'paid', updated_at = datetime('now')
       WHERE table_customer_id = ? AND status != 'cancelled'
     `).run(data.tableCustomerId);
 
     // Atualizar total pago do cliente
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_customers 
       SET paid_amount = paid_amount + ?,
           payment_status = CASE 
@@ -6531,7 +7069,7 @@ export class DatabaseManager {
     `).run(data.amount, data.amount, data.amount, data.tableCustomerId);
 
     // Atualizar total pago da sessão
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_sessions 
       SET paid_amount = paid_amount + ?, updated_at = datetime('now')
       WHERE id = ?
@@ -6549,7 +7087,7 @@ export class DatabaseManager {
         // 1 ponto para cada 1.000 FCFA (100.000 centavos) - MESMA LÓGICA DO PDV
         const pointsToAdd = Math.floor(data.amount / 100000);
         if (pointsToAdd > 0) {
-          this.db.prepare(`
+          this.prepareCached(`
             UPDATE customers 
             SET loyalty_points = loyalty_points + ?,
                 updated_at = datetime('now'),
@@ -6628,7 +7166,7 @@ export class DatabaseManager {
     }
 
     // Buscar todos os pedidos não pagos da sessão
-    const orders = this.db.prepare(`
+    const orders = this.prepareCached(`
       SELECT o.*, p.name as product_name, c.customer_id, c.customer_name
       FROM table_orders o
       LEFT JOIN products p ON o.product_id = p.id
@@ -6643,11 +7181,10 @@ export class DatabaseManager {
     // Calcular total dos pedidos
     const totalOrders = orders.reduce((sum, o) => sum + (o.total || 0), 0);
 
-    // Gerar número de venda único - usar MAX para evitar duplicação após sync
-    const saleNumber = this.generateUniqueSaleNumber();
+    const saleNumber = this.allocateDocumentNumber('sale', session.branch_id);
 
     // Verificar se há cliente único cadastrado na mesa
-    const customers = this.db.prepare(`
+    const customers = this.prepareCached(`
       SELECT DISTINCT customer_id 
       FROM table_customers 
       WHERE session_id = ? AND customer_id IS NOT NULL
@@ -6657,7 +7194,7 @@ export class DatabaseManager {
 
     // Criar venda (SALE)
     const saleId = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO sales (
         id, sale_number, branch_id, type, table_id, customer_id, 
         cashier_id, status, subtotal, total, muntu_savings, 
@@ -6685,7 +7222,7 @@ export class DatabaseManager {
       // Calcular economia Muntu
       let muntuSavings = 0;
       if (order.is_muntu) {
-        const product: any = this.db.prepare('SELECT price_unit FROM products WHERE id = ?').get(order.product_id);
+        const product: any = this.prepareCached('SELECT price_unit FROM products WHERE id = ?').get(order.product_id);
         if (product) {
           const regularPrice = product.price_unit * order.qty_units;
           muntuSavings = regularPrice - order.total;
@@ -6693,7 +7230,7 @@ export class DatabaseManager {
         }
       }
 
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO sale_items (
           id, sale_id, product_id, qty_units, is_muntu, 
           unit_price, unit_cost, subtotal, total, muntu_savings
@@ -6732,12 +7269,12 @@ export class DatabaseManager {
 
     // Atualizar economia Muntu na venda
     if (totalMuntuSavings > 0) {
-      this.db.prepare('UPDATE sales SET muntu_savings = ? WHERE id = ?').run(totalMuntuSavings, saleId);
+      this.prepareCached('UPDATE sales SET muntu_savings = ? WHERE id = ?').run(totalMuntuSavings, saleId);
     }
 
     // Criar pagamento vinculado à venda
     const paymentId = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO payments (
         id, sale_id, method, amount, reference_number, status, processed_at
       ) VALUES (?, ?, ?, ?, ?, 'completed', datetime('now'))
@@ -6754,7 +7291,7 @@ export class DatabaseManager {
 
     // Criar pagamento de mesa (table_payments)
     const tablePaymentId = this.generateUUID();
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO table_payments (
         id, session_id, payment_id, method, amount, reference_number, processed_by
       ) VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -6769,14 +7306,14 @@ export class DatabaseManager {
     );
 
     // Atualizar status dos pedidos para 'paid'
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_orders 
       SET status = 'paid', updated_at = datetime('now')
       WHERE session_id = ? AND status != 'cancelled' AND status != 'paid'
     `).run(data.sessionId);
 
     // Atualizar pagamento de todos os clientes
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_customers 
       SET paid_amount = total,
           payment_status = 'paid',
@@ -6785,7 +7322,7 @@ export class DatabaseManager {
     `).run(data.sessionId);
 
     // Atualizar total pago da sessão
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_sessions 
       SET paid_amount = paid_amount + ?, updated_at = datetime('now')
       WHERE id = ?
@@ -6803,7 +7340,7 @@ export class DatabaseManager {
     if (pointsToAdd > 0) {
       for (const customerId of customerIds) {
         try {
-          this.db.prepare(`
+          this.prepareCached(`
             UPDATE customers 
             SET loyalty_points = loyalty_points + ?,
                 updated_at = datetime('now'),
@@ -6877,13 +7414,13 @@ export class DatabaseManager {
       throw new Error('Sessão não encontrada');
     }
 
-    const customer = this.db.prepare('SELECT * FROM table_customers WHERE id = ?').get(data.tableCustomerId) as any;
+    const customer = this.prepareCached('SELECT * FROM table_customers WHERE id = ?').get(data.tableCustomerId) as any;
     if (!customer) {
       throw new Error('Cliente não encontrado');
     }
 
     // Contar pedidos pagos antes de deletar
-    const paidOrders = this.db.prepare(`
+    const paidOrders = this.prepareCached(`
       SELECT COUNT(*) as count, SUM(total) as total
       FROM table_orders 
       WHERE table_customer_id = ? AND status = 'paid'
@@ -6894,20 +7431,20 @@ export class DatabaseManager {
     }
 
     // Deletar pedidos pagos
-    this.db.prepare(`
+    this.prepareCached(`
       DELETE FROM table_orders 
       WHERE table_customer_id = ? AND status = 'paid'
     `).run(data.tableCustomerId);
 
     // Recalcular totais do cliente baseado nos pedidos restantes (pendentes)
-    const remainingOrders = this.db.prepare(`
+    const remainingOrders = this.prepareCached(`
       SELECT COALESCE(SUM(total), 0) as total, COALESCE(SUM(subtotal), 0) as subtotal
       FROM table_orders 
       WHERE table_customer_id = ? AND status NOT IN ('cancelled', 'paid')
     `).get(data.tableCustomerId) as any;
 
     // Atualizar totais do cliente
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_customers 
       SET subtotal = ?,
           total = ?,
@@ -6923,13 +7460,13 @@ export class DatabaseManager {
     );
 
     // Recalcular totais da sessão
-    const sessionTotals = this.db.prepare(`
+    const sessionTotals = this.prepareCached(`
       SELECT COALESCE(SUM(total), 0) as total, COALESCE(SUM(paid_amount), 0) as paid
       FROM table_customers 
       WHERE session_id = ?
     `).get(data.sessionId) as any;
 
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_sessions 
       SET total_amount = ?,
           paid_amount = ?,
@@ -6982,7 +7519,7 @@ export class DatabaseManager {
     }
     
     // Fechar sessão
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_sessions 
       SET status = 'closed', 
           closed_by = ?, 
@@ -7009,7 +7546,7 @@ export class DatabaseManager {
    */
   setCustomerLoyaltyPoints(customerCode: string, points: number) {
     // Buscar cliente
-    const customer: any = this.db.prepare(`
+    const customer: any = this.prepareCached(`
       SELECT id, code, full_name, loyalty_points FROM customers WHERE code = ?
     `).get(customerCode);
 
@@ -7033,7 +7570,7 @@ export class DatabaseManager {
     }
 
     // Atualizar pontos
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE customers 
       SET loyalty_points = ?,
           updated_at = datetime('now'),
@@ -7062,7 +7599,7 @@ export class DatabaseManager {
    */
   fixCustomerLoyaltyPoints(customerCode: string) {
     // Buscar cliente
-    const customer: any = this.db.prepare(`
+    const customer: any = this.prepareCached(`
       SELECT id, code, full_name, loyalty_points FROM customers WHERE code = ?
     `).get(customerCode);
 
@@ -7071,7 +7608,7 @@ export class DatabaseManager {
     }
 
     // Calcular total de vendas do cliente (em centavos)
-    const salesTotal: any = this.db.prepare(`
+    const salesTotal: any = this.prepareCached(`
       SELECT COALESCE(SUM(total), 0) as total_spent
       FROM sales
       WHERE customer_id = ? AND status = 'paid'
@@ -7089,7 +7626,7 @@ export class DatabaseManager {
     console.log(`[FIX LOYALTY] Diferença: ${difference}`);
 
     // Atualizar pontos
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE customers 
       SET loyalty_points = ?,
           updated_at = datetime('now'),
@@ -7112,7 +7649,7 @@ export class DatabaseManager {
    * Atualizar totais do cliente
    */
   private updateTableCustomerTotals(tableCustomerId: string) {
-    const totals = this.db.prepare(`
+    const totals = this.prepareCached(`
       SELECT 
         COALESCE(SUM(subtotal), 0) as subtotal,
         COALESCE(SUM(total), 0) as total
@@ -7120,7 +7657,7 @@ export class DatabaseManager {
       WHERE table_customer_id = ? AND status != 'cancelled'
     `).get(tableCustomerId) as TotalsRow;
     
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE table_customers 
       SET subtotal = ?, total = ?, updated_at = datetime('now')
       WHERE id = ?
@@ -7139,7 +7676,7 @@ export class DatabaseManager {
   }) {
     const id = this.generateUUID();
     
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO table_actions (
         id, session_id, action_type, performed_by, description, metadata
       ) VALUES (?, ?, ?, ?, ?, ?)
@@ -7153,7 +7690,7 @@ export class DatabaseManager {
    * Buscar histórico de ações de uma sessão
    */
   getTableSessionActions(sessionId: string) {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM table_actions 
       WHERE session_id = ? 
       ORDER BY performed_at DESC
@@ -7167,18 +7704,18 @@ export class DatabaseManager {
     const tables = this.getTables({ branchId, isActive: true });
     
     return tables.map((table: any) => {
-      const session = this.db.prepare(`
+      const session = this.prepareCached(`
         SELECT * FROM table_sessions 
         WHERE table_id = ? AND status IN ('open', 'awaiting_payment')
         ORDER BY opened_at DESC LIMIT 1
       `).get(table.id) as SessionRow | undefined;
       
       if (session) {
-        const customerCount = this.db.prepare(`
+        const customerCount = this.prepareCached(`
           SELECT COUNT(*) as count FROM table_customers WHERE session_id = ?
         `).get(session.id) as CountRow;
         
-        const orderCount = this.db.prepare(`
+        const orderCount = this.prepareCached(`
           SELECT COUNT(*) as count FROM table_orders 
           WHERE session_id = ? AND status != 'cancelled'
         `).get(session.id) as CountRow;
@@ -7249,7 +7786,7 @@ export class DatabaseManager {
       
       // Registrar no histórico
       const historyId = this.generateUUID();
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO backup_history (id, file_name, file_path, file_size, backup_type, status, created_by)
         VALUES (?, ?, ?, ?, ?, 'completed', ?)
       `).run(historyId, fileName, backupFile, fileSize, backupType, createdBy || 'system');
@@ -7268,7 +7805,7 @@ export class DatabaseManager {
       // Registrar falha no histórico
       try {
         const historyId = this.generateUUID();
-        this.db.prepare(`
+        this.prepareCached(`
           INSERT INTO backup_history (id, file_name, file_path, backup_type, status, error_message, created_by)
           VALUES (?, ?, ?, ?, 'failed', ?, ?)
         `).run(historyId, 'failed', backupDir, backupType, error.message, createdBy || 'system');
@@ -7344,8 +7881,8 @@ export class DatabaseManager {
         console.warn('⚠️ Não foi possível criar backup de segurança antes da restauração');
       }
       
-      // Fechar banco atual
-      this.db.close();
+      // Fechar banco atual (statements em cache são da conexão antiga)
+      this.close();
       
       // Copiar arquivo de backup para o caminho do banco
       fs.copyFileSync(backupFile, this.dbPath);
@@ -7377,7 +7914,7 @@ export class DatabaseManager {
       try {
         const historyId = this.generateUUID();
         const fileName = path.basename(backupFile);
-        this.db.prepare(`
+        this.prepareCached(`
           INSERT INTO backup_history (id, file_name, file_path, backup_type, status, created_by)
           VALUES (?, ?, ?, 'restore', 'completed', 'system')
         `).run(historyId, fileName, backupFile);
@@ -7417,7 +7954,7 @@ export class DatabaseManager {
    */
   getBackupHistory(limit: number = 20): any[] {
     try {
-      return this.db.prepare(`
+      return this.prepareCached(`
         SELECT * FROM backup_history 
         ORDER BY created_at DESC 
         LIMIT ?
@@ -7433,7 +7970,7 @@ export class DatabaseManager {
    */
   deleteBackup(id: string, deleteFile: boolean = true): { success: boolean; error?: string } {
     try {
-      const backup: any = this.db.prepare('SELECT * FROM backup_history WHERE id = ?').get(id);
+      const backup: any = this.prepareCached('SELECT * FROM backup_history WHERE id = ?').get(id);
       
       if (!backup) {
         throw new Error('Backup não encontrado no histórico');
@@ -7446,7 +7983,7 @@ export class DatabaseManager {
       }
       
       // Remover do histórico
-      this.db.prepare('DELETE FROM backup_history WHERE id = ?').run(id);
+      this.prepareCached('DELETE FROM backup_history WHERE id = ?').run(id);
       
       return { success: true };
     } catch (error: any) {
@@ -7461,23 +7998,23 @@ export class DatabaseManager {
 
   private async seedInitialData() {
     // Migrar branch-1 para main-branch se existir
-    const oldBranch = this.db.prepare('SELECT id FROM branches WHERE id = ?').get('branch-1');
+    const oldBranch = this.prepareCached('SELECT id FROM branches WHERE id = ?').get('branch-1');
     if (oldBranch) {
       console.log('Migrando branch-1 para main-branch...');
       // Atualizar tabelas que referenciam branch_id
-      this.db.prepare('UPDATE tables SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
-      this.db.prepare('UPDATE table_sessions SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
-      this.db.prepare('UPDATE inventory SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
-      this.db.prepare('UPDATE sales SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
-      this.db.prepare('UPDATE cash_boxes SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
+      this.prepareCached('UPDATE tables SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
+      this.prepareCached('UPDATE table_sessions SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
+      this.prepareCached('UPDATE inventory SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
+      this.prepareCached('UPDATE sales SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
+      this.prepareCached('UPDATE cash_boxes SET branch_id = ? WHERE branch_id = ?').run('main-branch', 'branch-1');
       // Atualizar o próprio branch
-      this.db.prepare('UPDATE branches SET id = ? WHERE id = ?').run('main-branch', 'branch-1');
+      this.prepareCached('UPDATE branches SET id = ? WHERE id = ?').run('main-branch', 'branch-1');
       console.log('✅ Branch migrado para main-branch!');
       return;
     }
     
     // Verifica se a filial padrão já existe
-    const existingBranch = this.db.prepare('SELECT COUNT(*) as count FROM branches').get() as { count: number };
+    const existingBranch = this.prepareCached('SELECT COUNT(*) as count FROM branches').get() as { count: number };
     
     if (existingBranch.count > 0) {
       console.log('Filial padrão já existe, pulando seed inicial');
@@ -7488,7 +8025,7 @@ export class DatabaseManager {
 
     // Criar filial padrão com ID main-branch
     const branchId = 'main-branch';
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO branches (id, name, code, is_main, is_active, created_at, updated_at)
       VALUES (?, 'Filial Principal', 'MAIN', 1, 1, datetime('now'), datetime('now'))
     `).run(branchId);
@@ -7509,7 +8046,7 @@ export class DatabaseManager {
   fixUnitCostInSaleItems() {
     try {
       // Verificar quantos sale_items têm unit_cost = 0 ou NULL
-      const countBefore = this.db.prepare(`
+      const countBefore = this.prepareCached(`
         SELECT COUNT(*) as count 
         FROM sale_items 
         WHERE unit_cost IS NULL OR unit_cost = 0
@@ -7519,7 +8056,7 @@ export class DatabaseManager {
       
       if (countBefore.count > 0) {
         // Atualizar unit_cost usando o cost_unit do produto
-        const result = this.db.prepare(`
+        const result = this.prepareCached(`
           UPDATE sale_items 
           SET unit_cost = (
             SELECT cost_unit 
@@ -7532,7 +8069,7 @@ export class DatabaseManager {
         console.log(`[Migration] ✅ ${result.changes} registros atualizados!`);
         
         // Verificar novamente
-        const countAfter = this.db.prepare(`
+        const countAfter = this.prepareCached(`
           SELECT COUNT(*) as count 
           FROM sale_items 
           WHERE unit_cost IS NULL OR unit_cost = 0
@@ -7574,29 +8111,88 @@ export class DatabaseManager {
   }
 
   /**
-   * Gera um número de venda único (SALE-XXXXXX)
-   * Usa MAX para extrair o maior número existente, evitando duplicação após sync
+   * Próximo número de documento da série (venda, compra ou dívida) da filial.
+   *
+   * O contador fica em document_counters e é incrementado com um único
+   * UPDATE ... RETURNING: custo constante, independente de quantas vendas
+   * existem, e dentro da transação de quem chamou (rollback devolve o número).
+   * Como os números são UNIQUE no banco todo, o valor alocado parte do maior
+   * contador do prefixo entre as filiais.
    */
-  private generateUniqueSaleNumber(): string {
-    // Buscar TODOS os sale_numbers e encontrar o maior número
-    const allSales: any[] = this.db.prepare(
-      "SELECT sale_number FROM sales WHERE sale_number LIKE 'SALE-%'"
-    ).all();
-    
-    let maxNumber = 0;
-    for (const sale of allSales) {
-      if (sale.sale_number) {
-        const match = sale.sale_number.match(/SALE-(\d+)/);
-        if (match) {
-          const num = parseInt(match[1], 10);
-          if (num > maxNumber) {
-            maxNumber = num;
-          }
-        }
-      }
+  private allocateDocumentNumber(type: DocumentType, branchId: string): string {
+    const series = DOCUMENT_SERIES[type];
+    const prefix = series.prefix(new Date());
+    this.ensureDocumentCounter(type, prefix, branchId);
+
+    const row = this.prepareCached(`
+      UPDATE document_counters
+      SET last_value = (SELECT MAX(last_value) FROM document_counters WHERE prefix = ?) + 1,
+          updated_at = CURRENT_TIMESTAMP
+      WHERE prefix = ? AND branch_id = ?
+      RETURNING last_value
+    `).get(prefix, prefix, branchId) as { last_value: number };
+
+    return `${prefix}-${String(row.last_value).padStart(series.width, '0')}`;
+  }
+
+  /**
+   * Registra um número recebido do servidor (pull), para que a sequência
+   * local continue depois dele e não repita números de outros dispositivos.
+   */
+  noteDocumentNumber(type: DocumentType, branchId: string | null | undefined, documentNumber: string | null | undefined) {
+    const parsed = parseDocumentNumber(documentNumber);
+    if (!parsed) {
+      return;
     }
-    
-    return `SALE-${String(maxNumber + 1).padStart(6, '0')}`;
+    const branch = branchId || 'main-branch';
+    this.ensureDocumentCounter(type, parsed.prefix, branch);
+    this.prepareCached(`
+      UPDATE document_counters
+      SET last_value = MAX(last_value, ?), updated_at = CURRENT_TIMESTAMP
+      WHERE prefix = ? AND branch_id = ?
+    `).run(parsed.value, parsed.prefix, branch);
+  }
+
+  /**
+   * Cria o contador na primeira vez que um prefixo é usado, semeado com o
+   * maior número já existente na tabela do documento (consulta por faixa no
+   * índice UNIQUE da coluna; roda uma vez por prefixo).
+   */
+  private ensureDocumentCounter(type: DocumentType, prefix: string, branchId: string) {
+    const exists = this.prepareCached(
+      'SELECT 1 FROM document_counters WHERE prefix = ? AND branch_id = ?'
+    ).get(prefix, branchId);
+    if (exists) {
+      return;
+    }
+
+    const known = this.prepareCached(
+      'SELECT MAX(last_value) AS value FROM document_counters WHERE prefix = ?'
+    ).get(prefix) as { value: number | null };
+
+    let seed = known.value;
+    if (seed === null) {
+      const { table, column } = DOCUMENT_SERIES[type];
+      const row = this.db.prepare(`
+        SELECT MAX(CAST(substr(${column}, ?) AS INTEGER)) AS value
+        FROM ${table}
+        WHERE ${column} > ? AND ${column} < ?
+          AND length(${column}) BETWEEN ? AND ?
+          AND substr(${column}, ?) NOT GLOB '*[^0-9]*'
+      `).get(
+        prefix.length + 2,
+        `${prefix}-`,
+        `${prefix}.`,
+        prefix.length + 2,
+        prefix.length + 1 + MAX_SEQUENCE_DIGITS,
+        prefix.length + 2
+      ) as { value: number | null };
+      seed = row.value || 0;
+    }
+
+    this.prepareCached(`
+      INSERT OR IGNORE INTO document_counters (prefix, branch_id, last_value) VALUES (?, ?, ?)
+    `).run(prefix, branchId, seed);
   }
 
   private generateSequentialNumber(lastNumber: string | null | undefined, prefix: string): string {
@@ -7620,7 +8216,7 @@ export class DatabaseManager {
       console.log('[Seed] Verificando necessidade de criar vendas de exemplo...');
       
       // Verificar se já existem vendas
-      const existingSales = this.db.prepare('SELECT COUNT(*) as count FROM sales').get() as { count: number };
+      const existingSales = this.prepareCached('SELECT COUNT(*) as count FROM sales').get() as { count: number };
       
       if (existingSales.count > 0) {
         console.log(`[Seed] Já existem ${existingSales.count} vendas no banco`);
@@ -7645,7 +8241,7 @@ export class DatabaseManager {
         const muntuSavings = Math.floor(Math.random() * 5000);
         const total = subtotal - muntuSavings;
         
-        this.db.prepare(`
+        this.prepareCached(`
           INSERT INTO sales (
             id, sale_number, branch_id, cashier_id, status,
             subtotal, total, muntu_savings, 
@@ -7681,7 +8277,7 @@ export class DatabaseManager {
    */
   getSetting(key: string): string | null {
     try {
-      const result = this.db.prepare(
+      const result = this.prepareCached(
         "SELECT value FROM settings WHERE key = ?"
       ).get(key) as { value: string } | undefined;
       return result?.value || null;
@@ -7697,7 +8293,7 @@ export class DatabaseManager {
    */
   setSetting(key: string, value: string, syncToServer: boolean = true) {
     try {
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT OR REPLACE INTO settings (key, value, synced, updated_at)
         VALUES (?, ?, 0, datetime('now'))
       `).run(key, value);
@@ -7717,7 +8313,7 @@ export class DatabaseManager {
    */
   setSettingFromServer(key: string, value: string) {
     try {
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT OR REPLACE INTO settings (key, value, synced, updated_at)
         VALUES (?, ?, 1, datetime('now'))
       `).run(key, value);
@@ -7734,7 +8330,7 @@ export class DatabaseManager {
       const localOnlySettings = ['device_id', 'last_sync_date', 'sync_token'];
       const placeholders = localOnlySettings.map(() => '?').join(',');
       
-      return this.db.prepare(`
+      return this.prepareCached(`
         SELECT key, value FROM settings 
         WHERE synced = 0 AND key NOT IN (${placeholders})
       `).all(...localOnlySettings) as Array<{ key: string; value: string }>;
@@ -7749,7 +8345,7 @@ export class DatabaseManager {
    */
   markSettingSynced(key: string) {
     try {
-      this.db.prepare('UPDATE settings SET synced = 1 WHERE key = ?').run(key);
+      this.prepareCached('UPDATE settings SET synced = 1 WHERE key = ?').run(key);
     } catch (error) {
       console.error('Erro ao marcar setting como sincronizada:', key, error);
     }
@@ -7763,7 +8359,7 @@ export class DatabaseManager {
       const localOnlySettings = ['device_id', 'last_sync_date', 'sync_token'];
       const placeholders = localOnlySettings.map(() => '?').join(',');
       
-      return this.db.prepare(`
+      return this.prepareCached(`
         SELECT key, value FROM settings 
         WHERE key NOT IN (${placeholders})
       `).all(...localOnlySettings) as Array<{ key: string; value: string }>;
@@ -7778,10 +8374,16 @@ export class DatabaseManager {
    * O ID é persistido e reutilizado em todas as operações
    */
   getDeviceId(): string {
+    // Chamado em cada addToSyncQueue: manter em memória após a primeira leitura
+    if (this.deviceIdCache) {
+      return this.deviceIdCache;
+    }
+
     try {
       const existingDeviceId = this.getSetting('device_id');
       
       if (existingDeviceId) {
+        this.deviceIdCache = existingDeviceId;
         return existingDeviceId;
       }
       
@@ -7833,7 +8435,7 @@ export class DatabaseManager {
         return 0;
       }
       
-      const result = this.db.prepare(`SELECT COUNT(*) as count FROM ${tableName}`).get() as { count: number };
+      const result = this.prepareCached(`SELECT COUNT(*) as count FROM ${tableName}`).get() as { count: number };
       return result?.count || 0;
     } catch (error) {
       console.error(`Erro ao contar registros em ${tableName}:`, error);
@@ -7846,7 +8448,7 @@ export class DatabaseManager {
    */
   getPendingSyncCount(entity: string): number {
     try {
-      const result = this.db.prepare(
+      const result = this.prepareCached(
         `SELECT COUNT(*) as count FROM sync_queue WHERE entity = ? AND status = 'pending'`
       ).get(entity) as { count: number } | undefined;
       return result?.count || 0;
@@ -7861,7 +8463,7 @@ export class DatabaseManager {
    */
   getLastSyncDate(): Date | null {
     try {
-      const result = this.db.prepare(
+      const result = this.prepareCached(
         "SELECT value FROM settings WHERE key = 'last_sync_date'"
       ).get() as { value: string } | undefined;
       
@@ -7880,7 +8482,7 @@ export class DatabaseManager {
    */
   setLastSyncDate(date: Date) {
     try {
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT OR REPLACE INTO settings (key, value, updated_at)
         VALUES ('last_sync_date', ?, datetime('now'))
       `).run(date.toISOString());
@@ -7894,7 +8496,7 @@ export class DatabaseManager {
    */
   getBranchById(id: string) {
     try {
-      return this.db.prepare('SELECT * FROM branches WHERE id = ?').get(id);
+      return this.prepareCached('SELECT * FROM branches WHERE id = ?').get(id);
     } catch (error) {
       console.error('Erro ao buscar branch por ID:', error);
       return null;
@@ -7906,7 +8508,7 @@ export class DatabaseManager {
    */
   getDefaultBranchId(): string | null {
     try {
-      const branch = this.db.prepare('SELECT id FROM branches WHERE is_active = 1 ORDER BY is_main DESC, created_at ASC LIMIT 1').get() as { id: string } | undefined;
+      const branch = this.prepareCached('SELECT id FROM branches WHERE is_active = 1 ORDER BY is_main DESC, created_at ASC LIMIT 1').get() as { id: string } | undefined;
       return branch?.id || null;
     } catch (error) {
       console.error('Erro ao buscar branch default:', error);
@@ -7920,7 +8522,7 @@ export class DatabaseManager {
   createBranch(data: any) {
     try {
       const id = data.id || this.generateUUID();
-      this.db.prepare(`
+      this.prepareCached(`
         INSERT INTO branches (
           id, name, code, address, phone, is_main, is_active, synced, last_sync, created_at, updated_at
         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
@@ -7962,7 +8564,7 @@ export class DatabaseManager {
       if (fields.length > 0) {
         fields.push('updated_at = datetime(\'now\')');
         values.push(id);
-        this.db.prepare(`UPDATE branches SET ${fields.join(', ')} WHERE id = ?`).run(...values);
+        this.prepareCached(`UPDATE branches SET ${fields.join(', ')} WHERE id = ?`).run(...values);
       }
       return this.getBranchById(id);
     } catch (error) {
@@ -7976,7 +8578,7 @@ export class DatabaseManager {
    */
   getSupplierById(id: string) {
     try {
-      return this.db.prepare('SELECT * FROM suppliers WHERE id = ?').get(id);
+      return this.prepareCached('SELECT * FROM suppliers WHERE id = ?').get(id);
     } catch (error) {
       console.error('Erro ao buscar supplier por ID:', error);
       return null;
@@ -7988,7 +8590,7 @@ export class DatabaseManager {
    */
   getCategoryById(id: string) {
     try {
-      return this.db.prepare('SELECT * FROM categories WHERE id = ?').get(id);
+      return this.prepareCached('SELECT * FROM categories WHERE id = ?').get(id);
     } catch (error) {
       console.error('Erro ao buscar category por ID:', error);
       return null;
@@ -8029,7 +8631,7 @@ export class DatabaseManager {
       if (fields.length > 0) {
         fields.push('updated_at = datetime(\'now\')');
         values.push(id);
-        this.db.prepare(`UPDATE users SET ${fields.join(', ')} WHERE id = ?`).run(...values);
+        this.prepareCached(`UPDATE users SET ${fields.join(', ')} WHERE id = ?`).run(...values);
       }
       return this.getUserById(id);
     } catch (error) {
@@ -8040,7 +8642,7 @@ export class DatabaseManager {
 
   // Métodos públicos para acesso ao banco de dados
   prepare(query: string): any {
-    return this.db.prepare(query);
+    return this.prepareCached(query);
   }
 
   exec(query: string): any {
@@ -8069,11 +8671,11 @@ export class DatabaseManager {
     
     // Limpar fila atual para evitar duplicatas
     console.log('🗑️ Limpando fila de sincronização atual...');
-    this.db.prepare('DELETE FROM sync_queue').run();
+    this.prepareCached('DELETE FROM sync_queue').run();
     
-    const insertQueue = this.db.prepare(`
-      INSERT INTO sync_queue (id, entity, entity_id, operation, data, status, priority, created_at)
-      VALUES (?, ?, ?, 'create', ?, 'pending', ?, datetime('now'))
+    const insertQueue = this.prepareCached(`
+      INSERT INTO sync_queue (id, entity, entity_id, operation, data, status, priority, created_at, updated_at)
+      VALUES (?, ?, ?, 'create', ?, 'pending', ?, datetime('now'), datetime('now'))
     `);
     
     let totalAdded = 0;
@@ -8081,7 +8683,7 @@ export class DatabaseManager {
     
     for (const { table, entity, priority } of SYNC_ORDER) {
       try {
-        const rows = this.db.prepare(`SELECT * FROM ${table}`).all() as any[];
+        const rows = this.prepareCached(`SELECT * FROM ${table}`).all() as any[];
         
         for (const row of rows) {
           const queueId = this.generateUUID(); // Gerar ID único para cada item da fila
@@ -8112,7 +8714,7 @@ export class DatabaseManager {
     lastCheck: string;
   } {
     // Buscar produtos locais ativos
-    const localProducts = this.db.prepare(`
+    const localProducts = this.prepareCached(`
       SELECT id, sku, name, price_unit, is_active, synced, last_sync
       FROM products 
       WHERE is_active = 1
@@ -8123,7 +8725,7 @@ export class DatabaseManager {
     const localOnly = localProducts.filter(p => !p.synced || p.synced === 0);
     
     // Verificar itens na fila pendentes para produtos
-    const pendingProductSync = this.db.prepare(`
+    const pendingProductSync = this.prepareCached(`
       SELECT entity_id, operation, status, last_error, retry_count, created_at
       FROM sync_queue 
       WHERE entity = 'product' AND status IN ('pending', 'failed')
@@ -8142,7 +8744,7 @@ export class DatabaseManager {
    * 🔍 Marca um produto como sincronizado após confirmação do servidor
    */
   markProductSynced(id: string, serverTimestamp?: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE products 
       SET synced = 1, last_sync = ? 
       WHERE id = ?
@@ -8153,7 +8755,7 @@ export class DatabaseManager {
    * 🔍 Marca um produto como falha de sincronização
    */
   markProductSyncFailed(id: string, error: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE products 
       SET synced = 0, sync_error = ? 
       WHERE id = ?
@@ -8171,7 +8773,7 @@ export class DatabaseManager {
     lastSync: string | null;
   } {
     // Produtos
-    const productStats = this.db.prepare(`
+    const productStats = this.prepareCached(`
       SELECT 
         COUNT(*) as total,
         SUM(CASE WHEN synced = 1 THEN 1 ELSE 0 END) as synced
@@ -8179,7 +8781,7 @@ export class DatabaseManager {
     `).get() as any;
     
     // Categorias
-    const categoryStats = this.db.prepare(`
+    const categoryStats = this.prepareCached(`
       SELECT 
         COUNT(*) as total,
         SUM(CASE WHEN synced = 1 THEN 1 ELSE 0 END) as synced
@@ -8187,7 +8789,7 @@ export class DatabaseManager {
     `).get() as any;
     
     // Fornecedores
-    const supplierStats = this.db.prepare(`
+    const supplierStats = this.prepareCached(`
       SELECT 
         COUNT(*) as total,
         SUM(CASE WHEN synced = 1 THEN 1 ELSE 0 END) as synced
@@ -8232,7 +8834,7 @@ export class DatabaseManager {
    * Retorna estatísticas da fila de sincronização
    */
   getSyncQueueStats(): { pending: number; failed: number; completed: number; byEntity: any[] } {
-    const stats = this.db.prepare(`
+    const stats = this.prepareCached(`
       SELECT 
         status,
         COUNT(*) as count
@@ -8240,7 +8842,7 @@ export class DatabaseManager {
       GROUP BY status
     `).all() as any[];
     
-    const byEntity = this.db.prepare(`
+    const byEntity = this.prepareCached(`
       SELECT 
         entity,
         status,
@@ -8262,7 +8864,7 @@ export class DatabaseManager {
    * Retorna contagem total de itens de sync pendentes (sem filtro de entidade)
    */
   getTotalPendingSyncCount(): number {
-    const result = this.db.prepare(
+    const result = this.prepareCached(
       "SELECT COUNT(*) as count FROM sync_queue WHERE status = 'pending'"
     ).get() as any;
     return result?.count || 0;
@@ -8272,7 +8874,7 @@ export class DatabaseManager {
    * Retorna contagem de itens de sync com falha
    */
   getFailedSyncCount(): number {
-    const result = this.db.prepare(
+    const result = this.prepareCached(
       "SELECT COUNT(*) as count FROM sync_queue WHERE status = 'failed'"
     ).get() as any;
     return result?.count || 0;
@@ -8282,7 +8884,7 @@ export class DatabaseManager {
    * Retorna contagem de itens na Dead Letter Queue
    */
   getDlqCount(): number {
-    const result = this.db.prepare(
+    const result = this.prepareCached(
       "SELECT COUNT(*) as count FROM sync_dead_letter WHERE resolved_at IS NULL"
     ).get() as any;
     return result?.count || 0;
@@ -8292,7 +8894,7 @@ export class DatabaseManager {
    * Retorna IDs de itens sincronizados recentemente (para ACK)
    */
   getRecentlySyncedIds(): string[] {
-    const results = this.db.prepare(`
+    const results = this.prepareCached(`
       SELECT entity_id FROM sync_queue 
       WHERE status = 'pending' 
         AND synced = 0 
@@ -8321,7 +8923,7 @@ export class DatabaseManager {
     const id = `audit-${Date.now()}-${Math.random().toString(36).substring(2, 9)}`;
     const deviceId = this.getDeviceId();
     
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO sync_audit_log (id, device_id, action, entity, entity_id, direction, status, details, error_message)
       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     `).run(
@@ -8362,14 +8964,14 @@ export class DatabaseManager {
       params.push(options.limit);
     }
     
-    return this.db.prepare(query).all(...params);
+    return this.prepareCached(query).all(...params);
   }
 
   /**
    * Limpa logs antigos de auditoria (mantém últimos 7 dias)
    */
   cleanOldAuditLogs(daysToKeep: number = 7) {
-    const result = this.db.prepare(`
+    const result = this.prepareCached(`
       DELETE FROM sync_audit_log 
       WHERE created_at < datetime('now', '-' || ? || ' days')
     `).run(daysToKeep);
@@ -8393,7 +8995,7 @@ export class DatabaseManager {
     const id = `conflict-${Date.now()}-${Math.random().toString(36).substring(2, 9)}`;
     const deviceId = this.getDeviceId();
     
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO sync_conflicts (id, entity, entity_id, local_data, server_data, local_device_id, server_device_id, local_timestamp, server_timestamp)
       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     `).run(
@@ -8416,7 +9018,7 @@ export class DatabaseManager {
    * Obtém conflitos pendentes de resolução
    */
   getPendingConflicts(): any[] {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM sync_conflicts 
       WHERE resolution IS NULL 
       ORDER BY created_at DESC
@@ -8427,7 +9029,7 @@ export class DatabaseManager {
    * Resolve um conflito
    */
   resolveConflict(conflictId: string, resolution: 'keep_local' | 'keep_server' | 'merge', resolvedBy?: string) {
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE sync_conflicts 
       SET resolution = ?, resolved_at = CURRENT_TIMESTAMP, resolved_by = ?
       WHERE id = ?
@@ -8443,7 +9045,7 @@ export class DatabaseManager {
   detectConflict(entity: string, entityId: string, serverUpdatedAt: Date): { hasConflict: boolean; localData?: any; serverTimestamp: Date } {
     try {
       // Buscar dados locais
-      const localData = this.db.prepare(`SELECT * FROM ${entity} WHERE id = ?`).get(entityId) as any;
+      const localData = this.prepareCached(`SELECT * FROM ${entity} WHERE id = ?`).get(entityId) as any;
       
       if (!localData) {
         return { hasConflict: false, serverTimestamp: serverUpdatedAt };
@@ -8476,7 +9078,7 @@ export class DatabaseManager {
     const os = require('os');
     const deviceName = os.hostname();
     
-    this.db.prepare(`
+    this.prepareCached(`
       INSERT INTO device_registry (device_id, device_name, last_heartbeat, updated_at)
       VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
       ON CONFLICT(device_id) DO UPDATE SET
@@ -8493,7 +9095,7 @@ export class DatabaseManager {
   updateDeviceLastSync() {
     const deviceId = this.getDeviceId();
     
-    this.db.prepare(`
+    this.prepareCached(`
       UPDATE device_registry 
       SET last_sync = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
       WHERE device_id = ?
@@ -8504,7 +9106,7 @@ export class DatabaseManager {
    * Obtém lista de dispositivos ativos (heartbeat nos últimos 5 minutos)
    */
   getActiveDevices(): any[] {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT * FROM device_registry 
       WHERE last_heartbeat > datetime('now', '-5 minutes')
       AND is_active = 1
@@ -8516,7 +9118,7 @@ export class DatabaseManager {
    * Obtém todos os dispositivos registrados
    */
   getAllDevices(): any[] {
-    return this.db.prepare(`
+    return this.prepareCached(`
       SELECT *,
         CASE 
           WHEN last_heartbeat > datetime('now', '-5 minutes') THEN 'online'
@@ -8532,7 +9134,7 @@ export class DatabaseManager {
    * Marca dispositivos inativos (sem heartbeat por mais de 1 hora)
    */
   markInactiveDevices() {
-    const result = this.db.prepare(`
+    const result = this.prepareCached(`
       UPDATE device_registry 
       SET is_active = 0, updated_at = CURRENT_TIMESTAMP
       WHERE last_heartbeat < datetime('now', '-1 hour')
@@ -8552,7 +9154,7 @@ export class DatabaseManager {
     const targetDevice = deviceId || this.getDeviceId();
     
     return {
-      auditLogs: this.db.prepare(`
+      auditLogs: this.prepareCached(`
         SELECT 
           status,
           COUNT(*) as count
@@ -8560,7 +9162,7 @@ export class DatabaseManager {
         WHERE device_id = ?
         GROUP BY status
       `).all(targetDevice),
-      lastSync: this.db.prepare(`
+      lastSync: this.prepareCached(`
         SELECT last_sync FROM device_registry WHERE device_id = ?
       `).get(targetDevice),
       pendingItems: this.getPendingSyncCount(''),
@@ -8608,86 +9210,86 @@ export class DatabaseManager {
         // 3. Executar dentro de uma transação
         const transaction = this.db.transaction(() => {
           // Tabelas de sincronização e logs
-          stats['sync_queue'] = this.db.prepare('DELETE FROM sync_queue').run().changes;
-          stats['sync_audit_log'] = this.db.prepare('DELETE FROM sync_audit_log').run().changes;
+          stats['sync_queue'] = this.prepareCached('DELETE FROM sync_queue').run().changes;
+          stats['sync_audit_log'] = this.prepareCached('DELETE FROM sync_audit_log').run().changes;
           
           try {
-            stats['sync_conflicts'] = this.db.prepare('DELETE FROM sync_conflicts').run().changes;
+            stats['sync_conflicts'] = this.prepareCached('DELETE FROM sync_conflicts').run().changes;
           } catch (e) { stats['sync_conflicts'] = 0; }
 
           // Pagamentos
-          stats['payments'] = this.db.prepare('DELETE FROM payments').run().changes;
+          stats['payments'] = this.prepareCached('DELETE FROM payments').run().changes;
           
           try {
-            stats['debt_payments'] = this.db.prepare('DELETE FROM debt_payments').run().changes;
+            stats['debt_payments'] = this.prepareCached('DELETE FROM debt_payments').run().changes;
           } catch (e) { stats['debt_payments'] = 0; }
 
           // Itens de vendas e compras
-          stats['sale_items'] = this.db.prepare('DELETE FROM sale_items').run().changes;
+          stats['sale_items'] = this.prepareCached('DELETE FROM sale_items').run().changes;
           
           try {
-            stats['purchase_items'] = this.db.prepare('DELETE FROM purchase_items').run().changes;
+            stats['purchase_items'] = this.prepareCached('DELETE FROM purchase_items').run().changes;
           } catch (e) { stats['purchase_items'] = 0; }
 
           // Vendas, compras e caixas
-          stats['sales'] = this.db.prepare('DELETE FROM sales').run().changes;
+          stats['sales'] = this.prepareCached('DELETE FROM sales').run().changes;
           
           try {
-            stats['purchases'] = this.db.prepare('DELETE FROM purchases').run().changes;
+            stats['purchases'] = this.prepareCached('DELETE FROM purchases').run().changes;
           } catch (e) { stats['purchases'] = 0; }
           
           try {
-            stats['cash_boxes'] = this.db.prepare('DELETE FROM cash_boxes').run().changes;
+            stats['cash_boxes'] = this.prepareCached('DELETE FROM cash_boxes').run().changes;
           } catch (e) { stats['cash_boxes'] = 0; }
 
           // Dívidas
           try {
-            stats['debts'] = this.db.prepare('DELETE FROM debts').run().changes;
+            stats['debts'] = this.prepareCached('DELETE FROM debts').run().changes;
           } catch (e) { stats['debts'] = 0; }
 
           // Movimentações de estoque
           try {
-            stats['stock_movements'] = this.db.prepare('DELETE FROM stock_movements').run().changes;
+            stats['stock_movements'] = this.prepareCached('DELETE FROM stock_movements').run().changes;
           } catch (e) { stats['stock_movements'] = 0; }
 
           // Inventário
           try {
-            stats['inventory_items'] = this.db.prepare('DELETE FROM inventory_items').run().changes;
+            stats['inventory_items'] = this.prepareCached('DELETE FROM inventory_items').run().changes;
           } catch (e) { stats['inventory_items'] = 0; }
 
           // Mesas e sessões (deletar em ordem: orders -> customers -> sessions -> tables)
           try {
-            stats['table_orders'] = this.db.prepare('DELETE FROM table_orders').run().changes;
+            stats['table_orders'] = this.prepareCached('DELETE FROM table_orders').run().changes;
           } catch (e) { stats['table_orders'] = 0; }
           
           try {
-            stats['table_customers'] = this.db.prepare('DELETE FROM table_customers').run().changes;
+            stats['table_customers'] = this.prepareCached('DELETE FROM table_customers').run().changes;
           } catch (e) { stats['table_customers'] = 0; }
           
           try {
-            stats['table_sessions'] = this.db.prepare('DELETE FROM table_sessions').run().changes;
+            stats['table_sessions'] = this.prepareCached('DELETE FROM table_sessions').run().changes;
           } catch (e) { stats['table_sessions'] = 0; }
           
           try {
-            stats['tables'] = this.db.prepare('DELETE FROM tables').run().changes;
+            stats['tables'] = this.prepareCached('DELETE FROM tables').run().changes;
           } catch (e) { stats['tables'] = 0; }
 
           // Produtos e categorias
-          stats['products'] = this.db.prepare('DELETE FROM products').run().changes;
-          stats['categories'] = this.db.prepare('DELETE FROM categories').run().changes;
+          stats['products'] = this.prepareCached('DELETE FROM products').run().changes;
+          stats['categories'] = this.prepareCached('DELETE FROM categories').run().changes;
 
           // Fornecedores
           try {
-            stats['suppliers'] = this.db.prepare('DELETE FROM suppliers').run().changes;
+            stats['suppliers'] = this.prepareCached('DELETE FROM suppliers').run().changes;
           } catch (e) { stats['suppliers'] = 0; }
 
           // Clientes
-          stats['customers'] = this.db.prepare('DELETE FROM customers').run().changes;
+          stats['customers'] = this.prepareCached('DELETE FROM customers').run().changes;
 
           // CORREÇÃO CRÍTICA: Limpar last_sync_date para forçar sync completo
           // Sem isso, o sync usa updatedAfter=<data antiga> e servidor retorna vazio
           try {
-            this.db.prepare("DELETE FROM settings WHERE key = 'last_sync_date'").run();
+            this.prepareCached("DELETE FROM settings WHERE key = 'last_sync_date'").run();
             console.log('🗑️ last_sync_date removido - próximo sync será completo');
           } catch (e) {
             console.warn('⚠️ Não foi possível limpar last_sync_date');
@@ -8696,14 +9298,14 @@ export class DatabaseManager {
           // Registrar a operação de reset no log
           // Colunas da tabela: id, device_id, action, entity, entity_id, direction, status, details, error_message, created_at
           const auditId = this.generateUUID();
-          this.db.prepare(`
+          this.prepareCached(`
             INSERT INTO sync_audit_log (id, device_id, action, entity, entity_id, direction, status, details, created_at)
             VALUES (?, ?, 'RESET_LOCAL_DATA', 'system', ?, 'local', 'completed', ?, datetime('now'))
           `).run(auditId, this.getDeviceId(), adminUserId, JSON.stringify(stats));
         });
 
         // Executar transação
-        transaction();
+        transaction.immediate();
 
       } finally {
         // 4. Reabilitar foreign keys
@@ -8757,7 +9359,7 @@ export class DatabaseManager {
 
     for (const table of tables) {
       try {
-        const result = this.db.prepare(`SELECT COUNT(*) as count FROM ${table}`).get() as any;
+        const result = this.prepareCached(`SELECT COUNT(*) as count FROM ${table}`).get() as any;
         counts[table] = result?.count || 0;
       } catch (e) {
         counts[table] = 0;
@@ -8766,8 +9368,8 @@ export class DatabaseManager {
 
     // Adicionar contagem de preservados
     try {
-      counts['_preserved_users'] = (this.db.prepare('SELECT COUNT(*) as count FROM users').get() as any)?.count || 0;
-      counts['_preserved_branches'] = (this.db.prepare('SELECT COUNT(*) as count FROM branches').get() as any)?.count || 0;
+      counts['_preserved_users'] = (this.prepareCached('SELECT COUNT(*) as count FROM users').get() as any)?.count || 0;
+      counts['_preserved_branches'] = (this.prepareCached('SELECT COUNT(*) as count FROM branches').get() as any)?.count || 0;
     } catch (e) {
       // Ignorar
     }
@@ -8777,7 +9379,20 @@ export class DatabaseManager {
 
   close() {
     if (this.db) {
+      this.statementCache.clear();
+      this.deviceIdCache = null;
       this.db.close();
+      this.db = null;
     }
   }
+
+  /**
+   * Reabre a conexão principal depois que o arquivo do banco foi trocado por
+   * fora (restore do BackupManager). Migrations rodam de novo: o backup pode
+   * ser de um schema mais antigo.
+   */
+  async reopen() {
+    this.close();
+    await this.initialize();
+  }
 }
@@ -0,0 +1,200 @@
+import * as os from 'os';
+import * as path from 'path';
+import { Worker } from 'worker_threads';
+import type { DatabaseManager } from './manager';
+import type { WorkerMessage, WorkerRequest, WorkerRole, WorkerTarget } from './worker';
+import type { SyncMerger } from '../sync/merge';
+
+// Métodos públicos do DatabaseManager que podem ser chamados num worker
+export type ManagerMethod = {
+  [K in keyof DatabaseManager]: DatabaseManager[K] extends (...args: any[]) => any ? K : never;
+}[keyof DatabaseManager];
+
+interface PendingRequest {
+  method: string;
+  args: unknown[];
+  resolve: (value: any) => void;
+  reject: (error: Error) => void;
+}
+
+interface DatabaseWorker {
+  worker: Worker;
+  ready: boolean;
+  pending: Map<number, PendingRequest>;
+}
+
+/**
+ * Pool de workers do SQLite.
+ *
+ * Um worker de escrita é dono da conexão de escrita: vendas, cadastros, a fila
+ * de sync e o merge do pull (fullPullFromServer) rodam nele, em ordem de
+ * chegada. N workers de leitura com conexões somente leitura em WAL atendem
+ * listagens e relatórios. Uma consulta longa ou um merge grande não trava mais
+ * o IPC do PDV e várias leituras usam núcleos diferentes.
+ *
+ * A conexão do processo principal continua aberta para backup/restore e
+ * consultas pontuais, e assume o trabalho quando não há worker (better-sqlite3
+ * indisponível, worker ainda abrindo ou caiu). Leitura que tenta escrever
+ * (SQLITE_READONLY) passa a ir para o worker de escrita.
+ */
+export class DatabaseWorkerPool {
+  private readers: DatabaseWorker[] = [];
+  private writer: DatabaseWorker | null = null;
+  private nextId = 1;
+  private readsOnWriter = new Set<string>();
+  private eventHandler: ((event: string, data?: any) => void) | null = null;
+
+  constructor(
+    private dbPath: string,
+    private main: DatabaseManager,
+    private size = Math.max(1, Math.min(2, os.cpus().length - 1))
+  ) {}
+
+  start(): void {
+    // O device_id é gerado e gravado pela conexão principal antes dos workers
+    // lerem (evita dois workers gerando IDs diferentes)
+    this.main.getDeviceId();
+
+    this.writer = this.spawn('writer');
+    for (let i = 0; i < this.size; i++) {
+      this.readers.push(this.spawn('reader'));
+    }
+    console.log(`📖 Pool SQLite: 1 worker de escrita + ${this.size} de leitura`);
+  }
+
+  /**
+   * Executa um método de leitura do DatabaseManager num worker livre.
+   * Argumentos e resultado passam por structured clone (objetos, arrays, Date).
+   */
+  read<K extends ManagerMethod>(
+    method: K,
+    ...args: Parameters<DatabaseManager[K]>
+  ): Promise<Awaited<ReturnType<DatabaseManager[K]>>> {
+    if (this.readsOnWriter.has(method)) {
+      return this.write(method, ...args);
+    }
+    const reader = this.pickReader();
+    if (!reader) {
+      return this.runOnMain(method, args);
+    }
+    return this.send(reader, 'manager', method, args);
+  }
+
+  /**
+   * Executa um método de escrita do DatabaseManager no worker de escrita.
+   * Gravações são atendidas uma por vez, na ordem em que chegaram.
+   */
+  write<K extends ManagerMethod>(
+    method: K,
+    ...args: Parameters<DatabaseManager[K]>
+  ): Promise<Awaited<ReturnType<DatabaseManager[K]>>> {
+    if (!this.writer?.ready) {
+      return this.runOnMain(method, args);
+    }
+    return this.send(this.writer, 'manager', method, args);
+  }
+
+  /**
+   * Mescla os dados do pull no worker de escrita (SyncMerger.mergeEntityData).
+   * Sem o worker, usa o merger do processo principal.
+   */
+  merge(entityName: string, items: any[], fallback: SyncMerger): Promise<void> {
+    if (!this.writer?.ready) {
+      return fallback.mergeEntityData(entityName, items);
+    }
+    return this.send(this.writer, 'merger', 'mergeEntityData', [entityName, items]);
+  }
+
+  // Eventos emitidos nos workers (ex.: sync:conflict do merge)
+  onEvent(handler: (event: string, data?: any) => void): void {
+    this.eventHandler = handler;
+  }
+
+  async stop(): Promise<void> {
+    const workers = this.writer ? [this.writer, ...this.readers] : this.readers;
+    this.writer = null;
+    this.readers = [];
+    await Promise.all(workers.map(entry => entry.worker.terminate()));
+  }
+
+  private send(entry: DatabaseWorker, target: WorkerTarget, method: string, args: unknown[]): Promise<any> {
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      entry.pending.set(id, { method, args, resolve, reject });
+      entry.worker.postMessage({ id, target, method, args } as WorkerRequest);
+    });
+  }
+
+  // Worker pronto com menos leituras em andamento
+  private pickReader(): DatabaseWorker | null {
+    let best: DatabaseWorker | null = null;
+    for (const reader of this.readers) {
+      if (reader.ready && (!best || reader.pending.size < best.pending.size)) {
+        best = reader;
+      }
+    }
+    return best;
+  }
+
+  private async runOnMain(method: string, args: unknown[]): Promise<any> {
+    return (this.main as any)[method](...args);
+  }
+
+  private spawn(role: WorkerRole): DatabaseWorker {
+    // No app empacotado o worker fica fora do asar (asarUnpack no package.json)
+    const workerPath = path.join(__dirname, 'worker.js').replace('app.asar', 'app.asar.unpacked');
+    const entry: DatabaseWorker = {
+      worker: new Worker(workerPath, { workerData: { dbPath: this.dbPath, role } }),
+      ready: false,
+      pending: new Map(),
+    };
+    const label = role === 'writer' ? 'escrita' : 'leitura';
+
+    entry.worker.on('message', (message: WorkerMessage) => {
+      if (message.type === 'ready') {
+        entry.ready = true;
+      } else if (message.type === 'failed') {
+        console.warn(`⚠️ Worker de ${label} não abriu o banco, usando conexão principal:`, message.message);
+      } else if (message.type === 'event') {
+        this.eventHandler?.(message.event, message.data);
+      } else if (message.type === 'response') {
+        const request = entry.pending.get(message.id);
+        if (!request) return;
+        entry.pending.delete(message.id);
+        if (message.ok) {
+          request.resolve(message.result);
+        } else if (role === 'reader' && message.code === 'SQLITE_READONLY') {
+          // O método grava algo: passa a rodar sempre no worker de escrita
+          console.warn(`⚠️ ${request.method} escreve no banco, executando no worker de escrita`);
+          this.readsOnWriter.add(request.method);
+          (this.write as any)(request.method, ...request.args).then(request.resolve, request.reject);
+        } else {
+          request.reject(new Error(message.message));
+        }
+      }
+    });
+
+    entry.worker.on('error', (error) => {
+      console.error(`❌ Erro no worker de ${label}:`, error);
+    });
+
+    entry.worker.on('exit', () => {
+      if (entry === this.writer) {
+        this.writer = null;
+      }
+      this.readers = this.readers.filter(r => r !== entry);
+      for (const request of entry.pending.values()) {
+        if (role === 'reader') {
+          // Leituras em andamento são refeitas na conexão principal
+          this.runOnMain(request.method, request.args).then(request.resolve, request.reject);
+        } else {
+          // Gravação pode ter sido aplicada antes da queda: não repetir às cegas
+          request.reject(new Error(`Worker de escrita encerrado durante ${request.method}`));
+        }
+      }
+      entry.pending.clear();
+    });
+
+    return entry;
+  }
+}
@@ -0,0 +1,72 @@
+/**
+ * Worker do SQLite (executa fora do processo principal, ver database/pool.ts)
+ *
+ * role 'reader': conexão somente leitura. Em WAL, leituras não bloqueiam a
+ * escrita nem umas às outras, então relatórios e listagens longas rodam em
+ * paralelo com o checkout.
+ *
+ * role 'writer': dono da conexão de escrita. Atende os métodos de escrita do
+ * DatabaseManager e o merge do pull (target 'merger', ver sync/merge.ts).
+ *
+ * Mensagens: { id, target, method, args } → { id, ok, result } | { id, ok: false, message, code }
+ * Eventos do merge (sync:conflict) sobem como { type: 'event', event, data }.
+ */
+import { parentPort, workerData } from 'worker_threads';
+import { DatabaseManager } from './manager';
+import { SyncMerger } from '../sync/merge';
+
+export type WorkerRole = 'reader' | 'writer';
+
+export type WorkerTarget = 'manager' | 'merger';
+
+export interface WorkerRequest {
+  id: number;
+  target: WorkerTarget;
+  method: string;
+  args: unknown[];
+}
+
+export type WorkerMessage =
+  | { type: 'ready' }
+  | { type: 'failed'; message: string }
+  | { type: 'event'; event: string; data?: unknown }
+  | { type: 'response'; id: number; ok: true; result: unknown }
+  | { type: 'response'; id: number; ok: false; message: string; code?: string };
+
+if (parentPort) {
+  const port = parentPort;
+  const role: WorkerRole = workerData.role ?? 'reader';
+  const manager = new DatabaseManager(workerData.dbPath);
+  const targets: Record<WorkerTarget, any> = { manager, merger: null };
+
+  try {
+    if (role === 'writer') {
+      manager.openWriter();
+      targets.merger = new SyncMerger(manager, (event, data) => {
+        port.postMessage({ type: 'event', event, data } as WorkerMessage);
+      });
+    } else {
+      manager.openReadOnly();
+    }
+    port.postMessage({ type: 'ready' } as WorkerMessage);
+  } catch (error) {
+    port.postMessage({ type: 'failed', message: (error as Error).message } as WorkerMessage);
+    process.exit(1);
+  }
+
+  port.on('message', async (request: WorkerRequest) => {
+    try {
+      const target = targets[request.target];
+      const result = await target[request.method](...request.args);
+      port.postMessage({ type: 'response', id: request.id, ok: true, result } as WorkerMessage);
+    } catch (error) {
+      port.postMessage({
+        type: 'response',
+        id: request.id,
+        ok: false,
+        message: (error as Error).message,
+        code: (error as any).code,
+      } as WorkerMessage);
+    }
+  });
+}
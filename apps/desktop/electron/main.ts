@@ -4,8 +4,10 @@ import * as fs from 'fs';
 import Store from 'electron-store';
 import axios from 'axios';
 import { DatabaseManager } from './database/manager';
+import { DatabaseWorkerPool } from './database/pool';
 import { SyncManager } from './sync/manager';
 import { BackupManager } from './backup/manager';
+import { StartupProfile } from './startup/profile';
 
 // Logs críticos obrigatórios
 console.log('🚀 ELECTRON MAIN STARTED');
@@ -15,8 +17,12 @@ process.on('unhandledRejection', (reason) => console.error('❌ UNHANDLED REJECT
 const store = new Store();
 let mainWindow: BrowserWindow | null = null;
 let dbManager: DatabaseManager;
+// Workers do SQLite: gravações no worker de escrita, listagens e relatórios nos de leitura
+let dbPool: DatabaseWorkerPool;
 let syncManager: SyncManager;
 let backupManager: BackupManager;
+// Etapas do startup: banco + janela primeiro, backup e sync depois do primeiro paint
+const startupProfile = new StartupProfile(path.join(app.getPath('userData'), 'logs', 'startup-profile.log'));
 
 function createWindow() {
   mainWindow = new BrowserWindow({
@@ -43,8 +49,13 @@ function createWindow() {
   });
   
   mainWindow.webContents.on('did-finish-load', () => {
+    startupProfile.mark('renderer-loaded');
     console.log('✅ Página carregada com sucesso');
   });
+
+  mainWindow.once('ready-to-show', () => {
+    startupProfile.firstPaint();
+  });
   
   if (isDev) {
     mainWindow.loadURL('http://localhost:5173');
@@ -62,18 +73,27 @@ function createWindow() {
 }
 
 app.whenReady().then(async () => {
+  startupProfile.mark('app-ready');
+
   // Inicializar banco de dados local SQLite
   const dbPath = path.join(app.getPath('userData'), 'barmanager.db');
   dbManager = new DatabaseManager(dbPath);
   
   try {
-    await dbManager.initialize();
+    await startupProfile.measure('database', () => dbManager.initialize());
     console.log('✅ Banco de dados SQLite inicializado');
+
+    // Até os workers abrirem o banco, leituras e gravações usam a conexão principal
+    dbPool = new DatabaseWorkerPool(dbPath, dbManager);
+    startupProfile.defer('db-workers', () => dbPool.start());
     
-    // Inicializar backup automático
+    // Backup de startup (cópia completa/delta do banco) só depois do primeiro paint
     backupManager = new BackupManager(dbPath);
-    backupManager.startAutoBackup();
-    console.log('✅ Backup automático iniciado');
+    startupProfile.defer('backup', () => {
+      backupManager.startAutoBackup();
+      // Devolve o backup de startup já em andamento, para medir até o fim
+      return backupManager.createBackup('startup');
+    });
   } catch (error) {
     console.error('⚠️ Erro ao inicializar banco SQLite (funcionará apenas online):', error);
     // Continuar sem banco local - app vai usar apenas API
@@ -87,9 +107,12 @@ app.whenReady().then(async () => {
   
   if (dbManager) {
     syncManager = new SyncManager(dbManager, apiUrl);
+    if (dbPool) {
+      syncManager.setDatabasePool(dbPool);
+    }
   }
 
-  createWindow();
+  await startupProfile.measure('window', () => createWindow());
   
   // Passar referência da janela para o SyncManager (para emitir eventos)
   if (mainWindow && syncManager) {
@@ -122,6 +145,9 @@ app.on('before-quit', async () => {
       console.error('Erro ao parar sincronização:', error);
     }
   }
+  if (dbPool) {
+    dbPool.stop().catch(error => console.error('Erro ao parar workers do SQLite:', error));
+  }
   if (dbManager) {
     try {
       dbManager.close();
@@ -143,12 +169,8 @@ ipcMain.handle('auth:login', async (_, credentials) => {
     // Após login bem-sucedido, iniciar sincronização automática
     if (result) {
       console.log('🔄 Iniciando sincronização automática após login...');
-      // Iniciar em background para não bloquear resposta do login
-      setTimeout(() => {
-        syncManager.start().catch(err => {
-          console.error('Erro ao iniciar sincronização:', err);
-        });
-      }, 1000);
+      // Iniciar em background (etapa adiada do startup) para não bloquear resposta do login
+      startupProfile.defer('sync', () => syncManager.start());
     }
     
     return { success: true, data: result };
@@ -165,7 +187,8 @@ ipcMain.handle('auth:logout', async () => {
 
 // Sales
 ipcMain.handle('sales:create', async (_, saleData) => {
-  const sale = dbManager.createSale(saleData);
+  const sale = await dbPool.write('createSale', saleData);
+  startupProfile.mark('first-sale');
   // 🔴 CORREÇÃO CRÍTICA: Sync imediato após criar venda
   // Garante que vendas rápidas em sequência não sejam perdidas
   syncManager.syncSalesImmediately();
@@ -173,21 +196,29 @@ ipcMain.handle('sales:create', async (_, saleData) => {
 });
 
 ipcMain.handle('sales:addItem', async (_, { saleId, itemData }) => {
-  const item = dbManager.addSaleItem(saleId, itemData);
+  const item = await dbPool.write('addSaleItem', saleId, itemData);
   // 🔴 CORREÇÃO: Sync imediato após adicionar item
   syncManager.syncSalesImmediately();
   return item;
 });
 
 ipcMain.handle('sales:addPayment', async (_, { saleId, paymentData }) => {
-  const payment = dbManager.addSalePayment(saleId, paymentData);
+  const payment = await dbPool.write('addSalePayment', saleId, paymentData);
   // 🔴 CORREÇÃO: Sync imediato após adicionar pagamento
   syncManager.syncSalesImmediately();
   return payment;
 });
 
+// ⚡ Venda completa (venda + itens + pagamentos) numa única transação
+ipcMain.handle('sales:record', async (_, data) => {
+  const sale = await dbPool.write('recordSale', data);
+  startupProfile.mark('first-sale');
+  syncManager.syncSalesImmediately();
+  return sale;
+});
+
 ipcMain.handle('sales:list', async (_, filters) => {
-  return dbManager.getSales(filters);
+  return dbPool.read('getSales', filters);
 });
 
 ipcMain.handle('sales:getById', async (_, saleId) => {
@@ -196,23 +227,23 @@ ipcMain.handle('sales:getById', async (_, saleId) => {
 
 // Products
 ipcMain.handle('products:list', async (_, filters) => {
-  return dbManager.getProducts(filters);
+  return dbPool.read('getProducts', filters);
 });
 
 ipcMain.handle('products:search', async (_, query) => {
-  return dbManager.searchProducts(query);
+  return dbPool.read('searchProducts', query);
 });
 
 ipcMain.handle('products:create', async (_, productData) => {
-  return dbManager.createProduct(productData);
+  return dbPool.write('createProduct', productData);
 });
 
 ipcMain.handle('products:update', async (_, { id, data }) => {
-  return dbManager.updateProduct(id, data);
+  return dbPool.write('updateProduct', id, data);
 });
 
 ipcMain.handle('products:delete', async (_, id) => {
-  return dbManager.deleteProduct(id);
+  return dbPool.write('deleteProduct', id);
 });
 
 ipcMain.handle('products:getById', async (_, id) => {
@@ -225,15 +256,15 @@ ipcMain.handle('categories:list', async (_, filters) => {
 });
 
 ipcMain.handle('categories:create', async (_, categoryData) => {
-  return dbManager.createCategory(categoryData);
+  return dbPool.write('createCategory', categoryData);
 });
 
 ipcMain.handle('categories:update', async (_, { id, data }) => {
-  return dbManager.updateCategory(id, data);
+  return dbPool.write('updateCategory', id, data);
 });
 
 ipcMain.handle('categories:delete', async (_, id) => {
-  return dbManager.deleteCategory(id);
+  return dbPool.write('deleteCategory', id);
 });
 
 // Suppliers
@@ -242,20 +273,20 @@ ipcMain.handle('suppliers:list', async () => {
 });
 
 ipcMain.handle('suppliers:create', async (_, supplierData) => {
-  return dbManager.createSupplier(supplierData);
+  return dbPool.write('createSupplier', supplierData);
 });
 
 ipcMain.handle('suppliers:update', async (_, { id, data }) => {
-  return dbManager.updateSupplier(id, data);
+  return dbPool.write('updateSupplier', id, data);
 });
 
 ipcMain.handle('suppliers:delete', async (_, id) => {
-  return dbManager.deleteSupplier(id);
+  return dbPool.write('deleteSupplier', id);
 });
 
 // Purchases
 ipcMain.handle('purchases:list', async (_, filters) => {
-  return dbManager.getPurchases(filters);
+  return dbPool.read('getPurchases', filters);
 });
 
 ipcMain.handle('purchases:getById', async (_, id) => {
@@ -263,28 +294,28 @@ ipcMain.handle('purchases:getById', async (_, id) => {
 });
 
 ipcMain.handle('purchases:create', async (_, purchaseData) => {
-  return dbManager.createPurchase(purchaseData);
+  return dbPool.write('createPurchase', purchaseData);
 });
 
 ipcMain.handle('purchases:addItem', async (_, { purchaseId, itemData }) => {
-  return dbManager.addPurchaseItem(purchaseId, itemData);
+  return dbPool.write('addPurchaseItem', purchaseId, itemData);
 });
 
 ipcMain.handle('purchases:complete', async (_, { purchaseId, receivedBy }) => {
-  return dbManager.completePurchase(purchaseId, receivedBy);
+  return dbPool.write('completePurchase', purchaseId, receivedBy);
 });
 
 // Customers
 ipcMain.handle('customers:list', async (_, filters) => {
-  return dbManager.getCustomers(filters);
+  return dbPool.read('getCustomers', filters);
 });
 
 ipcMain.handle('customers:create', async (_, customerData) => {
-  return dbManager.createCustomer(customerData);
+  return dbPool.write('createCustomer', customerData);
 });
 
 ipcMain.handle('customers:update', async (_, { id, data }) => {
-  return dbManager.updateCustomer(id, data);
+  return dbPool.write('updateCustomer', id, data);
 });
 
 ipcMain.handle('customers:getById', async (_, id) => {
@@ -292,20 +323,20 @@ ipcMain.handle('customers:getById', async (_, id) => {
 });
 
 ipcMain.handle('customers:delete', async (_, id) => {
-  return dbManager.deleteCustomer(id);
+  return dbPool.write('deleteCustomer', id);
 });
 
 ipcMain.handle('customers:getPurchaseHistory', async (_, { customerId, filters }) => {
-  return dbManager.getCustomerPurchaseHistory(customerId, filters);
+  return dbPool.read('getCustomerPurchaseHistory', customerId, filters);
 });
 
 ipcMain.handle('customers:getStats', async (_, customerId) => {
-  return dbManager.getCustomerStats(customerId);
+  return dbPool.read('getCustomerStats', customerId);
 });
 
 // Loyalty Points (Fidelidade)
 ipcMain.handle('loyalty:addPoints', async (_, { customerId, saleAmount, saleId }) => {
-  return dbManager.addLoyaltyPoints(customerId, saleAmount, saleId);
+  return dbPool.write('addLoyaltyPoints', customerId, saleAmount, saleId);
 });
 
 ipcMain.handle('loyalty:getCustomerLoyalty', async (_, customerId) => {
@@ -313,7 +344,7 @@ ipcMain.handle('loyalty:getCustomerLoyalty', async (_, customerId) => {
 });
 
 ipcMain.handle('loyalty:fixCustomerPoints', async (_, customerCode) => {
-  return dbManager.fixCustomerLoyaltyPoints(customerCode);
+  return dbPool.write('fixCustomerLoyaltyPoints', customerCode);
 });
 
 // Rate limiter para evitar chamadas excessivas
@@ -330,7 +361,7 @@ ipcMain.handle('loyalty:setCustomerPoints', async (_, { customerCode, points })
   }
   
   loyaltyCallCache.set(customerCode, now);
-  return dbManager.setCustomerLoyaltyPoints(customerCode, points);
+  return dbPool.write('setCustomerLoyaltyPoints', customerCode, points);
 });
 
 // Users (Usuários)
@@ -339,11 +370,11 @@ ipcMain.handle('users:list', async (_, filters) => {
 });
 
 ipcMain.handle('users:create', async (_, userData) => {
-  return dbManager.createUser(userData);
+  return dbPool.write('createUser', userData);
 });
 
 ipcMain.handle('users:update', async (_, { id, data }) => {
-  return dbManager.updateUser(id, data);
+  return dbPool.write('updateUser', id, data);
 });
 
 ipcMain.handle('users:getById', async (_, id) => {
@@ -359,11 +390,11 @@ ipcMain.handle('users:getByEmail', async (_, email) => {
 });
 
 ipcMain.handle('users:resetPassword', async (_, { id, newPasswordHash, originalPassword }) => {
-  return dbManager.resetUserPassword(id, newPasswordHash, originalPassword);
+  return dbPool.write('resetUserPassword', id, newPasswordHash, originalPassword);
 });
 
 ipcMain.handle('users:delete', async (_, id) => {
-  return dbManager.deleteUser(id);
+  return dbPool.write('deleteUser', id);
 });
 
 ipcMain.handle('users:hashPassword', async (_, password) => {
@@ -382,16 +413,16 @@ ipcMain.handle('users:getUnsyncedUsers', async () => {
 });
 
 ipcMain.handle('users:queueForSync', async (_, { userId, password }) => {
-  return dbManager.queueUserForSync(userId, password);
+  return dbPool.write('queueUserForSync', userId, password);
 });
 
 ipcMain.handle('users:queueAllPendingForSync', async () => {
-  return dbManager.queueAllPendingUsersForSync();
+  return dbPool.write('queueAllPendingUsersForSync');
 });
 
 ipcMain.handle('users:syncNow', async (_, { userId, password }) => {
   // Adiciona à fila e força sync imediato
-  const result = dbManager.queueUserForSync(userId, password);
+  const result = await dbPool.write('queueUserForSync', userId, password);
   if (syncManager) {
     await syncManager.syncNow();
   }
@@ -400,7 +431,7 @@ ipcMain.handle('users:syncNow', async (_, { userId, password }) => {
 
 // Debts (Dívidas/Vales)
 ipcMain.handle('debts:create', async (_, data) => {
-  return dbManager.createDebt(data);
+  return dbPool.write('createDebt', data);
 });
 
 ipcMain.handle('debts:list', async (_, filters) => {
@@ -415,7 +446,7 @@ ipcMain.handle('debts:list', async (_, filters) => {
     // Continua mesmo com erro de sync - retorna dados locais
   }
   
-  return dbManager.getDebts(filters);
+  return dbPool.read('getDebts', filters);
 });
 
 ipcMain.handle('debts:getById', async (_, id) => {
@@ -423,11 +454,11 @@ ipcMain.handle('debts:getById', async (_, id) => {
 });
 
 ipcMain.handle('debts:pay', async (_, data) => {
-  return dbManager.payDebt(data);
+  return dbPool.write('payDebt', data);
 });
 
 ipcMain.handle('debts:cancel', async (_, { debtId, reason }) => {
-  return dbManager.cancelDebt(debtId, reason);
+  return dbPool.write('cancelDebt', debtId, reason);
 });
 
 ipcMain.handle('debts:getCustomerStats', async (_, customerId) => {
@@ -446,40 +477,40 @@ ipcMain.handle('debts:getCustomersPendingDebts', async (_, customerIds) => {
 
 // Inventory
 ipcMain.handle('inventory:list', async (_, filters) => {
-  return dbManager.getInventory(filters);
+  return dbPool.read('getInventory', filters);
 });
 
 ipcMain.handle('inventory:update', async (_, { productId, branchId, quantity, reason }) => {
-  return dbManager.updateInventory(productId, branchId, quantity, reason);
+  return dbPool.write('updateInventory', productId, branchId, quantity, reason);
 });
 
 // Inventory Advanced
 ipcMain.handle('inventory:registerLoss', async (_, { productId, branchId, quantity, reason, responsible, notes }) => {
-  return dbManager.registerLoss(productId, branchId, quantity, reason, responsible, notes);
+  return dbPool.write('registerLoss', productId, branchId, quantity, reason, responsible, notes);
 });
 
 ipcMain.handle('inventory:registerBreakage', async (_, { productId, branchId, quantity, reason, responsible, notes }) => {
-  return dbManager.registerBreakage(productId, branchId, quantity, reason, responsible, notes);
+  return dbPool.write('registerBreakage', productId, branchId, quantity, reason, responsible, notes);
 });
 
 ipcMain.handle('inventory:manualAdjustment', async (_, { productId, branchId, quantity, reason, responsible, notes }) => {
-  return dbManager.manualAdjustment(productId, branchId, quantity, reason, responsible, notes);
+  return dbPool.write('manualAdjustment', productId, branchId, quantity, reason, responsible, notes);
 });
 
 ipcMain.handle('inventory:adjustBoxes', async (_, { productId, branchId, boxes, reason, responsible, notes }) => {
-  return dbManager.adjustBoxes(productId, branchId, boxes, reason, responsible, notes);
+  return dbPool.write('adjustBoxes', productId, branchId, boxes, reason, responsible, notes);
 });
 
 ipcMain.handle('inventory:calculateConsumption', async (_, { productId, branchId }) => {
-  return dbManager.calculateConsumptionAndForecast(productId, branchId);
+  return dbPool.write('calculateConsumptionAndForecast', productId, branchId);
 });
 
 ipcMain.handle('inventory:getMovements', async (_, filters) => {
-  return dbManager.getStockMovements(filters);
+  return dbPool.read('getStockMovements', filters);
 });
 
 ipcMain.handle('inventory:validateConsistency', async (_, { productId, branchId }) => {
-  return dbManager.validateInventoryConsistency(productId, branchId);
+  return dbPool.write('validateInventoryConsistency', productId, branchId);
 });
 
 // Cash Box - 🔴 CORREÇÃO: Verificação de servidor para multi-PC
@@ -493,11 +524,11 @@ ipcMain.handle('cashbox:open', async (_, data) => {
     return result.cashBox;
   }
   // Fallback para modo offline puro
-  return dbManager.openCashBox(data);
+  return dbPool.write('openCashBox', data);
 });
 
 ipcMain.handle('cashbox:close', async (_, { cashBoxId, closingData }) => {
-  return dbManager.closeCashBox(cashBoxId, closingData);
+  return dbPool.write('closeCashBox', cashBoxId, closingData);
 });
 
 ipcMain.handle('cashbox:getCurrent', async (_, branchId) => {
@@ -509,16 +540,16 @@ ipcMain.handle('cashbox:getCurrent', async (_, branchId) => {
 });
 
 ipcMain.handle('cashbox:getHistory', async (_, filters) => {
-  return dbManager.getCashBoxHistory(filters);
+  return dbPool.read('getCashBoxHistory', filters);
 });
 
 // Tables Management (Gestão de Mesas)
 ipcMain.handle('tables:create', async (_, data) => {
-  return dbManager.createTable(data);
+  return dbPool.write('createTable', data);
 });
 
 ipcMain.handle('tables:update', async (_, { id, data }) => {
-  return dbManager.updateTable(id, data);
+  return dbPool.write('updateTable', id, data);
 });
 
 ipcMain.handle('tables:list', async (_, filters) => {
@@ -530,16 +561,16 @@ ipcMain.handle('tables:getById', async (_, id) => {
 });
 
 ipcMain.handle('tables:getOverview', async (_, branchId) => {
-  return dbManager.getTablesOverview(branchId);
+  return dbPool.read('getTablesOverview', branchId);
 });
 
 // Table Sessions
 ipcMain.handle('tableSessions:open', async (_, data) => {
-  return dbManager.openTableSession(data);
+  return dbPool.write('openTableSession', data);
 });
 
 ipcMain.handle('tableSessions:close', async (_, data) => {
-  return dbManager.closeTableSession(data);
+  return dbPool.write('closeTableSession', data);
 });
 
 ipcMain.handle('tableSessions:getById', async (_, id) => {
@@ -547,23 +578,23 @@ ipcMain.handle('tableSessions:getById', async (_, id) => {
 });
 
 ipcMain.handle('tableSessions:list', async (_, filters) => {
-  return dbManager.getTableSessions(filters);
+  return dbPool.read('getTableSessions', filters);
 });
 
 ipcMain.handle('tableSessions:transfer', async (_, data) => {
-  return dbManager.transferTableSession(data);
+  return dbPool.write('transferTableSession', data);
 });
 
 ipcMain.handle('tableSessions:transferCustomers', async (_, data) => {
-  return dbManager.transferTableCustomers(data);
+  return dbPool.write('transferTableCustomers', data);
 });
 
 ipcMain.handle('tableSessions:merge', async (_, data) => {
-  return dbManager.mergeTableSessions(data);
+  return dbPool.write('mergeTableSessions', data);
 });
 
 ipcMain.handle('tableSessions:split', async (_, data) => {
-  return dbManager.splitMergedTable(data);
+  return dbPool.write('splitMergedTable', data);
 });
 
 ipcMain.handle('tableSessions:getActions', async (_, sessionId) => {
@@ -572,57 +603,58 @@ ipcMain.handle('tableSessions:getActions', async (_, sessionId) => {
 
 // Table Customers
 ipcMain.handle('tableCustomers:add', async (_, data) => {
-  return dbManager.addCustomerToTable(data);
+  return dbPool.write('addCustomerToTable', data);
 });
 
 // Table Orders
 ipcMain.handle('tableOrders:add', async (_, data) => {
   console.log('[IPC main.ts] tableOrders:add recebido:', data);
-  const result = dbManager.addTableOrder(data);
+  const result = await dbPool.write('addTableOrder', data);
   console.log('[IPC main.ts] tableOrders:add retornando:', result);
   return result;
 });
 
 ipcMain.handle('tableOrders:cancel', async (_, data) => {
-  return dbManager.cancelTableOrder(data);
+  return dbPool.write('cancelTableOrder', data);
 });
 
 ipcMain.handle('tableOrders:transfer', async (_, data) => {
-  return dbManager.transferTableOrder(data);
+  return dbPool.write('transferTableOrder', data);
 });
 
 ipcMain.handle('tableOrders:split', async (_, data) => {
-  return dbManager.splitTableOrder(data);
+  return dbPool.write('splitTableOrder', data);
 });
 
 // Table Payments
 ipcMain.handle('tablePayments:processCustomer', async (_, data) => {
-  return dbManager.processTableCustomerPayment(data);
+  return dbPool.write('processTableCustomerPayment', data);
 });
 
 ipcMain.handle('tablePayments:processSession', async (_, data) => {
-  return dbManager.processTableSessionPayment(data);
+  return dbPool.write('processTableSessionPayment', data);
 });
 
 ipcMain.handle('tablePayments:clearPaidOrders', async (_, data) => {
-  return dbManager.clearPaidOrders(data);
+  return dbPool.write('clearPaidOrders', data);
 });
 ipcMain.handle('cashbox:getById', async (_, id) => {
   return dbManager.getCashBoxById(id);
 });
 
 ipcMain.handle('cashbox:updateTotals', async (_, { cashBoxId, saleTotal, paymentMethod }) => {
-  return dbManager.updateCashBoxTotals(cashBoxId, saleTotal, paymentMethod);
+  return dbPool.write('updateCashBoxTotals', cashBoxId, saleTotal, paymentMethod);
 });
 
 // Database Migrations
 ipcMain.handle('database:fixUnitCost', async () => {
-  return dbManager.fixUnitCostInSaleItems();
+  return dbPool.write('fixUnitCostInSaleItems');
 });
 
 // Sync
 ipcMain.handle('sync:start', async () => {
-  await syncManager.start();
+  // Primeira sincronização (pull crítico, heartbeat) não segura o login nem o PDV
+  startupProfile.defer('sync', () => syncManager.start());
   return { success: true };
 });
 
@@ -651,10 +683,10 @@ ipcMain.handle('sync:forcePush', async () => {
 // Re-sincronizar mesas não sincronizadas e re-tentar vendas falhadas
 ipcMain.handle('sync:resyncTablesAndRetryFailedSales', async () => {
   // 1. Adicionar mesas não sincronizadas à fila
-  const tablesResynced = dbManager.resyncUnsyncedTables();
+  const tablesResynced = await dbPool.write('resyncUnsyncedTables');
   
   // 2. Re-tentar vendas de mesa que falharam
-  const failedSales = dbManager.retryFailedTableSales();
+  const failedSales = await dbPool.write('retryFailedTableSales');
   
   // 3. Forçar push
   await syncManager.forcePush();
@@ -678,7 +710,7 @@ ipcMain.handle('sync:fullPullFromServer', async () => {
 
 // Adiciona TODAS as entidades locais à fila de sincronização (para Railway vazio)
 ipcMain.handle('sync:queueFullResync', async () => {
-  const result = dbManager.queueFullResync();
+  const result = await dbPool.write('queueFullResync');
   // Iniciar sincronização imediata após enfileirar
   syncManager.syncNow();
   return result;
@@ -686,17 +718,17 @@ ipcMain.handle('sync:queueFullResync', async () => {
 
 // Obter estatísticas da fila de sincronização
 ipcMain.handle('sync:getQueueStats', async () => {
-  return dbManager.getSyncQueueStats();
+  return dbPool.read('getSyncQueueStats');
 });
 
 // 🔍 Obter relatório de saúde da sincronização
 ipcMain.handle('sync:getHealthReport', async () => {
-  return dbManager.getSyncHealthReport();
+  return dbPool.read('getSyncHealthReport');
 });
 
 // 🔍 Obter validação de sincronização de produtos
 ipcMain.handle('sync:getProductValidation', async () => {
-  return dbManager.getProductSyncValidation();
+  return dbPool.read('getProductSyncValidation');
 });
 
 // Verifica se banco local está vazio
@@ -985,7 +1017,7 @@ ipcMain.handle('autoBackup:create', async () => {
   if (!backupManager) {
     return { success: false, error: 'BackupManager não inicializado' };
   }
-  const backupPath = backupManager.createBackup('manual');
+  const backupPath = await backupManager.createBackup('manual');
   return { success: !!backupPath, path: backupPath };
 });
 
@@ -997,12 +1029,35 @@ ipcMain.handle('autoBackup:list', async () => {
   return backupManager.listBackups();
 });
 
+// Depois de um restore do BackupManager: conexão principal, workers e ETags do sync
+async function reopenAfterRestore() {
+  try {
+    await dbManager.reopen();
+  } catch (error) {
+    console.error('❌ Erro ao reabrir o banco após restore:', error);
+    return;
+  }
+  dbPool?.start();
+  syncManager?.clearResponseCache();
+}
+
 // Restaurar backup
 ipcMain.handle('autoBackup:restore', async (_, backupPath: string) => {
   if (!backupManager) {
     return { success: false, error: 'BackupManager não inicializado' };
   }
-  const success = backupManager.restoreBackup(backupPath);
+  // O restore copia outro arquivo por cima do banco: nenhuma conexão pode
+  // continuar aberta nele (workers e conexão principal reabrem depois)
+  if (dbPool) {
+    await dbPool.stop();
+  }
+  dbManager.close();
+  let success = false;
+  try {
+    success = await backupManager.restoreBackup(backupPath);
+  } finally {
+    await reopenAfterRestore();
+  }
   return { success };
 });
 
@@ -1067,10 +1122,7 @@ ipcMain.handle('dlq:retry', async (_, entityId: string) => {
     return { success: false, error: 'Database não inicializado' };
   }
   try {
-    dbManager.prepare(`
-      UPDATE sync_queue SET retry_count = 0, last_error = NULL 
-      WHERE entity_id = ?
-    `).run(entityId);
+    await dbPool.write('resetSyncQueueRetries', entityId);
     return { success: true };
   } catch (error: any) {
     console.error('Erro ao reprocessar item DLQ:', error);
@@ -1084,7 +1136,7 @@ ipcMain.handle('dlq:remove', async (_, entityId: string) => {
     return { success: false, error: 'Database não inicializado' };
   }
   try {
-    dbManager.prepare(`DELETE FROM sync_queue WHERE entity_id = ?`).run(entityId);
+    await dbPool.write('removeSyncQueueEntity', entityId);
     return { success: true };
   } catch (error: any) {
     console.error('Erro ao remover item DLQ:', error);
@@ -1098,8 +1150,8 @@ ipcMain.handle('dlq:clear', async () => {
     return { success: false, error: 'Database não inicializado' };
   }
   try {
-    const result = dbManager.prepare(`DELETE FROM sync_queue WHERE retry_count >= 10`).run();
-    return { success: true, deletedCount: result.changes };
+    const deletedCount = await dbPool.write('clearExhaustedSyncItems', 10);
+    return { success: true, deletedCount };
   } catch (error: any) {
     console.error('Erro ao limpar DLQ:', error);
     return { success: false, error: error.message };
@@ -1140,15 +1192,25 @@ ipcMain.handle('backup:create', async (_, options) => {
 });
 
 ipcMain.handle('backup:restore', async (_, filePath) => {
-  return await dbManager.restoreBackup(filePath);
+  // O restore troca o arquivo do banco: os workers fecham as conexões antes
+  // e reabrem no banco restaurado
+  if (dbPool) {
+    await dbPool.stop();
+  }
+  try {
+    return await dbManager.restoreBackup(filePath);
+  } finally {
+    dbPool?.start();
+    syncManager?.clearResponseCache();
+  }
 });
 
 ipcMain.handle('backup:history', async (_, limit) => {
-  return dbManager.getBackupHistory(limit || 20);
+  return dbPool.read('getBackupHistory', limit || 20);
 });
 
 ipcMain.handle('backup:delete', async (_, { id, deleteFile }) => {
-  return dbManager.deleteBackup(id, deleteFile !== false);
+  return dbPool.write('deleteBackup', id, deleteFile !== false);
 });
 
 ipcMain.handle('backup:selectFile', async () => {
@@ -1207,7 +1269,7 @@ ipcMain.handle('reports:sales', async (_, { startDate, endDate, branchId }) => {
       }
       
       // Criar vendas de exemplo se necessário (apenas para testes)
-      dbManager.seedSampleSales();
+      await dbPool.write('seedSampleSales');
       
       // Converter strings de data para objetos Date
       const start = new Date(startDate);
@@ -1215,8 +1277,8 @@ ipcMain.handle('reports:sales', async (_, { startDate, endDate, branchId }) => {
       
       console.log('📅 Datas convertidas:', { start: start.toISOString(), end: end.toISOString() });
       
-      // Método síncrono, não precisa de await
-      const localData = dbManager.getSalesReport(start, end, branchId);
+      // Consulta pesada: roda num worker de leitura
+      const localData = await dbPool.read('getSalesReport', start, end, branchId);
       console.log('📊 Dados locais encontrados:', localData.length, 'registros');
       
       if (localData.length > 0) {
@@ -1303,8 +1365,8 @@ ipcMain.handle('reports:inventory', async (_, { branchId }) => {
         throw new Error('DatabaseManager não está inicializado');
       }
       
-      // Método síncrono, não precisa de await
-      const localData = dbManager.getInventoryReport(branchId);
+      // Consulta pesada: roda num worker de leitura
+      const localData = await dbPool.read('getInventoryReport', branchId);
       console.log('📦 Itens de estoque encontrados:', localData.length);
       
       // Transformar dados do SQLite para formato esperado
@@ -1441,7 +1503,7 @@ ipcMain.handle('printer:print', async (_, { type, data }) => {
 
 // Obter contagem de dados para preview
 ipcMain.handle('admin:getLocalDataCounts', async () => {
-  return dbManager.getDataCountsForReset();
+  return dbPool.read('getDataCountsForReset');
 });
 
 // Zerar dados locais (Electron)
@@ -1452,7 +1514,7 @@ ipcMain.handle('admin:resetLocalData', async (_, { adminUserId, confirmationCode
   }
   
   console.log(`🔐 Reset local solicitado por: ${adminUserId}`);
-  return dbManager.resetLocalData(adminUserId);
+  return dbPool.write('resetLocalData', adminUserId);
 });
 
 // Obter contagem de dados do servidor
@@ -13,6 +13,7 @@ const api = {
     create: (data: any) => ipcRenderer.invoke('sales:create', data),
     addItem: (saleId: string, itemData: any) => ipcRenderer.invoke('sales:addItem', { saleId, itemData }),
     addPayment: (saleId: string, paymentData: any) => ipcRenderer.invoke('sales:addPayment', { saleId, paymentData }),
+    record: (data: { sale: any; items: any[]; payments?: any[] }) => ipcRenderer.invoke('sales:record', data),
     list: (filters: any) => ipcRenderer.invoke('sales:list', filters),
     getById: (saleId: string) => ipcRenderer.invoke('sales:getById', saleId),
   },
@@ -0,0 +1,152 @@
+import * as fs from 'fs';
+import * as path from 'path';
+import { performance } from 'perf_hooks';
+
+interface StartupPhase {
+  name: string;
+  startMs: number;
+  durationMs: number;
+  error?: string;
+}
+
+type DeferredTask = { name: string; run: () => unknown };
+
+// Espera após o primeiro paint antes das tarefas pesadas (backup, sync)
+const DEFERRED_DELAY_MS = 2000;
+// Se a janela nunca pintar (erro no renderer), as tarefas rodam assim mesmo
+const DEFERRED_FALLBACK_MS = 15000;
+// Linhas mantidas no log (uma ou duas por inicialização)
+const MAX_LOG_LINES = 200;
+
+/**
+ * Inicialização em etapas do processo principal.
+ *
+ * Etapa crítica: banco, janela e handlers IPC do PDV. Etapa adiada: backup
+ * de startup, primeira sincronização (pull de entidades críticas, heartbeat),
+ * liberada alguns segundos após o primeiro paint e executada uma tarefa por
+ * vez, cedendo o event loop entre elas.
+ *
+ * Os tempos são medidos desde o início do processo (performance.now) e
+ * gravados em JSON Lines em startup-profile.log.
+ */
+export class StartupProfile {
+  private readonly startedAt = new Date(Date.now() - performance.now()).toISOString();
+  private phases: StartupPhase[] = [];
+  private marks: Record<string, number> = {};
+  private deferredQueue: DeferredTask[] = [];
+  private deferredOpen = false;
+  private deferredRunning = false;
+  private deferredTimer: NodeJS.Timeout | null = null;
+  private written = false;
+
+  constructor(private logPath: string) {}
+
+  /**
+   * Mede uma etapa (síncrona ou assíncrona). Erros são registrados e relançados.
+   */
+  async measure<T>(name: string, fn: () => T | Promise<T>): Promise<T> {
+    const startMs = performance.now();
+    const phase: StartupPhase = { name, startMs: round(startMs), durationMs: 0 };
+    this.phases.push(phase);
+    try {
+      return await fn();
+    } catch (error) {
+      phase.error = String(error);
+      throw error;
+    } finally {
+      phase.durationMs = round(performance.now() - startMs);
+    }
+  }
+
+  /**
+   * Marco instantâneo (primeiro paint, primeira venda). Só o primeiro conta.
+   */
+  mark(name: string) {
+    if (this.marks[name] === undefined) {
+      this.marks[name] = round(performance.now());
+      if (name === 'first-sale' && this.written) {
+        this.appendLine({ startedAt: this.startedAt, marks: { 'first-sale': this.marks[name] } });
+      }
+    }
+  }
+
+  /**
+   * Agenda uma tarefa para a etapa adiada. Depois que a etapa foi liberada,
+   * novas tarefas entram na mesma fila e rodam na próxima volta do event loop.
+   */
+  defer(name: string, run: () => unknown) {
+    this.deferredQueue.push({ name, run });
+    if (this.deferredOpen) {
+      this.drainDeferred();
+    } else if (!this.deferredTimer) {
+      this.deferredTimer = setTimeout(() => this.releaseDeferred(), DEFERRED_FALLBACK_MS);
+    }
+  }
+
+  /**
+   * Chamado no primeiro paint da janela: libera a etapa adiada após DEFERRED_DELAY_MS.
+   */
+  firstPaint() {
+    this.mark('first-paint');
+    if (this.deferredOpen) return;
+    if (this.deferredTimer) {
+      clearTimeout(this.deferredTimer);
+    }
+    this.deferredTimer = setTimeout(() => this.releaseDeferred(), DEFERRED_DELAY_MS);
+  }
+
+  private releaseDeferred() {
+    if (this.deferredOpen) return;
+    this.deferredOpen = true;
+    this.deferredTimer = null;
+    this.mark('deferred-start');
+    this.drainDeferred();
+  }
+
+  private async drainDeferred() {
+    if (this.deferredRunning) return;
+    this.deferredRunning = true;
+    try {
+      while (this.deferredQueue.length > 0) {
+        const task = this.deferredQueue.shift()!;
+        // Cede o event loop: IPC do PDV pendente roda antes da próxima tarefa
+        await new Promise(resolve => setImmediate(resolve));
+        try {
+          await this.measure(task.name, task.run);
+        } catch (error) {
+          console.error(`⚠️ Erro na tarefa adiada de startup (${task.name}):`, error);
+        }
+      }
+    } finally {
+      this.deferredRunning = false;
+    }
+    if (!this.written) {
+      this.written = true;
+      this.write();
+    }
+  }
+
+  private write() {
+    const summary = this.phases.map(phase => `${phase.name} ${phase.durationMs}ms`).join(', ');
+    console.log(`⏱️ Startup: primeiro paint em ${this.marks['first-paint'] ?? '-'}ms (${summary})`);
+    this.appendLine({ startedAt: this.startedAt, marks: this.marks, phases: this.phases });
+  }
+
+  private appendLine(entry: object) {
+    try {
+      fs.mkdirSync(path.dirname(this.logPath), { recursive: true });
+      let lines: string[] = [];
+      if (fs.existsSync(this.logPath)) {
+        lines = fs.readFileSync(this.logPath, 'utf-8').split('\n').filter(Boolean);
+      }
+      lines.push(JSON.stringify(entry));
+      fs.writeFileSync(this.logPath, lines.slice(-MAX_LOG_LINES).join('\n') + '\n');
+    } catch (error) {
+      console.warn('⚠️ Não foi possível gravar o perfil de startup:', error);
+    }
+  }
+}
+
+function round(ms: number): number {
+  return Math.round(ms * 10) / 10;
+}
@@ -1,15 +1,10 @@
-import axios, { AxiosInstance, AxiosError } from 'axios';
+import axios, { AxiosInstance, AxiosError, AxiosRequestConfig } from 'axios';
 import { DatabaseManager } from '../database/manager';
+import type { DatabaseWorkerPool, ManagerMethod } from '../database/pool';
 import { BrowserWindow } from 'electron';
 import { tryNormalizePaymentMethod, isValidPaymentMethod, PaymentMethod } from '../shared/payment-methods';
-
-interface SyncItem {
-  id: string;
-  entity: string;
-  operation: 'create' | 'update' | 'delete';
-  entity_id?: string;
-  data: string;
-}
+import { SyncMerger } from './merge';
+import type { SyncItem } from './merge';
 
 /**
  * Configurações otimizadas para Railway Free Plan
@@ -72,11 +67,18 @@ export class SyncManager {
   private criticalSyncInterval: NodeJS.Timeout | null = null;
   // 🔴 CORREÇÃO F5: Contador para sync de settings (menos frequente)
   private _settingsSyncCounter: number = 0;
+  // Cache de respostas por ETag (GET condicional) - evita re-download de listas sem mudanças
+  private responseCache = new Map<string, { etag: string; data: any }>();
+  // Merge do pull no processo principal (usado enquanto não há worker de escrita)
+  private merger: SyncMerger;
+  // Workers do SQLite: gravações e merge vão para o worker de escrita
+  private dbPool: DatabaseWorkerPool | null = null;
 
   constructor(
     private dbManager: DatabaseManager,
     private apiUrl: string
   ) {
+    this.merger = new SyncMerger(dbManager, (event, data) => this.emit(event, data));
     this.apiClient = axios.create({
       baseURL: apiUrl,
       timeout: RAILWAY_FREE_CONFIG.REQUEST_TIMEOUT_MS,
@@ -116,6 +118,46 @@ export class SyncManager {
     this.mainWindow = window;
   }
 
+  /**
+   * Passa a gravar pelo worker de escrita do pool (fila de sync, marcações de
+   * sincronizado e o merge do pull) em vez da conexão do processo principal
+   */
+  setDatabasePool(pool: DatabaseWorkerPool) {
+    this.dbPool = pool;
+    pool.onEvent((event, data) => this.emit(event, data));
+  }
+
+  /**
+   * Executa um método de escrita do DatabaseManager no worker de escrita
+   * (ou na conexão principal, sem pool)
+   */
+  private async write<K extends ManagerMethod>(
+    method: K,
+    ...args: Parameters<DatabaseManager[K]>
+  ): Promise<Awaited<ReturnType<DatabaseManager[K]>>> {
+    if (this.dbPool) {
+      return this.dbPool.write(method, ...args);
+    }
+    return (this.dbManager as any)[method](...args);
+  }
+
+  /**
+   * Mescla dados recebidos do servidor com dados locais (ver sync/merge.ts)
+   */
+  private async mergeEntityData(entityName: string, items: any[]) {
+    if (this.dbPool) {
+      return this.dbPool.merge(entityName, items, this.merger);
+    }
+    return this.merger.mergeEntityData(entityName, items);
+  }
+
+  /**
+   * Descarta os ETags guardados (o banco local foi trocado por um restore)
+   */
+  clearResponseCache() {
+    this.responseCache.clear();
+  }
+
   /**
    * Retorna o token de autenticação atual
    */
@@ -207,6 +249,37 @@ export class SyncManager {
     throw lastError;
   }
 
+  /**
+   * GET condicional: envia If-None-Match com o ETag da última resposta
+   * e reaproveita o corpo em cache quando o servidor responde 304.
+   */
+  private async conditionalGet(
+    url: string,
+    config: AxiosRequestConfig = {}
+  ): Promise<{ data: any; notModified: boolean }> {
+    const cached = this.responseCache.get(url);
+    const response = await this.apiClient.get(url, {
+      ...config,
+      headers: {
+        ...(config.headers || {}),
+        ...(cached ? { 'If-None-Match': cached.etag } : {}),
+      },
+      validateStatus: status => (status >= 200 && status < 300) || status === 304,
+    });
+
+    if (response.status === 304 && cached) {
+      return { data: cached.data, notModified: true };
+    }
+
+    const etag = response.headers?.etag;
+    if (etag) {
+      this.responseCache.set(url, { etag, data: response.data });
+    } else {
+      this.responseCache.delete(url);
+    }
+    return { data: response.data, notModified: false };
+  }
+
   /**
    * Verifica se o erro indica um possível cold start do Railway
    */
@@ -305,6 +378,8 @@ export class SyncManager {
     }
 
     const stats: Record<string, number> = {};
+    // Download completo substitui os dados locais: ETags antigos não valem mais
+    this.responseCache.clear();
     
     // Entidades a baixar na ordem correta (respeitando dependências)
     const entities = [
@@ -471,7 +546,7 @@ export class SyncManager {
     }
 
     // Atualizar data da última sincronização
-    this.dbManager.setLastSyncDate(new Date());
+    await this.write('setLastSyncDate', new Date());
     
     console.log('📊 RESUMO DO DOWNLOAD COMPLETO:');
     for (const [entityName, count] of Object.entries(stats)) {
@@ -568,7 +643,7 @@ export class SyncManager {
           const passwordHash = await bcrypt.hash(credentials.password, 10);
           
           // Atualizar senha e limpar flag
-          this.dbManager.updateUserPasswordLocal(localUser.id, passwordHash);
+          await this.write('updateUserPasswordLocal', localUser.id, passwordHash);
           
           console.log('✅ Senha local atualizada! Usuário pode fazer login offline agora.');
         }
@@ -637,7 +712,7 @@ export class SyncManager {
         }
         
         // Atualizar último login
-        this.dbManager.updateUserLastLogin(user.id);
+        await this.write('updateUserLastLogin', user.id);
         
         // Parse allowed_tabs do banco de dados
         let allowedTabs: string[] = [];
@@ -681,6 +756,7 @@ export class SyncManager {
       console.error('Erro ao fazer logout:', error);
     } finally {
       this.token = null;
+      this.responseCache.clear();
       await this.stop();
     }
   }
@@ -745,7 +821,7 @@ export class SyncManager {
           console.log('❌ Já existe um caixa aberto nesta filial:', serverBox.id);
           
           // Sincronizar o caixa do servidor para o local
-          this.syncServerCashBoxToLocal(serverBox);
+          await this.syncServerCashBoxToLocal(serverBox);
           
           return {
             success: false,
@@ -767,7 +843,7 @@ export class SyncManager {
         console.log('✅ Caixa criado no servidor:', serverCashBox.id);
         
         // 2. Criar localmente com mesmo ID
-        const localCashBox = this.dbManager.createCashBoxFromServer({
+        const localCashBox = await this.write('createCashBoxFromServer', {
           id: serverCashBox.id,
           boxNumber: serverCashBox.boxNumber || data.boxNumber,
           branchId: serverCashBox.branchId || data.branchId,
@@ -796,7 +872,7 @@ export class SyncManager {
     
     // 3. Modo Offline: Criar localmente
     console.log('📦 Abrindo caixa localmente (modo offline)...');
-    const localCashBox = this.dbManager.openCashBox(data);
+    const localCashBox = await this.write('openCashBox', data);
     
     return { success: true, cashBox: localCashBox };
   }
@@ -805,7 +881,7 @@ export class SyncManager {
    * Sincroniza caixa do servidor para o banco local
    * 🔴 CORREÇÃO: Mapear TODOS os campos do servidor para evitar NaN/Invalid Date
    */
-  private syncServerCashBoxToLocal(serverBox: any) {
+  private async syncServerCashBoxToLocal(serverBox: any) {
     try {
       // Mapear campos do servidor (camelCase) para local (snake_case)
       const mappedData = {
@@ -832,10 +908,10 @@ export class SyncManager {
       
       if (existingLocal) {
         console.log('📦 Caixa já existe localmente, atualizando...');
-        this.dbManager.updateCashBoxFromServer(serverBox.id, mappedData);
+        await this.write('updateCashBoxFromServer', serverBox.id, mappedData);
       } else {
         console.log('📦 Criando caixa local a partir do servidor...');
-        this.dbManager.createCashBoxFromServer(mappedData);
+        await this.write('createCashBoxFromServer', mappedData);
       }
     } catch (error) {
       console.error('❌ Erro ao sincronizar caixa do servidor:', error);
@@ -855,7 +931,7 @@ export class SyncManager {
         
         if (serverBox && serverBox.status === 'open') {
           // Sincronizar para local (salva no SQLite com snake_case)
-          this.syncServerCashBoxToLocal(serverBox);
+          await this.syncServerCashBoxToLocal(serverBox);
           
           // 🔴 CORREÇÃO: Retornar do banco local (snake_case) em vez do servidor (camelCase)
           // O frontend espera snake_case: opening_cash, opened_at, etc.
@@ -909,12 +985,12 @@ export class SyncManager {
     
     // Re-sincronizar mesas não sincronizadas e retry de vendas falhadas
     try {
-      const tablesResynced = this.dbManager.resyncUnsyncedTables();
+      const tablesResynced = await this.write('resyncUnsyncedTables');
       if (tablesResynced > 0) {
         console.log(`📋 ${tablesResynced} mesas adicionadas à fila de sync`);
       }
       
-      const salesRetried = this.dbManager.retryFailedTableSales();
+      const salesRetried = await this.write('retryFailedTableSales');
       if (salesRetried > 0) {
         console.log(`🔁 ${salesRetried} vendas de mesa marcadas para retry`);
       }
@@ -992,7 +1068,7 @@ export class SyncManager {
         
         if (!localBox) {
           console.log('⚡ Novo caixa detectado no servidor, sincronizando...');
-          this.syncServerCashBoxToLocal(serverBox);
+          await this.syncServerCashBoxToLocal(serverBox);
           this.emit('sync:cashBoxUpdated', serverBox);
         } else {
           // 🔴 CORREÇÃO: Verificar se dados locais estão inválidos (NaN, null, undefined)
@@ -1002,7 +1078,7 @@ export class SyncManager {
           
           if (hasInvalidData) {
             console.log('⚡ Caixa local com dados inválidos, atualizando do servidor...');
-            this.syncServerCashBoxToLocal(serverBox);
+            await this.syncServerCashBoxToLocal(serverBox);
             this.emit('sync:cashBoxUpdated', serverBox);
           }
         }
@@ -1034,7 +1110,7 @@ export class SyncManager {
         
         // Atualizar se valor for diferente
         if (localValue !== setting.value) {
-          this.dbManager.setSettingFromServer(setting.key, setting.value);
+          await this.write('setSettingFromServer', setting.key, setting.value);
           updatedCount++;
         }
       }
@@ -1061,7 +1137,7 @@ export class SyncManager {
         
         if (!localUser) {
           // Usuário novo no servidor, criar localmente
-          this.dbManager.createUserFromServer({
+          await this.write('createUserFromServer', {
             id: serverUser.id,
             username: serverUser.username,
             email: serverUser.email,
@@ -1178,7 +1254,7 @@ export class SyncManager {
       
       // 🔴 CORREÇÃO: Mover itens que excederam 10 tentativas para Dead Letter Queue
       // Isso limpa a fila e preserva os dados para análise manual
-      const movedToDLQ = this.dbManager.moveToDeadLetterQueue(10);
+      const movedToDLQ = await this.write('moveToDeadLetterQueue', 10);
       if (movedToDLQ > 0) {
         console.log(`📦 ${movedToDLQ} itens movidos para Dead Letter Queue (excederam 10 tentativas)`);
         this.emit('sync:dlq', { count: movedToDLQ });
@@ -1186,7 +1262,7 @@ export class SyncManager {
       
       // Restaurar itens falhados para pendentes antes de sincronizar
       // Isso garante que vendas que falharam por queda de conexão sejam retentadas
-      const retriedItems = this.dbManager.retryFailedSyncItems(10); // Aumentado para 10 tentativas
+      const retriedItems = await this.write('retryFailedSyncItems', 10); // Aumentado para 10 tentativas
       if (retriedItems > 0) {
         console.log(`🔄 ${retriedItems} itens restaurados para re-sincronização`);
       }
@@ -1288,8 +1364,8 @@ export class SyncManager {
         const hasError = result.errors?.some((e: any) => e.item?.entityId === item.entity_id);
         
         if (!hasError) {
-          this.dbManager.markSyncItemCompleted(item.id);
-          this.dbManager.logSyncAudit({
+          await this.write('markSyncItemCompleted', item.id);
+          await this.write('logSyncAudit', {
             action: item.operation,
             entity: item.entity,
             entityId: item.entity_id,
@@ -1299,7 +1375,7 @@ export class SyncManager {
           });
         } else {
           const error = result.errors.find((e: any) => e.item?.entityId === item.entity_id);
-          this.dbManager.markSyncItemFailed(item.id, error?.error || 'Bulk sync error');
+          await this.write('markSyncItemFailed', item.id, error?.error || 'Bulk sync error');
         }
       }
 
@@ -1309,7 +1385,7 @@ export class SyncManager {
       
       // Marcar todos como falhados para retry individual
       for (const item of salesItems) {
-        this.dbManager.markSyncItemFailed(item.id, error.message);
+        await this.write('markSyncItemFailed', item.id, error.message);
       }
       
       return { success: 0, failed: salesItems.length };
@@ -1325,7 +1401,7 @@ export class SyncManager {
     }
     
     // Atualizar heartbeat do dispositivo
-    this.dbManager.updateDeviceHeartbeat();
+    await this.write('updateDeviceHeartbeat');
     
     // Ordenar itens por prioridade de dependência
     const sortedItems = this.sortByDependency(pendingItems);
@@ -1359,15 +1435,15 @@ export class SyncManager {
         const syncResult = await this.syncEntityItem(item, data);
         
         if (syncResult.success) {
-          this.dbManager.markSyncItemCompleted(item.id);
+          await this.write('markSyncItemCompleted', item.id);
           
           // 🔴 CORREÇÃO CRÍTICA: Marcar entidade como sincronizada
           if (item.entity === 'product' && item.entity_id) {
-            this.dbManager.markProductSynced(item.entity_id);
+            await this.write('markProductSynced', item.entity_id);
           }
           
           // Log de auditoria - sucesso
-          this.dbManager.logSyncAudit({
+          await this.write('logSyncAudit', {
             action: item.operation,
             entity: item.entity,
             entityId: item.entity_id,
@@ -1378,7 +1454,7 @@ export class SyncManager {
           console.log(`✅ Sync ${item.entity} concluído`);
         } else if (syncResult.skip) {
           // Marcar como completado para pular (entidade não suportada)
-          this.dbManager.markSyncItemCompleted(item.id);
+          await this.write('markSyncItemCompleted', item.id);
           console.log(`⏭️ Sync ${item.entity} ignorado: ${syncResult.reason}`);
         }
         
@@ -1394,8 +1470,8 @@ export class SyncManager {
         // Isso ocorre quando o item já foi sincronizado anteriormente
         if (error?.response?.status === 409) {
           console.log(`✅ Sync ${item.entity} - já existe no servidor (409), marcando como completado`);
-          this.dbManager.markSyncItemCompleted(item.id);
-          this.dbManager.logSyncAudit({
+          await this.write('markSyncItemCompleted', item.id);
+          await this.write('logSyncAudit', {
             action: item.operation,
             entity: item.entity,
             entityId: item.entity_id,
@@ -1410,7 +1486,7 @@ export class SyncManager {
         console.error(`❌ Erro ao sincronizar ${item.entity}:`, errorMsg);
         
         // Log de auditoria - erro
-        this.dbManager.logSyncAudit({
+        await this.write('logSyncAudit', {
           action: item.operation,
           entity: item.entity,
           entityId: item.entity_id,
@@ -1422,13 +1498,13 @@ export class SyncManager {
         // Verificar tipo de erro
         if (error.response?.status === 401) {
           console.error('🔒 Erro de autenticação (401) - Token inválido ou expirado');
-          this.dbManager.markSyncItemFailed(item.id, 'Erro de autenticação');
+          await this.write('markSyncItemFailed', item.id, 'Erro de autenticação');
           await this.stop();
           break;
         } else if (error.code === 'ECONNREFUSED' || error.code === 'ENOTFOUND' || error.code === 'ETIMEDOUT') {
           console.log('🔴 Erro de conexão ao sincronizar item:', error.code);
           console.log('📦 Item será mantido na fila para próxima tentativa');
-          this.dbManager.markSyncItemFailed(item.id, `Erro de conexão: ${error.code}`);
+          await this.write('markSyncItemFailed', item.id, `Erro de conexão: ${error.code}`);
           // 🔴 ISOLAMENTO: Erro de conexão para em vez de continuar
           // porque se não há rede, não adianta tentar outros itens
           break;
@@ -1436,20 +1512,20 @@ export class SyncManager {
           // 🔴 ISOLAMENTO POR ENTIDADE: Erros pontuais NÃO param o loop
           // O item é marcado como falho e o próximo é processado
           console.log(`⚠️ Erro em ${item.entity}/${item.entity_id}, continuando com próximos itens...`);
-          this.dbManager.markSyncItemFailed(item.id, errorMsg);
+          await this.write('markSyncItemFailed', item.id, errorMsg);
           // NÃO TEM BREAK - continua processando outros itens
         }
       }
     }
     
     // Atualizar última sincronização do dispositivo
-    this.dbManager.updateDeviceLastSync();
+    await this.write('updateDeviceLastSync');
     
     // Se houve falhas, tentar re-sincronizar itens falhados
     // (útil quando dependências foram sincronizadas nesta rodada)
     if (hasFailures) {
       // 🔴 CORREÇÃO: Aumentado para 10 tentativas - vendas não podem ser perdidas
-      const retried = this.dbManager.retryFailedSyncItems(10);
+      const retried = await this.write('retryFailedSyncItems', 10);
       if (retried > 0) {
         console.log(`🔄 Re-tentando ${retried} itens que podem ter sido desbloqueados por dependências...`);
         // Fazer uma segunda passada imediata
@@ -1461,16 +1537,16 @@ export class SyncManager {
             const syncResult = await this.syncEntityItem(item, data);
             
             if (syncResult.success) {
-              this.dbManager.markSyncItemCompleted(item.id);
+              await this.write('markSyncItemCompleted', item.id);
               console.log(`✅ Re-sync ${item.entity} concluído`);
             } else if (syncResult.skip) {
-              this.dbManager.markSyncItemCompleted(item.id);
+              await this.write('markSyncItemCompleted', item.id);
             }
           } catch (error: any) {
             let errorMsg = error?.response?.data?.message || error?.message || 'Unknown error';
             if (Array.isArray(errorMsg)) errorMsg = errorMsg.join(', ');
             console.error(`❌ Re-sync ${item.entity} falhou:`, errorMsg);
-            this.dbManager.markSyncItemFailed(item.id, String(errorMsg));
+            await this.write('markSyncItemFailed', item.id, String(errorMsg));
           }
         }
       }
@@ -1495,7 +1571,7 @@ export class SyncManager {
     }
     
     // Salvar timestamp da verificação
-    this.dbManager.setSetting('last_resync_check', now.toISOString());
+    await this.write('setSetting', 'last_resync_check', now.toISOString());
     
     try {
       // Verificar se fila está vazia ou só tem itens falhados
@@ -1529,7 +1605,7 @@ export class SyncManager {
         console.log('⚠️ Railway vazio detectado! Iniciando resync automático completo...');
         
         // Executar queueFullResync
-        const result = this.dbManager.queueFullResync();
+        const result = await this.write('queueFullResync');
         console.log(`✅ Resync automático enfileirado: ${result.total} itens`);
         
         // Notificar UI
@@ -1684,14 +1760,25 @@ export class SyncManager {
             url += `?updatedAfter=${lastSyncDate.toISOString()}`;
           }
           
-          const response = await this.apiClient.get(url, { timeout: 30000 });
+          const response = await this.conditionalGet(url, { timeout: 30000 });
+          if (response.notModified) {
+            // 304: dados idênticos aos já mesclados no último pull
+            console.log(`ℹ️ ${entity.name}: sem alterações (304)`);
+            continue;
+          }
           const items = Array.isArray(response.data) ? response.data : response.data?.data || [];
           
-          if (items.length > 0) {
-            console.log(`✅ ${entity.name}: ${items.length} itens recebidos`);
-            await this.mergeEntityData(entity.name, items);
-          } else {
-            console.log(`ℹ️ ${entity.name}: nenhum item novo`);
+          try {
+            if (items.length > 0) {
+              console.log(`✅ ${entity.name}: ${items.length} itens recebidos`);
+              await this.mergeEntityData(entity.name, items);
+            } else {
+              console.log(`ℹ️ ${entity.name}: nenhum item novo`);
+            }
+          } catch (mergeError) {
+            // Merge falhou: descartar ETag para que o próximo pull baixe tudo de novo
+            this.responseCache.delete(url);
+            throw mergeError;
           }
         } catch (entityError: any) {
           // Ignorar erros 404 (endpoint não existe)
@@ -1706,7 +1793,7 @@ export class SyncManager {
       }
       
       // 3. Atualizar data da última sincronização
-      this.dbManager.setLastSyncDate(new Date());
+      await this.write('setLastSyncDate', new Date());
       console.log('✅ Pull do servidor concluído');
       
       // 4. Enviar ACK para confirmar recebimento
@@ -1785,7 +1872,7 @@ export class SyncManager {
     }
 
     try {
-      const response = await this.apiClient.get(endpoint, { timeout: 15000 });
+      const response = await this.conditionalGet(endpoint, { timeout: 15000 });
       return { success: true, data: response.data };
     } catch (error: any) {
       console.error(`❌ Erro ao buscar ${endpoint}:`, error?.message);
@@ -1834,1495 +1921,6 @@ export class SyncManager {
       throw error;
     }
   }
-  
-  /**
-   * Verifica se um item local tem alterações pendentes (não sincronizadas)
-   * Retorna true se o item NÃO deve ser sobrescrito pelo servidor
-   * 
-   * 🔴 CORREÇÃO CRÍTICA: Usa timestamp para resolver conflitos
-   * Se o servidor tem dados mais recentes (de outro dispositivo), aceita do servidor
-   */
-  private hasLocalPendingChanges(entityName: string, itemId: string, existing: any, serverItem?: any): boolean {
-    // Se não existe localmente, não há conflito
-    if (!existing) return false;
-    
-    // Verificar se synced = 0 (alteração local pendente)
-    const synced = existing.synced ?? existing.is_synced ?? 1;
-    if (synced === 0) {
-      // 🔴 CORREÇÃO: Usar timestamp para resolver conflitos
-      if (serverItem) {
-        const serverUpdatedAt = new Date(serverItem.updatedAt || serverItem.updated_at || 0).getTime();
-        const localUpdatedAt = new Date(existing.updated_at || existing.updatedAt || 0).getTime();
-        
-        // Se servidor é mais recente, aceitar dados do servidor (de outro dispositivo)
-        if (serverUpdatedAt > localUpdatedAt) {
-          console.log(`📥 ${entityName} ${itemId}: servidor mais recente (${new Date(serverUpdatedAt).toISOString()} > local: ${new Date(localUpdatedAt).toISOString()}), aceitando do servidor`);
-          return false; // NÃO bloqueia - permite sobrescrever
-        }
-      }
-      
-      console.log(`⏳ ${entityName} ${itemId}: alterações locais mais recentes (synced=0), aguardando envio`);
-      return true; // Bloqueia - mantém local
-    }
-    
-    // Verificar se está na fila de sincronização
-    const pendingItems = this.dbManager.getPendingSyncItems() as SyncItem[];
-    const hasPendingSync = pendingItems.some(
-      item => item.entity === entityName.slice(0, -1) && item.entity_id === itemId
-    );
-    
-    if (hasPendingSync) {
-      // 🔴 CORREÇÃO: Também usar timestamp para itens na fila
-      if (serverItem) {
-        const serverUpdatedAt = new Date(serverItem.updatedAt || serverItem.updated_at || 0).getTime();
-        const localUpdatedAt = new Date(existing.updated_at || existing.updatedAt || 0).getTime();
-        
-        if (serverUpdatedAt > localUpdatedAt) {
-          console.log(`📥 ${entityName} ${itemId}: servidor mais recente, aceitando mesmo com item na fila`);
-          return false; // NÃO bloqueia
-        }
-      }
-      
-      console.log(`⏳ ${entityName} ${itemId}: na fila de sync, aguardando envio`);
-      return true;
-    }
-    
-    return false;
-  }
-
-  /**
-   * FASE 3: Registra conflito se os dados locais e do servidor são diferentes
-   */
-  private registerConflictIfNeeded(entityName: string, itemId: string, localData: any, serverData: any): void {
-    try {
-      // Verificar se realmente há diferença significativa
-      const localUpdated = new Date(localData.updated_at || localData.updatedAt || 0);
-      const serverUpdated = new Date(serverData.updated_at || serverData.updatedAt || 0);
-      
-      // Se os timestamps são iguais, não há conflito real
-      if (Math.abs(localUpdated.getTime() - serverUpdated.getTime()) < 1000) {
-        return;
-      }
-      
-      // Registrar o conflito
-      this.dbManager.registerSyncConflict({
-        entity: entityName,
-        entityId: itemId,
-        localData: localData,
-        serverData: serverData,
-        serverDeviceId: serverData._deviceId,
-        localTimestamp: localUpdated,
-        serverTimestamp: serverUpdated,
-      });
-      
-      // Log de auditoria
-      this.dbManager.logSyncAudit({
-        action: 'conflict_detected',
-        entity: entityName,
-        entityId: itemId,
-        direction: 'pull',
-        status: 'conflict',
-        details: {
-          localUpdated: localUpdated.toISOString(),
-          serverUpdated: serverUpdated.toISOString(),
-        },
-      });
-      
-      // Emitir evento para UI
-      this.emit('sync:conflict', {
-        entity: entityName,
-        entityId: itemId,
-        localTimestamp: localUpdated,
-        serverTimestamp: serverUpdated,
-      });
-      
-    } catch (error: any) {
-      console.error(`Erro ao registrar conflito para ${entityName}/${itemId}:`, error.message);
-    }
-  }
-
-  /**
-   * Mescla dados recebidos do servidor com dados locais
-   * Estratégia: servidor tem prioridade, MAS respeita alterações locais não sincronizadas
-   */
-  private async mergeEntityData(entityName: string, items: any[]) {
-    const mergeStrategies: Record<string, (items: any[]) => void> = {
-      branches: (items) => {
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getBranchById(item.id);
-            
-            // CORREÇÃO: Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('branches', item.id, existing, item)) {
-              continue;
-            }
-            
-            if (existing) {
-              this.dbManager.updateBranch(item.id, {
-                name: item.name,
-                code: item.code,
-                address: item.address,
-                phone: item.phone,
-                is_main: item.isMain ? 1 : 0,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-              });
-            } else {
-              this.dbManager.createBranch({
-                id: item.id,
-                name: item.name,
-                code: item.code,
-                address: item.address,
-                phone: item.phone,
-                is_main: item.isMain ? 1 : 0,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-              });
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar branch ${item.id}:`, e?.message);
-          }
-        }
-      },
-      
-      users: (items) => {
-        for (const item of items) {
-          try {
-            // Tentar encontrar por email (mais confiável)
-            const existingByEmail = this.dbManager.getUserByEmail(item.email);
-            // Também tentar por ID (pode ser o mesmo)
-            const existingById = this.dbManager.getUserById(item.id);
-            
-            const existing = existingByEmail || existingById;
-            
-            // CORREÇÃO: Não sobrescrever se há alterações locais pendentes
-            if (existing && this.hasLocalPendingChanges('users', (existing as any).id, existing, item)) {
-              console.log(`⏳ Usuário ${item.email} tem alterações locais pendentes - pulando`);
-              continue;
-            }
-            
-            if (existing) {
-              // Não sobrescrever senha local se usuário já existe
-              // Processar allowedTabs - pode vir como string JSON ou array
-              let allowedTabs = item.allowedTabs;
-              if (typeof allowedTabs === 'string') {
-                try {
-                  allowedTabs = JSON.parse(allowedTabs);
-                } catch (e) {
-                  // Já é string, manter
-                }
-              }
-              
-              // Atualizar com o server_id do servidor
-              this.dbManager.updateUserFromServer((existing as any).id, {
-                username: item.username,
-                email: item.email,
-                full_name: item.fullName,
-                role: item.role || item.roleName,
-                branch_id: item.branchId,
-                phone: item.phone,
-                allowed_tabs: allowedTabs,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-                server_id: item.id, // Vincular ao ID do servidor
-              });
-              console.log(`✅ Usuário vinculado/atualizado: ${item.email} (server_id: ${item.id})`);
-            } else {
-              // 🔴 CORREÇÃO CRÍTICA: Criar usuário do servidor localmente
-              // Usuário existe no servidor mas não localmente - CRIAR AGORA
-              // Usuário precisará fazer login online primeira vez para definir senha local
-              console.log(`📥 Criando usuário do servidor localmente: ${item.email}`);
-              
-              // Processar allowedTabs - pode vir como string JSON ou array
-              let allowedTabs = item.allowedTabs;
-              if (typeof allowedTabs === 'string') {
-                try {
-                  allowedTabs = JSON.parse(allowedTabs);
-                } catch (e) {
-                  // Já é string, manter
-                }
-              }
-              
-              try {
-                this.dbManager.createUserFromServer({
-                  id: item.id,
-                  username: item.username,
-                  email: item.email,
-                  fullName: item.fullName,
-                  role: item.role || item.roleName || 'cashier',
-                  branchId: item.branchId,
-                  phone: item.phone,
-                  allowedTabs: allowedTabs,
-                });
-                console.log(`✅ Usuário criado do servidor: ${item.email} (requer login online primeiro)`);
-              } catch (createError: any) {
-                console.error(`❌ Erro ao criar usuário ${item.email}:`, createError?.message);
-              }
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar user ${item.email}:`, e?.message);
-          }
-        }
-      },
-      
-      categories: (items) => {
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getCategoryById(item.id);
-            
-            // CORREÇÃO: Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('categories', item.id, existing, item)) {
-              continue;
-            }
-            
-            if (existing) {
-              this.dbManager.updateCategory(item.id, {
-                name: item.name,
-                description: item.description,
-                parent_id: item.parentId,
-                sort_order: item.sortOrder || 0,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-              }, true); // skipSyncQueue = true para evitar loop
-            } else {
-              this.dbManager.createCategory({
-                id: item.id,
-                name: item.name,
-                description: item.description,
-                parent_id: item.parentId,
-                sort_order: item.sortOrder || 0,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-              }, true); // skipSyncQueue = true para evitar loop
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar category ${item.id}:`, e?.message);
-          }
-        }
-      },
-      
-      products: (items) => {
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getProductById(item.id);
-            
-            // CORREÇÃO: Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('products', item.id, existing, item)) {
-              continue;
-            }
-            
-            if (existing) {
-              this.dbManager.updateProduct(item.id, {
-                name: item.name,
-                sku: item.sku,
-                barcode: item.barcode,
-                description: item.description,
-                categoryId: item.categoryId,
-                supplierId: item.supplierId,
-                priceBox: item.priceBox,
-                priceUnit: item.priceUnit || 0,
-                costUnit: item.costUnit || 0,
-                costBox: item.costBox,
-                unitsPerBox: item.unitsPerBox,
-                lowStockAlert: item.lowStockAlert,
-                isActive: item.isActive !== false ? 1 : 0,
-                // MUNTU: Campos booleanos e numéricos - usar ?? para preservar false/0
-                isMuntuEligible: item.isMuntuEligible ?? false,
-                muntuQuantity: item.muntuQuantity ?? null,
-                muntuPrice: item.muntuPrice ?? null,
-                synced: 1,
-                lastSync: new Date().toISOString(),
-              }, true); // skipSyncQueue = true para evitar loop
-            } else {
-              this.dbManager.createProduct({
-                id: item.id,
-                name: item.name,
-                sku: item.sku,
-                barcode: item.barcode,
-                description: item.description,
-                categoryId: item.categoryId,
-                supplierId: item.supplierId,
-                priceBox: item.priceBox || 0,
-                priceUnit: item.priceUnit || 0,
-                costUnit: item.costUnit || 0,
-                costBox: item.costBox || null,
-                unitsPerBox: item.unitsPerBox || 1,
-                lowStockAlert: item.lowStockAlert || 10,
-                isActive: item.isActive !== false ? 1 : 0,
-                // MUNTU: Campos booleanos e numéricos - usar ?? para preservar false/0
-                isMuntuEligible: item.isMuntuEligible ?? false,
-                muntuQuantity: item.muntuQuantity ?? null,
-                muntuPrice: item.muntuPrice ?? null,
-                synced: 1,
-                lastSync: new Date().toISOString(),
-              }, true); // skipSyncQueue = true para evitar loop
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar product ${item.id}:`, e?.message);
-          }
-        }
-      },
-      
-      customers: (items) => {
-        // LOGS DE RASTREABILIDADE para sincronização de clientes
-        console.log(`\n👥 SYNC CUSTOMERS: Processando ${items.length} clientes do servidor`);
-        let created = 0, updated = 0, skippedNoName = 0, skippedPending = 0;
-        
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getCustomerById(item.id);
-            
-            // CORREÇÃO: Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('customers', item.id, existing, item)) {
-              skippedPending++;
-              continue;
-            }
-            
-            // Mapear name corretamente - backend pode enviar name, fullName ou firstName/lastName
-            const fullName = item.name || item.fullName || 
-              (item.firstName && item.lastName ? `${item.firstName} ${item.lastName}` : null);
-            
-            if (!fullName) {
-              console.warn(`⚠️ Cliente ${item.id} sem nome válido - pulando`);
-              skippedNoName++;
-              continue;
-            }
-            
-            if (existing) {
-              // Preservar creditLimit local se o servidor não enviar
-              const existingAny = existing as any;
-              const creditLimit = item.creditLimit !== undefined 
-                ? item.creditLimit 
-                : (existingAny.credit_limit || 0);
-              
-              // Obter loyalty_points e current_debt do servidor
-              const loyaltyPoints = item.loyaltyPoints ?? item.loyalty_points ?? existingAny.loyalty_points ?? 0;
-              const currentDebt = item.currentDebt ?? item.current_debt ?? existingAny.current_debt ?? 0;
-              
-              this.dbManager.updateCustomer(item.id, {
-                name: fullName,
-                email: item.email,
-                phone: item.phone,
-                code: item.code,
-                address: item.address,
-                creditLimit: creditLimit,
-                loyalty_points: loyaltyPoints,
-                current_debt: currentDebt,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-              }, true); // skipSyncQueue = true para evitar loop
-              updated++;
-            } else {
-              this.dbManager.createCustomer({
-                id: item.id,
-                name: fullName,
-                email: item.email,
-                phone: item.phone,
-                code: item.code,
-                address: item.address,
-                creditLimit: item.creditLimit || 0,
-                loyalty_points: item.loyaltyPoints ?? item.loyalty_points ?? 0,
-                current_debt: item.currentDebt ?? item.current_debt ?? 0,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-              }, true); // skipSyncQueue = true para evitar loop
-              created++;
-              console.log(`   ➕ Cliente criado: ${fullName} (${item.code || 'sem código'})`);
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar customer ${item.id}:`, e?.message);
-          }
-        }
-        
-        // RESUMO DE SINCRONIZAÇÃO DE CLIENTES
-        console.log(`📊 SYNC CUSTOMERS RESUMO:`);
-        console.log(`   ✅ Criados: ${created}`);
-        console.log(`   📝 Atualizados: ${updated}`);
-        console.log(`   ⚠️ Pulados (sem nome): ${skippedNoName}`);
-        console.log(`   ⏸️ Pulados (alterações locais): ${skippedPending}`);
-      },
-      
-      suppliers: (items) => {
-        console.log(`📦 SYNC SUPPLIERS: Processando ${items.length} fornecedores...`);
-        let created = 0, updated = 0, errors = 0;
-        
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getSupplierById(item.id);
-            
-            // CORREÇÃO: Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('suppliers', item.id, existing, item)) {
-              console.log(`⏸️ Supplier ${item.name} tem alterações locais pendentes`);
-              continue;
-            }
-            
-            // Gerar código se não existir
-            const code = item.code || `SUP-${Date.now()}`;
-            
-            if (existing) {
-              this.dbManager.updateSupplier(item.id, {
-                code: code,
-                name: item.name,
-                email: item.email,
-                phone: item.phone,
-                address: item.address,
-                contactPerson: item.contactPerson || item.contact_person,
-                taxId: item.taxId || item.tax_id,
-                paymentTerms: item.paymentTerms || item.payment_terms,
-                notes: item.notes,
-                is_active: item.isActive !== false ? 1 : 0,
-                synced: 1,
-                last_sync: new Date().toISOString(),
-              }, true); // skipSyncQueue = true para evitar loop
-              updated++;
-              console.log(`📝 Supplier atualizado: ${item.name}`);
-            } else {
-              this.dbManager.createSupplier({
-                id: item.id,
-                code: code,
-                name: item.name,
-                email: item.email,
-                phone: item.phone,
-                address: item.address,
-                contactPerson: item.contactPerson || item.contact_person,
-                taxId: item.taxId || item.tax_id,
-                paymentTerms: item.paymentTerms || item.payment_terms,
-                notes: item.notes,
-              }, true); // skipSyncQueue = true para evitar loop
-              created++;
-              console.log(`➕ Supplier criado: ${item.name}`);
-            }
-          } catch (e: any) {
-            errors++;
-            console.error(`❌ Erro ao mesclar supplier ${item.id} (${item.name}):`, e?.message);
-          }
-        }
-        
-        console.log(`📊 SYNC SUPPLIERS RESUMO: ✅ Criados: ${created} | 📝 Atualizados: ${updated} | ❌ Erros: ${errors}`);
-      },
-      
-      inventory: (items) => {
-        // Inventário - atualizar quantidades na tabela inventory_items
-        console.log(`📦 Recebidos ${items.length} itens de inventário do servidor`);
-        
-        for (const item of items) {
-          try {
-            // O backend retorna items com productId e qtyUnits
-            const productId = item.productId || item.product_id;
-            const branchId = item.branchId || item.branch_id;
-            
-            if (!productId) {
-              console.log(`⚠️ Item de inventário sem productId: ${JSON.stringify(item)}`);
-              continue;
-            }
-            
-            // Verificar se o produto existe
-            const product = this.dbManager.getProductById(productId);
-            if (!product) {
-              console.log(`⚠️ Produto não encontrado localmente: ${productId}`);
-              continue;
-            }
-            
-            const newQty = item.qtyUnits ?? item.qty_units ?? 0;
-            
-            // IMPORTANTE: Não usar closedBoxes/openBoxUnits do servidor se forem 0
-            // O servidor Railway pode não ter esses campos corretamente preenchidos
-            // O método updateInventoryItemByProductId vai calcular automaticamente baseado em qtyUnits
-            const closedBoxes = (item.closedBoxes ?? item.closed_boxes) || undefined;
-            const openBoxUnits = (item.openBoxUnits ?? item.open_box_units) || undefined;
-            
-            // Buscar item de inventário local
-            const inventoryItem = this.dbManager.getInventoryItemByProductId(productId, branchId);
-            
-            if (inventoryItem) {
-              // 🔴 CORREÇÃO CRÍTICA: Usar timestamp para resolver conflitos, não apenas synced
-              // Se synced === 0, pode haver alteração local pendente, MAS se o servidor
-              // tem dados mais recentes (de outro dispositivo), devemos aceitar do servidor
-              if (inventoryItem.synced === 0) {
-                const serverUpdatedAt = new Date(item.updatedAt || item.updated_at || 0).getTime();
-                const localUpdatedAt = new Date(inventoryItem.updated_at || 0).getTime();
-                
-                if (serverUpdatedAt > localUpdatedAt) {
-                  // Servidor tem dados mais recentes (venda de outro dispositivo)
-                  console.log(`📥 Servidor tem estoque mais recente para ${productId} (server: ${new Date(serverUpdatedAt).toISOString()} > local: ${new Date(localUpdatedAt).toISOString()})`);
-                  // Continua e atualiza - NÃO pula
-                } else {
-                  // Local tem dados mais recentes - aguardar envio
-                  console.log(`⏳ Inventory item ${productId} tem alterações locais mais recentes (synced=0), aguardando envio...`);
-                  continue;
-                }
-              }
-              
-              const currentStock = inventoryItem.qty_units ?? 0;
-              
-              // Só atualizar se houver diferença
-              if (currentStock !== newQty) {
-                console.log(`📦 Atualizando estoque: ${(product as any).name} (${productId})`);
-                console.log(`   Local: ${currentStock} → Servidor: ${newQty}`);
-                
-                // Atualizar inventory_items diretamente
-                const updated = this.dbManager.updateInventoryItemByProductId(productId, {
-                  qtyUnits: newQty,
-                  closedBoxes,
-                  openBoxUnits,
-                }, true); // skipSyncQueue = true para evitar loop
-                
-                if (updated) {
-                  console.log(`✅ Estoque atualizado: ${(product as any).name} = ${newQty} unidades`);
-                }
-              } else {
-                console.log(`ℹ️ Estoque já sincronizado: ${(product as any).name} = ${newQty}`);
-              }
-            } else {
-              // Item não existe localmente - criar novo
-              if (branchId) {
-                console.log(`📦 Criando inventory item: ${(product as any).name} (${productId}) = ${newQty} unidades`);
-                this.dbManager.createInventoryItemFromSync(productId, branchId, {
-                  qtyUnits: newQty,
-                  closedBoxes,
-                  openBoxUnits,
-                });
-              } else {
-                console.log(`⚠️ Não é possível criar inventory item sem branchId: ${productId}`);
-              }
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar inventory ${item.id}:`, e?.message);
-          }
-        }
-      },
-      
-      inventory_movements: (items) => {
-        // Movimentações de estoque - sincronizar do servidor para o desktop
-        console.log(`📦 Processando ${items.length} movimentações de estoque do servidor`);
-        
-        for (const item of items) {
-          try {
-            // Verificar se a movimentação já existe localmente
-            const existing = this.dbManager.prepare(`
-              SELECT id FROM stock_movements WHERE id = ?
-            `).get(item.id);
-            
-            if (existing) {
-              // Movimentação já existe, pular
-              continue;
-            }
-            
-            // Extrair dados da movimentação
-            const productId = item.inventoryItem?.product?.id || item.productId || item.product_id;
-            const branchId = item.inventoryItem?.branch?.id || item.branchId || item.branch_id;
-            
-            if (!productId) {
-              console.log(`⚠️ Movimentação ${item.id} sem productId, pulando...`);
-              continue;
-            }
-            
-            // Criar nova movimentação
-            this.dbManager.prepare(`
-              INSERT INTO stock_movements (id, product_id, branch_id, movement_type, qty_units, qty_boxes, reason, reference_type, reference_id, notes, created_by, synced, created_at)
-              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
-            `).run(
-              item.id,
-              productId,
-              branchId || 'main-branch',
-              item.movementType || item.movement_type || 'adjustment',
-              item.qtyUnits || item.qty_units || 0,
-              item.qtyBoxes || item.qty_boxes || 0,
-              item.reason || null,
-              item.referenceType || item.reference_type || null,
-              item.referenceId || item.reference_id || null,
-              item.notes || null,
-              item.createdBy || item.created_by || null,
-              item.createdAt || item.created_at || new Date().toISOString()
-            );
-            console.log(`➕ Movimentação criada: ${item.id} (${item.movementType || item.movement_type})`);
-          } catch (e: any) {
-            console.error(`Erro ao mesclar movement ${item.id}:`, e?.message);
-          }
-        }
-      },
-      
-      debts: (items) => {
-        // Débitos/Vales - sincronizar do servidor para o desktop
-        // LOGS DE RASTREABILIDADE para diagnóstico de sincronização
-        console.log(`\n📋 SYNC DEBTS: Processando ${items.length} dívidas do servidor`);
-        let created = 0, updated = 0, skippedNoCustomer = 0, skippedPending = 0, skippedDuplicate = 0;
-        
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getDebtById ? this.dbManager.getDebtById(item.id) : null;
-            
-            // Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('debts', item.id, existing, item)) {
-              skippedPending++;
-              continue;
-            }
-            
-            // Calcular valores corretos
-            const amount = item.amount || item.originalAmount || 0;
-            const paidAmount = item.paid || item.paidAmount || 0;
-            const balance = item.balance ?? (amount - paidAmount);
-            
-            if (existing) {
-              // Atualizar débito existente
-              this.dbManager.prepare(`
-                UPDATE debts SET
-                  customer_id = ?,
-                  original_amount = ?,
-                  amount = ?,
-                  paid_amount = ?,
-                  balance = ?,
-                  status = ?,
-                  due_date = ?,
-                  notes = ?,
-                  synced = 1,
-                  updated_at = datetime('now')
-                WHERE id = ?
-              `).run(
-                item.customerId || item.customer_id,
-                item.originalAmount || amount,
-                amount,
-                paidAmount,
-                balance,
-                item.status || 'pending',
-                item.dueDate || item.due_date || null,
-                item.notes || null,
-                item.id
-              );
-              updated++;
-            } else {
-              // Criar novo débito
-              // Verificar se o cliente existe localmente
-              const customerId = item.customerId || item.customer_id;
-              const customerExists = this.dbManager.prepare(`SELECT id, full_name FROM customers WHERE id = ?`).get(customerId) as { id: string; full_name: string } | undefined;
-              
-              if (!customerExists) {
-                console.warn(`   ⚠️ PULANDO débito ${item.id}: Cliente ${customerId} não existe localmente`);
-                skippedNoCustomer++;
-                continue;
-              }
-              
-              // 🔒 IDEMPOTÊNCIA POR SALE_ID: Verificar se já existe debt local com mesmo saleId
-              // Isso evita duplicação quando:
-              // 1. Electron cria debt local (ID_LOCAL) com saleId=X
-              // 2. Backend cria debt (ID_BACKEND) com saleId=X quando sincroniza Sale
-              // 3. Electron baixa debt do servidor (ID_BACKEND) - sem esta verificação, criaria duplicata
-              const saleId = item.saleId || item.sale_id;
-              if (saleId) {
-                const existingBySale = this.dbManager.prepare(`
-                  SELECT id, debt_number FROM debts WHERE sale_id = ?
-                `).get(saleId) as { id: string; debt_number: string } | undefined;
-                
-                if (existingBySale && existingBySale.id !== item.id) {
-                  // Já existe debt local com mesmo saleId mas ID diferente
-                  // Atualizar o debt local para usar o ID do servidor (canonical)
-                  console.log(`   🔄 MERGE: Debt local ${existingBySale.id} → ${item.id} (mesmo saleId: ${saleId})`);
-                  
-                  // Deletar o debt local (será substituído pelo do servidor)
-                  this.dbManager.prepare(`DELETE FROM debts WHERE id = ?`).run(existingBySale.id);
-                  
-                  // Remover da sync queue se estiver lá
-                  this.dbManager.prepare(`
-                    DELETE FROM sync_queue WHERE entity_type = 'debt' AND entity_id = ?
-                  `).run(existingBySale.id);
-                }
-              }
-              
-              this.dbManager.prepare(`
-                INSERT INTO debts (id, debt_number, customer_id, sale_id, branch_id, original_amount, amount, paid_amount, balance, status, due_date, notes, created_by, synced, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-              `).run(
-                item.id,
-                item.debtNumber || item.debt_number || `DEBT-${Date.now()}`,
-                customerId,
-                saleId || null,
-                item.branchId || item.branch_id || 'main-branch',
-                item.originalAmount || amount,
-                amount,
-                paidAmount,
-                balance,
-                item.status || 'pending',
-                item.dueDate || item.due_date || null,
-                item.notes || null,
-                item.createdBy || item.created_by || null
-              );
-              created++;
-              console.log(`   ➕ Débito criado: ${item.id} | Cliente: ${customerExists.full_name} | Status: ${item.status} | Saldo: ${balance/100} FCFA`);
-            }
-            
-            // Sincronizar pagamentos do débito se existirem
-            if (item.payments && Array.isArray(item.payments)) {
-              for (const payment of item.payments) {
-                try {
-                  const existingPayment = this.dbManager.prepare(`
-                    SELECT id FROM debt_payments WHERE id = ?
-                  `).get(payment.id);
-                  
-                  if (!existingPayment) {
-                    // Validar método de pagamento - NUNCA usar fallback
-                    const normalizedMethod = tryNormalizePaymentMethod(payment.method);
-                    if (!normalizedMethod) {
-                      console.error(`  ❌ Pagamento de dívida ${payment.id} com método inválido: ${payment.method}`);
-                      continue;
-                    }
-                    
-                    this.dbManager.prepare(`
-                      INSERT INTO debt_payments (id, debt_id, amount, method, reference, notes, created_at)
-                      VALUES (?, ?, ?, ?, ?, ?, ?)
-                    `).run(
-                      payment.id,
-                      item.id,
-                      payment.amount,
-                      normalizedMethod, // Método validado e normalizado
-                      payment.referenceNumber || payment.reference || null,
-                      payment.notes || null,
-                      payment.createdAt || new Date().toISOString()
-                    );
-                  }
-                } catch (paymentError: any) {
-                  console.error(`  ❌ Erro ao sincronizar pagamento ${payment.id}:`, paymentError?.message);
-                }
-              }
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar debt ${item.id}:`, e?.message);
-          }
-        }
-        
-        // RESUMO DE SINCRONIZAÇÃO DE DÍVIDAS
-        console.log(`📊 SYNC DEBTS RESUMO:`);
-        console.log(`   ✅ Criados: ${created}`);
-        console.log(`   📝 Atualizados: ${updated}`);
-        console.log(`   ⚠️ Pulados (sem cliente local): ${skippedNoCustomer}`);
-        console.log(`   ⏸️ Pulados (alterações locais): ${skippedPending}`);
-        if (skippedNoCustomer > 0) {
-          console.log(`   ❗ ATENÇÃO: ${skippedNoCustomer} dívidas não foram sincronizadas porque os clientes não existem localmente!`);
-        }
-      },
-      
-      purchases: (items) => {
-        // Compras - sincronizar do servidor para o desktop
-        console.log(`📦 SYNC PURCHASES: Processando ${items.length} compras...`);
-        let created = 0, updated = 0, errors = 0;
-        
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getPurchaseById ? this.dbManager.getPurchaseById(item.id) : null;
-            
-            // Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('purchases', item.id, existing, item)) {
-              console.log(`⏸️ Compra ${item.id} tem alterações locais pendentes`);
-              continue;
-            }
-            
-            // Verificar se o fornecedor existe
-            const supplierId = item.supplierId || item.supplier_id;
-            if (supplierId) {
-              const supplierExists = this.dbManager.getSupplierById(supplierId);
-              if (!supplierExists) {
-                console.log(`⚠️ Compra ${item.id}: fornecedor ${supplierId} não existe localmente, pulando...`);
-                errors++;
-                continue;
-              }
-            }
-            
-            if (existing) {
-              // Atualizar compra existente - especialmente o status
-              this.dbManager.prepare(`
-                UPDATE purchases SET
-                  supplier_id = ?,
-                  status = ?,
-                  total = ?,
-                  notes = ?,
-                  received_at = ?,
-                  synced = 1,
-                  updated_at = datetime('now')
-                WHERE id = ?
-              `).run(
-                supplierId,
-                item.status || 'pending',
-                item.total || 0,
-                item.notes || null,
-                item.receivedAt || item.received_at || null,
-                item.id
-              );
-              updated++;
-              console.log(`📝 Compra atualizada: ${item.id} (status: ${item.status})`);
-            } else {
-              // Criar nova compra
-              this.dbManager.prepare(`
-                INSERT INTO purchases (id, purchase_number, branch_id, supplier_id, status, subtotal, tax_total, discount_total, total, notes, received_by, received_at, synced, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-              `).run(
-                item.id,
-                item.purchaseNumber || item.purchase_number || `PUR-${Date.now()}`,
-                item.branchId || item.branch_id || 'main-branch',
-                supplierId,
-                item.status || 'pending',
-                item.subtotal || 0,
-                item.taxTotal || item.tax_total || 0,
-                item.discountTotal || item.discount_total || 0,
-                item.total || item.totalCost || 0,
-                item.notes || null,
-                item.receivedBy || item.received_by || null,
-                item.receivedAt || item.received_at || null
-              );
-              created++;
-              console.log(`➕ Compra criada: ${item.id}`);
-            }
-            
-            // Sincronizar itens da compra se existirem
-            if (item.items && Array.isArray(item.items)) {
-              for (const purchaseItem of item.items) {
-                try {
-                  const existingItem = this.dbManager.prepare(`
-                    SELECT id FROM purchase_items WHERE id = ?
-                  `).get(purchaseItem.id);
-                  
-                  if (!existingItem) {
-                    this.dbManager.prepare(`
-                      INSERT INTO purchase_items (id, purchase_id, product_id, qty_units, qty_boxes, unit_cost, subtotal, total)
-                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    `).run(
-                      purchaseItem.id,
-                      item.id,
-                      purchaseItem.productId || purchaseItem.product_id,
-                      purchaseItem.qtyUnits || purchaseItem.qty_units || 0,
-                      purchaseItem.qtyBoxes || purchaseItem.qty_boxes || 0,
-                      purchaseItem.unitCost || purchaseItem.unit_cost || 0,
-                      purchaseItem.subtotal || 0,
-                      purchaseItem.total || purchaseItem.subtotal || 0
-                    );
-                    console.log(`  📋 Item de compra sincronizado: ${purchaseItem.id}`);
-                  }
-                } catch (itemError: any) {
-                  console.error(`  ❌ Erro ao sincronizar item ${purchaseItem.id}:`, itemError?.message);
-                }
-              }
-            }
-          } catch (e: any) {
-            errors++;
-            console.error(`❌ Erro ao mesclar purchase ${item.id}:`, e?.message);
-          }
-        }
-        
-        console.log(`📊 SYNC PURCHASES RESUMO: ✅ Criados: ${created} | 📝 Atualizados: ${updated} | ❌ Erros: ${errors}`);
-      },
-      
-      tables: (items) => {
-        // Mesas - sincronizar do servidor para o desktop
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getTableById ? this.dbManager.getTableById(item.id) : null;
-            
-            // Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('tables', item.id, existing, item)) {
-              continue;
-            }
-            
-            if (existing) {
-              // Atualizar mesa existente
-              this.dbManager.prepare(`
-                UPDATE tables SET
-                  number = ?,
-                  name = ?,
-                  seats = ?,
-                  area = ?,
-                  status = ?,
-                  is_active = ?,
-                  synced = 1,
-                  updated_at = datetime('now')
-                WHERE id = ?
-              `).run(
-                item.number,
-                item.name || `Mesa ${item.number}`,
-                item.seats || 4,
-                item.area || null,
-                item.status || 'available',
-                item.isActive !== false ? 1 : 0,
-                item.id
-              );
-              console.log(`📝 Mesa atualizada: ${item.number}`);
-            } else {
-              // Criar nova mesa
-              this.dbManager.prepare(`
-                INSERT INTO tables (id, number, name, seats, area, status, branch_id, is_active, synced, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-              `).run(
-                item.id,
-                item.number,
-                item.name || `Mesa ${item.number}`,
-                item.seats || 4,
-                item.area || null,
-                item.status || 'available',
-                item.branchId || item.branch_id || 'main-branch',
-                item.isActive !== false ? 1 : 0
-              );
-              console.log(`➕ Mesa criada: ${item.number}`);
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar table ${item.id}:`, e?.message);
-          }
-        }
-      },
-      
-      table_sessions: (items) => {
-        // Sessões de mesa - sincronizar do servidor para o desktop
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.prepare(`SELECT id FROM table_sessions WHERE id = ?`).get(item.id);
-            
-            // Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('table_sessions', item.id, existing, item)) {
-              continue;
-            }
-            
-            if (existing) {
-              // Atualizar sessão existente
-              this.dbManager.prepare(`
-                UPDATE table_sessions SET
-                  status = ?,
-                  closed_by = ?,
-                  closed_at = ?,
-                  synced = 1,
-                  updated_at = datetime('now')
-                WHERE id = ?
-              `).run(
-                item.status || 'open',
-                item.closedBy || item.closed_by || null,
-                item.closedAt || item.closed_at || null,
-                item.id
-              );
-              console.log(`📝 Sessão de mesa atualizada: ${item.id}`);
-            } else {
-              // Criar nova sessão
-              this.dbManager.prepare(`
-                INSERT INTO table_sessions (id, table_id, branch_id, status, opened_by, opened_at, synced, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-              `).run(
-                item.id,
-                item.tableId || item.table_id,
-                item.branchId || item.branch_id || 'main-branch',
-                item.status || 'open',
-                item.openedBy || item.opened_by || 'system',
-                item.openedAt || item.opened_at || new Date().toISOString()
-              );
-              console.log(`➕ Sessão de mesa criada: ${item.id}`);
-            }
-            
-            // Sincronizar clientes da sessão
-            if (item.customers && Array.isArray(item.customers)) {
-              for (const customer of item.customers) {
-                try {
-                  const existingCustomer = this.dbManager.prepare(`SELECT id FROM table_customers WHERE id = ?`).get(customer.id);
-                  
-                  if (!existingCustomer) {
-                    this.dbManager.prepare(`
-                      INSERT INTO table_customers (id, session_id, customer_id, customer_name, status, added_by, synced, created_at, updated_at)
-                      VALUES (?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-                    `).run(
-                      customer.id,
-                      item.id,
-                      customer.customerId || customer.customer_id || null,
-                      customer.customerName || customer.customer_name,
-                      customer.status || 'active',
-                      customer.addedBy || customer.added_by || 'system'
-                    );
-                    console.log(`   ➕ Cliente de mesa: ${customer.customerName || customer.customer_name}`);
-                  }
-                  
-                  // Sincronizar pedidos do cliente
-                  if (customer.orders && Array.isArray(customer.orders)) {
-                    for (const order of customer.orders) {
-                      try {
-                        const existingOrder = this.dbManager.prepare(`SELECT id FROM table_orders WHERE id = ?`).get(order.id);
-                        
-                        if (!existingOrder) {
-                          this.dbManager.prepare(`
-                            INSERT INTO table_orders (id, session_id, table_customer_id, product_id, qty_units, unit_price, is_muntu, status, ordered_by, synced, created_at, updated_at)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-                          `).run(
-                            order.id,
-                            item.id,
-                            customer.id,
-                            order.productId || order.product_id,
-                            order.qtyUnits || order.qty_units || 1,
-                            order.unitPrice || order.unit_price || 0,
-                            order.isMuntu || order.is_muntu ? 1 : 0,
-                            order.status || 'pending',
-                            order.orderedBy || order.ordered_by || 'system'
-                          );
-                        }
-                      } catch (orderError: any) {
-                        console.error(`   ❌ Erro ao criar pedido de mesa:`, orderError?.message);
-                      }
-                    }
-                  }
-                } catch (customerError: any) {
-                  console.error(`   ❌ Erro ao criar cliente de mesa:`, customerError?.message);
-                }
-              }
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar table_session ${item.id}:`, e?.message);
-          }
-        }
-      },
-      
-      cash_boxes: (items) => {
-        // Caixas - sincronizar histórico do servidor para o desktop
-        console.log(`💰 SYNC CASH_BOXES: Processando ${items.length} caixas...`);
-        let created = 0, updated = 0, errors = 0;
-        
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.getCashBoxById ? this.dbManager.getCashBoxById(item.id) : null;
-            
-            // Não sobrescrever se há alterações locais pendentes
-            if (this.hasLocalPendingChanges('cash_box', item.id, existing, item)) {
-              console.log(`⏸️ Caixa ${item.id} tem alterações locais pendentes`);
-              continue;
-            }
-            
-            if (existing) {
-              // Atualizar caixa existente (especialmente status de fechamento)
-              // NOTA: A tabela NÃO tem coluna 'total_pix'
-              this.dbManager.prepare(`
-                UPDATE cash_boxes SET
-                  status = ?,
-                  closing_cash = ?,
-                  total_sales = ?,
-                  total_cash = ?,
-                  total_card = ?,
-                  total_mobile_money = ?,
-                  total_debt = ?,
-                  difference = ?,
-                  closed_at = ?,
-                  synced = 1,
-                  updated_at = datetime('now')
-                WHERE id = ?
-              `).run(
-                item.status || 'open',
-                item.closingCash || item.closing_cash || null,
-                item.totalSales || item.total_sales || item.stats?.totalSales || 0,
-                item.totalCash || item.total_cash || item.stats?.cashPayments || 0,
-                item.totalCard || item.total_card || item.stats?.cardPayments || 0,
-                item.totalMobileMoney || item.total_mobile_money || item.totalPix || item.stats?.mobileMoneyPayments || 0,
-                item.totalDebt || item.total_debt || item.stats?.debtPayments || 0,
-                item.difference || 0,
-                item.closedAt || item.closed_at || null,
-                item.id
-              );
-              updated++;
-              console.log(`📝 Caixa atualizado: ${item.id} (${item.status})`);
-            } else {
-              // Criar novo caixa do servidor
-              // NOTA: A tabela NÃO tem coluna 'total_pix', usa 'total_mobile_money' para pagamentos móveis
-              this.dbManager.prepare(`
-                INSERT INTO cash_boxes (id, box_number, branch_id, opened_by, status, opening_cash, closing_cash, total_sales, total_cash, total_card, total_mobile_money, total_debt, difference, notes, opened_at, closed_at, synced, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-              `).run(
-                item.id,
-                item.boxNumber || item.box_number || `CX-${Date.now()}`,
-                item.branchId || item.branch_id || 'main-branch',
-                item.openedBy || item.opened_by || 'unknown', // NOT NULL - usar default se não existir
-                item.status || 'closed',
-                item.openingCash || item.opening_cash || 0,
-                item.closingCash || item.closing_cash || null,
-                item.totalSales || item.total_sales || item.stats?.totalSales || 0,
-                item.totalCash || item.total_cash || item.stats?.cashPayments || 0,
-                item.totalCard || item.total_card || item.stats?.cardPayments || 0,
-                item.totalMobileMoney || item.total_mobile_money || item.totalPix || item.stats?.mobileMoneyPayments || 0,
-                item.totalDebt || item.total_debt || item.stats?.debtPayments || 0,
-                item.difference || 0,
-                item.notes || null,
-                item.openedAt || item.opened_at || new Date().toISOString(),
-                item.closedAt || item.closed_at || null
-              );
-              created++;
-              console.log(`➕ Caixa criado do servidor: ${item.id} (${item.status})`);
-            }
-          } catch (e: any) {
-            errors++;
-            console.error(`❌ Erro ao mesclar cash_box ${item.id}:`, e?.message);
-          }
-        }
-        
-        console.log(`📊 SYNC CASH_BOXES RESUMO: ✅ Criados: ${created} | 📝 Atualizados: ${updated} | ❌ Erros: ${errors}`);
-      },
-      
-      settings: (items) => {
-        // Configurações - sincronizar do servidor para o desktop
-        // Configurações de admin têm prioridade sobre locais
-        console.log(`⚙️ Processando ${items.length} configurações do servidor`);
-        
-        for (const item of items) {
-          try {
-            const key = item.key;
-            const value = item.value;
-            
-            if (!key) {
-              continue;
-            }
-            
-            // Configurações especiais que NÃO devem ser sobrescritas (específicas do dispositivo)
-            const deviceSpecificKeys = ['device_id', 'last_sync_date', 'offline_mode'];
-            if (deviceSpecificKeys.includes(key)) {
-              console.log(`⚠️ Pulando configuração específica do dispositivo: ${key}`);
-              continue;
-            }
-            
-            // Verificar se existe localmente
-            const existing = this.dbManager.getSetting(key);
-            
-            if (existing !== value) {
-              this.dbManager.setSetting(key, value);
-              console.log(`⚙️ Configuração atualizada: ${key} = ${value.substring(0, 50)}${value.length > 50 ? '...' : ''}`);
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar setting ${item.key}:`, e?.message);
-          }
-        }
-      },
-      
-      sales: (items) => {
-        // Vendas - sincronizar do servidor para o desktop (bidirecional)
-        for (const item of items) {
-          try {
-            // Verificar se a venda já existe localmente
-            const existing = this.dbManager.getSaleById ? this.dbManager.getSaleById(item.id) : null;
-            
-            // Para vendas, NÃO pular se existir - precisamos verificar pagamentos
-            // Mesmo que a venda local tenha synced=0, podemos precisar adicionar pagamentos do servidor
-            
-            if (!existing) {
-              // Determinar o método de pagamento do servidor
-              // Prioridade: 1) payments[0].method, 2) paymentMethod da venda
-              const serverPaymentMethod = item.payments && Array.isArray(item.payments) && item.payments.length > 0
-                ? item.payments[0].method
-                : (item.paymentMethod || item.payment_method || null);
-              
-              // Criar venda do servidor localmente (sync bidirecional)
-              const saleData = {
-                id: item.id,
-                sale_number: item.saleNumber || item.sale_number || `SALE-${Date.now()}`,
-                type: item.type || 'direct',
-                status: item.status || 'completed',
-                subtotal: item.subtotal || 0,
-                discount: item.discount || 0,
-                tax: item.tax || 0,
-                total: item.total || 0,
-                paid: item.paid || item.total || 0,
-                change_amount: item.change || item.changeAmount || item.change_amount || 0,
-                customer_id: item.customerId || item.customer_id || null,
-                customer_name: item.customerName || item.customer_name || null,
-                table_id: item.tableId || item.table_id || null,
-                cash_box_id: item.cashBoxId || item.cash_box_id || null,
-                branch_id: item.branchId || item.branch_id || null,
-                created_by: item.createdBy || item.created_by || null,
-                paymentMethod: serverPaymentMethod, // IMPORTANTE: Salvar método de pagamento
-                notes: item.notes || null,
-                synced: 1,
-                created_at: item.createdAt || item.created_at || new Date().toISOString(),
-                updated_at: item.updatedAt || item.updated_at || new Date().toISOString(),
-              };
-              
-              console.log(`📝 Criando venda ${item.id} com paymentMethod: ${serverPaymentMethod}`);
-              
-              // Criar a venda no banco local
-              this.dbManager.createSale(saleData, true); // skipSyncQueue = true
-              console.log(`➕ Venda criada do servidor: ${item.id} (${item.status}, total: ${item.total})`);
-              
-              // 🔴 CORREÇÃO CRÍTICA: Atualizar totais do caixa para vendas sincronizadas
-              // Vendas do Vendas-Mobile devem entrar nos cálculos da Caixa do Electron
-              const currentCashBox = this.dbManager.getCurrentCashBox();
-              if (currentCashBox && serverPaymentMethod && item.total > 0) {
-                // Verificar se a venda foi criada durante este caixa (após abertura)
-                const saleCreatedAt = new Date(item.createdAt || item.created_at || new Date());
-                const cashBoxOpenedAt = new Date(currentCashBox.opened_at);
-                
-                if (saleCreatedAt >= cashBoxOpenedAt) {
-                  this.dbManager.updateCashBoxTotals(currentCashBox.id, item.total, serverPaymentMethod);
-                  console.log(`  💰 Caixa atualizado: +${item.total} (${serverPaymentMethod})`);
-                }
-              }              
-              // Sincronizar itens da venda se existirem
-              if (item.items && Array.isArray(item.items)) {
-                for (const saleItem of item.items) {
-                  try {
-                    const existingItem = this.dbManager.prepare(`
-                      SELECT id FROM sale_items WHERE id = ?
-                    `).get(saleItem.id);
-                    
-                    if (!existingItem) {
-                      this.dbManager.prepare(`
-                        INSERT INTO sale_items (id, sale_id, product_id, qty_units, unit_price, unit_cost, subtotal, discount_amount, tax_amount, total, is_muntu, notes, synced, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
-                      `).run(
-                        saleItem.id,
-                        item.id,
-                        saleItem.productId || saleItem.product_id,
-                        saleItem.qtyUnits || saleItem.qty_units || 1,
-                        saleItem.unitPrice || saleItem.unit_price || 0,
-                        saleItem.unitCost || saleItem.unit_cost || 0,
-                        saleItem.subtotal || 0,
-                        saleItem.discount || saleItem.discountAmount || saleItem.discount_amount || 0,
-                        saleItem.taxAmount || saleItem.tax_amount || 0,
-                        saleItem.total || saleItem.subtotal || 0,
-                        saleItem.isMuntu || saleItem.is_muntu ? 1 : 0,
-                        saleItem.notes || null,
-                        saleItem.createdAt || new Date().toISOString()
-                      );
-                      console.log(`  📦 Item sincronizado: productId=${saleItem.productId || saleItem.product_id}`);
-                    }
-                  } catch (itemError: any) {
-                    console.error(`  ❌ Erro ao sincronizar item ${saleItem.id}:`, itemError?.message);
-                  }
-                }
-              }
-              
-              // Sincronizar pagamentos da venda se existirem
-              if (item.payments && Array.isArray(item.payments) && item.payments.length > 0) {
-                for (const payment of item.payments) {
-                  try {
-                    const existingPayment = this.dbManager.prepare(`
-                      SELECT id FROM payments WHERE id = ?
-                    `).get(payment.id);
-                    
-                    if (!existingPayment) {
-                      // Validar método de pagamento - NUNCA usar fallback
-                      const normalizedMethod = tryNormalizePaymentMethod(payment.method);
-                      if (!normalizedMethod) {
-                        console.error(`  ❌ Método de pagamento inválido: ${payment.method} - Venda ${item.id} marcada como inconsistente`);
-                        // Marcar a venda como inconsistente em vez de assumir 'cash'
-                        continue;
-                      }
-                      
-                      this.dbManager.prepare(`
-                        INSERT INTO payments (id, sale_id, method, amount, provider, reference_number, transaction_id, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                      `).run(
-                        payment.id,
-                        item.id,
-                        normalizedMethod, // Método validado e normalizado
-                        payment.amount || item.total,
-                        payment.provider || null,
-                        payment.referenceNumber || payment.reference_number || null,
-                        payment.transactionId || payment.transaction_id || null,
-                        payment.createdAt || new Date().toISOString()
-                      );
-                      console.log(`  💰 Pagamento sincronizado: ${normalizedMethod} - ${payment.amount}`);
-                    }
-                  } catch (paymentError: any) {
-                    console.error(`  ❌ Erro ao sincronizar pagamento ${payment.id}:`, paymentError?.message);
-                  }
-                }
-              } else {
-                // Se não tem array de payments, verificar paymentMethod direto do item
-                const rawPaymentMethod = item.paymentMethod || item.payment_method;
-                
-                // Validar método de pagamento - NUNCA usar fallback
-                const normalizedMethod = tryNormalizePaymentMethod(rawPaymentMethod);
-                if (!normalizedMethod) {
-                  console.error(`  ❌ Venda ${item.id} sem método de pagamento válido: ${rawPaymentMethod}`);
-                  // NÃO criar pagamento com método inválido
-                } else {
-                  const paymentId = `PAY-${item.id}-${Date.now()}`;
-                  
-                  try {
-                    this.dbManager.prepare(`
-                      INSERT INTO payments (id, sale_id, method, amount, created_at)
-                      VALUES (?, ?, ?, ?, ?)
-                    `).run(
-                      paymentId,
-                      item.id,
-                      normalizedMethod, // Método validado e normalizado
-                      item.total || 0,
-                      item.createdAt || new Date().toISOString()
-                    );
-                    console.log(`  💰 Pagamento criado: ${normalizedMethod} - ${item.total}`);
-                  } catch (paymentError: any) {
-                    console.error(`  ❌ Erro ao criar pagamento:`, paymentError?.message);
-                  }
-                }
-              }
-              
-              // ⚠️ NÃO decrementar estoque aqui!
-              // O estoque já foi decrementado no dispositivo que criou a venda (Mobile ou outro Desktop)
-              // E o servidor sincroniza o inventário separadamente.
-              // Decrementar aqui causaria DUPLICAÇÃO: estoque cairia 2x para cada venda.
-              
-              // ANTIGO CÓDIGO PROBLEMÁTICO (REMOVIDO):
-              // if (item.items && Array.isArray(item.items)) {
-              //   for (const saleItem of item.items) {
-              //     // decrementava estoque para vendas recebidas do servidor - ERRADO!
-              //   }
-              // }
-            } else {
-              // Venda já existe - verificar se precisa atualizar
-              const existingAny = existing as any;
-              
-              // Atualizar status se necessário
-              if (existingAny.status !== item.status) {
-                this.dbManager.prepare(`
-                  UPDATE sales SET status = ?, synced = 1, updated_at = datetime('now')
-                  WHERE id = ?
-                `).run(item.status, item.id);
-                console.log(`📝 Venda atualizada: ${item.id} (status: ${item.status})`);
-              }
-              
-              // Verificar pagamentos locais e do servidor
-              const localPayments = this.dbManager.prepare(`
-                SELECT id, method FROM payments WHERE sale_id = ?
-              `).all(item.id) as any[];
-              
-              // Determinar método de pagamento do servidor
-              const serverPaymentMethod = item.payments && Array.isArray(item.payments) && item.payments.length > 0
-                ? item.payments[0].method
-                : (item.paymentMethod || item.payment_method || null);
-              
-              if (localPayments.length === 0) {
-                // Não tem pagamento local - criar
-                if (item.payments && Array.isArray(item.payments) && item.payments.length > 0) {
-                  // Sincronizar pagamentos do servidor
-                  for (const payment of item.payments) {
-                    try {
-                      // Validar método de pagamento - NUNCA usar fallback
-                      const normalizedMethod = tryNormalizePaymentMethod(payment.method);
-                      if (!normalizedMethod) {
-                        console.error(`  ❌ Pagamento ${payment.id} com método inválido: ${payment.method}`);
-                        continue;
-                      }
-                      
-                      this.dbManager.prepare(`
-                        INSERT INTO payments (id, sale_id, method, amount, provider, reference_number, transaction_id, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                      `).run(
-                        payment.id,
-                        item.id,
-                        normalizedMethod, // Método validado e normalizado
-                        payment.amount || item.total,
-                        payment.provider || null,
-                        payment.referenceNumber || payment.reference_number || null,
-                        payment.transactionId || payment.transaction_id || null,
-                        payment.createdAt || new Date().toISOString()
-                      );
-                      console.log(`  💰 Pagamento adicionado: ${normalizedMethod} - ${payment.amount}`);
-                    } catch (paymentError: any) {
-                      console.error(`  ❌ Erro ao adicionar pagamento:`, paymentError?.message);
-                    }
-                  }
-                } else if (serverPaymentMethod) {
-                  // Sem pagamento no servidor mas tem paymentMethod - criar do paymentMethod
-                  const paymentId = `PAY-${item.id}-${Date.now()}`;
-                  
-                  try {
-                    this.dbManager.prepare(`
-                      INSERT INTO payments (id, sale_id, method, amount, created_at)
-                      VALUES (?, ?, ?, ?, ?)
-                    `).run(
-                      paymentId,
-                      item.id,
-                      serverPaymentMethod,
-                      item.total || 0,
-                      item.createdAt || new Date().toISOString()
-                    );
-                    console.log(`  💰 Pagamento criado para venda existente: ${serverPaymentMethod} - ${item.total}`);
-                  } catch (paymentError: any) {
-                    console.error(`  ❌ Erro ao criar pagamento:`, paymentError?.message);
-                  }
-                }
-              } else if (serverPaymentMethod && localPayments.length > 0) {
-                // Tem pagamento local E servidor tem método diferente
-                // Verificar se o método local está incorreto (cash quando deveria ser outro)
-                const localMethod = localPayments[0].method;
-                
-                console.log(`  📊 Comparando métodos: local="${localMethod}" vs server="${serverPaymentMethod}"`);
-                
-                // Se o servidor diz que é 'debt' ou 'vale' mas local diz 'cash', confiar no servidor
-                if (localMethod !== serverPaymentMethod) {
-                  console.log(`  🔄 Corrigindo método de pagamento: ${localMethod} → ${serverPaymentMethod}`);
-                  this.dbManager.prepare(`
-                    UPDATE payments SET method = ? WHERE sale_id = ?
-                  `).run(serverPaymentMethod, item.id);
-                }
-              }
-              
-              // Marcar como sincronizado
-              this.dbManager.prepare(`
-                UPDATE sales SET synced = 1 WHERE id = ?
-              `).run(item.id);
-            }
-          } catch (e: any) {
-            console.error(`Erro ao mesclar sale ${item.id}:`, e?.message);
-          }
-        }
-      },
-
-      // 🔴 CORREÇÃO: Handler para sincronizar pagamentos de mesa
-      table_payments: (items) => {
-        console.log(`💳 Processando ${items.length} pagamentos de mesa...`);
-        let created = 0, updated = 0, errors = 0;
-        
-        for (const item of items) {
-          try {
-            const existing = this.dbManager.prepare(`SELECT id FROM table_payments WHERE id = ?`).get(item.id);
-            
-            if (existing) {
-              // Atualizar pagamento existente
-              this.dbManager.prepare(`
-                UPDATE table_payments SET
-                  amount = ?,
-                  method = ?,
-                  synced = 1,
-                  updated_at = datetime('now')
-                WHERE id = ?
-              `).run(
-                item.amount || 0,
-                item.method || 'cash',
-                item.id
-              );
-              updated++;
-            } else {
-              // Criar novo pagamento
-              this.dbManager.prepare(`
-                INSERT INTO table_payments (id, session_id, table_customer_id, payment_id, amount, method, processed_by, paid_at, synced, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, datetime('now'), datetime('now'))
-              `).run(
-                item.id,
-                item.sessionId || item.session_id,
-                item.tableCustomerId || item.table_customer_id || null,
-                item.paymentId || item.payment_id || null,
-                item.amount || 0,
-                item.method || 'cash',
-                item.processedBy || item.processed_by || 'system',
-                item.paidAt || item.paid_at || new Date().toISOString()
-              );
-              created++;
-            }
-          } catch (e: any) {
-            errors++;
-            console.error(`❌ Erro ao mesclar table_payment ${item.id}:`, e?.message);
-          }
-        }
-        console.log(`📊 TABLE_PAYMENTS RESUMO: ✅ Criados: ${created} | 📝 Atualizados: ${updated} | ❌ Erros: ${errors}`);
-      },
-    };
-    
-    const strategy = mergeStrategies[entityName];
-    if (strategy) {
-      strategy(items);
-    } else {
-      console.warn(`⚠️ Sem estratégia de merge para: ${entityName}`);
-    }
-  }
 
   /**
    * Sincroniza um item individual, tratando casos especiais de entidades aninhadas
@@ -3482,7 +2080,7 @@ export class SyncManager {
           if (!data.password) {
             console.error('❌ Senha não disponível para sincronização de usuário');
             // Marcar erro no registro do usuário
-            this.dbManager.markUserSyncError(userId, 'Senha não disponível para sincronização');
+            await this.write('markUserSyncError', userId, 'Senha não disponível para sincronização');
             return { 
               success: false, 
               reason: 'Senha não disponível para sincronização. Usuário criado apenas localmente.' 
@@ -3527,19 +2125,19 @@ export class SyncManager {
             const serverId = response.data?.id || userId;
             console.log('✅ Usuário sincronizado com backend:', data.email);
             // Marcar como sincronizado com sucesso
-            this.dbManager.markUserSynced(userId, serverId);
+            await this.write('markUserSynced', userId, serverId);
             return { success: true };
           } catch (error: any) {
             // Se usuário já existe, considerar sucesso e vincular
             if (error?.response?.status === 409) {
               console.log('⚠️ Usuário já existe no backend:', data.email);
               // Marcar como sincronizado (já existe no servidor)
-              this.dbManager.markUserSynced(userId, userId);
+              await this.write('markUserSynced', userId, userId);
               return { success: true };
             }
             // Marcar erro
             const errorMsg = error?.response?.data?.message || error.message || 'Erro desconhecido';
-            this.dbManager.markUserSyncError(userId, errorMsg);
+            await this.write('markUserSyncError', userId, errorMsg);
             throw error;
           }
         } else if (operation === 'update') {
@@ -3558,11 +2156,11 @@ export class SyncManager {
           try {
             await this.apiClient.put(`/users/${userId}`, updatePayload);
             console.log('✅ Usuário atualizado no backend:', userId);
-            this.dbManager.markUserSynced(userId);
+            await this.write('markUserSynced', userId);
             return { success: true };
           } catch (error: any) {
             const errorMsg = error?.response?.data?.message || error.message || 'Erro desconhecido';
-            this.dbManager.markUserSyncError(userId, errorMsg);
+            await this.write('markUserSyncError', userId, errorMsg);
             throw error;
           }
         } else if (operation === 'delete') {
@@ -3570,11 +2168,11 @@ export class SyncManager {
           try {
             await this.apiClient.put(`/users/${userId}`, { isActive: false });
             console.log('✅ Usuário desativado no backend:', userId);
-            this.dbManager.markUserSynced(userId);
+            await this.write('markUserSynced', userId);
             return { success: true };
           } catch (error: any) {
             const errorMsg = error?.response?.data?.message || error.message || 'Erro desconhecido';
-            this.dbManager.markUserSyncError(userId, errorMsg);
+            await this.write('markUserSyncError', userId, errorMsg);
             throw error;
           }
         }
@@ -3594,7 +2192,7 @@ export class SyncManager {
               newPassword: data.newPassword
             });
             console.log('✅ Senha do usuário resetada no backend:', pwUserId);
-            this.dbManager.markUserSynced(pwUserId);
+            await this.write('markUserSynced', pwUserId);
             return { success: true };
           } catch (error: any) {
             // Se endpoint não existir, tentar PUT /users/:id com password
@@ -3604,16 +2202,16 @@ export class SyncManager {
                   password: data.newPassword 
                 });
                 console.log('✅ Senha do usuário atualizada no backend via PUT:', pwUserId);
-                this.dbManager.markUserSynced(pwUserId);
+                await this.write('markUserSynced', pwUserId);
                 return { success: true };
               } catch (putError: any) {
                 const errorMsg = putError?.response?.data?.message || putError.message || 'Erro desconhecido';
-                this.dbManager.markUserSyncError(pwUserId, errorMsg);
+                await this.write('markUserSyncError', pwUserId, errorMsg);
                 throw putError;
               }
             }
             const errorMsg = error?.response?.data?.message || error.message || 'Erro desconhecido';
-            this.dbManager.markUserSyncError(pwUserId, errorMsg);
+            await this.write('markUserSyncError', pwUserId, errorMsg);
             throw error;
           }
         }
@@ -3735,7 +2333,7 @@ export class SyncManager {
             
             // Marcar movimento local como sincronizado
             if (entity_id) {
-              this.dbManager.markStockMovementSynced(entity_id);
+              await this.write('markStockMovementSynced', entity_id);
             }
             
             return { success: true };
@@ -3762,7 +2360,7 @@ export class SyncManager {
             console.log(`✅ Configuração sincronizada: ${data.key}`);
             
             // Marcar como sincronizada
-            this.dbManager.markSettingSynced(data.key);
+            await this.write('markSettingSynced', data.key);
             
             return { success: true };
           } catch (error: any) {
@@ -344,21 +344,13 @@ export default function POS() {
         status: 'completed', // Venda já fechada
       };
 
-      // @ts-ignore - Criar a venda
-      const sale = await window.electronAPI?.sales?.create?.(saleData);
-      
-      if (!sale) {
-        toast.error('Erro ao criar venda');
-        return;
-      }
-
-      // Adicionar cada item da venda
-      for (const item of cart) {
+      // Montar os itens da venda
+      const items = cart.map(item => {
         // Buscar o custo do produto
         const product = products.find(p => p.id === item.productId);
         const unitCost = product?.costUnit || 0;
         
-        const itemData = {
+        return {
           productId: item.productId,
           branchId: 'main-branch',
           qtyUnits: item.quantity,
@@ -371,9 +363,27 @@ export default function POS() {
           muntuSavings: item.isMuntu ? Math.round((item.unitPrice * item.quantity - item.subtotal) * 100) : 0,
           cashierId: 'offline-admin',
         };
-        
-        // @ts-ignore
-        await window.electronAPI?.sales?.addItem?.(sale.id, itemData);
+      });
+
+      // Registrar pagamento
+      const paymentData = {
+        method: selectedPaymentMethod, // cash, orange, teletaku, vale, mixed
+        amount: totalCents, // Total em centavos
+        status: 'completed',
+        notes: `Venda ${saleNumber}`,
+      };
+
+      // ⚡ Venda + itens + pagamento gravados numa única transação (um IPC, um commit)
+      // @ts-ignore
+      const sale = await window.electronAPI?.sales?.record?.({
+        sale: saleData,
+        items,
+        payments: [paymentData],
+      });
+      
+      if (!sale) {
+        toast.error('Erro ao criar venda');
+        return;
       }
 
       // ═══════════════════════════════════════════════════════════════════
@@ -393,17 +403,6 @@ export default function POS() {
         toast.success(`✅ Vale registrado para ${selectedCustomer.name}! Será sincronizado automaticamente.`, 4000);
       }
 
-      // Registrar pagamento
-      const paymentData = {
-        method: selectedPaymentMethod, // cash, orange, teletaku, vale, mixed
-        amount: totalCents, // Total em centavos
-        status: 'completed',
-        notes: `Venda ${saleNumber}`,
-      };
-      
-      // @ts-ignore
-      await window.electronAPI?.sales?.addPayment?.(sale.id, paymentData);
-
       // Adicionar pontos de fidelidade se houver cliente selecionado
       if (selectedCustomer) {
         try {
@@ -427,7 +426,7 @@ export default function POS() {
       }
 
       // 🔴 REMOVIDO: Chamada duplicada de updateCashBoxTotals
-      // O addSalePayment() já atualiza os totais do caixa automaticamente (linha 1204 do manager.ts)
+      // O recordSale() já atualiza os totais do caixa automaticamente (via insertSalePayment no manager.ts)
       // Esta chamada explícita causava DUPLICAÇÃO dos valores (34.400 ao invés de 17.200)
       // if (currentCashBox) { ... cashBox.updateTotals ... }
       
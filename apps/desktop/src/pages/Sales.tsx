@@ -39,6 +39,8 @@ interface SaleDetail extends Sale {
   payments: any[];
 }
 
+const SALES_PAGE_SIZE = 100;
+
 export default function SalesPage() {
   const toast = useToast();
   const [sales, setSales] = useState<Sale[]>([]);
@@ -53,22 +55,43 @@ export default function SalesPage() {
   const [dateFilter, setDateFilter] = useState('');
   const [paymentFilter, setPaymentFilter] = useState('all');
   const [showFilters, setShowFilters] = useState(false);
+  const [hasMore, setHasMore] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
 
+  // Data e método de pagamento são filtrados no banco (paginação por created_at/id)
   useEffect(() => {
     loadSales();
-  }, []);
+  }, [dateFilter, paymentFilter]);
 
   useEffect(() => {
     applyFilters();
   }, [sales, searchTerm, dateFilter, paymentFilter]);
 
+  const buildListFilters = (before?: Sale) => {
+    const filters: any = { limit: SALES_PAGE_SIZE };
+    if (dateFilter) {
+      const nextDay = new Date(dateFilter);
+      nextDay.setDate(nextDay.getDate() + 1);
+      filters.dateFrom = dateFilter;
+      filters.dateTo = nextDay.toISOString().slice(0, 10);
+    }
+    if (paymentFilter !== 'all') {
+      filters.paymentMethod = paymentFilter;
+    }
+    if (before) {
+      filters.before = { createdAt: before.created_at, id: before.id };
+    }
+    return filters;
+  };
+
   const loadSales = async () => {
     setLoading(true);
     try {
       // @ts-ignore
-      const result = await window.electronAPI?.sales?.list?.({});
+      const result = await window.electronAPI?.sales?.list?.(buildListFilters());
       if (result && Array.isArray(result)) {
         setSales(result);
+        setHasMore(result.length === SALES_PAGE_SIZE);
       }
     } catch (error) {
       console.error('Erro ao carregar vendas:', error);
@@ -78,6 +101,24 @@ export default function SalesPage() {
     }
   };
 
+  const loadMoreSales = async () => {
+    if (sales.length === 0) return;
+    setLoadingMore(true);
+    try {
+      // @ts-ignore
+      const result = await window.electronAPI?.sales?.list?.(buildListFilters(sales[sales.length - 1]));
+      if (result && Array.isArray(result)) {
+        setSales(prev => [...prev, ...result]);
+        setHasMore(result.length === SALES_PAGE_SIZE);
+      }
+    } catch (error) {
+      console.error('Erro ao carregar mais vendas:', error);
+      toast.error('Erro ao carregar vendas');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const applyFilters = () => {
     let filtered = [...sales];
 
@@ -376,6 +417,17 @@ export default function SalesPage() {
             </tbody>
           </table>
         </div>
+        {hasMore && !loading && (
+          <div className="p-4 border-t text-center">
+            <button
+              onClick={loadMoreSales}
+              disabled={loadingMore}
+              className="px-4 py-2 rounded-lg bg-gray-100 text-gray-700 hover:bg-gray-200 transition-colors disabled:opacity-50"
+            >
+              {loadingMore ? 'Carregando...' : 'Carregar mais vendas'}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* Modal Loading */}
@@ -0,0 +1,9 @@
+"""
+Ferramentas Python compartilhadas do BarManager Pro.
+
+Os scripts avulsos da raiz (check-*.py, fix-*.py, sync-*.py) repetem
+login, caminhos de banco e consultas. Este pacote reúne o que é comum.
+
+Uso (a partir da raiz do repositório):
+    python -m barmanager_tools.<modulo> --help
+"""
@@ -0,0 +1,343 @@
+"""
+Relatórios de fechamento de mês a partir do banco local do desktop (offline).
+
+Carrega vendas, itens de venda, compras, estoque e movimentações em colunas
+NumPy (lidas em blocos com fetchmany) e calcula, para todos os produtos de
+uma vez (np.bincount por produto):
+
+- vendas: quantidade, receita, custo (CMV), margem e margem %
+- compras: quantidade e custo total no período, custo médio por unidade
+- estoque: unidades, caixas fechadas + unidades soltas, valor a custo e a preço
+- giro: unidades vendidas por dia, dias de cobertura do estoque atual,
+  entradas e saídas pelas movimentações de estoque
+
+Saída: resumo no terminal, CSV por produto (--csv) e JSON completo (--json).
+
+Requer o pacote numpy:  pip install numpy
+
+Uso:
+    python -m barmanager_tools.analytics --month 2026-01
+    python -m barmanager_tools.analytics --from 2026-01-01 --to 2026-02-01 --branch main-branch --csv jan.csv
+    python -m barmanager_tools.analytics --db barmanager.db --json relatorio.json
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import date, datetime
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError('barmanager_tools.analytics requer o pacote numpy: pip install numpy') from error
+
+from . import db
+
+CHUNK_SIZE = 50000
+
+# Índice numérico de cada produto (ordem por id), usado por todas as consultas
+PRODUCT_INDEX_SQL = '(SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS idx FROM products)'
+
+
+def load_columns(conn, sql, params=(), columns=1, chunk_size=CHUNK_SIZE, dtype=np.float64):
+    """
+    Executa `sql` e devolve uma matriz (linhas x colunas) NumPy, lendo em blocos.
+    Todas as colunas da consulta devem ser numéricas.
+    """
+    cursor = conn.execute(sql, params)
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=dtype).reshape(-1, columns))
+    if not chunks:
+        return np.empty((0, columns), dtype=dtype)
+    return np.concatenate(chunks)
+
+
+def per_product(index, weights, size):
+    """Soma `weights` por produto (índice inteiro)."""
+    if len(index) == 0:
+        return np.zeros(size)
+    return np.bincount(index.astype(np.int64), weights=weights, minlength=size)
+
+
+def _safe_div(numerator, denominator):
+    out = np.zeros_like(numerator, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def _branch_filter(column, branch_id):
+    return (f' AND {column} = ?', (branch_id,)) if branch_id else ('', ())
+
+
+def _movement_columns(conn):
+    """
+    stock_movements tem dois esquemas (quantity_before/after ou qty_before/after),
+    conforme a versão que criou a tabela.
+    """
+    tables = db.list_tables(conn)
+    if 'stock_movements' not in tables:
+        return None
+    columns = db.table_columns(conn, 'stock_movements')
+    if 'quantity_before' in columns:
+        return 'quantity_before', 'quantity_after'
+    if 'qty_before' in columns:
+        return 'qty_before', 'qty_after'
+    return None
+
+
+def load_products(conn):
+    rows = conn.execute(
+        'SELECT id, name, sku, COALESCE(cost_unit, 0), COALESCE(price_unit, 0), '
+        'COALESCE(units_per_box, 1) FROM products ORDER BY id'
+    ).fetchall()
+    return {
+        'id': [row[0] for row in rows],
+        'name': [row[1] for row in rows],
+        'sku': [row[2] for row in rows],
+        'cost_unit': np.array([row[3] for row in rows], dtype=np.float64),
+        'price_unit': np.array([row[4] for row in rows], dtype=np.float64),
+        'units_per_box': np.array([row[5] for row in rows], dtype=np.int64),
+    }
+
+
+def compute(conn, start, end, branch_id=None, timings=None):
+    """
+    Calcula todas as métricas por produto para o período [start, end).
+    Retorna (produtos, métricas por produto, resumo).
+    """
+    timings = timings if timings is not None else {}
+
+    def timed(label, fn):
+        started = time.perf_counter()
+        result = fn()
+        timings[label] = round(time.perf_counter() - started, 3)
+        return result
+
+    products = timed('products', lambda: load_products(conn))
+    size = len(products['id'])
+    period_days = max((end - start).days, 1)
+    start_s, end_s = start.isoformat(), end.isoformat()
+
+    # Vendas do período (exceto canceladas): [produto, qtd, receita, custo]
+    where, params = _branch_filter('s.branch_id', branch_id)
+    sales = timed('sale_items', lambda: load_columns(conn, f'''
+        SELECT p.idx, si.qty_units, si.total, si.unit_cost * si.qty_units
+        FROM sale_items si
+        JOIN sales s ON s.id = si.sale_id
+        JOIN {PRODUCT_INDEX_SQL} p ON p.id = si.product_id
+        WHERE s.created_at >= ? AND s.created_at < ?
+          AND COALESCE(s.status, '') NOT IN ('cancelled', 'canceled'){where}
+    ''', (start_s, end_s) + params, columns=4))
+    sale_count = conn.execute(
+        f'''SELECT COUNT(*) FROM sales s WHERE s.created_at >= ? AND s.created_at < ?
+            AND COALESCE(s.status, '') NOT IN ('cancelled', 'canceled'){where}''',
+        (start_s, end_s) + params,
+    ).fetchone()[0]
+
+    # Compras do período: [produto, qtd, total]
+    where, params = _branch_filter('pu.branch_id', branch_id)
+    purchases = timed('purchase_items', lambda: load_columns(conn, f'''
+        SELECT p.idx, pi.qty_units, pi.total
+        FROM purchase_items pi
+        JOIN purchases pu ON pu.id = pi.purchase_id
+        JOIN {PRODUCT_INDEX_SQL} p ON p.id = pi.product_id
+        WHERE pu.created_at >= ? AND pu.created_at < ?{where}
+    ''', (start_s, end_s) + params, columns=3))
+
+    # Estoque atual: [produto, unidades, caixas fechadas, unidades da caixa aberta]
+    where, params = _branch_filter('i.branch_id', branch_id)
+    inventory = timed('inventory_items', lambda: load_columns(conn, f'''
+        SELECT p.idx, COALESCE(i.qty_units, 0), COALESCE(i.closed_boxes, 0), COALESCE(i.open_box_units, 0)
+        FROM inventory_items i
+        JOIN {PRODUCT_INDEX_SQL} p ON p.id = i.product_id
+        WHERE 1 = 1{where}
+    ''', params, columns=4))
+
+    # Movimentações do período: [produto, variação]
+    movement_cols = _movement_columns(conn)
+    if movement_cols:
+        before, after = movement_cols
+        where, params = _branch_filter('m.branch_id', branch_id)
+        movements = timed('stock_movements', lambda: load_columns(conn, f'''
+            SELECT p.idx, m.{after} - m.{before}
+            FROM stock_movements m
+            JOIN {PRODUCT_INDEX_SQL} p ON p.id = m.product_id
+            WHERE m.created_at >= ? AND m.created_at < ?{where}
+        ''', (start_s, end_s) + params, columns=2))
+    else:
+        movements = np.empty((0, 2))
+
+    started = time.perf_counter()
+    sale_idx = sales[:, 0]
+    qty_sold = per_product(sale_idx, sales[:, 1], size)
+    revenue = per_product(sale_idx, sales[:, 2], size)
+    cogs = per_product(sale_idx, sales[:, 3], size)
+    margin = revenue - cogs
+
+    qty_purchased = per_product(purchases[:, 0], purchases[:, 1], size)
+    purchase_cost = per_product(purchases[:, 0], purchases[:, 2], size)
+
+    stock_units = per_product(inventory[:, 0], inventory[:, 1], size)
+    closed_boxes = per_product(inventory[:, 0], inventory[:, 2], size)
+    open_box_units = per_product(inventory[:, 0], inventory[:, 3], size)
+
+    deltas = movements[:, 1]
+    units_in = per_product(movements[:, 0], np.where(deltas > 0, deltas, 0), size)
+    units_out = per_product(movements[:, 0], np.where(deltas < 0, -deltas, 0), size)
+
+    units_per_box = np.maximum(products['units_per_box'], 1)
+    stock_int = stock_units.astype(np.int64)
+    velocity = qty_sold / period_days
+    cover_days = np.full(size, np.nan)
+    np.divide(stock_units, velocity, out=cover_days, where=velocity > 0)
+
+    metrics = {
+        'qty_sold': qty_sold,
+        'revenue': revenue,
+        'cogs': cogs,
+        'margin': margin,
+        'margin_pct': _safe_div(margin, revenue) * 100,
+        'qty_purchased': qty_purchased,
+        'purchase_cost': purchase_cost,
+        'avg_purchase_cost': _safe_div(purchase_cost, qty_purchased),
+        'stock_units': stock_units,
+        'stock_boxes': np.floor_divide(np.maximum(stock_int, 0), units_per_box),
+        'stock_loose_units': np.mod(np.maximum(stock_int, 0), units_per_box),
+        'closed_boxes': closed_boxes,
+        'open_box_units': open_box_units,
+        # Caixas fechadas + caixa aberta registradas não batem com o total de unidades
+        'box_mismatch': (closed_boxes * units_per_box + open_box_units) != stock_units,
+        'stock_value_cost': stock_units * products['cost_unit'],
+        'stock_value_price': stock_units * products['price_unit'],
+        'velocity_per_day': velocity,
+        'cover_days': cover_days,
+        'units_in': units_in,
+        'units_out': units_out,
+    }
+    timings['compute'] = round(time.perf_counter() - started, 3)
+
+    total_revenue = float(revenue.sum())
+    summary = {
+        'period': {'from': start_s, 'to': end_s, 'days': period_days},
+        'branch_id': branch_id,
+        'products': size,
+        'sales': int(sale_count),
+        'sale_items': int(len(sales)),
+        'revenue': total_revenue,
+        'cogs': float(cogs.sum()),
+        'margin': float(margin.sum()),
+        'margin_pct': round(float(margin.sum()) / total_revenue * 100, 2) if total_revenue else 0,
+        'purchase_cost': float(purchase_cost.sum()),
+        'stock_units': float(stock_units.sum()),
+        'stock_value_cost': float(metrics['stock_value_cost'].sum()),
+        'stock_value_price': float(metrics['stock_value_price'].sum()),
+        'box_mismatches': int(np.count_nonzero(metrics['box_mismatch'] & (stock_units != 0))),
+        'products_without_sales': int(np.count_nonzero((qty_sold == 0) & (stock_units > 0))),
+    }
+    return products, metrics, summary
+
+
+def product_rows(products, metrics):
+    """Linhas por produto (para CSV/JSON), ordenadas por receita."""
+    order = np.argsort(-metrics['revenue'], kind='stable')
+    rows = []
+    for i in order:
+        row = {'product_id': products['id'][i], 'name': products['name'][i], 'sku': products['sku'][i]}
+        for key, values in metrics.items():
+            value = values[i]
+            if isinstance(value, np.bool_):
+                row[key] = bool(value)
+            elif np.isnan(value):
+                row[key] = None
+            elif float(value).is_integer():
+                row[key] = int(value)
+            else:
+                row[key] = round(float(value), 2)
+        rows.append(row)
+    return rows
+
+
+def write_csv(path, rows):
+    if not rows:
+        open(path, 'w').close()
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_summary(summary, rows, timings, top=10):
+    money = lambda cents: f'{cents / 100:,.0f} FCFA'.replace(',', '.')
+    period = summary['period']
+    print('═' * 70)
+    print(f"  FECHAMENTO {period['from']} → {period['to']} ({period['days']} dias)")
+    print('═' * 70)
+    print(f"  Vendas: {summary['sales']} ({summary['sale_items']} itens)")
+    print(f"  Receita: {money(summary['revenue'])} | CMV: {money(summary['cogs'])}")
+    print(f"  Margem: {money(summary['margin'])} ({summary['margin_pct']}%)")
+    print(f"  Compras: {money(summary['purchase_cost'])}")
+    print(f"  Estoque: {summary['stock_units']:.0f} un | a custo {money(summary['stock_value_cost'])} "
+          f"| a preço {money(summary['stock_value_price'])}")
+    print(f"  Caixas inconsistentes: {summary['box_mismatches']} | "
+          f"Produtos parados com estoque: {summary['products_without_sales']}")
+    print()
+    print(f"  {'PRODUTO':<30} {'QTD':>7} {'RECEITA':>14} {'MARGEM %':>9} {'COBERTURA':>10}")
+    for row in rows[:top]:
+        cover = f"{row['cover_days']:.0f} d" if row['cover_days'] is not None else '-'
+        print(f"  {(row['name'] or '')[:30]:<30} {row['qty_sold']:>7} {money(row['revenue']):>14} "
+              f"{row['margin_pct']:>8}% {cover:>10}")
+    print()
+    print('  Tempos: ' + ', '.join(f'{k} {v}s' for k, v in timings.items()))
+
+
+def _parse_period(args):
+    if args.date_from or args.date_to:
+        start = datetime.strptime(args.date_from, '%Y-%m-%d').date() if args.date_from else date(2000, 1, 1)
+        end = datetime.strptime(args.date_to, '%Y-%m-%d').date() if args.date_to else date.today()
+        return start, end
+    month = datetime.strptime(args.month, '%Y-%m').date() if args.month else date.today().replace(day=1)
+    end = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+    return month, end
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Relatórios de margem, estoque e giro a partir do banco local')
+    parser.add_argument('--db', default=None, help='Caminho do barmanager.db (padrão: banco do desktop)')
+    parser.add_argument('--month', help='Mês do relatório (AAAA-MM, padrão: mês atual)')
+    parser.add_argument('--from', dest='date_from', help='Início do período (AAAA-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='Fim do período, exclusivo (AAAA-MM-DD)')
+    parser.add_argument('--branch', help='Filtrar por filial (branch_id)')
+    parser.add_argument('--csv', dest='csv_path', help='Gravar métricas por produto em CSV')
+    parser.add_argument('--json', dest='json_path', help='Gravar resumo + produtos em JSON')
+    parser.add_argument('--top', type=int, default=10, help='Produtos no resumo do terminal')
+    args = parser.parse_args(argv)
+
+    start, end = _parse_period(args)
+    conn = db.connect(args.db or db.default_db_path(), row_factory=None)
+    timings = {}
+    try:
+        products, metrics, summary = compute(conn, start, end, args.branch, timings)
+    finally:
+        conn.close()
+
+    rows = product_rows(products, metrics)
+    print_summary(summary, rows, timings, args.top)
+
+    if args.csv_path:
+        write_csv(args.csv_path, rows)
+        print(f'  CSV salvo em {args.csv_path}')
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'timings': timings, 'products': rows}, f, ensure_ascii=False, indent=2)
+        print(f'  JSON salvo em {args.json_path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
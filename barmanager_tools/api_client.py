@@ -0,0 +1,177 @@
+"""
+Cliente HTTP compartilhado para a API do backend (Railway).
+
+- Login com token JWT (accessToken / access_token)
+- GET condicional: guarda ETag + corpo em disco e envia If-None-Match;
+  quando o servidor responde 304 o corpo em cache é reutilizado
+- Aceita respostas comprimidas (gzip e, se o pacote `brotli` estiver
+  instalado, brotli)
+
+Exemplo:
+    from barmanager_tools.api_client import ApiClient
+
+    client = ApiClient()
+    client.login('email@exemplo.com', 'senha')
+    inventory = client.get('/inventory')
+    print(client.stats)
+"""
+import hashlib
+import json
+import os
+
+import requests
+
+DEFAULT_BASE_URL = 'https://barmanagerbackend-production.up.railway.app/api/v1'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'barmanager', 'http')
+
+
+def _accept_encoding():
+    try:
+        import brotli  # noqa: F401
+        return 'br, gzip, deflate'
+    except ImportError:
+        return 'gzip, deflate'
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f'{status_code} - {message}')
+        self.status_code = status_code
+
+
+class ApiClient:
+    def __init__(self, base_url=None, cache_dir=None, use_cache=True, timeout=30):
+        self.base_url = (base_url or os.environ.get('BARMANAGER_API_URL') or DEFAULT_BASE_URL).rstrip('/')
+        self.cache_dir = cache_dir or os.environ.get('BARMANAGER_HTTP_CACHE') or DEFAULT_CACHE_DIR
+        self.use_cache = use_cache
+        self.timeout = timeout
+        self.token = None
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = _accept_encoding()
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes_received': 0}
+
+    # ------------------------------------------------------------------
+    # Autenticação
+    # ------------------------------------------------------------------
+    def login(self, email=None, password=None):
+        email = email or os.environ.get('BARMANAGER_EMAIL')
+        password = password or os.environ.get('BARMANAGER_PASSWORD')
+        if not email or not password:
+            raise ApiError(0, 'Credenciais ausentes (BARMANAGER_EMAIL / BARMANAGER_PASSWORD)')
+
+        response = self.session.post(
+            f'{self.base_url}/auth/login',
+            json={'email': email, 'password': password},
+            timeout=self.timeout,
+        )
+        if response.status_code not in (200, 201):
+            raise ApiError(response.status_code, response.text)
+
+        body = response.json()
+        self.token = body.get('accessToken') or body.get('access_token')
+        if not self.token:
+            raise ApiError(response.status_code, f'Token não encontrado na resposta: {body}')
+        self.session.headers['Authorization'] = f'Bearer {self.token}'
+        return self.token
+
+    # ------------------------------------------------------------------
+    # Requisições
+    # ------------------------------------------------------------------
+    def get(self, path, params=None):
+        body, _ = self.get_page(path, params)
+        return body
+
+    def get_all(self, path, params=None, page_size=1000):
+        """
+        Percorre uma listagem paginada por cursor (header X-Next-Cursor).
+        """
+        params = dict(params or {})
+        params['limit'] = page_size
+        items = []
+        while True:
+            body, next_cursor = self.get_page(path, params)
+            items.extend(body)
+            if not next_cursor:
+                return items
+            params['cursor'] = next_cursor
+
+    def get_page(self, path, params=None):
+        """
+        GET condicional. Retorna (corpo, próximo cursor ou None).
+        """
+        url = self._url(path)
+        cache_file = self._cache_file(url, params)
+        cached = self._read_cache(cache_file)
+
+        headers = {}
+        if cached:
+            headers['If-None-Match'] = cached['etag']
+
+        response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        self.stats['requests'] += 1
+        self.stats['bytes_received'] += int(response.headers.get('Content-Length') or len(response.content))
+
+        if response.status_code == 304 and cached:
+            self.stats['not_modified'] += 1
+            return cached['body'], cached.get('next_cursor')
+
+        if response.status_code != 200:
+            raise ApiError(response.status_code, response.text)
+
+        body = response.json()
+        next_cursor = response.headers.get('X-Next-Cursor')
+        etag = response.headers.get('ETag')
+        if etag:
+            self._write_cache(cache_file, etag, body, next_cursor)
+        return body, next_cursor
+
+    def post(self, path, payload):
+        return self._send('post', path, payload)
+
+    def put(self, path, payload):
+        return self._send('put', path, payload)
+
+    def _send(self, method, path, payload):
+        response = self.session.request(method, self._url(path), json=payload, timeout=self.timeout)
+        self.stats['requests'] += 1
+        if response.status_code not in (200, 201):
+            raise ApiError(response.status_code, response.text)
+        return response.json() if response.content else None
+
+    # ------------------------------------------------------------------
+    # Cache local de respostas (ETag)
+    # ------------------------------------------------------------------
+    def clear_cache(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def _url(self, path):
+        return path if path.startswith('http') else f'{self.base_url}/{path.lstrip("/")}'
+
+    def _cache_file(self, url, params):
+        if not self.use_cache:
+            return None
+        key = url + '?' + json.dumps(params or {}, sort_keys=True)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{digest}.json')
+
+    def _read_cache(self, cache_file):
+        if not cache_file or not os.path.exists(cache_file):
+            return None
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, cache_file, etag, body, next_cursor=None):
+        if not cache_file:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'etag': etag, 'body': body, 'next_cursor': next_cursor}, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
@@ -0,0 +1,74 @@
+"""
+Acesso ao banco SQLite do app desktop (Electron).
+
+- Caminho padrão do banco (variável BARMANAGER_DB ou pasta do Electron)
+- Conexão somente leitura (URI mode=ro) para ler o banco com o app aberto
+- Snapshot consistente via API de backup do SQLite
+"""
+import os
+import sqlite3
+import sys
+
+
+def default_db_path():
+    """
+    Caminho do barmanager.db do desktop.
+    Ordem: $BARMANAGER_DB, %APPDATA% (Windows), ~/Library (macOS), ~/.config (Linux).
+    """
+    env_path = os.environ.get('BARMANAGER_DB')
+    if env_path:
+        return env_path
+    if os.environ.get('APPDATA'):
+        base = os.environ['APPDATA']
+    elif sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, '@barmanager', 'desktop', 'barmanager.db')
+
+
+def connect(path, readonly=True, row_factory=sqlite3.Row):
+    """
+    Abre o banco. Em modo somente leitura o arquivo precisa existir e nenhuma
+    escrita é possível (seguro para rodar com o app aberto, em WAL).
+    """
+    if readonly:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'Banco não encontrado: {path}')
+        uri = 'file:' + os.path.abspath(path).replace('\\', '/') + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True)
+    else:
+        conn = sqlite3.connect(path)
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    return conn
+
+
+def snapshot(path, target_path, pages_per_step=1024):
+    """
+    Copia um banco (inclusive com WAL pendente) para target_path usando a API
+    de backup online do SQLite. O resultado é um arquivo único e consistente.
+    """
+    source = connect(path, row_factory=None)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages_per_step)
+    finally:
+        target.close()
+        source.close()
+    return target_path
+
+
+def list_tables(conn):
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({quote_ident(table)})').fetchall()]
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
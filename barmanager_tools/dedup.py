@@ -0,0 +1,673 @@
+"""
+Deduplicação de clientes e fornecedores do banco do desktop.
+
+Os scripts analyze-customers.py, fix-customer-sync.py e check-supplier-sync.py
+mostram o mesmo cliente/fornecedor com ids diferentes (criado no desktop e
+recriado pelo servidor, depois baixado de volta). Aqui:
+
+- telefones, nomes e emails são normalizados (só dígitos sem +245, nome sem
+  acentos/pontuação, email minúsculo)
+- cada registro entra em blocos: telefone, email, soundex do primeiro e do
+  último nome, prefixo do nome. Só registros do mesmo bloco são comparados,
+  então o custo cresce quase linear (não n²); blocos enormes (telefone
+  genérico, nome muito comum) são ignorados e listados
+- cada par recebe uma pontuação (telefone, email, NIF, semelhança de
+  nome, com penalidade para telefones diferentes) e os pares acima de
+  --min-score formam grupos; em cada grupo fica o registro já sincronizado
+  e mais referenciado
+- as propostas vão para um CSV com a coluna accept preenchida nas de
+  pontuação alta; depois de revisar, `apply` executa as aceitas numa única
+  transação: vendas, dívidas, mesas (clientes) ou compras e produtos
+  (fornecedores) passam a apontar para o registro mantido, payloads
+  pendentes da sync_queue com customerId/supplierId são corrigidos, campos
+  vazios e saldos do mantido são completados, e o duplicado sai de cena
+
+O duplicado já sincronizado não é apagado: fica bloqueado/inativo com os
+saldos zerados e a sync_queue ganha um 'delete' dele, como deleteCustomer e
+deleteSupplier no desktop. O servidor só desativa o registro (soft delete),
+então uma linha apagada aqui voltaria no próximo pull; inativa, ela continua
+existindo e fica de fora de `propose`. Duplicados nunca sincronizados são
+apagados. O registro mantido ganha um 'update'.
+Vendas e dívidas já sincronizadas não são reenviadas.
+
+Uso:
+    python -m barmanager_tools.dedup propose --out propostas.csv
+    python -m barmanager_tools.dedup propose --entity suppliers --min-score 0.5
+    python -m barmanager_tools.dedup apply propostas.csv --backup antes-da-fusao.db
+"""
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+import unicodedata
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from difflib import SequenceMatcher
+
+from . import db
+
+COUNTRY_CODE = '245'  # Guiné-Bissau
+# Blocos maiores que isso não geram pares (ex.: telefone 000000000, "Maria")
+MAX_BLOCK = 100
+# Propostas com pontuação a partir disso já saem com accept=y
+AUTO_ACCEPT = 0.9
+ACCEPTED = ('1', 'y', 'yes', 's', 'sim', 'x', 'true')
+
+NAME_STOPWORDS = {'sr', 'sra', 'dr', 'dra', 'dona', 'de', 'da', 'do', 'das', 'dos', 'e'}
+
+ENTITIES = {
+    'customers': {
+        'sync_entity': 'customer',
+        'name': 'full_name',
+        # Colunas identificadoras comparadas exatamente → peso na pontuação
+        # (code é UNIQUE no desktop, então nunca se repete)
+        'identifiers': {},
+        'references': [('sales', 'customer_id'), ('debts', 'customer_id'), ('table_customers', 'customer_id')],
+        'payload_keys': ['customerId', 'customer_id'],
+        'related_entities': ['customer_loyalty'],
+        'fill': ['phone', 'email'],
+        'sum': ['current_debt', 'loyalty_points'],
+        'max': ['credit_limit'],
+        # Mesmo formato de updateCustomer no desktop
+        'payload': {
+            'name': 'full_name', 'phone': 'phone', 'email': 'email', 'code': 'code',
+            'creditLimit': 'credit_limit', 'currentDebt': 'current_debt', 'loyaltyPoints': 'loyalty_points',
+        },
+        'delete_payload': lambda row: {},
+        # Coluna e valor de um registro removido (deleteCustomer bloqueia)
+        'inactive': ('is_blocked', 1),
+    },
+    'suppliers': {
+        'sync_entity': 'supplier',
+        'name': 'name',
+        'identifiers': {'tax_id': 0.9},
+        'references': [('purchases', 'supplier_id'), ('products', 'supplier_id')],
+        'payload_keys': ['supplierId', 'supplier_id'],
+        'related_entities': [],
+        'fill': ['contact_person', 'phone', 'email', 'address', 'tax_id', 'payment_terms', 'notes'],
+        'sum': [],
+        'max': [],
+        'payload': {
+            'name': 'name', 'code': 'code', 'contactPerson': 'contact_person', 'phone': 'phone',
+            'email': 'email', 'address': 'address', 'taxId': 'tax_id', 'paymentTerms': 'payment_terms',
+        },
+        'delete_payload': lambda row: {'id': row['id'], 'code': row['code'], 'name': row['name'], 'isActive': False},
+        'inactive': ('is_active', 0),
+    },
+}
+
+CSV_FIELDS = [
+    'accept', 'entity', 'group', 'score', 'keep_id', 'drop_id',
+    'keep_name', 'drop_name', 'keep_phone', 'drop_phone', 'reasons',
+]
+
+
+class DedupError(Exception):
+    pass
+
+
+def active_filter(spec, columns, alias=''):
+    """Condição SQL dos registros ativos (None se a tabela não tem a coluna)."""
+    column, value = spec['inactive']
+    if column not in columns:
+        return None
+    return f'COALESCE({alias}{column}, {1 - value}) != {value}'
+
+
+# ---------------------------------------------------------------------------
+# Normalização e blocos
+# ---------------------------------------------------------------------------
+
+def normalize_phone(value):
+    """Só dígitos, sem 00/+245. Números curtos ou repetidos (000000) viram None."""
+    digits = re.sub(r'\D', '', str(value or ''))
+    if digits.startswith('00'):
+        digits = digits[2:]
+    if len(digits) > 9 and digits.startswith(COUNTRY_CODE):
+        digits = digits[len(COUNTRY_CODE):]
+    if len(digits) < 6 or len(set(digits)) == 1:
+        return None
+    return digits
+
+
+def normalize_name(value):
+    """Minúsculas, sem acentos nem pontuação, sem tratamentos (Sr., Dona...)."""
+    text = unicodedata.normalize('NFKD', str(value or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    words = re.sub(r'[^a-z0-9]+', ' ', text).split()
+    return ' '.join(word for word in words if word not in NAME_STOPWORDS)
+
+
+def normalize_email(value):
+    email = str(value or '').strip().lower()
+    return email if '@' in email else None
+
+
+def soundex(word):
+    """Soundex clássico (letra inicial + 3 dígitos)."""
+    codes = {}
+    for letters, digit in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')):
+        for letter in letters:
+            codes[letter] = digit
+    word = re.sub(r'[^a-z]', '', word)
+    if not word:
+        return None
+    result = word[0].upper()
+    previous = codes.get(word[0])
+    for letter in word[1:]:
+        digit = codes.get(letter)
+        if digit and digit != previous:
+            result += digit
+        if letter not in 'hw':
+            previous = digit
+    return (result + '000')[:4]
+
+
+def blocking_keys(record):
+    keys = []
+    if record['phone']:
+        keys.append('tel:' + record['phone'])
+    if record['email']:
+        keys.append('email:' + record['email'])
+    words = record['name'].split()
+    if words:
+        first, last = soundex(words[0]), soundex(words[-1])
+        if first:
+            keys.append(f'som:{first}:{last}')
+        keys.append(f'pref:{words[0][:4]}:{words[-1][:4]}')
+    return keys
+
+
+# ---------------------------------------------------------------------------
+# Leitura e comparação
+# ---------------------------------------------------------------------------
+
+def load_records(conn, entity):
+    spec = ENTITIES[entity]
+    columns = set(db.table_columns(conn, entity))
+    identifiers = [column for column in spec['identifiers'] if column in columns]
+    select = ['id', f"{spec['name']} AS name", 'phone', 'email', 'synced', 'created_at'] + identifiers
+
+    references = defaultdict(int)
+    tables = set(db.list_tables(conn))
+    for table, column in spec['references']:
+        if table in tables:
+            rows = conn.execute(
+                f'SELECT {column}, COUNT(*) FROM {table} WHERE {column} IS NOT NULL GROUP BY {column}'
+            )
+            for record_id, count in rows:
+                references[record_id] += count
+
+    # Removidos (bloqueados/inativos) não são candidatos: ver merge_entity
+    active = active_filter(spec, columns)
+    where = f' WHERE {active}' if active else ''
+
+    records = []
+    for row in conn.execute(f'SELECT {", ".join(select)} FROM {entity}{where}'):
+        row = dict(row)
+        records.append({
+            'id': row['id'],
+            'raw_name': row['name'] or '',
+            'raw_phone': row['phone'] or '',
+            'name': normalize_name(row['name']),
+            'phone': normalize_phone(row['phone']),
+            'email': normalize_email(row['email']),
+            'identifiers': {
+                column: str(row[column]).strip().lower() for column in identifiers if row[column]
+            },
+            'synced': bool(row['synced']),
+            'created_at': row['created_at'] or '',
+            'references': references.get(row['id'], 0),
+        })
+    return records
+
+
+def candidate_pairs(records, max_block=MAX_BLOCK):
+    """Pares (i, j) que dividem ao menos um bloco; devolve também os blocos ignorados."""
+    blocks = defaultdict(list)
+    for index, record in enumerate(records):
+        for key in blocking_keys(record):
+            blocks[key].append(index)
+
+    pairs = set()
+    oversized = []
+    for key, members in blocks.items():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block:
+            oversized.append((key, len(members)))
+            continue
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                pairs.add((i, j))
+    return pairs, len(blocks), sorted(oversized, key=lambda item: -item[1])
+
+
+def score_pair(a, b, identifier_weights):
+    """
+    Pontuação 0..1 (ou-ruidoso das evidências) e motivos. Telefones
+    diferentes e nomes muito diferentes derrubam a pontuação.
+    """
+    evidence = []
+    reasons = []
+    if a['phone'] and a['phone'] == b['phone']:
+        evidence.append(0.8)
+        reasons.append('telefone')
+    if a['email'] and a['email'] == b['email']:
+        evidence.append(0.8)
+        reasons.append('email')
+    for column, weight in identifier_weights.items():
+        value = a['identifiers'].get(column)
+        if value and value == b['identifiers'].get(column):
+            evidence.append(weight)
+            reasons.append('NIF' if column == 'tax_id' else column)
+
+    similarity = SequenceMatcher(None, a['name'], b['name']).ratio() if a['name'] and b['name'] else 0.0
+    if similarity >= 0.97:
+        evidence.append(0.75)
+        reasons.append('nome igual')
+    elif similarity >= 0.85:
+        evidence.append(0.5)
+        reasons.append(f'nome {similarity:.0%}')
+
+    remaining = 1.0
+    for weight in evidence:
+        remaining *= 1 - weight
+    score = 1 - remaining
+
+    if a['phone'] and b['phone'] and a['phone'] != b['phone']:
+        score *= 0.6
+        reasons.append('telefones diferentes')
+    if a['name'] and b['name'] and similarity < 0.5:
+        # Mesmo telefone, pessoas diferentes (família, empresa)
+        score *= 0.7
+        reasons.append('nomes diferentes')
+    return round(score, 3), reasons
+
+
+def survivor_rank(record):
+    # Já sincronizado, mais referenciado, mais antigo
+    return (record['synced'], record['references'], _reverse(record['created_at']))
+
+
+def _reverse(text):
+    return tuple(-ord(char) for char in text)
+
+
+def conflicting(a, b):
+    """Telefone, email ou NIF preenchidos nos dois e diferentes: não podem ser o mesmo."""
+    for key in ('phone', 'email'):
+        if a[key] and b[key] and a[key] != b[key]:
+            return True
+    for column, value in a['identifiers'].items():
+        other = b['identifiers'].get(column)
+        if other and other != value:
+            return True
+    return False
+
+
+def propose(records, entity, min_score, max_block=MAX_BLOCK):
+    """
+    Compara os pares candidatos e junta os que passam de min_score em grupos,
+    do par mais forte para o mais fraco; dois grupos só se juntam se nenhum
+    membro conflitar (evita encadear homônimos com telefones diferentes).
+    Devolve uma proposta por registro a remover, pontuada contra o mantido.
+    """
+    identifier_weights = ENTITIES[entity]['identifiers']
+    pairs, block_count, oversized = candidate_pairs(records, max_block)
+
+    edges = []
+    for i, j in pairs:
+        score, _reasons = score_pair(records[i], records[j], identifier_weights)
+        if score >= min_score:
+            edges.append((score, i, j))
+    edges.sort(reverse=True)
+
+    group_of = {}
+    groups = {}
+    for _score, i, j in edges:
+        a = groups.get(group_of.get(i), [i])
+        b = groups.get(group_of.get(j), [j])
+        if a is b or any(conflicting(records[x], records[y]) for x in a for y in b):
+            continue
+        merged = a + b
+        groups.pop(group_of.get(i), None)
+        groups.pop(group_of.get(j), None)
+        groups[i] = merged
+        for index in merged:
+            group_of[index] = i
+
+    proposals = []
+    for number, members in enumerate(sorted(groups.values(), key=len, reverse=True), start=1):
+        keep = max(members, key=lambda index: survivor_rank(records[index]))
+        for index in members:
+            if index == keep:
+                continue
+            score, reasons = score_pair(records[keep], records[index], identifier_weights)
+            proposals.append({
+                'accept': 'y' if score >= AUTO_ACCEPT else '',
+                'entity': entity,
+                'group': number,
+                'score': score,
+                'keep_id': records[keep]['id'],
+                'drop_id': records[index]['id'],
+                'keep_name': records[keep]['raw_name'],
+                'drop_name': records[index]['raw_name'],
+                'keep_phone': records[keep]['raw_phone'],
+                'drop_phone': records[index]['raw_phone'],
+                'reasons': ', '.join(reasons),
+            })
+    proposals.sort(key=lambda proposal: (proposal['group'], -proposal['score']))
+    stats = {
+        'records': len(records),
+        'blocks': block_count,
+        'pairs': len(pairs),
+        'all_pairs': len(records) * (len(records) - 1) // 2,
+        'groups': len(groups),
+        'oversized': oversized,
+    }
+    return proposals, stats
+
+
+def write_proposals(path, proposals):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(proposals)
+
+
+def read_accepted(path):
+    """{entidade: {drop_id: keep_id}} das linhas com accept marcado."""
+    merges = defaultdict(dict)
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            if (row.get('accept') or '').strip().lower() not in ACCEPTED:
+                continue
+            entity = row.get('entity')
+            if entity not in ENTITIES:
+                raise DedupError(f'{path}:{line}: entidade desconhecida {entity!r}')
+            if not row.get('keep_id') or not row.get('drop_id') or row['keep_id'] == row['drop_id']:
+                raise DedupError(f'{path}:{line}: keep_id/drop_id inválidos')
+            merges[entity][row['drop_id']] = row['keep_id']
+    return merges
+
+
+def resolve_chains(mapping):
+    """Se o registro mantido também foi removido em outra linha, segue até o final."""
+    resolved = {}
+    for drop_id in mapping:
+        keep_id, seen = mapping[drop_id], {drop_id}
+        while keep_id in mapping:
+            if keep_id in seen:
+                raise DedupError(f'ciclo nas fusões envolvendo {drop_id}')
+            seen.add(keep_id)
+            keep_id = mapping[keep_id]
+        resolved[drop_id] = keep_id
+    return resolved
+
+
+# ---------------------------------------------------------------------------
+# Aplicação
+# ---------------------------------------------------------------------------
+
+def _device_id(conn):
+    if 'settings' not in db.list_tables(conn):
+        return None
+    row = conn.execute("SELECT value FROM settings WHERE key = 'device_id'").fetchone()
+    return row[0] if row else None
+
+
+def _enqueue(conn, operation, entity, entity_id, data, device_id):
+    # Mesmo formato de addToSyncQueue no desktop (prioridade 0 = cadastros)
+    payload = dict(data, _deviceId=device_id, _timestamp=datetime.now(timezone.utc).isoformat())
+    conn.execute(
+        'INSERT INTO sync_queue (id, operation, entity, entity_id, data, priority, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP)',
+        (str(uuid.uuid4()), operation, entity, entity_id, json.dumps(payload, ensure_ascii=False)),
+    )
+
+
+def merge_entity(conn, entity, mapping):
+    """
+    Executa as fusões {drop_id: keep_id} de uma entidade (sem commit).
+    Devolve contadores por etapa.
+    """
+    spec = ENTITIES[entity]
+    columns = set(db.table_columns(conn, entity))
+    tables = set(db.list_tables(conn))
+    counts = {}
+
+    conn.execute('DROP TABLE IF EXISTS temp.dedup_map')
+    conn.execute('CREATE TEMP TABLE dedup_map (drop_id TEXT PRIMARY KEY, keep_id TEXT NOT NULL)')
+    conn.executemany('INSERT INTO dedup_map VALUES (?, ?)', mapping.items())
+    # Linhas do arquivo que não existem mais no banco ou já foram removidas
+    # (proposta antiga, arquivo aplicado duas vezes: os saldos não somam de novo)
+    active = active_filter(spec, columns)
+    existing = f'SELECT id FROM {entity}' + (f' WHERE {active}' if active else '')
+    stale = conn.execute(
+        f'DELETE FROM dedup_map WHERE drop_id NOT IN ({existing}) OR keep_id NOT IN ({existing})'
+    ).rowcount
+    counts['ignoradas'] = stale
+    counts['fundidos'] = conn.execute('SELECT COUNT(*) FROM dedup_map').fetchone()[0]
+    if not counts['fundidos']:
+        return counts
+
+    # 1. Referências locais
+    for table, column in spec['references']:
+        if table in tables:
+            counts[table] = conn.execute(
+                f'UPDATE {table} SET {column} = m.keep_id FROM dedup_map m WHERE {table}.{column} = m.drop_id'
+            ).rowcount
+
+    # 2. Campos vazios e saldos do mantido
+    assignments = []
+    aggregates = []
+    for column in spec['fill']:
+        if column in columns:
+            assignments.append(f"{column} = COALESCE(NULLIF({entity}.{column}, ''), a.{column})")
+            aggregates.append(f"MAX(NULLIF(d.{column}, '')) AS {column}")
+    for column in spec['sum']:
+        if column in columns:
+            assignments.append(f'{column} = COALESCE({entity}.{column}, 0) + a.{column}')
+            aggregates.append(f'COALESCE(SUM(d.{column}), 0) AS {column}')
+    for column in spec['max']:
+        if column in columns:
+            assignments.append(f'{column} = MAX(COALESCE({entity}.{column}, 0), a.{column})')
+            aggregates.append(f'COALESCE(MAX(d.{column}), 0) AS {column}')
+    assignments.append('synced = 0')
+    assignments.append("updated_at = datetime('now')")
+    if 'version' in columns:
+        assignments.append('version = COALESCE(version, 0) + 1')
+    conn.execute(
+        f'UPDATE {entity} SET {", ".join(assignments)} '
+        f'FROM (SELECT m.keep_id, {", ".join(aggregates)} FROM dedup_map m '
+        f'JOIN {entity} d ON d.id = m.drop_id GROUP BY m.keep_id) a '
+        f'WHERE {entity}.id = a.keep_id'
+    )
+
+    # 3. Fila de sincronização
+    if 'sync_queue' in tables:
+        counts.update(repoint_sync_queue(conn, entity, spec))
+
+    # 4. Duplicados (nada mais aponta para eles). Os que nunca foram ao
+    # servidor são apagados; os sincronizados ficam inativos, como no
+    # deleteCustomer/deleteSupplier, porque o servidor só os desativa e o
+    # pull recriaria uma linha apagada (com o saldo antigo)
+    counts['apagados'] = conn.execute(
+        f'DELETE FROM {entity} WHERE COALESCE(synced, 0) != 1 AND id IN (SELECT drop_id FROM dedup_map)'
+    ).rowcount
+    flag, value = spec['inactive']
+    assignments = [f'{flag} = {value}'] if flag in columns else []
+    assignments += [f'{column} = 0' for column in spec['sum'] if column in columns]
+    assignments.append('synced = 0')
+    assignments.append("updated_at = datetime('now')")
+    if 'version' in columns:
+        assignments.append('version = COALESCE(version, 0) + 1')
+    counts['desativados'] = conn.execute(
+        f'UPDATE {entity} SET {", ".join(assignments)} WHERE id IN (SELECT drop_id FROM dedup_map)'
+    ).rowcount
+    conn.execute('DROP TABLE temp.dedup_map')
+    return counts
+
+
+def repoint_sync_queue(conn, entity, spec):
+    """
+    Itens ainda não enviados (pending/failed): payloads com o id removido
+    passam a usar o mantido; create/update do removido saem da fila; o
+    mantido ganha um 'update' e o removido já sincronizado, um 'delete'
+    (desativa no servidor).
+    """
+    counts = {}
+    open_items = "status IN ('pending', 'failed')"
+    payloads = 0
+    for key in spec['payload_keys']:
+        path = f'$.{key}'
+        payloads += conn.execute(
+            f"UPDATE sync_queue SET data = json_set(data, '{path}', m.keep_id), updated_at = CURRENT_TIMESTAMP "
+            f"FROM dedup_map m WHERE {open_items} AND json_valid(data) "
+            f"AND json_extract(data, '{path}') = m.drop_id"
+        ).rowcount
+    counts['sync_queue_payloads'] = payloads
+
+    related = 0
+    for related_entity in spec['related_entities']:
+        related += conn.execute(
+            f'UPDATE sync_queue SET entity_id = m.keep_id, updated_at = CURRENT_TIMESTAMP '
+            f'FROM dedup_map m WHERE {open_items} AND entity = ? AND entity_id = m.drop_id',
+            (related_entity,),
+        ).rowcount
+    counts['sync_queue_relacionados'] = related
+
+    sync_entity = spec['sync_entity']
+    device_id = _device_id(conn)
+    deletes = conn.execute(
+        f'SELECT d.* FROM {entity} d JOIN dedup_map m ON m.drop_id = d.id WHERE d.synced = 1'
+    ).fetchall()
+    counts['sync_queue_removidos'] = conn.execute(
+        f'DELETE FROM sync_queue WHERE {open_items} AND entity = ? '
+        f'AND entity_id IN (SELECT drop_id FROM dedup_map)',
+        (sync_entity,),
+    ).rowcount
+    for row in deletes:
+        _enqueue(conn, 'delete', sync_entity, row['id'], spec['delete_payload'](dict(row)), device_id)
+
+    keeps = conn.execute(
+        f'SELECT * FROM {entity} WHERE id IN (SELECT DISTINCT keep_id FROM dedup_map)'
+    ).fetchall()
+    for row in keeps:
+        row = dict(row)
+        data = {key: row.get(column) for key, column in spec['payload'].items() if column in row}
+        _enqueue(conn, 'update', sync_entity, row['id'], data, device_id)
+    counts['sync_queue_novos'] = len(deletes) + len(keeps)
+    return counts
+
+
+def apply(conn, merges):
+    """Todas as fusões aceitas numa transação (BEGIN IMMEDIATE ... COMMIT)."""
+    results = {}
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for entity, mapping in merges.items():
+            results[entity] = merge_entity(conn, entity, resolve_chains(mapping))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return results
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def print_stats(entity, stats, proposals, seconds):
+    print(f"📋 {entity}: {stats['records']} registros, {stats['blocks']} blocos")
+    print(f"   {stats['pairs']} pares comparados (de {stats['all_pairs']} possíveis) em {seconds:.2f}s")
+    print(f"   {len(proposals)} fusões propostas em {stats['groups']} grupos, "
+          f"{sum(1 for p in proposals if p['accept'])} com pontuação >= {AUTO_ACCEPT}")
+    if stats['oversized']:
+        shown = ', '.join(f'{key} ({size})' for key, size in stats['oversized'][:5])
+        print(f'   ⚠️  {len(stats["oversized"])} blocos grandes ignorados: {shown}')
+
+
+def print_proposals(proposals, limit):
+    for proposal in proposals[:limit]:
+        print(f"   [{proposal['group']}] {proposal['score']:.2f} {proposal['accept'] or '-'} "
+              f"{proposal['keep_name']} ({proposal['keep_phone'] or 's/ tel'}) ← "
+              f"{proposal['drop_name']} ({proposal['drop_phone'] or 's/ tel'}): {proposal['reasons']}")
+    if len(proposals) > limit:
+        print(f'   ... mais {len(proposals) - limit}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Deduplicação de clientes e fornecedores do desktop')
+    parser.add_argument('--db', default=None, help='Caminho do barmanager.db (padrão: banco do desktop)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    propose_cmd = sub.add_parser('propose', help='Gerar propostas de fusão')
+    propose_cmd.add_argument('--entity', choices=sorted(ENTITIES), action='append',
+                             help='Entidade (pode repetir; padrão: clientes e fornecedores)')
+    propose_cmd.add_argument('--min-score', type=float, default=0.6, help='Pontuação mínima de um par')
+    propose_cmd.add_argument('--max-block', type=int, default=MAX_BLOCK, help='Tamanho máximo de um bloco')
+    propose_cmd.add_argument('--out', default='dedup-propostas.csv', help='CSV com as propostas')
+    propose_cmd.add_argument('--show', type=int, default=20, help='Propostas listadas no terminal')
+
+    apply_cmd = sub.add_parser('apply', help='Aplicar as propostas marcadas em accept')
+    apply_cmd.add_argument('proposals', help='CSV gerado por propose (revisado)')
+    apply_cmd.add_argument('--backup', help='Antes de aplicar, copiar o banco para este arquivo')
+    args = parser.parse_args(argv)
+
+    db_path = args.db or db.default_db_path()
+
+    if args.command == 'propose':
+        conn = db.connect(db_path)
+        all_proposals = []
+        try:
+            for entity in args.entity or sorted(ENTITIES):
+                started = time.perf_counter()
+                records = load_records(conn, entity)
+                proposals, stats = propose(records, entity, args.min_score, args.max_block)
+                print_stats(entity, stats, proposals, time.perf_counter() - started)
+                print_proposals(proposals, args.show)
+                all_proposals += proposals
+        finally:
+            conn.close()
+        write_proposals(args.out, all_proposals)
+        print(f'\n💾 {len(all_proposals)} propostas em {args.out}')
+        print(f'   Revise a coluna accept e rode: python -m barmanager_tools.dedup apply {args.out}')
+        return 0
+
+    try:
+        merges = read_accepted(args.proposals)
+    except DedupError as error:
+        print(f'❌ {error}')
+        return 2
+    if not merges:
+        print('Nenhuma proposta marcada em accept')
+        return 0
+
+    if args.backup:
+        db.snapshot(db_path, args.backup)
+        print(f'Backup salvo em {args.backup}')
+
+    conn = db.connect(db_path, readonly=False)
+    conn.isolation_level = None  # transação explícita
+    try:
+        results = apply(conn, merges)
+    except DedupError as error:
+        print(f'❌ {error}')
+        return 2
+    finally:
+        conn.close()
+
+    for entity, counts in results.items():
+        details = ', '.join(f'{key}: {value}' for key, value in counts.items() if key != 'fundidos')
+        print(f"✅ {entity}: {counts['fundidos']} registros fundidos ({details})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
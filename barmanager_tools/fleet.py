@@ -0,0 +1,298 @@
+"""
+Executa uma ferramenta do pacote sobre os bancos de várias filiais.
+
+Recebe uma pasta com os snapshots das filiais (um .db por filial, ou
+<filial>/barmanager.db) ou um manifesto, e roda a ferramenta em paralelo:
+um processo por filial, cada um com a sua conexão. Os maiores bancos são
+disparados primeiro, para o tempo total ficar perto do da filial mais lenta.
+
+Por filial ficam em --out o log (<filial>.log) e, nas ferramentas com
+--json, o relatório (<filial>.json). O consolidado (fleet.json e fleet.csv)
+traz status, código de saída, tempo e o resumo de cada filial, com os
+totais somados entre filiais.
+
+Nos argumentos da ferramenta, {db} e {branch} são substituídos pelo caminho
+do banco e pelo nome da filial. Sem {db}, é acrescentado --db <caminho>.
+
+Manifesto: JSON ({"filial": "caminho"} ou [{"branch": ..., "path": ...}])
+ou CSV com colunas branch,path. Caminhos relativos partem do manifesto.
+
+Uso:
+    python -m barmanager_tools.fleet --dir snapshots/ stock_ledger --no-checkpoint
+    python -m barmanager_tools.fleet --manifest filiais.json --jobs 8 analytics --month 2026-01
+    python -m barmanager_tools.fleet --dir snapshots/ verify_backup backups/{branch}.delta.gz --source {db} --jobs 1
+"""
+import argparse
+import csv
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+# Ferramentas que gravam o relatório com --json <arquivo>
+JSON_TOOLS = {'analytics', 'stock_ledger', 'verify_backup'}
+# Campos de cada produto do relatório do stock_ledger usados no resumo
+LEDGER_KEYS = ('drift', 'chain_gaps')
+# Campos do resumo que não se somam entre filiais
+NON_ADDITIVE = {'margin_pct', 'seconds', 'days'}
+
+
+# ----------------------------------------------------------------------
+# Filiais
+# ----------------------------------------------------------------------
+def discover_branches(directory):
+    """
+    Um banco por filial: <dir>/<filial>.db ou <dir>/<filial>/barmanager.db.
+    Arquivos -wal/-shm e backups dentro de pastas 'backups' são ignorados.
+    """
+    branches = {}
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d != 'backups')
+        for name in sorted(files):
+            if not name.endswith(SQLITE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            stem = os.path.splitext(name)[0]
+            if stem == 'barmanager' and os.path.abspath(root) != os.path.abspath(directory):
+                branch = os.path.basename(root)
+            else:
+                branch = stem
+            _add_branch(branches, branch, path)
+    return branches
+
+
+def load_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            entries = [(row['branch'], row['path']) for row in csv.DictReader(f)]
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                entries = list(data.items())
+            else:
+                entries = [(item['branch'], item['path']) for item in data]
+
+    branches = {}
+    for branch, db_path in entries:
+        _add_branch(branches, str(branch), os.path.join(base, os.path.expanduser(db_path)))
+    return branches
+
+
+def _add_branch(branches, branch, path):
+    name, n = branch, 2
+    while name in branches:
+        name = f'{branch}-{n}'
+        n += 1
+    branches[name] = path
+
+
+# ----------------------------------------------------------------------
+# Execução (roda no processo da filial)
+# ----------------------------------------------------------------------
+def tool_argv(tool, tool_args, branch, db_path, json_path):
+    argv = [arg.replace('{db}', db_path).replace('{branch}', branch) for arg in tool_args]
+    if not any('{db}' in arg for arg in tool_args):
+        argv += ['--db', db_path]
+    if json_path:
+        argv += ['--json', json_path]
+    return argv
+
+
+def run_branch(tool, tool_args, branch, db_path, out_dir):
+    """Roda `tool` para uma filial com stdout/stderr no log dela."""
+    started = time.perf_counter()
+    json_path = os.path.join(out_dir, f'{branch}.json') if tool in JSON_TOOLS else None
+    log_path = os.path.join(out_dir, f'{branch}.log')
+    status, exit_code = 'ok', 0
+
+    with open(log_path, 'w', encoding='utf-8') as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(f'Banco não encontrado: {db_path}')
+            module = importlib.import_module(f'{__package__}.{tool}')
+            exit_code = module.main(tool_argv(tool, tool_args, branch, db_path, json_path)) or 0
+        except SystemExit as exc:  # argparse
+            exit_code = exc.code if isinstance(exc.code, int) else 2
+        except Exception:
+            traceback.print_exc()
+            status, exit_code = 'error', None
+
+    if status == 'ok' and exit_code != 0:
+        status = 'failed'
+    report = None
+    if json_path and os.path.exists(json_path):
+        with open(json_path, encoding='utf-8') as f:
+            report = json.load(f)
+
+    return {
+        'branch': branch,
+        'db': db_path,
+        'status': status,
+        'exit_code': exit_code,
+        'seconds': round(time.perf_counter() - started, 2),
+        'log': log_path,
+        'report': json_path if report is not None else None,
+        'summary': summarize(tool, report) if report is not None else {},
+    }
+
+
+# ----------------------------------------------------------------------
+# Consolidação
+# ----------------------------------------------------------------------
+def summarize(tool, report):
+    """Resumo numérico de uma filial, por ferramenta."""
+    if tool == 'stock_ledger':
+        products = report.get('products', [])
+        # Chave renomeada no stock_ledger somaria zero em silêncio: falhar com o nome dela
+        missing = [key for key in LEDGER_KEYS if products and key not in products[0]]
+        if missing:
+            raise KeyError(f"Relatório do stock_ledger sem {', '.join(missing)} (chaves: {', '.join(products[0])})")
+        return {
+            'products': len(products),
+            'drift': sum(1 for p in products if p['drift']),
+            'gaps': sum(p['chain_gaps'] for p in products),
+        }
+    summary = report.get('summary')
+    if not isinstance(summary, dict):
+        return {}
+    return {k: v for k, v in summary.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+def merge_summaries(tool, results):
+    totals = {}
+    for result in results:
+        for key, value in result['summary'].items():
+            if key not in NON_ADDITIVE:
+                totals[key] = totals.get(key, 0) + value
+    if tool == 'analytics' and totals.get('revenue'):
+        totals['margin_pct'] = round(totals.get('margin', 0) / totals['revenue'] * 100, 2)
+    return {k: round(v, 2) if isinstance(v, float) else v for k, v in totals.items()}
+
+
+def run_fleet(tool, tool_args, branches, out_dir, jobs=None):
+    os.makedirs(out_dir, exist_ok=True)
+    # Maiores primeiro: a filial mais lenta começa logo e não fica para o fim
+    order = sorted(branches.items(), key=lambda item: -_file_size(item[1]))
+    started = time.perf_counter()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(run_branch, tool, tool_args, branch, path, out_dir): branch
+            for branch, path in order
+        }
+        for n, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as exc:  # processo da filial morreu
+                branch = futures[future]
+                result = {'branch': branch, 'db': branches[branch], 'status': 'error', 'exit_code': None,
+                          'seconds': None, 'log': None, 'report': None, 'summary': {}, 'error': str(exc)}
+            results.append(result)
+            mark = {'ok': '✓', 'failed': '✗'}.get(result['status'], '!')
+            seconds = '-' if result['seconds'] is None else f"{result['seconds']:.2f}s"
+            print(f"  [{n:>{len(str(len(futures)))}}/{len(futures)}] {mark} {result['branch']} ({seconds})",
+                  file=sys.stderr)
+
+    results.sort(key=lambda r: r['branch'])
+    wall = time.perf_counter() - started
+    branch_seconds = [r['seconds'] for r in results if r['seconds'] is not None]
+    return {
+        'tool': tool,
+        'args': tool_args,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'branches': results,
+        'totals': merge_summaries(tool, results),
+        'summary': {
+            'branches': len(results),
+            'ok': sum(1 for r in results if r['status'] == 'ok'),
+            'failed': sum(1 for r in results if r['status'] == 'failed'),
+            'errors': sum(1 for r in results if r['status'] == 'error'),
+            'wall_seconds': round(wall, 2),
+            'sum_seconds': round(sum(branch_seconds), 2),
+            'slowest_seconds': max(branch_seconds, default=0),
+        },
+    }
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def write_outputs(fleet, out_dir):
+    with open(os.path.join(out_dir, 'fleet.json'), 'w', encoding='utf-8') as f:
+        json.dump(fleet, f, ensure_ascii=False, indent=2)
+
+    keys = []
+    for result in fleet['branches']:
+        keys += [k for k in result['summary'] if k not in keys]
+    with open(os.path.join(out_dir, 'fleet.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['branch', 'status', 'exit_code', 'seconds'] + keys)
+        for result in fleet['branches']:
+            writer.writerow([result['branch'], result['status'], result['exit_code'], result['seconds']]
+                            + [result['summary'].get(k, '') for k in keys])
+        writer.writerow(['TOTAL', '', '', fleet['summary']['sum_seconds']] + [fleet['totals'].get(k, '') for k in keys])
+
+
+def print_report(fleet):
+    summary = fleet['summary']
+    print('═' * 70)
+    print(f"  FROTA: {fleet['tool']} em {summary['branches']} filiais")
+    print('═' * 70)
+    width = max((len(r['branch']) for r in fleet['branches']), default=6)
+    for result in sorted(fleet['branches'], key=lambda r: -(r['seconds'] or 0)):
+        seconds = '-' if result['seconds'] is None else f"{result['seconds']:7.2f}s"
+        code = '' if result['exit_code'] in (0, None) else f" (saída {result['exit_code']})"
+        print(f"  {result['branch']:<{width}}  {result['status']:<6} {seconds}{code}")
+    if fleet['totals']:
+        print('\n  Totais: ' + ' | '.join(f'{k} {v}' for k, v in fleet['totals'].items()))
+    speedup = summary['sum_seconds'] / summary['wall_seconds'] if summary['wall_seconds'] else 0
+    print(f"\n  OK: {summary['ok']} | Falhas: {summary['failed']} | Erros: {summary['errors']}")
+    print(f"  Tempo: {summary['wall_seconds']}s (soma das filiais {summary['sum_seconds']}s, "
+          f"mais lenta {summary['slowest_seconds']}s, {speedup:.1f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Roda uma ferramenta sobre os bancos de várias filiais em paralelo')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dir', help='Pasta com os bancos das filiais')
+    source.add_argument('--manifest', help='Manifesto JSON/CSV com filial e caminho do banco')
+    parser.add_argument('--jobs', type=int, default=None, help='Processos em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--out', default=None, help='Pasta dos resultados (padrão: fleet-<ferramenta>-<data>)')
+    parser.add_argument('tool', help='Módulo do barmanager_tools (ex.: stock_ledger, analytics, verify_backup)')
+    parser.add_argument('tool_args', nargs=argparse.REMAINDER, help='Argumentos repassados à ferramenta')
+    args = parser.parse_args(argv)
+
+    if args.tool == 'fleet' or importlib.util.find_spec(f'{__package__}.{args.tool}') is None:
+        parser.error(f'ferramenta desconhecida: {args.tool}')
+
+    branches = discover_branches(args.dir) if args.dir else load_manifest(args.manifest)
+    if not branches:
+        print('Nenhum banco de filial encontrado.', file=sys.stderr)
+        return 2
+
+    out_dir = args.out or f"fleet-{args.tool}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    fleet = run_fleet(args.tool, args.tool_args, branches, out_dir, jobs=args.jobs)
+    write_outputs(fleet, out_dir)
+    print_report(fleet)
+    print(f'\n  Resultados em {out_dir}/ (fleet.json, fleet.csv e logs por filial)')
+
+    if fleet['summary']['errors']:
+        return 2
+    return 1 if fleet['summary']['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
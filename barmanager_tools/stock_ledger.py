@@ -0,0 +1,589 @@
+"""
+Razão de estoque: reconstrói o saldo de cada produto/filial a partir do
+histórico e compara com inventory_items.
+
+Dois saldos por (produto, filial):
+
+- cadeia de movimentações (stock_movements, ou inventory_movements nos bancos
+  antigos): cada movimento deve começar onde o anterior terminou
+  (quantity_before == quantity_after do anterior). O primeiro movimento que
+  quebra a cadeia é reportado: é ali que o estoque mudou sem movimentação
+  (upsert direto, sync de valor absoluto etc.).
+- transações: compras concluídas - itens de vendas não canceladas + ajustes
+  manuais (perdas, quebras, ajustes) registrados nas movimentações.
+
+Ambos são comparados com qty_units / closed_boxes / open_box_units.
+
+A cadeia é percorrida numa única leitura sequencial da tabela (em ordem de
+rowid; produtos com movimentos fora de ordem são refeitos em ordem de
+created_at). Um checkpoint (saldo, último movimento e marca d'água) permite que as próximas execuções processem só os
+movimentos novos; se movimentos antigos aparecerem depois (sync), a
+execução volta a ser completa automaticamente. O saldo de transações usa a
+mesma marca d'água: compras/vendas com updated_at até ela ficam somadas no
+checkpoint e só as alteradas depois são agregadas de novo; se a contagem das
+já somadas mudar (documento apagado ou updated_at reescrito para trás), as
+transações são recalculadas por completo.
+
+Uso:
+    python -m barmanager_tools.stock_ledger
+    python -m barmanager_tools.stock_ledger --db barmanager.db --checkpoint ledger.json --json drift.json
+    python -m barmanager_tools.stock_ledger --db /tmp/bench.db --generate 5000000 [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from . import db
+
+CHECKPOINT_VERSION = 2
+FETCH_SIZE = 20000
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'barmanager', 'ledger')
+
+# Tipos que já são contados pelas compras / itens de venda no saldo de transações
+TRANSACTION_TYPES = ('sale', 'sale_muntu', 'purchase')
+
+# Colunas das duas versões da tabela de movimentações
+MOVEMENT_LAYOUTS = (
+    {
+        'type': 'movement_type', 'before': 'quantity_before', 'after': 'quantity_after',
+        'boxes_after': 'closed_boxes_after', 'open_after': 'open_box_after',
+    },
+    {
+        'type': 'type', 'before': 'qty_before', 'after': 'qty_after',
+        'boxes_after': 'closed_boxes_after', 'open_after': 'open_box_units_after',
+    },
+)
+
+
+def movement_source(conn):
+    """(tabela, colunas) da movimentação usada na cadeia, ou None."""
+    tables = db.list_tables(conn)
+    for table in ('stock_movements', 'inventory_movements'):
+        if table not in tables:
+            continue
+        columns = set(db.table_columns(conn, table))
+        for layout in MOVEMENT_LAYOUTS:
+            if set(layout.values()) <= columns:
+                return table, layout
+    return None
+
+
+def _key(product_id, branch_id):
+    return f'{product_id}|{branch_id}'
+
+
+def _empty_state():
+    return {
+        'movements': 0,
+        'balance': 0,           # soma das variações (partindo de zero)
+        'last_after': None,     # saldo registrado no último movimento
+        'last_boxes': None,
+        'last_open': None,
+        'last_movement': None,
+        'adjustments': 0,       # variações fora de venda/compra
+        'gaps': 0,
+        'first_gap': None,
+        'last_created_at': None,
+        'last_rowid': None,
+    }
+
+
+# ----------------------------------------------------------------------
+# Cadeia de movimentações (incremental)
+# ----------------------------------------------------------------------
+def replay_movements(conn, table, cols, states, watermark):
+    """
+    Aplica os movimentos posteriores à marca d'água (created_at, rowid) sobre
+    os estados por produto/filial. Retorna a nova marca d'água.
+
+    A tabela é lida em ordem de rowid (varredura sequencial, sem ordenar
+    milhões de linhas), que coincide com a ordem cronológica quase sempre.
+    Produtos que recebem um movimento mais antigo que o último aplicado
+    (sync fora de ordem) são refeitos a partir do estado anterior ao lote,
+    agora em ordem de created_at/rowid. Só as colunas da cadeia são lidas;
+    id e caixas do último movimento são buscados no fim, por rowid.
+    """
+    t = db.quote_ident(table)
+    select = (
+        f"SELECT rowid, product_id, branch_id, {cols['type']}, created_at, "
+        f"{cols['before']}, {cols['after']} FROM {t}"
+    )
+    # O prefixo created_at >= ? e o ORDER BY +rowid fazem o planejador usar o
+    # índice de created_at; sem eles, ORDER BY rowid vira varredura completa
+    where = 'WHERE created_at >= ? AND (created_at, rowid) > (?, ?)'
+    params = (watermark['created_at'], watermark['created_at'], watermark['rowid'])
+    if watermark['rowid'] >= 0:
+        scan = conn.execute(f'{select} {where} ORDER BY +rowid', params)
+    else:
+        # Sem marca d'água, varrer a tabela direto (o índice de created_at faria um acesso aleatório por linha)
+        scan = conn.execute(f'{select} NOT INDEXED ORDER BY rowid')
+
+    snapshots, disordered = {}, set()
+    while True:
+        rows = scan.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            key = f'{row[1]}|{row[2]}'
+            if key in disordered:
+                continue
+            state = states.get(key)
+            if key not in snapshots:
+                snapshots[key] = dict(state) if state else None
+                if state is None:
+                    state = states[key] = _empty_state()
+            created_at = row[4] or ''
+            if state['last_rowid'] is not None and (created_at, row[0]) < (state['last_created_at'], state['last_rowid']):
+                disordered.add(key)
+                continue
+            _apply_movement(state, row, created_at)
+
+    if disordered:
+        for key in disordered:
+            states[key] = snapshots[key] or _empty_state()
+        ordered = conn.execute(
+            f"{select} {where} AND product_id || '|' || branch_id IN (SELECT value FROM json_each(?)) "
+            f'ORDER BY product_id, branch_id, created_at, rowid',
+            params + (json.dumps(sorted(disordered)),),
+        )
+        for row in ordered:
+            _apply_movement(states[_key(row[1], row[2])], row, row[4] or '')
+
+    # Detalhes do último movimento e da primeira quebra de cada produto tocado no lote
+    touched = [states[key] for key in snapshots]
+    details = {}
+    lookup = [s['last_rowid'] for s in touched]
+    lookup += [s['first_gap']['rowid'] for s in touched if s['first_gap'] and 'movement_id' not in s['first_gap']]
+    for start in range(0, len(lookup), FETCH_SIZE):
+        for rowid, movement_id, boxes_after, open_after in conn.execute(
+            f"SELECT rowid, id, {cols['boxes_after']}, {cols['open_after']} FROM {t} "
+            f'WHERE rowid IN (SELECT value FROM json_each(?))',
+            (json.dumps(lookup[start:start + FETCH_SIZE]),),
+        ):
+            details[rowid] = (movement_id, boxes_after, open_after)
+    for state in touched:
+        movement_id, state['last_boxes'], state['last_open'] = details[state['last_rowid']]
+        state['last_movement'] = {'id': movement_id, 'created_at': state['last_created_at']}
+        gap = state['first_gap']
+        if gap and 'movement_id' not in gap:
+            gap['movement_id'] = details[gap['rowid']][0]
+
+    newest = max(((s['last_created_at'], s['last_rowid']) for s in touched), default=None)
+    if newest:
+        watermark = {'created_at': newest[0], 'rowid': newest[1]}
+    watermark['count'] = count_until(conn, table, watermark)
+    return watermark
+
+
+def count_until(conn, table, watermark):
+    """
+    Movimentos até a marca d'água, como total menos os posteriores: o
+    COUNT(*) simples e a faixa curta no índice de created_at evitam
+    percorrer o índice inteiro até a marca.
+    """
+    t = db.quote_ident(table)
+    total = conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+    newer = conn.execute(
+        f'SELECT COUNT(*) FROM {t} WHERE created_at > ? OR (created_at = ? AND rowid > ?)',
+        (watermark['created_at'], watermark['created_at'], watermark['rowid']),
+    ).fetchone()[0]
+    return total - newer
+
+
+def _apply_movement(state, row, created_at):
+    rowid, _, _, kind, _, before, after = row
+    before, after = before or 0, after or 0
+    # Cada movimento começa onde o anterior terminou (o primeiro, em zero)
+    expected = state['last_after'] if state['last_after'] is not None else 0
+    if before != expected:
+        state['gaps'] += 1
+        if state['first_gap'] is None:
+            state['first_gap'] = {
+                'rowid': rowid,
+                'created_at': created_at,
+                'type': kind,
+                'expected_before': expected,
+                'recorded_before': before,
+                'difference': before - expected,
+            }
+    delta = after - before
+    state['movements'] += 1
+    state['balance'] += delta
+    if kind not in TRANSACTION_TYPES:
+        state['adjustments'] += delta
+    state['last_after'] = after
+    state['last_created_at'] = created_at
+    state['last_rowid'] = rowid
+
+
+# ----------------------------------------------------------------------
+# Saldo por transações (incremental pela mesma marca d'água)
+# ----------------------------------------------------------------------
+# Partindo do cabeçalho (sales/purchases), para usar o índice dos itens
+TRANSACTION_QUERIES = (
+    ('purchases', '''
+        SELECT pi.product_id, pu.branch_id, pu.updated_at IS NULL OR pu.updated_at <= ?, SUM(pi.qty_units)
+        FROM purchases pu
+        JOIN purchase_items pi ON pi.purchase_id = pu.id
+        WHERE pu.status IN ('completed', 'received') {since}
+        GROUP BY 1, 2, 3
+    '''),
+    ('sales', '''
+        SELECT si.product_id, s.branch_id, s.updated_at IS NULL OR s.updated_at <= ?, SUM(si.qty_units)
+        FROM sales s
+        JOIN sale_items si ON si.sale_id = s.id
+        WHERE COALESCE(s.status, '') NOT IN ('cancelled', 'canceled') {since}
+        GROUP BY 1, 2, 3
+    '''),
+)
+
+
+def settled_counts(conn, cutoff):
+    """Compras e vendas com updated_at até o corte (por tabela)."""
+    counts = []
+    for table, _query in TRANSACTION_QUERIES:
+        total = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        newer = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE updated_at > ?', (cutoff,)).fetchone()[0]
+        counts.append(total - newer)
+    return counts
+
+
+def transaction_totals(conn, cutoff, previous=None):
+    """
+    Comprado/vendido por produto/filial. Documentos com updated_at até o corte
+    (a marca d'água dos movimentos) ficam "assentados" e seus totais vão para
+    o checkpoint; na execução seguinte só os documentos alterados depois do
+    corte anterior são agregados (índice em updated_at). Se o número de
+    documentos assentados mudou (venda antiga cancelada, compra antiga
+    recebida pelo sync), a agregação volta a ser completa.
+
+    Retorna (totais, estado para o checkpoint).
+    """
+    settled, since = {}, None
+    if previous and settled_counts(conn, previous['cutoff']) == previous['counts']:
+        settled = {key: list(value) for key, value in previous['totals'].items()}
+        since = previous['cutoff']
+
+    recent = {}
+    for index, (_table, query) in enumerate(TRANSACTION_QUERIES):
+        if since is None:
+            rows = conn.execute(query.format(since=''), (cutoff,))
+        else:
+            rows = conn.execute(query.format(since='AND updated_at > ?'), (cutoff, since))
+        for product_id, branch_id, is_settled, qty in rows:
+            target = settled if is_settled else recent
+            target.setdefault(_key(product_id, branch_id), [0, 0])[index] += qty or 0
+
+    totals = {key: list(value) for key, value in settled.items()}
+    for key, (purchased, sold) in recent.items():
+        total = totals.setdefault(key, [0, 0])
+        total[0] += purchased
+        total[1] += sold
+    state = {
+        'cutoff': cutoff,
+        'counts': settled_counts(conn, cutoff),
+        'totals': settled,
+        'mode': 'incremental' if since is not None else 'full',
+    }
+    return totals, state
+
+
+# ----------------------------------------------------------------------
+# Checkpoint
+# ----------------------------------------------------------------------
+def default_checkpoint_path(db_path):
+    digest = hashlib.sha1(os.path.abspath(db_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(DEFAULT_CHECKPOINT_DIR, f'{digest}.json')
+
+
+def load_checkpoint(path, table):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('table') != table:
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, table, watermark, states, transactions):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': CHECKPOINT_VERSION,
+            'table': table,
+            'watermark': watermark,
+            'states': states,
+            'transactions': transactions,
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def checkpoint_still_valid(conn, table, watermark):
+    """
+    Movimentos com created_at antigo podem chegar depois (sync). Se a contagem
+    até a marca d'água mudou, o checkpoint não vale mais.
+    """
+    return count_until(conn, table, watermark) == watermark.get('count')
+
+
+# ----------------------------------------------------------------------
+# Verificação
+# ----------------------------------------------------------------------
+def check(conn, checkpoint_path=None, full=False):
+    timings = {}
+    started = time.perf_counter()
+
+    source = movement_source(conn)
+    states, mode = {}, 'full'
+    watermark = {'created_at': '', 'rowid': -1}
+    checkpoint = None
+
+    if source:
+        table, cols = source
+        checkpoint = None if full else load_checkpoint(checkpoint_path, table)
+        if checkpoint and checkpoint_still_valid(conn, table, checkpoint['watermark']):
+            states, watermark, mode = checkpoint['states'], checkpoint['watermark'], 'incremental'
+        watermark = replay_movements(conn, table, cols, states, watermark)
+        timings['movements'] = round(time.perf_counter() - started, 3)
+    else:
+        table = None
+
+    step = time.perf_counter()
+    transactions, transactions_state = transaction_totals(
+        conn, watermark['created_at'], checkpoint.get('transactions') if checkpoint else None
+    )
+    timings['transactions'] = round(time.perf_counter() - step, 3)
+    if source and checkpoint_path:
+        save_checkpoint(checkpoint_path, table, watermark, states, transactions_state)
+
+    step = time.perf_counter()
+    inventory = {}
+    for product_id, branch_id, qty, boxes, open_units in conn.execute('''
+        SELECT product_id, branch_id, SUM(COALESCE(qty_units, 0)),
+               SUM(COALESCE(closed_boxes, 0)), SUM(COALESCE(open_box_units, 0))
+        FROM inventory_items
+        GROUP BY product_id, branch_id
+    '''):
+        inventory[_key(product_id, branch_id)] = (qty, boxes, open_units)
+    names = dict(conn.execute('SELECT id, name FROM products').fetchall())
+
+    results = []
+    for key in sorted(set(states) | set(transactions) | set(inventory)):
+        product_id, branch_id = key.split('|', 1)
+        state = states.get(key) or _empty_state()
+        purchased, sold = transactions.get(key, (0, 0))
+        qty, boxes, open_units = inventory.get(key, (0, 0, 0))
+        transactions_balance = purchased - sold + state['adjustments']
+
+        result = {
+            'product_id': product_id,
+            'product_name': names.get(product_id),
+            'branch_id': branch_id,
+            'inventory_units': qty,
+            'inventory_closed_boxes': boxes,
+            'inventory_open_box_units': open_units,
+            'movements': state['movements'],
+            'ledger_balance': state['balance'],
+            'ledger_drift': qty - state['balance'],
+            # Escrita depois do último movimento (saldo atual ≠ saldo do último movimento)
+            'untracked_since_last_movement': (
+                qty - state['last_after'] if state['last_after'] is not None else None
+            ),
+            'box_drift': (
+                state['last_boxes'] is not None
+                and (boxes != state['last_boxes'] or open_units != state['last_open'])
+            ),
+            'purchased': purchased,
+            'sold': sold,
+            'adjustments': state['adjustments'],
+            'transactions_balance': transactions_balance,
+            'transactions_drift': qty - transactions_balance,
+            'chain_gaps': state['gaps'],
+            'first_gap': state['first_gap'],
+            'last_movement': state['last_movement'],
+        }
+        result['drift'] = bool(
+            result['ledger_drift'] or result['transactions_drift'] or result['chain_gaps'] or result['box_drift']
+        )
+        results.append(result)
+    timings['compare'] = round(time.perf_counter() - step, 3)
+    timings['total'] = round(time.perf_counter() - started, 3)
+
+    return {
+        'mode': mode,
+        'transactions_mode': transactions_state['mode'],
+        'movement_table': table,
+        'watermark': watermark,
+        'timings': timings,
+        'products': results,
+    }
+
+
+def print_report(report, limit=30):
+    drifted = [r for r in report['products'] if r['drift']]
+    print('═' * 90)
+    print(f"  RAZÃO DE ESTOQUE ({report['mode']}/{report['transactions_mode']}, "
+          f"{report['movement_table'] or 'sem movimentações'})")
+    print('═' * 90)
+    print(f"  Produtos/filiais: {len(report['products'])} | Com divergência: {len(drifted)}")
+    print(f"  Tempos: " + ', '.join(f'{k} {v}s' for k, v in report['timings'].items()))
+    if not drifted:
+        print('\n  ✅ Estoque consistente com o histórico')
+        return
+
+    print()
+    print(f"  {'PRODUTO':<28} {'ATUAL':>7} {'RAZÃO':>7} {'Δ RAZÃO':>8} {'TRANS.':>7} {'Δ TRANS.':>8} {'QUEBRAS':>7}")
+    drifted.sort(key=lambda r: -abs(r['ledger_drift']) - abs(r['transactions_drift']))
+    for r in drifted[:limit]:
+        name = (r['product_name'] or r['product_id'])[:28]
+        print(f"  {name:<28} {r['inventory_units']:>7} {r['ledger_balance']:>7} {r['ledger_drift']:>+8} "
+              f"{r['transactions_balance']:>7} {r['transactions_drift']:>+8} {r['chain_gaps']:>7}")
+        gap = r['first_gap']
+        if gap:
+            print(f"     1ª quebra: {gap['created_at']} {gap['type']} {gap['movement_id']} "
+                  f"(esperado {gap['expected_before']}, registrado {gap['recorded_before']}, {gap['difference']:+})")
+        if r['box_drift']:
+            print('     caixas fechadas/abertas diferentes do último movimento')
+    if len(drifted) > limit:
+        print(f'\n  ... mais {len(drifted) - limit} (use --json para a lista completa)')
+
+
+# ----------------------------------------------------------------------
+# Banco sintético para benchmark
+# ----------------------------------------------------------------------
+def generate_fixture(path, movements, products=1000, branches=2, seed=42):
+    """
+    Gera um banco com o esquema mínimo do desktop e `movements` movimentações
+    encadeadas (com algumas quebras e divergências propositais).
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE products (id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE inventory_items (id TEXT PRIMARY KEY, product_id TEXT, branch_id TEXT,
+            qty_units INTEGER, closed_boxes INTEGER, open_box_units INTEGER);
+        CREATE TABLE stock_movements (id TEXT PRIMARY KEY, product_id TEXT, branch_id TEXT,
+            movement_type TEXT, quantity INTEGER, quantity_before INTEGER, quantity_after INTEGER,
+            closed_boxes_after INTEGER, open_box_after INTEGER, created_at DATETIME);
+        CREATE TABLE purchases (id TEXT PRIMARY KEY, branch_id TEXT, status TEXT,
+            created_at DATETIME, updated_at DATETIME);
+        CREATE TABLE purchase_items (id TEXT PRIMARY KEY, purchase_id TEXT, product_id TEXT, qty_units INTEGER);
+        CREATE TABLE sales (id TEXT PRIMARY KEY, branch_id TEXT, status TEXT, created_at DATETIME, updated_at DATETIME);
+        CREATE TABLE sale_items (id TEXT PRIMARY KEY, sale_id TEXT, product_id TEXT, qty_units INTEGER);
+        CREATE INDEX idx_stock_movements_product ON stock_movements(product_id);
+        CREATE INDEX idx_stock_movements_branch ON stock_movements(branch_id);
+        CREATE INDEX idx_stock_movements_created ON stock_movements(created_at);
+        CREATE INDEX idx_sale_items_sale ON sale_items(sale_id);
+        CREATE INDEX idx_purchase_items_purchase ON purchase_items(purchase_id);
+        CREATE INDEX idx_sales_updated ON sales(updated_at);
+        CREATE INDEX idx_purchases_updated ON purchases(updated_at);
+    ''')
+    keys = [(f'prod-{p}', f'branch-{b}') for p in range(products) for b in range(branches)]
+    conn.executemany('INSERT INTO products VALUES (?, ?)', ((f'prod-{p}', f'Produto {p}') for p in range(products)))
+    balances = {key: 0 for key in keys}
+
+    movements_batch, headers_batch, items_batch = [], [], []
+
+    def flush():
+        conn.executemany('INSERT INTO stock_movements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', movements_batch)
+        conn.executemany('INSERT INTO purchases VALUES (?, ?, ?, ?, ?)',
+                         [h for h in headers_batch if h[0].startswith('pur')])
+        conn.executemany('INSERT INTO sales VALUES (?, ?, ?, ?, ?)',
+                         [h for h in headers_batch if h[0].startswith('sale')])
+        conn.executemany('INSERT INTO purchase_items VALUES (?, ?, ?, ?)',
+                         [i for i in items_batch if i[0].startswith('pur')])
+        conn.executemany('INSERT INTO sale_items VALUES (?, ?, ?, ?)', [i for i in items_batch if i[0].startswith('sale')])
+        del movements_batch[:], headers_batch[:], items_batch[:]
+
+    for n in range(movements):
+        key = keys[rng.randrange(len(keys))]
+        before = balances[key]
+        seconds = n // 10
+        created_at = f'2025-{1 + (seconds // 2419200) % 12:02d}-{1 + (seconds // 86400) % 28:02d} ' \
+                     f'{(seconds // 3600) % 24:02d}:{(seconds // 60) % 60:02d}:{seconds % 60:02d}'
+        if before < 24 or rng.random() < 0.1:
+            kind, qty, doc = 'purchase', 24 * rng.randint(1, 5), f'pur-{n}'
+            headers_batch.append((doc, key[1], 'completed', created_at, created_at))
+        else:
+            kind, qty, doc = 'sale', -rng.randint(1, min(before, 6)), f'sale-{n}'
+            headers_batch.append((doc, key[1], 'paid', created_at, created_at))
+        items_batch.append((f'{doc}-1', doc, key[0], abs(qty)))
+        # Quebra proposital: estoque alterado sem movimentação
+        if rng.random() < 0.00001:
+            before += rng.randint(1, 50)
+        after = before + qty
+        balances[key] = after
+        movements_batch.append((f'mov-{n}', key[0], key[1], kind, qty, before, after, after // 24, after % 24, created_at))
+        if len(movements_batch) >= 50000:
+            flush()
+    flush()
+
+    conn.executemany(
+        'INSERT INTO inventory_items VALUES (?, ?, ?, ?, ?, ?)',
+        ((f'inv-{i}', key[0], key[1], balances[key], balances[key] // 24, balances[key] % 24)
+         for i, key in enumerate(keys)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reconstrói o estoque a partir do histórico e aponta divergências')
+    parser.add_argument('--db', default=None, help='Caminho do barmanager.db (padrão: banco do desktop)')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Arquivo de checkpoint (padrão: ~/.cache/barmanager/ledger/<hash do caminho>.json)')
+    parser.add_argument('--no-checkpoint', action='store_true', help='Não ler nem gravar checkpoint')
+    parser.add_argument('--full', action='store_true', help='Ignorar o checkpoint e reprocessar tudo')
+    parser.add_argument('--json', dest='json_path', help='Gravar o relatório completo em JSON')
+    parser.add_argument('--limit', type=int, default=30, help='Divergências listadas no terminal')
+    parser.add_argument('--generate', type=int, metavar='N',
+                        help='Gerar em --db um banco sintético com N movimentações (benchmark) e sair')
+    parser.add_argument('--force', action='store_true', help='Com --generate, sobrescrever o arquivo de --db')
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        # Nunca no banco padrão do desktop: o arquivo é apagado e recriado
+        if not args.db:
+            parser.error('--generate exige --db com o caminho do banco sintético')
+        if os.path.exists(args.db):
+            if not args.force:
+                parser.error(f'{args.db} já existe; use --force para sobrescrever')
+            os.remove(args.db)
+        started = time.perf_counter()
+        generate_fixture(args.db, args.generate)
+        print(f'Banco sintético com {args.generate} movimentações em {args.db} '
+              f'({time.perf_counter() - started:.1f}s)')
+        return 0
+
+    db_path = args.db or db.default_db_path()
+
+    checkpoint_path = None if args.no_checkpoint else (args.checkpoint or default_checkpoint_path(db_path))
+    conn = db.connect(db_path, row_factory=None)
+    try:
+        report = check(conn, checkpoint_path, full=args.full)
+    finally:
+        conn.close()
+
+    print_report(report, args.limit)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'\n  Relatório salvo em {args.json_path}')
+
+    return 1 if any(r['drift'] for r in report['products']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Monitor contínuo da sync_queue do desktop.
+
+Substitui rodar check-sync-queue.py / check-sync-errors.py repetidamente.
+Mantém uma conexão somente leitura aberta e consulta `PRAGMA data_version`
+a cada intervalo: o valor só muda quando outra conexão (o Electron) grava
+no banco, então com o app parado o custo é uma PRAGMA por intervalo. Quando
+muda, lê apenas as linhas com updated_at a partir da última marca d'água
+(índice idx_sync_queue_updated) e atualiza os contadores em memória:
+
+- profundidade por entidade (pending / failed)
+- idade do item pendente mais antigo
+- vazão (completados por minuto) e taxa de falha na janela
+- saldo da fila por minuto e estimativa para esvaziar
+
+Nenhuma transação de leitura fica aberta entre as consultas (WAL), então o
+monitor nunca segura checkpoints nem disputa com o escritor. Remoções
+(Dead Letter Queue, limpeza da fila) não mudam updated_at: são detectadas
+pela contagem de itens abertos, que força uma releitura completa.
+
+Uso:
+    python -m barmanager_tools.sync_monitor
+    python -m barmanager_tools.sync_monitor --interval 0.5 --window 300
+    python -m barmanager_tools.sync_monitor --once
+"""
+import argparse
+import collections
+import sys
+import time
+from datetime import datetime, timezone
+
+from . import db
+
+OPEN_STATUSES = ('pending', 'failed')
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('T', ' ').rstrip('Z')[:19])
+    except ValueError:
+        return None
+
+
+class QueueMonitor:
+    """
+    Estado da fila mantido incrementalmente. Só os itens abertos (pending e
+    failed) ficam em memória; itens completados entram nas taxas e saem.
+    """
+
+    def __init__(self, conn, window_seconds=300):
+        self.conn = conn
+        self.window_seconds = window_seconds
+        self.items = {}                 # id -> (entity, status, created_at)
+        self.watermark = None           # maior updated_at já lido
+        self.events = collections.deque()  # (monotonic, 'completed'|'failed')
+        self.depth_history = collections.deque()  # (monotonic, profundidade)
+        self.data_version = None
+        self.queries = 0
+        self.full_reloads = 0
+        self.has_updated_at = 'updated_at' in db.table_columns(conn, 'sync_queue')
+
+    # ------------------------------------------------------------------
+    def poll(self):
+        """Retorna True se o banco mudou e os contadores foram atualizados."""
+        version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self.data_version:
+            return False
+        first = self.data_version is None
+        self.data_version = version
+        if first or not self.has_updated_at:
+            self.reload()
+        else:
+            self.read_changes()
+            if self.open_count_in_db() != len(self.items):
+                self.reload()
+        self._record_depth()
+        return True
+
+    def reload(self):
+        """Leitura completa dos itens abertos (início, remoções ou banco sem updated_at)."""
+        self.full_reloads += 1
+        self.queries += 1
+        placeholders = ', '.join('?' for _ in OPEN_STATUSES)
+        rows = self.conn.execute(
+            f'SELECT id, entity, status, created_at FROM sync_queue WHERE status IN ({placeholders})',
+            OPEN_STATUSES,
+        ).fetchall()
+        self.items = {row[0]: (row[1], row[2], _parse_timestamp(row[3])) for row in rows}
+        if self.has_updated_at:
+            self.queries += 1
+            self.watermark = self.conn.execute('SELECT MAX(updated_at) FROM sync_queue').fetchone()[0]
+
+    def read_changes(self):
+        """
+        Linhas com updated_at >= marca d'água. updated_at tem resolução de
+        segundos, então o último segundo é relido; como só mudanças de status
+        contam, reler uma linha já vista não altera nada.
+        """
+        self.queries += 1
+        rows = self.conn.execute(
+            'SELECT id, entity, status, created_at, updated_at FROM sync_queue WHERE updated_at >= ? '
+            'ORDER BY updated_at',
+            (self.watermark or '',),
+        ).fetchall()
+        now = time.monotonic()
+        for item_id, entity, status, created_at, updated_at in rows:
+            self.watermark = updated_at
+            previous = self.items.get(item_id)
+            # Completado: só conta se estava aberto (releituras e itens antigos não entram na vazão)
+            if status == 'completed' and previous is not None:
+                self.events.append((now, status))
+            elif status == 'failed' and (previous is None or previous[1] != 'failed'):
+                self.events.append((now, status))
+            if status in OPEN_STATUSES:
+                self.items[item_id] = (entity, status, _parse_timestamp(created_at))
+            else:
+                self.items.pop(item_id, None)
+
+    def open_count_in_db(self):
+        self.queries += 1
+        placeholders = ', '.join('?' for _ in OPEN_STATUSES)
+        return self.conn.execute(
+            f'SELECT COUNT(*) FROM sync_queue WHERE status IN ({placeholders})', OPEN_STATUSES
+        ).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    def _record_depth(self):
+        now = time.monotonic()
+        self.depth_history.append((now, self.pending_count()))
+        self._trim(now)
+
+    def _trim(self, now):
+        limit = now - self.window_seconds
+        while self.events and self.events[0][0] < limit:
+            self.events.popleft()
+        # Mantém um ponto antes da janela para medir a variação
+        while len(self.depth_history) > 1 and self.depth_history[1][0] < limit:
+            self.depth_history.popleft()
+
+    def pending_count(self):
+        return sum(1 for _, status, _ in self.items.values() if status == 'pending')
+
+    def snapshot(self):
+        now = time.monotonic()
+        self._trim(now)
+        by_entity = collections.defaultdict(lambda: {'pending': 0, 'failed': 0})
+        oldest = None
+        for entity, status, created_at in self.items.values():
+            by_entity[entity][status] += 1
+            if status == 'pending' and created_at and (oldest is None or created_at < oldest):
+                oldest = created_at
+
+        completed = sum(1 for _, kind in self.events if kind == 'completed')
+        failed = sum(1 for _, kind in self.events if kind == 'failed')
+        span = min(self.window_seconds, max(now - self.depth_history[0][0], 1)) if self.depth_history else 1
+        pending = self.pending_count()
+        net_per_min = None
+        if len(self.depth_history) > 1:
+            (start, start_depth) = self.depth_history[0]
+            if now - start >= 1:
+                net_per_min = (pending - start_depth) / (now - start) * 60
+
+        eta_min = None
+        if net_per_min is not None and net_per_min < 0 and pending:
+            eta_min = pending / -net_per_min
+
+        return {
+            'pending': pending,
+            'failed': len(self.items) - pending,
+            'by_entity': dict(sorted(by_entity.items(), key=lambda kv: -kv[1]['pending'] - kv[1]['failed'])),
+            'oldest_pending_age_s': int((_utc_now() - oldest).total_seconds()) if oldest else None,
+            'completed_per_min': completed / span * 60,
+            'failures_per_min': failed / span * 60,
+            'failure_rate': failed / (completed + failed) if completed + failed else 0.0,
+            'net_per_min': net_per_min,
+            'eta_min': eta_min,
+            'queries': self.queries,
+            'full_reloads': self.full_reloads,
+        }
+
+
+def _format_age(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < 120:
+        return f'{seconds}s'
+    if seconds < 7200:
+        return f'{seconds // 60}min'
+    return f'{seconds / 3600:.1f}h'
+
+
+def print_snapshot(snap, top=8):
+    stamp = datetime.now().strftime('%H:%M:%S')
+    net = '-' if snap['net_per_min'] is None else f"{snap['net_per_min']:+.1f}/min"
+    eta = '-' if snap['eta_min'] is None else f"{snap['eta_min']:.0f}min"
+    print(
+        f"[{stamp}] pendentes {snap['pending']} | falhas {snap['failed']} | "
+        f"mais antigo {_format_age(snap['oldest_pending_age_s'])} | "
+        f"vazão {snap['completed_per_min']:.1f}/min | falhas {snap['failures_per_min']:.1f}/min "
+        f"({snap['failure_rate']:.0%}) | saldo {net} | esvazia em {eta}"
+    )
+    entities = list(snap['by_entity'].items())[:top]
+    if entities:
+        print('           ' + ', '.join(
+            f"{entity} {counts['pending']}" + (f"/{counts['failed']}✗" if counts['failed'] else '')
+            for entity, counts in entities
+        ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Acompanha a sync_queue do desktop em tempo real')
+    parser.add_argument('--db', default=None, help='Caminho do barmanager.db (padrão: banco do desktop)')
+    parser.add_argument('--interval', type=float, default=1.0, help='Segundos entre verificações (padrão: 1)')
+    parser.add_argument('--window', type=int, default=300, help='Janela das taxas em segundos (padrão: 300)')
+    parser.add_argument('--heartbeat', type=int, default=60,
+                        help='Reimprimir o resumo a cada N segundos mesmo sem mudanças (0 desliga)')
+    parser.add_argument('--once', action='store_true', help='Imprimir o estado atual e sair')
+    args = parser.parse_args(argv)
+
+    conn = db.connect(args.db or db.default_db_path(), row_factory=None)
+    conn.isolation_level = None  # autocommit: nenhuma transação de leitura fica aberta
+    monitor = QueueMonitor(conn, window_seconds=args.window)
+    try:
+        monitor.poll()
+        print_snapshot(monitor.snapshot())
+        if args.once:
+            return 0
+        last_print = time.monotonic()
+        while True:
+            time.sleep(args.interval)
+            changed = monitor.poll()
+            now = time.monotonic()
+            if changed or (args.heartbeat and now - last_print >= args.heartbeat):
+                print_snapshot(monitor.snapshot())
+                last_print = now
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
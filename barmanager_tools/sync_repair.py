@@ -0,0 +1,371 @@
+"""
+Correções declarativas da sync_queue do desktop.
+
+Os scripts fix-*-sync.py da raiz percorriam a fila em Python (json.loads,
+SELECT por linha, UPDATE/INSERT por linha). Aqui cada correção é uma regra
+e vira um único comando SQL sobre o conjunto todo:
+
+- fill:    payloads sem os campos indicados recebem os valores da tabela de
+           origem (UPDATE ... SET data = json_insert(...) FROM <tabela>)
+- requeue: itens já processados com payload incompleto geram um novo item
+           pendente com o payload montado da tabela de origem
+           (INSERT ... SELECT json_object(...))
+- reset:   itens voltam para pending (retry_count = 0, last_error = NULL)
+
+Por padrão nada é gravado: cada regra mostra quantos itens seriam
+alterados e um antes/depois de algumas linhas. Com --apply cada regra roda
+na sua própria transação.
+
+Regras extras podem vir de um arquivo JSON (lista de objetos no mesmo
+formato de RULES).
+
+Uso:
+    python -m barmanager_tools.sync_repair --list
+    python -m barmanager_tools.sync_repair --rule purchase-number --diff 5
+    python -m barmanager_tools.sync_repair --apply --backup antes-da-correcao.db
+    python -m barmanager_tools.sync_repair --rules-file minhas-regras.json --apply
+"""
+import argparse
+import json
+import sys
+import time
+
+from . import db
+
+ACTIONS = ('fill', 'requeue', 'reset')
+
+# Tabela temporária com as entidades que já têm item completo na fila (requeue)
+DONE_TABLE = 'sync_repair_done'
+
+# Mesmas correções dos scripts fix-*-sync.py
+RULES = [
+    {
+        'name': 'purchase-number',
+        'description': 'Compras na fila sem purchaseNumber',
+        'action': 'fill',
+        'entity': 'purchase',
+        'source': 'purchases',
+        'fields': {'purchaseNumber': 'src.purchase_number'},
+    },
+    {
+        'name': 'purchase-item-purchase-id',
+        'description': 'Itens de compra na fila sem purchaseId',
+        'action': 'fill',
+        'entity': 'purchase_item',
+        'source': 'purchase_items',
+        'fields': {'purchaseId': 'src.purchase_id'},
+    },
+    {
+        'name': 'sale-resend-with-id',
+        'description': 'Vendas sincronizadas sem id no payload: reenviar com id',
+        'action': 'requeue',
+        'entity': 'sale',
+        'operation': 'create',
+        'status': 'completed',
+        'missing': ['id'],
+        'source': 'sales',
+        'priority': 1,
+        'fields': {
+            'id': 'src.id',
+            'saleNumber': 'src.sale_number',
+            'branchId': "COALESCE(src.branch_id, 'main-branch')",
+            'cashierId': "COALESCE(src.cashier_id, 'offline-admin')",
+            'customerId': 'src.customer_id',
+            'type': "COALESCE(src.type, 'counter')",
+        },
+    },
+    {
+        'name': 'customer-resend-with-id',
+        'description': 'Clientes sincronizados sem id no payload: reenviar com id',
+        'action': 'requeue',
+        'entity': 'customer',
+        'operation': 'create',
+        'status': 'completed',
+        'missing': ['id'],
+        'source': 'customers',
+        'priority': 0,
+        'fields': {
+            'id': 'src.id',
+            'name': 'src.full_name',
+            'phone': 'src.phone',
+            'email': 'src.email',
+            'creditLimit': 'COALESCE(src.credit_limit, 0)',
+            'code': 'src.code',
+        },
+    },
+    {
+        'name': 'reset-failed-sales',
+        'description': 'Vendas, itens e pagamentos com falha voltam para pending',
+        'action': 'reset',
+        'entity': ['sale', 'sale_item', 'payment'],
+        'status': 'failed',
+    },
+]
+
+# UUID v4 gerado pelo SQLite (mesmo formato do uuid.uuid4() dos scripts)
+UUID_SQL = (
+    "lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-4' || "
+    "substr(lower(hex(randomblob(2))), 2) || '-' || substr('89ab', 1 + abs(random()) % 4, 1) || "
+    "substr(lower(hex(randomblob(2))), 2) || '-' || lower(hex(randomblob(6)))"
+)
+
+
+class RuleError(ValueError):
+    pass
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _in_clause(column, values, params):
+    params.extend(values)
+    return f"{column} IN ({', '.join('?' for _ in values)})"
+
+
+def _missing_clause(fields, params, alias='sq'):
+    """Algum dos campos ausente do payload (mesmo critério de `campo not in data`)."""
+    checks = []
+    for field in fields:
+        params.append(f'$.{field}')
+        checks.append(f'json_type({alias}.data, ?) IS NULL')
+    return '(' + ' OR '.join(checks) + ')'
+
+
+def compile_rule(rule):
+    """
+    Traduz a regra em SQL (alias sq para a fila, src para a tabela de origem).
+    Retorna {'setup': [(sql, params)], 'count': (sql, params), 'preview': (sql, params),
+    'apply': (sql, params)}: comandos que preparam tabelas temporárias (rodam
+    antes dos demais), contagem dos itens afetados, amostra (id, antes,
+    depois) com LIMIT ? e o comando que faz a correção.
+    """
+    name = rule.get('name')
+    action = rule.get('action')
+    if action not in ACTIONS:
+        raise RuleError(f"Regra {name}: ação inválida {action!r} (use {', '.join(ACTIONS)})")
+    entities = _as_list(rule.get('entity'))
+    if not entities:
+        raise RuleError(f"Regra {name}: 'entity' é obrigatório")
+    fields = rule.get('fields') or {}
+    if action != 'reset' and (not fields or not rule.get('source')):
+        raise RuleError(f"Regra {name}: 'source' e 'fields' são obrigatórios para {action}")
+    missing = rule.get('missing') or list(fields)
+
+    where_params = []
+    where = [_in_clause('sq.entity', entities, where_params)]
+    if rule.get('operation'):
+        where.append(_in_clause('sq.operation', _as_list(rule['operation']), where_params))
+    if rule.get('status'):
+        where.append(_in_clause('sq.status', _as_list(rule['status']), where_params))
+    if action != 'reset':
+        where.append('json_valid(sq.data)')
+        where.append(_missing_clause(missing, where_params))
+    setup = []
+    if action == 'requeue':
+        # Idempotente: não reenviar se outro item da mesma entidade já tem o payload completo.
+        # Os itens completos são agregados uma vez numa tabela temporária com chave
+        # (entity, entity_id, operation); o NOT EXISTS correlacionado direto na fila
+        # relia a fila inteira para cada item (quadrático: ~6 min com 50 mil vendas).
+        done_params = []
+        done_where = [_in_clause('done.entity', entities, done_params)]
+        if rule.get('operation'):
+            done_where.append(_in_clause('done.operation', _as_list(rule['operation']), done_params))
+        done_where.append('json_valid(done.data)')
+        done_where.append(f"NOT {_missing_clause(missing, done_params, 'done')}")
+        setup = [
+            (f'DROP TABLE IF EXISTS temp.{DONE_TABLE}', []),
+            (
+                f'CREATE TEMP TABLE {DONE_TABLE} (entity TEXT, entity_id TEXT, operation TEXT, '
+                'PRIMARY KEY (entity, entity_id, operation)) WITHOUT ROWID',
+                [],
+            ),
+            (
+                f'INSERT OR IGNORE INTO temp.{DONE_TABLE} SELECT done.entity, done.entity_id, done.operation '
+                f"FROM sync_queue AS done WHERE {' AND '.join(done_where)}",
+                done_params,
+            ),
+        ]
+        # Um item incompleto nunca está no conjunto dos completos, então não precisa de done.id != sq.id
+        where.append(
+            f'NOT EXISTS (SELECT 1 FROM temp.{DONE_TABLE} AS done WHERE done.entity = sq.entity '
+            'AND done.entity_id = sq.entity_id AND done.operation = sq.operation)'
+        )
+    if rule.get('when'):
+        where.append(f"({rule['when']})")
+    where_sql = ' AND '.join(where)
+
+    if action == 'reset':
+        base = f'FROM sync_queue AS sq WHERE {where_sql}'
+        return {
+            'setup': setup,
+            'count': (f'SELECT COUNT(*) {base}', where_params),
+            'preview': (f"SELECT sq.id, sq.status, 'pending' {base} LIMIT ?", where_params),
+            'apply': (
+                "UPDATE sync_queue AS sq SET status = 'pending', retry_count = 0, last_error = NULL, "
+                f"updated_at = datetime('now') WHERE {where_sql}",
+                where_params,
+            ),
+        }
+
+    source = db.quote_ident(rule['source'])
+    join_on = f"src.{db.quote_ident(rule.get('key', 'id'))} = sq.{db.quote_ident(rule.get('ref', 'entity_id'))}"
+    base = f'FROM sync_queue AS sq JOIN {source} AS src ON {join_on} WHERE {where_sql}'
+
+    after_params, pairs = [], []
+    for field, expr in fields.items():
+        # fill: caminho JSON (json_insert só acrescenta chaves ausentes); requeue: chave do json_object
+        after_params.append(f'$.{field}' if action == 'fill' else field)
+        pairs.append(f'?, {expr}')
+    if action == 'fill':
+        after = f"json_insert(sq.data, {', '.join(pairs)})"
+        apply = (
+            f"UPDATE sync_queue AS sq SET data = {after}, updated_at = datetime('now') "
+            f'FROM {source} AS src WHERE {join_on} AND {where_sql}',
+            after_params + where_params,
+        )
+        count_sql = f'SELECT COUNT(*) {base}'
+    else:
+        after = f"json_object({', '.join(pairs)})"
+        # Um novo item por entidade, mesmo que a fila tenha vários itens antigos dela
+        apply = (
+            'INSERT INTO sync_queue (id, operation, entity, entity_id, data, priority, status, retry_count, '
+            'created_at, updated_at) '
+            f"SELECT {UUID_SQL}, sq.operation, sq.entity, sq.entity_id, {after}, ?, 'pending', 0, "
+            f"datetime('now'), datetime('now') {base} GROUP BY sq.entity, sq.operation, sq.entity_id",
+            after_params + [rule.get('priority', 5)] + where_params,
+        )
+        count_sql = f'SELECT COUNT(*) FROM (SELECT 1 {base} GROUP BY sq.entity, sq.operation, sq.entity_id)'
+
+    return {
+        'setup': setup,
+        'count': (count_sql, where_params),
+        'preview': (f'SELECT sq.id, sq.data, {after} {base} LIMIT ?', after_params + where_params),
+        'apply': apply,
+    }
+
+
+def diff_payload(before, after):
+    """Campos acrescentados/alterados entre dois payloads JSON (texto)."""
+    try:
+        old, new = json.loads(before or '{}'), json.loads(after or '{}')
+    except ValueError:
+        return {'antes': before, 'depois': after}
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return {'antes': old, 'depois': new}
+    return {key: [old.get(key, '∅'), value] for key, value in new.items() if old.get(key, '∅') != value}
+
+
+def run_rule(conn, rule, apply=False, diff_rows=3):
+    """Conta (e com apply, executa numa transação própria) uma regra."""
+    compiled = compile_rule(rule)
+    started = time.perf_counter()
+    result = {'rule': rule['name'], 'action': rule['action'], 'affected': 0, 'changed': 0, 'samples': []}
+    if rule.get('source') and rule['source'] not in db.list_tables(conn):
+        result.update(skipped=f"tabela {rule['source']} não existe neste banco", seconds=0)
+        return result
+    for sql, params in compiled['setup']:
+        conn.execute(sql, params)
+    sql, params = compiled['count']
+    affected = conn.execute(sql, params).fetchone()[0]
+
+    samples = []
+    if diff_rows and affected:
+        sql, params = compiled['preview']
+        for queue_id, before, after in conn.execute(sql, params + [diff_rows]):
+            if rule['action'] == 'reset':
+                samples.append({'id': queue_id, 'status': [before, after]})
+            elif rule['action'] == 'requeue':
+                samples.append({'id': queue_id, 'novo_item': json.loads(after)})
+            else:
+                samples.append({'id': queue_id, 'campos': diff_payload(before, after)})
+
+    changed = 0
+    if apply and affected:
+        sql, params = compiled['apply']
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Refaz as tabelas temporárias já com a trava de escrita, caso a fila tenha mudado
+            for setup_sql, setup_params in compiled['setup']:
+                conn.execute(setup_sql, setup_params)
+            changed = conn.execute(sql, params).rowcount
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    result.update(affected=affected, changed=changed, samples=samples, seconds=round(time.perf_counter() - started, 3))
+    return result
+
+
+def load_rules(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise RuleError(f'{path}: esperado uma lista de regras')
+    for rule in rules:
+        compile_rule(rule)
+    return rules
+
+
+def print_result(result, applied):
+    if result.get('skipped'):
+        print(f"  — {result['rule']:<28} {result['action']:<8} ignorada: {result['skipped']}")
+        return
+    verb = 'alterados' if applied else 'seriam alterados'
+    count = result['changed'] if applied else result['affected']
+    icon = '✅' if applied and count else ('•' if count else '—')
+    print(f"  {icon} {result['rule']:<28} {result['action']:<8} {count:>7} {verb} ({result['seconds']}s)")
+    for sample in result['samples']:
+        details = {k: v for k, v in sample.items() if k != 'id'}
+        print(f"       {sample['id']}: {json.dumps(details, ensure_ascii=False, default=str)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Correções em lote da sync_queue do desktop')
+    parser.add_argument('--db', default=None, help='Caminho do barmanager.db (padrão: banco do desktop)')
+    parser.add_argument('--rule', action='append', help='Rodar só estas regras (pode repetir)')
+    parser.add_argument('--rules-file', help='Arquivo JSON com regras adicionais')
+    parser.add_argument('--list', action='store_true', help='Listar as regras e sair')
+    parser.add_argument('--apply', action='store_true', help='Gravar as correções (padrão: só simular)')
+    parser.add_argument('--diff', type=int, default=3, help='Linhas de antes/depois por regra (0 desliga)')
+    parser.add_argument('--backup', help='Antes de aplicar, copiar o banco para este arquivo')
+    args = parser.parse_args(argv)
+
+    rules = list(RULES)
+    if args.rules_file:
+        rules += load_rules(args.rules_file)
+    if args.list:
+        for rule in rules:
+            print(f"  {rule['name']:<28} {rule['action']:<8} {rule.get('description', '')}")
+        return 0
+    if args.rule:
+        known = {rule['name'] for rule in rules}
+        unknown = [name for name in args.rule if name not in known]
+        if unknown:
+            print(f"Regras desconhecidas: {', '.join(unknown)} (veja --list)")
+            return 2
+        rules = [rule for rule in rules if rule['name'] in args.rule]
+
+    db_path = args.db or db.default_db_path()
+    if args.apply and args.backup:
+        db.snapshot(db_path, args.backup)
+        print(f'Backup salvo em {args.backup}')
+
+    conn = db.connect(db_path, readonly=not args.apply, row_factory=None)
+    conn.isolation_level = None  # transações explícitas, uma por regra
+    print('=' * 70)
+    print('CORREÇÃO DA SYNC_QUEUE' + ('' if args.apply else ' (simulação, use --apply para gravar)'))
+    print('=' * 70)
+    try:
+        for rule in rules:
+            print_result(run_rule(conn, rule, apply=args.apply, diff_rows=args.diff), args.apply)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,510 @@
+"""
+Verificador de backups do BarManager.
+
+Compara um backup com o banco de origem (ou com outro backup/snapshot) e gera
+um relatório de diferenças por tabela:
+
+- integridade: PRAGMA integrity_check nos bancos SQLite, sha1 das cadeias
+  incrementais do desktop e sha256/contagem por seção dos backups NDJSON
+- contagem de linhas e hash do conteúdo por tabela, independente da ordem
+  (soma dos hashes das linhas), calculados em paralelo: um processo por tabela
+- nas tabelas divergentes: amostra dos IDs ausentes, extras e alterados
+
+Formatos aceitos (backup e origem):
+- desktop: barmanager.db / backups .db antigos / backups incrementais .gz (+ .json)
+- servidor: backup-*.json (BackupData) e backup-*.ndjson.gz
+
+Entre um banco do desktop e um backup do servidor os esquemas são diferentes;
+nesse caso a comparação é feita só pelo conjunto de IDs de cada tabela.
+
+Uso:
+    python -m barmanager_tools.verify_backup backups/barmanager_manual_2026-01-10T10-00-00.delta.gz
+    python -m barmanager_tools.verify_backup backup-2026-01-10.ndjson.gz --source backup-2026-01-09.ndjson.gz
+    python -m barmanager_tools.verify_backup backup.db --source barmanager.db --jobs 8 --json relatorio.json
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import db
+
+HASH_MASK = (1 << 128) - 1
+SAMPLE_SIZE = 5
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3', '.bkp')
+
+
+# ----------------------------------------------------------------------
+# Entradas: todo formato vira um arquivo SQLite legível pelos workers
+# ----------------------------------------------------------------------
+class Dataset:
+    """
+    kind: 'sqlite' (banco do desktop) ou 'export' (backup do servidor,
+    materializado como uma tabela por seção com colunas pk/body).
+    """
+
+    def __init__(self, label, kind, path):
+        self.label = label
+        self.kind = kind
+        self.path = path
+        self.problems = []
+
+    def tables(self):
+        conn = db.connect(self.path, row_factory=None)
+        try:
+            return db.list_tables(conn)
+        finally:
+            conn.close()
+
+
+def open_dataset(path, workdir, label, snapshot_live=True):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'Arquivo não encontrado: {path}')
+
+    lower = path.lower()
+    if lower.endswith('.ndjson.gz'):
+        return _load_ndjson(path, workdir, label)
+    if lower.endswith('.gz') and os.path.exists(path[:-3] + '.json'):
+        return _rebuild_desktop_chain(path, workdir, label)
+    if lower.endswith('.json'):
+        return _load_backup_json(path, workdir, label)
+    if lower.endswith(SQLITE_EXTENSIONS):
+        dataset = Dataset(label, 'sqlite', path)
+        # Banco em uso (ou backup com -wal ao lado): copiar um snapshot consistente
+        if snapshot_live or os.path.exists(path + '-wal'):
+            target = os.path.join(workdir, f'{label}.snapshot.db')
+            db.snapshot(path, target)
+            dataset.path = target
+        return dataset
+    raise ValueError(f'Formato de backup não reconhecido: {path}')
+
+
+def _rebuild_desktop_chain(path, workdir, label):
+    """
+    Reconstrói um backup incremental do desktop (base + deltas) usando os
+    manifestos .json gravados pelo BackupManager.
+    """
+    backup_dir = os.path.dirname(os.path.abspath(path))
+    chain = []
+    manifest_file = path[:-3] + '.json'
+    while manifest_file:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        chain.insert(0, manifest)
+        parent = manifest.get('parent')
+        manifest_file = os.path.join(backup_dir, parent[:-3] + '.json') if parent else None
+
+    target = os.path.join(workdir, f'{label}.restored.db')
+    with gzip.open(os.path.join(backup_dir, chain[0]['file']), 'rb') as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    with open(target, 'r+b') as dst:
+        for delta in chain[1:]:
+            page_size = delta['pageSize']
+            record_size = 4 + page_size
+            with gzip.open(os.path.join(backup_dir, delta['file']), 'rb') as src:
+                while True:
+                    record = src.read(record_size)
+                    if not record:
+                        break
+                    if len(record) != record_size:
+                        raise ValueError(f'Delta corrompido: {delta["file"]}')
+                    index = int.from_bytes(record[:4], 'big')
+                    dst.seek(index * page_size)
+                    dst.write(record[4:])
+        last = chain[-1]
+        dst.truncate(last['pageCount'] * last['pageSize'])
+
+    dataset = Dataset(label, 'sqlite', target)
+    digest = hashlib.sha1()
+    with open(target, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    if digest.hexdigest() != chain[-1]['sha1']:
+        dataset.problems.append(f'sha1 da cadeia não confere ({len(chain)} arquivos)')
+    return dataset
+
+
+def _export_writer(workdir, label):
+    target = os.path.join(workdir, f'{label}.export.db')
+    conn = sqlite3.connect(target)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    return target, conn
+
+
+def _canonical(row):
+    return json.dumps(row, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def _row_key(row):
+    key = row.get('id', row.get('key'))
+    return str(key) if key is not None else _canonical(row)
+
+
+def _write_section(conn, name, rows):
+    table = db.quote_ident(name)
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (pk TEXT, body TEXT)')
+    conn.executemany(
+        f'INSERT INTO {table} (pk, body) VALUES (?, ?)',
+        ((_row_key(row), _canonical(row)) for row in rows),
+    )
+
+
+def _load_ndjson(path, workdir, label):
+    target, conn = _export_writer(workdir, label)
+    dataset = Dataset(label, 'export', target)
+    section, rows, count, digest = None, [], 0, None
+    saw_manifest = False
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            if section and not line.startswith('{"type":"end"'):
+                digest.update((line + '\n').encode('utf-8'))
+                rows.append(json.loads(line))
+                count += 1
+                if len(rows) >= 5000:
+                    _write_section(conn, section, rows)
+                    rows = []
+                continue
+
+            record = json.loads(line)
+            kind = record.get('type')
+            if kind == 'section':
+                section, rows, count, digest = record['name'], [], 0, hashlib.sha256()
+                _write_section(conn, section, [])
+            elif kind == 'end':
+                _write_section(conn, section, rows)
+                if record.get('count') != count or record.get('sha256') != digest.hexdigest():
+                    dataset.problems.append(f'seção {section}: contagem/sha256 não confere com o marcador de fim')
+                section, rows = None, []
+            elif kind == 'manifest':
+                saw_manifest = True
+
+    if section or not saw_manifest:
+        dataset.problems.append('backup NDJSON incompleto (sem manifesto final)')
+    conn.commit()
+    conn.close()
+    return dataset
+
+
+def _load_backup_json(path, workdir, label):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    target, conn = _export_writer(workdir, label)
+    dataset = Dataset(label, 'export', target)
+    expected = (data.get('metadata') or {}).get('entities') or {}
+    for name, rows in data.items():
+        if name == 'metadata' or not isinstance(rows, list):
+            continue
+        _write_section(conn, name, rows)
+        if name in expected and expected[name] != len(rows):
+            dataset.problems.append(f'seção {name}: metadata indica {expected[name]}, arquivo tem {len(rows)}')
+    conn.commit()
+    conn.close()
+    return dataset
+
+
+# ----------------------------------------------------------------------
+# Workers (executados em processos separados)
+# ----------------------------------------------------------------------
+def integrity_worker(label, path, quick):
+    conn = db.connect(path, row_factory=None)
+    try:
+        pragma = 'quick_check' if quick else 'integrity_check'
+        started = time.perf_counter()
+        result = [row[0] for row in conn.execute(f'PRAGMA {pragma}').fetchall()]
+        return {
+            'label': label,
+            'ok': result == ['ok'],
+            'messages': result[:20],
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+    finally:
+        conn.close()
+
+
+def _key_expression(columns):
+    if 'id' in columns:
+        return db.quote_ident('id')
+    if 'key' in columns:
+        return db.quote_ident('key')
+    return 'rowid'
+
+
+def _row_query(kind, table, columns, keys_only):
+    name = db.quote_ident(table)
+    if kind == 'export':
+        return f'SELECT pk, {"pk" if keys_only else "body"} FROM {name}'
+    key = _key_expression(columns)
+    if keys_only:
+        return f'SELECT {key}, CAST({key} AS TEXT) FROM {name}'
+    # quote() gera uma representação tipada e canônica de cada valor, em C
+    row_text = " || char(31) || ".join(f'quote({db.quote_ident(c)})' for c in columns)
+    return f'SELECT {key}, {row_text} FROM {name}'
+
+
+def _scan(path, query, collect):
+    conn = db.connect(path, row_factory=None)
+    total, count, by_key = 0, 0, {} if collect else None
+    try:
+        for key, text in conn.execute(query):
+            digest = hashlib.blake2b(str(text).encode('utf-8'), digest_size=16).digest()
+            total = (total + int.from_bytes(digest, 'big')) & HASH_MASK
+            count += 1
+            if collect:
+                by_key[str(key)] = digest
+    finally:
+        conn.close()
+    return count, format(total, '032x'), by_key
+
+
+def table_worker(task):
+    """
+    Conta e calcula o hash de uma tabela dos dois lados. Se divergir, faz uma
+    segunda passagem guardando o hash por ID para listar as diferenças.
+    """
+    started = time.perf_counter()
+    backup, source = task['backup'], task['source']
+    backup_query = _row_query(backup['kind'], backup['table'], task['columns'], task['keys_only'])
+    source_query = _row_query(source['kind'], source['table'], task['columns'], task['keys_only'])
+
+    backup_count, backup_hash, _ = _scan(backup['path'], backup_query, False)
+    source_count, source_hash, _ = _scan(source['path'], source_query, False)
+
+    result = {
+        'table': task['name'],
+        'backup_count': backup_count,
+        'source_count': source_count,
+        'backup_hash': backup_hash,
+        'source_hash': source_hash,
+        'keys_only': task['keys_only'],
+        'match': backup_count == source_count and backup_hash == source_hash,
+    }
+
+    if not result['match']:
+        _, _, backup_rows = _scan(backup['path'], backup_query, True)
+        _, _, source_rows = _scan(source['path'], source_query, True)
+        missing = [k for k in source_rows if k not in backup_rows]
+        extra = [k for k in backup_rows if k not in source_rows]
+        changed = [k for k, digest in backup_rows.items() if k in source_rows and source_rows[k] != digest]
+        result.update({
+            'missing_in_backup': len(missing),
+            'extra_in_backup': len(extra),
+            'changed': len(changed),
+            'sample_missing': missing[:SAMPLE_SIZE],
+            'sample_extra': extra[:SAMPLE_SIZE],
+            'sample_changed': changed[:SAMPLE_SIZE],
+        })
+
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+# ----------------------------------------------------------------------
+# Planejamento e relatório
+# ----------------------------------------------------------------------
+def _snake_case(name):
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+
+def plan_tables(backup, source):
+    """
+    Pareia as tabelas dos dois lados. Retorna (tarefas, avisos de esquema).
+    """
+    backup_tables = backup.tables()
+    source_tables = source.tables()
+    keys_only = backup.kind != source.kind
+
+    def normalize(dataset, table):
+        return _snake_case(table) if dataset.kind == 'export' and keys_only else table
+
+    backup_map = {normalize(backup, t): t for t in backup_tables}
+    source_map = {normalize(source, t): t for t in source_tables}
+
+    tasks, notes = [], []
+    for name in sorted(set(backup_map) | set(source_map)):
+        if name not in backup_map:
+            notes.append({'table': name, 'issue': 'ausente no backup'})
+            continue
+        if name not in source_map:
+            notes.append({'table': name, 'issue': 'ausente na origem'})
+            continue
+
+        columns = []
+        if backup.kind == source.kind == 'sqlite':
+            backup_columns = _columns(backup.path, backup_map[name])
+            source_columns = _columns(source.path, source_map[name])
+            columns = sorted(set(backup_columns) & set(source_columns))
+            only_backup = sorted(set(backup_columns) - set(source_columns))
+            only_source = sorted(set(source_columns) - set(backup_columns))
+            if only_backup or only_source:
+                notes.append({
+                    'table': name,
+                    'issue': 'colunas diferentes (comparando só as comuns)',
+                    'only_backup': only_backup,
+                    'only_source': only_source,
+                })
+        elif keys_only:
+            sqlite_side = backup if backup.kind == 'sqlite' else source
+            table = backup_map[name] if sqlite_side is backup else source_map[name]
+            columns = _columns(sqlite_side.path, table)
+
+        tasks.append({
+            'name': name,
+            'columns': columns,
+            'keys_only': keys_only,
+            'backup': {'kind': backup.kind, 'path': backup.path, 'table': backup_map[name]},
+            'source': {'kind': source.kind, 'path': source.path, 'table': source_map[name]},
+        })
+    return tasks, notes
+
+
+def _columns(path, table):
+    conn = db.connect(path, row_factory=None)
+    try:
+        return db.table_columns(conn, table)
+    finally:
+        conn.close()
+
+
+def print_report(report):
+    print('═' * 78)
+    print('  VERIFICAÇÃO DE BACKUP')
+    print('═' * 78)
+    print(f"  Backup: {report['backup']}")
+    print(f"  Origem: {report['source']}")
+    if report['keys_only']:
+        print('  Modo:   somente IDs (esquemas diferentes: desktop x servidor)')
+    print()
+
+    for check in report['integrity']:
+        status = '✅' if check['ok'] else '❌'
+        print(f"  {status} integridade {check['label']}: {', '.join(check['messages'][:3])} ({check['seconds']}s)")
+    for label, problems in report['problems'].items():
+        for problem in problems:
+            print(f'  ❌ {label}: {problem}')
+    print()
+
+    print(f"  {'TABELA':<28} {'BACKUP':>10} {'ORIGEM':>10}  {'TEMPO':>7}  STATUS")
+    print('  ' + '─' * 74)
+    for table in report['tables']:
+        if table['match']:
+            status = '✅ ok'
+        else:
+            status = (f"❌ -{table['missing_in_backup']} +{table['extra_in_backup']} "
+                      f"~{table['changed']}")
+        print(f"  {table['table']:<28} {table['backup_count']:>10} {table['source_count']:>10}  "
+              f"{table['seconds']:>6.2f}s  {status}")
+    print()
+
+    for table in report['tables']:
+        if table['match']:
+            continue
+        print(f"  {table['table']}:")
+        for key, label in (('sample_missing', 'ausentes no backup'),
+                           ('sample_extra', 'só no backup'),
+                           ('sample_changed', 'alterados')):
+            if table[key]:
+                print(f"     {label}: {', '.join(table[key])}")
+    for note in report['notes']:
+        extra = ''
+        if note.get('only_backup') or note.get('only_source'):
+            extra = f" (backup: {note.get('only_backup')}, origem: {note.get('only_source')})"
+        print(f"  ⚠️  {note['table']}: {note['issue']}{extra}")
+
+    summary = report['summary']
+    print()
+    print(f"  Tabelas: {summary['tables']} | Iguais: {summary['matching']} | "
+          f"Divergentes: {summary['different']} | Tempo total: {summary['seconds']}s")
+
+
+def verify(backup_path, source_path, jobs=None, quick=False, snapshot_source=True):
+    started = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix='barmanager-verify-')
+    try:
+        backup = open_dataset(backup_path, workdir, 'backup', snapshot_live=False)
+        source = open_dataset(source_path, workdir, 'source', snapshot_live=snapshot_source)
+        tasks, notes = plan_tables(backup, source)
+
+        integrity, tables = [], []
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                pool.submit(integrity_worker, dataset.label, dataset.path, quick)
+                for dataset in (backup, source) if dataset.kind == 'sqlite'
+            ]
+            futures += [pool.submit(table_worker, task) for task in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                if 'table' in result:
+                    tables.append(result)
+                    mark = '✓' if result['match'] else '✗'
+                    print(f"  {mark} {result['table']} ({result['seconds']}s)", file=sys.stderr)
+                else:
+                    integrity.append(result)
+
+        tables.sort(key=lambda t: t['table'])
+        different = [t for t in tables if not t['match']]
+        return {
+            'backup': backup_path,
+            'source': source_path,
+            'keys_only': backup.kind != source.kind,
+            'integrity': integrity,
+            'problems': {d.label: d.problems for d in (backup, source) if d.problems},
+            'tables': tables,
+            'notes': notes,
+            'summary': {
+                'tables': len(tables),
+                'matching': len(tables) - len(different),
+                'different': len(different),
+                'seconds': round(time.perf_counter() - started, 2),
+            },
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verifica um backup contra o banco de origem ou outro backup')
+    parser.add_argument('backup', help='Backup a verificar (.db, .gz incremental, .json ou .ndjson.gz)')
+    parser.add_argument('--source', default=None, help='Banco/backup de referência (padrão: barmanager.db local)')
+    parser.add_argument('--jobs', type=int, default=None, help='Processos em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--quick', action='store_true', help='Usar PRAGMA quick_check em vez de integrity_check')
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help='Ler a origem SQLite direto, sem snapshot (só se o app estiver fechado)')
+    parser.add_argument('--json', dest='json_path', help='Gravar o relatório completo em JSON')
+    args = parser.parse_args(argv)
+
+    report = verify(
+        args.backup,
+        args.source or db.default_db_path(),
+        jobs=args.jobs,
+        quick=args.quick,
+        snapshot_source=not args.no_snapshot,
+    )
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'\n  Relatório salvo em {args.json_path}')
+
+    if report['problems'] or not all(check['ok'] for check in report['integrity']):
+        return 2
+    return 0 if report['summary']['different'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,801 @@
+"""
+Armazém analítico (SQLite) alimentado pelos bancos do desktop.
+
+Carrega vendas, itens, pagamentos, compras, itens de compra, dívidas, caixas
+e sessões de mesa de um ou vários bancos de filial para um arquivo separado
+em esquema estrela:
+
+- dimensões: dim_date, dim_branch, dim_product, dim_customer, dim_user
+  (chave inteira + id original)
+- fatos: fact_sales, fact_sale_items, fact_payments, fact_purchases,
+  fact_purchase_items, fact_debts, fact_cash_boxes, fact_table_sessions,
+  com índices de cobertura para as visões
+- visões agregadas: margem por produto/semana, desempenho de caixa (operador)
+  por dia, mix de pagamentos, idade das dívidas, compras por semana,
+  diferenças de caixa e giro de mesas
+
+A carga é incremental: para cada banco de origem e entidade fica uma marca
+d'água (maior updated_at lido, ou maior rowid em payments) em etl_watermarks.
+Pagamentos já carregados são relidos quando a venda ou a dívida deles muda.
+Cada origem é anexada somente leitura (ATTACH mode=ro) e carregada numa
+transação, com INSERT ... SELECT ... ON CONFLICT DO UPDATE (o registro com
+updated_at mais novo vence; a mesma venda vinda de duas filiais por sync vira
+uma linha só). Linhas apagadas na origem não são removidas; use --full para
+recarregar tudo.
+
+Limitação: a carga só vê alterações que mudam updated_at. Em caixas e sessões
+de mesa o desktop fecha sem carimbar updated_at, então ali vale o maior entre
+updated_at e closed_at (fact_*.updated_at guarda esse valor); outras edições
+dessas linhas que não mexem em nenhum dos dois só entram com --full. O mesmo
+vale para um pagamento editado sem alterar a venda ou a dívida (o trigger de
+last_payment_method não carimba sales.updated_at).
+
+Uso:
+    python -m barmanager_tools.warehouse load
+    python -m barmanager_tools.warehouse load --dir snapshots/ --warehouse armazem.db
+    python -m barmanager_tools.warehouse load --manifest filiais.json --full
+    python -m barmanager_tools.warehouse show v_product_margin_week --limit 20
+    python -m barmanager_tools.warehouse show v_debt_aging --csv dividas.csv
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from . import db
+from .fleet import discover_branches, load_manifest
+
+DEFAULT_WAREHOUSE = 'barmanager_warehouse.db'
+
+# ----------------------------------------------------------------------
+# Esquema do armazém
+# ----------------------------------------------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS etl_sources (
+    source_key INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    path TEXT,
+    loaded_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS etl_watermarks (
+    source_key INTEGER NOT NULL,
+    entity TEXT NOT NULL,
+    watermark TEXT,
+    rows_loaded INTEGER DEFAULT 0,
+    loaded_at TEXT,
+    PRIMARY KEY (source_key, entity)
+);
+
+CREATE TABLE IF NOT EXISTS dim_date (
+    date_key INTEGER PRIMARY KEY,      -- AAAAMMDD
+    date TEXT NOT NULL,
+    year INTEGER,
+    month TEXT,                        -- AAAA-MM
+    week_start TEXT,                   -- segunda-feira da semana
+    weekday INTEGER                    -- 0 = domingo
+);
+
+CREATE TABLE IF NOT EXISTS dim_branch (
+    branch_key INTEGER PRIMARY KEY,
+    branch_id TEXT UNIQUE NOT NULL,
+    code TEXT,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS dim_product (
+    product_key INTEGER PRIMARY KEY,
+    product_id TEXT UNIQUE NOT NULL,
+    sku TEXT,
+    name TEXT,
+    category TEXT,
+    supplier_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS dim_customer (
+    customer_key INTEGER PRIMARY KEY,
+    customer_id TEXT UNIQUE NOT NULL,
+    code TEXT,
+    full_name TEXT,
+    phone TEXT
+);
+
+CREATE TABLE IF NOT EXISTS dim_user (
+    user_key INTEGER PRIMARY KEY,
+    user_id TEXT UNIQUE NOT NULL,
+    username TEXT,
+    full_name TEXT,
+    role TEXT
+);
+
+CREATE TABLE IF NOT EXISTS fact_sales (
+    sale_id TEXT PRIMARY KEY,
+    source_key INTEGER,
+    date_key INTEGER,
+    branch_key INTEGER,
+    cashier_key INTEGER,
+    customer_key INTEGER,
+    sale_number TEXT,
+    type TEXT,
+    status TEXT,
+    payment_method TEXT,
+    subtotal INTEGER,
+    discount_total INTEGER,
+    tax_total INTEGER,
+    total INTEGER,
+    muntu_savings INTEGER,
+    created_at TEXT,
+    updated_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_sale_items (
+    item_id TEXT PRIMARY KEY,
+    sale_id TEXT,
+    source_key INTEGER,
+    date_key INTEGER,                  -- data da venda
+    branch_key INTEGER,
+    cashier_key INTEGER,
+    product_key INTEGER,
+    sale_status TEXT,                  -- copiado da venda (filtro sem join)
+    qty_units INTEGER,
+    unit_price INTEGER,
+    unit_cost INTEGER,
+    revenue INTEGER,
+    cost INTEGER,
+    is_muntu INTEGER,
+    updated_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_payments (
+    payment_id TEXT PRIMARY KEY,
+    source_key INTEGER,
+    sale_id TEXT,
+    debt_id TEXT,
+    date_key INTEGER,
+    branch_key INTEGER,
+    method TEXT,
+    status TEXT,
+    amount INTEGER,
+    created_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_purchases (
+    purchase_id TEXT PRIMARY KEY,
+    source_key INTEGER,
+    date_key INTEGER,
+    branch_key INTEGER,
+    supplier_id TEXT,
+    purchase_number TEXT,
+    status TEXT,
+    payment_status TEXT,
+    total INTEGER,
+    created_at TEXT,
+    updated_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_purchase_items (
+    item_id TEXT PRIMARY KEY,
+    purchase_id TEXT,
+    source_key INTEGER,
+    date_key INTEGER,
+    branch_key INTEGER,
+    product_key INTEGER,
+    purchase_status TEXT,
+    qty_units INTEGER,
+    unit_cost INTEGER,
+    total INTEGER,
+    updated_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_debts (
+    debt_id TEXT PRIMARY KEY,
+    source_key INTEGER,
+    date_key INTEGER,
+    branch_key INTEGER,
+    customer_key INTEGER,
+    debt_number TEXT,
+    sale_id TEXT,
+    status TEXT,
+    original_amount INTEGER,
+    paid_amount INTEGER,
+    balance INTEGER,
+    due_date TEXT,
+    created_at TEXT,
+    updated_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_cash_boxes (
+    cash_box_id TEXT PRIMARY KEY,
+    source_key INTEGER,
+    date_key INTEGER,                  -- abertura
+    branch_key INTEGER,
+    opened_by_key INTEGER,
+    closed_by_key INTEGER,
+    box_number TEXT,
+    status TEXT,
+    opening_cash INTEGER,
+    total_sales INTEGER,
+    total_cash INTEGER,
+    total_card INTEGER,
+    total_mobile_money INTEGER,
+    total_debt INTEGER,
+    closing_cash INTEGER,
+    difference INTEGER,
+    opened_at TEXT,
+    closed_at TEXT,
+    updated_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fact_table_sessions (
+    session_id TEXT PRIMARY KEY,
+    source_key INTEGER,
+    date_key INTEGER,
+    branch_key INTEGER,
+    opened_by_key INTEGER,
+    table_id TEXT,
+    status TEXT,
+    total_amount INTEGER,
+    paid_amount INTEGER,
+    minutes_open REAL,
+    opened_at TEXT,
+    closed_at TEXT,
+    updated_at TEXT
+) WITHOUT ROWID;
+
+-- Índices de cobertura: cada visão lê só o índice
+CREATE INDEX IF NOT EXISTS ix_fact_sale_items_margin
+    ON fact_sale_items(date_key, branch_key, product_key, sale_status, qty_units, revenue, cost);
+CREATE INDEX IF NOT EXISTS ix_fact_sale_items_sale ON fact_sale_items(sale_id);
+CREATE INDEX IF NOT EXISTS ix_fact_sales_cashier
+    ON fact_sales(date_key, branch_key, cashier_key, status, total, discount_total);
+CREATE INDEX IF NOT EXISTS ix_fact_payments_mix
+    ON fact_payments(date_key, branch_key, method, status, amount);
+CREATE INDEX IF NOT EXISTS ix_fact_debts_aging
+    ON fact_debts(status, branch_key, customer_key, date_key, balance);
+CREATE INDEX IF NOT EXISTS ix_fact_purchase_items_week
+    ON fact_purchase_items(date_key, branch_key, product_key, purchase_status, qty_units, total);
+CREATE INDEX IF NOT EXISTS ix_fact_purchase_items_purchase ON fact_purchase_items(purchase_id);
+CREATE INDEX IF NOT EXISTS ix_fact_cash_boxes_date ON fact_cash_boxes(date_key, branch_key);
+CREATE INDEX IF NOT EXISTS ix_fact_table_sessions_date
+    ON fact_table_sessions(date_key, branch_key, status, total_amount, minutes_open);
+"""
+
+VIEWS = {
+    'v_product_margin_week': """
+        SELECT d.week_start, b.name AS branch, p.sku, p.name AS product,
+               SUM(i.qty_units) AS qty, SUM(i.revenue) AS revenue, SUM(i.cost) AS cost,
+               SUM(i.revenue - i.cost) AS margin,
+               ROUND(100.0 * SUM(i.revenue - i.cost) / NULLIF(SUM(i.revenue), 0), 2) AS margin_pct
+        FROM fact_sale_items i
+        JOIN dim_date d ON d.date_key = i.date_key
+        LEFT JOIN dim_branch b ON b.branch_key = i.branch_key
+        LEFT JOIN dim_product p ON p.product_key = i.product_key
+        WHERE COALESCE(i.sale_status, '') NOT IN ('cancelled', 'canceled')
+        GROUP BY d.week_start, i.branch_key, i.product_key
+    """,
+    'v_cashier_day': """
+        SELECT d.date, b.name AS branch, u.full_name AS cashier,
+               COUNT(*) AS sales, SUM(s.total) AS total,
+               ROUND(1.0 * SUM(s.total) / COUNT(*), 0) AS avg_ticket,
+               SUM(s.discount_total) AS discounts
+        FROM fact_sales s
+        JOIN dim_date d ON d.date_key = s.date_key
+        LEFT JOIN dim_branch b ON b.branch_key = s.branch_key
+        LEFT JOIN dim_user u ON u.user_key = s.cashier_key
+        WHERE COALESCE(s.status, '') NOT IN ('cancelled', 'canceled')
+        GROUP BY s.date_key, s.branch_key, s.cashier_key
+    """,
+    'v_payment_mix_day': """
+        SELECT d.date, b.name AS branch, p.method, COUNT(*) AS payments, SUM(p.amount) AS amount
+        FROM fact_payments p
+        JOIN dim_date d ON d.date_key = p.date_key
+        LEFT JOIN dim_branch b ON b.branch_key = p.branch_key
+        WHERE COALESCE(p.status, 'completed') = 'completed'
+        GROUP BY p.date_key, p.branch_key, p.method
+    """,
+    'v_debt_aging': """
+        SELECT b.name AS branch, c.code AS customer_code, c.full_name AS customer,
+               COUNT(*) AS debts, SUM(x.balance) AS balance,
+               SUM(CASE WHEN x.age_days <= 30 THEN x.balance ELSE 0 END) AS d0_30,
+               SUM(CASE WHEN x.age_days BETWEEN 31 AND 60 THEN x.balance ELSE 0 END) AS d31_60,
+               SUM(CASE WHEN x.age_days BETWEEN 61 AND 90 THEN x.balance ELSE 0 END) AS d61_90,
+               SUM(CASE WHEN x.age_days > 90 THEN x.balance ELSE 0 END) AS d90_plus,
+               MAX(x.age_days) AS oldest_days
+        FROM (
+            SELECT f.branch_key, f.customer_key, f.balance,
+                   CAST(julianday('now') - julianday(d.date) AS INTEGER) AS age_days
+            FROM fact_debts f
+            JOIN dim_date d ON d.date_key = f.date_key
+            WHERE f.status NOT IN ('paid', 'cancelled', 'canceled') AND f.balance > 0
+        ) x
+        LEFT JOIN dim_branch b ON b.branch_key = x.branch_key
+        LEFT JOIN dim_customer c ON c.customer_key = x.customer_key
+        GROUP BY x.branch_key, x.customer_key
+    """,
+    'v_purchases_week': """
+        SELECT d.week_start, b.name AS branch, p.sku, p.name AS product,
+               SUM(i.qty_units) AS qty, SUM(i.total) AS total,
+               ROUND(1.0 * SUM(i.total) / NULLIF(SUM(i.qty_units), 0), 2) AS avg_unit_cost
+        FROM fact_purchase_items i
+        JOIN dim_date d ON d.date_key = i.date_key
+        LEFT JOIN dim_branch b ON b.branch_key = i.branch_key
+        LEFT JOIN dim_product p ON p.product_key = i.product_key
+        WHERE i.purchase_status IN ('completed', 'received')
+        GROUP BY d.week_start, i.branch_key, i.product_key
+    """,
+    'v_cash_box_differences': """
+        SELECT d.date, b.name AS branch, c.box_number, uo.full_name AS opened_by, uc.full_name AS closed_by,
+               c.total_sales, c.total_cash, c.closing_cash, c.difference
+        FROM fact_cash_boxes c
+        JOIN dim_date d ON d.date_key = c.date_key
+        LEFT JOIN dim_branch b ON b.branch_key = c.branch_key
+        LEFT JOIN dim_user uo ON uo.user_key = c.opened_by_key
+        LEFT JOIN dim_user uc ON uc.user_key = c.closed_by_key
+        WHERE c.status = 'closed'
+    """,
+    'v_table_turnover_day': """
+        SELECT d.date, b.name AS branch, COUNT(*) AS sessions,
+               SUM(t.total_amount) AS total,
+               ROUND(AVG(t.total_amount), 0) AS avg_ticket,
+               ROUND(AVG(t.minutes_open), 1) AS avg_minutes
+        FROM fact_table_sessions t
+        JOIN dim_date d ON d.date_key = t.date_key
+        LEFT JOIN dim_branch b ON b.branch_key = t.branch_key
+        WHERE t.status = 'closed'
+        GROUP BY t.date_key, t.branch_key
+    """,
+}
+
+# ----------------------------------------------------------------------
+# Origem: visões temporárias com colunas fixas sobre o banco anexado.
+# Bancos antigos sem alguma coluna recebem NULL no lugar.
+# ----------------------------------------------------------------------
+SOURCE_COLUMNS = {
+    'branches': ['id', 'code', 'name'],
+    'categories': ['id', 'name'],
+    'products': ['id', 'sku', 'name', 'category_id', 'supplier_id'],
+    'customers': ['id', 'code', 'full_name', 'phone'],
+    'users': ['id', 'username', 'full_name', 'role'],
+    'sales': ['id', 'sale_number', 'branch_id', 'type', 'customer_id', 'cashier_id', 'status', 'subtotal',
+              'tax_total', 'discount_total', 'total', 'muntu_savings', 'payment_method', 'last_payment_method',
+              'created_at', 'updated_at'],
+    'sale_items': ['id', 'sale_id', 'product_id', 'qty_units', 'is_muntu', 'unit_price', 'unit_cost', 'total',
+                   'created_at', 'updated_at'],
+    'payments': ['id', 'sale_id', 'debt_id', 'method', 'amount', 'status', 'created_at'],
+    'purchases': ['id', 'purchase_number', 'branch_id', 'supplier_id', 'status', 'payment_status', 'total',
+                  'created_at', 'updated_at'],
+    'purchase_items': ['id', 'purchase_id', 'product_id', 'qty_units', 'unit_cost', 'total', 'created_at',
+                       'updated_at'],
+    'debts': ['id', 'debt_number', 'customer_id', 'sale_id', 'branch_id', 'original_amount', 'paid_amount',
+              'balance', 'status', 'due_date', 'created_at', 'updated_at'],
+    'cash_boxes': ['id', 'box_number', 'branch_id', 'opened_by', 'closed_by', 'status', 'opening_cash',
+                   'total_sales', 'total_cash', 'total_card', 'total_mobile_money', 'total_debt', 'closing_cash',
+                   'difference', 'opened_at', 'closed_at', 'created_at', 'updated_at'],
+    'table_sessions': ['id', 'table_id', 'branch_id', 'status', 'opened_by', 'opened_at', 'closed_at',
+                       'total_amount', 'paid_amount', 'created_at', 'updated_at'],
+}
+# Datas do desktop vêm como 'AAAA-MM-DD HH:MM:SS' ou ISO do servidor ('...T...Z')
+TIMESTAMP_COLUMNS = {'created_at', 'updated_at', 'opened_at', 'closed_at'}
+# O desktop fecha caixas (closeCashBox) e sessões de mesa (transferência,
+# junção e divisão) sem carimbar updated_at: nestas tabelas o updated_at da
+# visão src_* é o maior entre updated_at e closed_at, e a marca d'água pega o fechamento
+CHANGED_AT_COLUMNS = {
+    'cash_boxes': ('updated_at', 'closed_at'),
+    'table_sessions': ('updated_at', 'closed_at'),
+}
+
+DIMENSIONS = [
+    ('dim_branch', 'branches', """
+        INSERT INTO dim_branch (branch_id, code, name)
+        SELECT id, code, name FROM src_branches WHERE id IS NOT NULL
+        ON CONFLICT(branch_id) DO UPDATE SET code = excluded.code, name = excluded.name
+    """),
+    ('dim_product', 'products', """
+        INSERT INTO dim_product (product_id, sku, name, category, supplier_id)
+        SELECT p.id, p.sku, p.name, c.name, p.supplier_id
+        FROM src_products p LEFT JOIN src_categories c ON c.id = p.category_id
+        WHERE p.id IS NOT NULL
+        ON CONFLICT(product_id) DO UPDATE SET sku = excluded.sku, name = excluded.name,
+            category = excluded.category, supplier_id = excluded.supplier_id
+    """),
+    ('dim_customer', 'customers', """
+        INSERT INTO dim_customer (customer_id, code, full_name, phone)
+        SELECT id, code, full_name, phone FROM src_customers WHERE id IS NOT NULL
+        ON CONFLICT(customer_id) DO UPDATE SET code = excluded.code, full_name = excluded.full_name,
+            phone = excluded.phone
+    """),
+    ('dim_user', 'users', """
+        INSERT INTO dim_user (user_id, username, full_name, role)
+        SELECT id, username, full_name, role FROM src_users WHERE id IS NOT NULL
+        ON CONFLICT(user_id) DO UPDATE SET username = excluded.username, full_name = excluded.full_name,
+            role = excluded.role
+    """),
+]
+
+BRANCH = '(SELECT branch_key FROM dim_branch WHERE branch_id = s.branch_id)'
+DATE_KEY = "CAST(strftime('%Y%m%d', {col}) AS INTEGER)"
+
+
+def _user(col):
+    return f'(SELECT user_key FROM dim_user WHERE user_id = s.{col})'
+
+
+# Ordem importa: itens depois do cabeçalho (herdam data, filial e status),
+# pagamentos depois de vendas e dívidas (herdam a filial)
+FACTS = [
+    {
+        'entity': 'sales', 'table': 'fact_sales', 'key': 'sale_id', 'watermark': 'updated_at',
+        'columns': {
+            'sale_id': 's.id', 'source_key': ':source_key', 'date_key': DATE_KEY.format(col='s.created_at'),
+            'branch_key': BRANCH, 'cashier_key': _user('cashier_id'),
+            'customer_key': '(SELECT customer_key FROM dim_customer WHERE customer_id = s.customer_id)',
+            'sale_number': 's.sale_number', 'type': 's.type', 'status': 's.status',
+            'payment_method': 'COALESCE(s.last_payment_method, s.payment_method)',
+            'subtotal': 's.subtotal', 'discount_total': 's.discount_total', 'tax_total': 's.tax_total',
+            'total': 's.total', 'muntu_savings': 's.muntu_savings',
+            'created_at': 's.created_at', 'updated_at': 's.updated_at',
+        },
+    },
+    {
+        'entity': 'sale_items', 'table': 'fact_sale_items', 'key': 'item_id', 'watermark': 'updated_at',
+        'join': 'LEFT JOIN fact_sales h ON h.sale_id = s.sale_id',
+        'columns': {
+            'item_id': 's.id', 'sale_id': 's.sale_id', 'source_key': ':source_key',
+            'date_key': 'COALESCE(h.date_key, ' + DATE_KEY.format(col='s.created_at') + ')',
+            'branch_key': 'h.branch_key', 'cashier_key': 'h.cashier_key',
+            'product_key': '(SELECT product_key FROM dim_product WHERE product_id = s.product_id)',
+            'sale_status': 'h.status', 'qty_units': 's.qty_units', 'unit_price': 's.unit_price',
+            'unit_cost': 's.unit_cost', 'revenue': 's.total', 'cost': 's.qty_units * s.unit_cost',
+            'is_muntu': 's.is_muntu', 'updated_at': 's.updated_at',
+        },
+        # Venda alterada (cancelada, fechada) nesta carga: propagar para os itens
+        'after': """
+            UPDATE fact_sale_items
+            SET sale_status = h.status, date_key = h.date_key, branch_key = h.branch_key,
+                cashier_key = h.cashier_key
+            FROM fact_sales h
+            WHERE h.sale_id = fact_sale_items.sale_id
+              AND h.sale_id IN (SELECT id FROM src_sales WHERE updated_at >= :sales_watermark)
+        """,
+    },
+    {
+        'entity': 'purchases', 'table': 'fact_purchases', 'key': 'purchase_id', 'watermark': 'updated_at',
+        'columns': {
+            'purchase_id': 's.id', 'source_key': ':source_key', 'date_key': DATE_KEY.format(col='s.created_at'),
+            'branch_key': BRANCH, 'supplier_id': 's.supplier_id', 'purchase_number': 's.purchase_number',
+            'status': 's.status', 'payment_status': 's.payment_status', 'total': 's.total',
+            'created_at': 's.created_at', 'updated_at': 's.updated_at',
+        },
+    },
+    {
+        'entity': 'purchase_items', 'table': 'fact_purchase_items', 'key': 'item_id', 'watermark': 'updated_at',
+        'join': 'LEFT JOIN fact_purchases h ON h.purchase_id = s.purchase_id',
+        'columns': {
+            'item_id': 's.id', 'purchase_id': 's.purchase_id', 'source_key': ':source_key',
+            'date_key': 'COALESCE(h.date_key, ' + DATE_KEY.format(col='s.created_at') + ')',
+            'branch_key': 'h.branch_key',
+            'product_key': '(SELECT product_key FROM dim_product WHERE product_id = s.product_id)',
+            'purchase_status': 'h.status', 'qty_units': 's.qty_units', 'unit_cost': 's.unit_cost',
+            'total': 's.total', 'updated_at': 's.updated_at',
+        },
+        'after': """
+            UPDATE fact_purchase_items
+            SET purchase_status = h.status, date_key = h.date_key, branch_key = h.branch_key
+            FROM fact_purchases h
+            WHERE h.purchase_id = fact_purchase_items.purchase_id
+              AND h.purchase_id IN (SELECT id FROM src_purchases WHERE updated_at >= :purchases_watermark)
+        """,
+    },
+    {
+        'entity': 'debts', 'table': 'fact_debts', 'key': 'debt_id', 'watermark': 'updated_at',
+        'columns': {
+            'debt_id': 's.id', 'source_key': ':source_key', 'date_key': DATE_KEY.format(col='s.created_at'),
+            'branch_key': BRANCH,
+            'customer_key': '(SELECT customer_key FROM dim_customer WHERE customer_id = s.customer_id)',
+            'debt_number': 's.debt_number', 'sale_id': 's.sale_id', 'status': 's.status',
+            'original_amount': 's.original_amount', 'paid_amount': 's.paid_amount', 'balance': 's.balance',
+            'due_date': 's.due_date', 'created_at': 's.created_at', 'updated_at': 's.updated_at',
+        },
+    },
+    {
+        'entity': 'cash_boxes', 'table': 'fact_cash_boxes', 'key': 'cash_box_id', 'watermark': 'updated_at',
+        'columns': {
+            'cash_box_id': 's.id', 'source_key': ':source_key',
+            'date_key': DATE_KEY.format(col='COALESCE(s.opened_at, s.created_at)'),
+            'branch_key': BRANCH, 'opened_by_key': _user('opened_by'), 'closed_by_key': _user('closed_by'),
+            'box_number': 's.box_number', 'status': 's.status', 'opening_cash': 's.opening_cash',
+            'total_sales': 's.total_sales', 'total_cash': 's.total_cash', 'total_card': 's.total_card',
+            'total_mobile_money': 's.total_mobile_money', 'total_debt': 's.total_debt',
+            'closing_cash': 's.closing_cash', 'difference': 's.difference',
+            'opened_at': 's.opened_at', 'closed_at': 's.closed_at', 'updated_at': 's.updated_at',
+        },
+    },
+    {
+        'entity': 'table_sessions', 'table': 'fact_table_sessions', 'key': 'session_id', 'watermark': 'updated_at',
+        'columns': {
+            'session_id': 's.id', 'source_key': ':source_key',
+            'date_key': DATE_KEY.format(col='COALESCE(s.opened_at, s.created_at)'),
+            'branch_key': BRANCH, 'opened_by_key': _user('opened_by'), 'table_id': 's.table_id',
+            'status': 's.status', 'total_amount': 's.total_amount', 'paid_amount': 's.paid_amount',
+            'minutes_open': 'ROUND((julianday(s.closed_at) - julianday(s.opened_at)) * 1440, 1)',
+            'opened_at': 's.opened_at', 'closed_at': 's.closed_at', 'updated_at': 's.updated_at',
+        },
+    },
+    {
+        'entity': 'payments', 'table': 'fact_payments', 'key': 'payment_id', 'watermark': 'rowid',
+        # payments não tem updated_at: além das linhas novas, recarrega os
+        # pagamentos das vendas e dívidas alteradas nesta carga (o pull corrige
+        # o método com UPDATE payments junto com o status da venda)
+        'reload': 's.sale_id IN (SELECT id FROM src_sales WHERE updated_at >= :sales_watermark) '
+                  'OR s.debt_id IN (SELECT id FROM src_debts WHERE updated_at >= :debts_watermark)',
+        'join': 'LEFT JOIN fact_sales h ON h.sale_id = s.sale_id '
+                'LEFT JOIN fact_debts dd ON dd.debt_id = s.debt_id',
+        'columns': {
+            'payment_id': 's.id', 'source_key': ':source_key', 'sale_id': 's.sale_id', 'debt_id': 's.debt_id',
+            'date_key': DATE_KEY.format(col='s.created_at'),
+            'branch_key': 'COALESCE(h.branch_key, dd.branch_key)',
+            'method': 's.method', 'status': 's.status', 'amount': 's.amount', 'created_at': 's.created_at',
+        },
+    },
+]
+
+
+def fact_sql(fact):
+    columns = fact['columns']
+    names = ', '.join(columns)
+    values = ',\n               '.join(columns.values())
+    updates = ', '.join(f'{c} = excluded.{c}' for c in columns if c != fact['key'])
+    if fact['watermark'] == 'rowid':
+        where = 's.src_rowid > CAST(:watermark AS INTEGER)'
+    else:
+        where = 's.updated_at >= :watermark'
+    if fact.get('reload'):
+        where = f"{where} OR {fact['reload']}"
+    # Registro mais novo vence (a mesma venda pode vir de mais de uma filial)
+    newer = f"WHERE excluded.updated_at >= COALESCE({fact['table']}.updated_at, '')" if 'updated_at' in columns else ''
+    return f"""
+        INSERT INTO {fact['table']} ({names})
+        SELECT {values}
+        FROM src_{fact['entity']} s {fact.get('join', '')}
+        WHERE {where}
+        ON CONFLICT({fact['key']}) DO UPDATE SET {updates}
+        {newer}
+    """
+
+
+# ----------------------------------------------------------------------
+# Carga
+# ----------------------------------------------------------------------
+def open_warehouse(path):
+    uri = 'file:' + os.path.abspath(path).replace('\\', '/')
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript(SCHEMA)
+    for name, sql in VIEWS.items():
+        conn.execute(f'CREATE VIEW IF NOT EXISTS {name} AS {sql}')
+    return conn
+
+
+def _timestamp(col):
+    return f"substr(replace({col}, 'T', ' '), 1, 19)"
+
+
+def attach_source(conn, path):
+    """Anexa o banco da filial somente leitura e cria as visões src_* com colunas fixas."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'Banco não encontrado: {path}')
+    uri = 'file:' + os.path.abspath(path).replace('\\', '/') + '?mode=ro'
+    conn.execute('ATTACH DATABASE ? AS src', (uri,))
+    existing = {row[0] for row in conn.execute("SELECT name FROM src.sqlite_master WHERE type = 'table'")}
+    for table, wanted in SOURCE_COLUMNS.items():
+        have = set()
+        if table in existing:
+            have = {row[1] for row in conn.execute(f'PRAGMA src.table_info({db.quote_ident(table)})')}
+        select = []
+        for col in wanted:
+            if col not in have:
+                select.append(f'NULL AS {col}')
+            elif col == 'updated_at' and table in CHANGED_AT_COLUMNS:
+                stamps = [_timestamp(c) for c in CHANGED_AT_COLUMNS[table] if c in have]
+                latest = ', '.join(f"COALESCE({stamp}, '')" for stamp in stamps)
+                select.append(f"NULLIF(MAX({latest}, ''), '') AS {col}")
+            elif col in TIMESTAMP_COLUMNS:
+                select.append(f'{_timestamp(col)} AS {col}')
+            else:
+                select.append(col)
+        if table in existing:
+            body = f"SELECT rowid AS src_rowid, {', '.join(select)} FROM src.{db.quote_ident(table)}"
+        else:
+            body = f"SELECT NULL AS src_rowid, {', '.join(select)} WHERE 0"
+        conn.execute(f'DROP VIEW IF EXISTS temp.src_{table}')
+        conn.execute(f'CREATE TEMP VIEW src_{table} AS {body}')
+
+
+def detach_source(conn):
+    for table in SOURCE_COLUMNS:
+        conn.execute(f'DROP VIEW IF EXISTS temp.src_{table}')
+    conn.execute('DETACH DATABASE src')
+
+
+def source_key(conn, name, path):
+    conn.execute(
+        'INSERT INTO etl_sources (name, path) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET path = excluded.path',
+        (name, os.path.abspath(path)),
+    )
+    return conn.execute('SELECT source_key FROM etl_sources WHERE name = ?', (name,)).fetchone()[0]
+
+
+def load_source(conn, name, path, full=False):
+    """Carrega uma origem numa transação. Devolve {entidade: linhas lidas}."""
+    started = time.perf_counter()
+    key = source_key(conn, name, path)
+    attach_source(conn, path)
+    counts = {}
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for _, _, sql in DIMENSIONS:
+            conn.execute(sql)
+
+        marks = {}
+        if not full:
+            marks = dict(conn.execute(
+                'SELECT entity, watermark FROM etl_watermarks WHERE source_key = ?', (key,)
+            ).fetchall())
+
+        params = {'source_key': key}
+        for fact in FACTS:
+            entity = fact['entity']
+            column = 'src_rowid' if fact['watermark'] == 'rowid' else 'updated_at'
+            start = marks.get(entity)
+            if start is None:
+                start = 0 if fact['watermark'] == 'rowid' else ''
+            params['watermark'] = start
+            params[f'{entity}_watermark'] = start
+            before = conn.total_changes
+            conn.execute(fact_sql(fact), params)
+            counts[entity] = conn.total_changes - before
+            if fact.get('after'):
+                conn.execute(fact['after'], params)
+
+            new_mark = conn.execute(f'SELECT MAX({column}) FROM src_{entity}').fetchone()[0]
+            conn.execute(
+                """INSERT INTO etl_watermarks (source_key, entity, watermark, rows_loaded, loaded_at)
+                   VALUES (?, ?, ?, ?, datetime('now'))
+                   ON CONFLICT(source_key, entity) DO UPDATE SET watermark = excluded.watermark,
+                       rows_loaded = etl_watermarks.rows_loaded + excluded.rows_loaded,
+                       loaded_at = excluded.loaded_at""",
+                (key, entity, new_mark if new_mark is not None else start, counts[entity]),
+            )
+
+        fill_dates(conn)
+        conn.execute("UPDATE etl_sources SET loaded_at = datetime('now') WHERE source_key = ?", (key,))
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        detach_source(conn)
+    counts['seconds'] = round(time.perf_counter() - started, 2)
+    return counts
+
+
+def fill_dates(conn):
+    """dim_date contínua entre a menor e a maior data dos fatos (min/max pelos índices)."""
+    bounds = conn.execute("""
+        SELECT MIN(lo), MAX(hi) FROM (
+            SELECT MIN(date_key) AS lo, MAX(date_key) AS hi FROM fact_sale_items
+            UNION ALL SELECT MIN(date_key), MAX(date_key) FROM fact_sales
+            UNION ALL SELECT MIN(date_key), MAX(date_key) FROM fact_payments
+            UNION ALL SELECT MIN(date_key), MAX(date_key) FROM fact_purchase_items
+            UNION ALL SELECT MIN(date_key), MAX(date_key) FROM fact_debts
+            UNION ALL SELECT MIN(date_key), MAX(date_key) FROM fact_cash_boxes
+            UNION ALL SELECT MIN(date_key), MAX(date_key) FROM fact_table_sessions
+        )
+    """).fetchone()
+    if bounds[0] is None:
+        return
+    lo, hi = (f'{k // 10000:04d}-{k // 100 % 100:02d}-{k % 100:02d}' for k in bounds)
+    conn.execute("""
+        WITH RECURSIVE days(d) AS (
+            SELECT date(?) UNION ALL SELECT date(d, '+1 day') FROM days WHERE d < date(?)
+        )
+        INSERT OR IGNORE INTO dim_date (date_key, date, year, month, week_start, weekday)
+        SELECT CAST(strftime('%Y%m%d', d) AS INTEGER), d, CAST(strftime('%Y', d) AS INTEGER),
+               strftime('%Y-%m', d),
+               date(d, '-' || ((CAST(strftime('%w', d) AS INTEGER) + 6) % 7) || ' days'),
+               CAST(strftime('%w', d) AS INTEGER)
+        FROM days
+    """, (lo, hi))
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+def print_load(name, counts):
+    rows = ', '.join(f'{entity} {n}' for entity, n in counts.items() if entity != 'seconds' and n)
+    print(f"  {name}: {rows or 'nada novo'} ({counts['seconds']}s)")
+
+
+def show(conn, view, limit=None, csv_path=None):
+    sql = f'SELECT * FROM {view}' + (f' LIMIT {int(limit)}' if limit and not csv_path else '')
+    cursor = conn.execute(sql)
+    columns = [c[0] for c in cursor.description]
+    if csv_path:
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(cursor)
+        print(f'  {view} salvo em {csv_path}')
+        return
+    rows = cursor.fetchall()
+    widths = [max([len(c)] + [len(str(r[i])) for r in rows]) for i, c in enumerate(columns)]
+    print('  ' + '  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  ' + '  '.join(str(v if v is not None else '-').ljust(w) for v, w in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Armazém analítico SQLite com os bancos das filiais')
+    parser.add_argument('--warehouse', default=DEFAULT_WAREHOUSE,
+                        help=f'Arquivo do armazém (padrão: {DEFAULT_WAREHOUSE})')
+    # --warehouse também depois do subcomando (load ... --warehouse armazem.db)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--warehouse', default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', parents=[common], help='Carregar (incremental) um ou mais bancos do desktop')
+    source = load.add_mutually_exclusive_group()
+    source.add_argument('--db', action='append', help='Banco de origem (pode repetir; padrão: banco do desktop)')
+    source.add_argument('--dir', help='Pasta com os bancos das filiais')
+    source.add_argument('--manifest', help='Manifesto JSON/CSV com filial e caminho do banco')
+    load.add_argument('--full', action='store_true', help='Ignorar as marcas d\'água e reler tudo')
+
+    show_cmd = commands.add_parser('show', parents=[common], help='Mostrar uma visão agregada')
+    show_cmd.add_argument('view', nargs='?', choices=sorted(VIEWS), help='Visão (sem nome: listar)')
+    show_cmd.add_argument('--limit', type=int, default=50, help='Linhas no terminal')
+    show_cmd.add_argument('--csv', dest='csv_path', help='Gravar a visão inteira em CSV')
+    args = parser.parse_args(argv)
+
+    conn = open_warehouse(args.warehouse)
+    try:
+        if args.command == 'show':
+            if not args.view:
+                for name in sorted(VIEWS):
+                    print(f'  {name}')
+                return 0
+            show(conn, args.view, args.limit, args.csv_path)
+            return 0
+
+        if args.dir:
+            sources = discover_branches(args.dir)
+        elif args.manifest:
+            sources = load_manifest(args.manifest)
+        else:
+            paths = args.db or [db.default_db_path()]
+            sources = {}
+            for path in paths:
+                name = os.path.splitext(os.path.basename(path))[0]
+                if name == 'barmanager':
+                    name = os.path.basename(os.path.dirname(os.path.abspath(path))) or name
+                sources[name] = path
+
+        print(f"Carregando {len(sources)} origem(ns) em {args.warehouse} "
+              f"({'completa' if args.full else 'incremental'}) — {datetime.now():%Y-%m-%d %H:%M}")
+        failed = 0
+        for name, path in sources.items():
+            try:
+                print_load(name, load_source(conn, name, path, full=args.full))
+            except (sqlite3.Error, OSError) as exc:
+                failed += 1
+                print(f'  {name}: ERRO {exc}', file=sys.stderr)
+        return 1 if failed else 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
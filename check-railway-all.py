@@ -1,15 +1,11 @@
-import requests
-import json
+from barmanager_tools.api_client import ApiClient
 
 # Login
-r = requests.post('https://barmanagerbackend-production.up.railway.app/api/v1/auth/login', 
-                  json={'email': 'isnatchuda1@gmail.com', 'password': 'isna123'})
-token = r.json().get('accessToken')
-headers = {'Authorization': f'Bearer {token}'}
+client = ApiClient()
+client.login('isnatchuda1@gmail.com', 'isna123')
 
-# Get all inventory items
-inv = requests.get('https://barmanagerbackend-production.up.railway.app/api/v1/inventory', headers=headers)
-data = inv.json()
+# Get all inventory items (GET condicional: 304 reutiliza o cache local)
+data = client.get('/inventory')
 
 print('=== TODOS OS ITENS DE INVENTÁRIO NO RAILWAY ===\n')
 for item in data:
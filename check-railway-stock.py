@@ -1,14 +1,12 @@
-import requests
+from barmanager_tools.api_client import ApiClient
 
 # Login
-r = requests.post('https://barmanagerbackend-production.up.railway.app/api/v1/auth/login', 
-                  json={'email': 'isnatchuda1@gmail.com', 'password': 'isna123'})
-token = r.json().get('accessToken')
-headers = {'Authorization': f'Bearer {token}'}
+client = ApiClient()
+client.login('isnatchuda1@gmail.com', 'isna123')
 
-# Get inventory
-inv = requests.get('https://barmanagerbackend-production.up.railway.app/api/v1/inventory', headers=headers)
-data = inv.json()
+# Get inventory (GET condicional: 304 reutiliza o cache local)
+# Só os campos usados - evita baixar o produto inteiro de cada item
+data = client.get('/inventory', params={'fields': 'productId,qtyUnits,product.name'})
 
 print('=== ESTOQUE RAILWAY (após sync) ===')
 seen = set()
@@ -17,3 +15,5 @@ for item in data:
     if name not in seen:
         print(f"{name}: {item['qtyUnits']} unidades")
         seen.add(name)
+
+print(f"\n(requisições: {client.stats['requests']}, não modificadas: {client.stats['not_modified']})")
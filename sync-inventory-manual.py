@@ -58,7 +58,8 @@ print(f"   Encontrados {len(items)} itens de estoque")
 
 # Buscar estoque atual no Railway para comparar
 print("\n🌐 Buscando estoque atual no Railway...")
-railway_response = requests.get(f'{BASE_URL}/inventory', headers=headers)
+railway_response = requests.get(f'{BASE_URL}/inventory', headers=headers,
+                                params={'fields': 'productId,qtyUnits'})
 if railway_response.status_code == 200:
     railway_inventory = railway_response.json()
     print(f"   Encontrados {len(railway_inventory)} itens no Railway")
@@ -58,7 +58,8 @@ print(f"   Encontrados {len(local_items)} itens de estoque")
 
 # Buscar inventário atual do Railway para obter os IDs corretos
 print("\n🌐 Buscando inventário atual do Railway...")
-railway_response = requests.get(f'{BASE_URL}/inventory', headers=headers)
+railway_response = requests.get(f'{BASE_URL}/inventory', headers=headers,
+                                params={'fields': 'id,productId,qtyUnits'})
 railway_items = railway_response.json()
 print(f"   Encontrados {len(railway_items)} itens no Railway")
 
@@ -156,7 +157,8 @@ print("\n" + "="*50)
 print("🔍 Verificando resultado final...")
 print("="*50)
 
-railway_response = requests.get(f'{BASE_URL}/inventory', headers=headers)
+railway_response = requests.get(f'{BASE_URL}/inventory', headers=headers,
+                                params={'fields': 'productId,qtyUnits,product.name'})
 railway_items = railway_response.json()
 
 seen = set()